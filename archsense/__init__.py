@@ -0,0 +1 @@
+"""Server-side building blocks for the ArchSense Python servers."""
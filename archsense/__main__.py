@@ -0,0 +1,8 @@
+"""Run the ArchSense server: ``python -m archsense --help``."""
+import sys
+
+from archsense.server import main
+
+# Spawned worker processes import this module again under another name
+if __name__ == '__main__':
+    sys.exit(main())
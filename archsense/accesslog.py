@@ -0,0 +1,147 @@
+"""Structured access logging off the request path.
+
+A request thread only appends a tuple to a bounded deque; a writer thread
+turns what has queued up into JSON lines every ``FLUSH_INTERVAL`` seconds
+(sooner once ``BATCH`` records wait) and writes them with one call. A
+line looks like::
+
+    {"ts": 1760870000.123, "method": "GET", "path": "/api/projects", "status": 200,
+     "ms": 1.42, "bytes": 5120, "user": "dev-user-1"}
+
+With a sampling rate below 1 only that share of requests is logged,
+though server errors always are. When the queue is full the record is
+dropped and counted rather than making the request wait; the writer
+notes the running total as ``{"ts": ..., "dropped": n}`` whenever it
+grows.
+
+Files rotate at ``max_bytes`` into ``<path>.1`` ... ``<path>.<backups>``.
+Workers of one server share the file: every batch is a single append and
+rotation happens under a lock file, so each process reopens a file
+another one rotated instead of rotating it again.
+"""
+import fcntl
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+CAPACITY = 10000
+BATCH = 512
+FLUSH_INTERVAL = 0.5
+MAX_BYTES = 64 * 1024 * 1024
+BACKUPS = 5
+FIELDS = ('ts', 'method', 'path', 'status', 'ms', 'bytes', 'user')
+
+
+class AccessLog:
+    """Queue of access records and the thread writing them to ``path`` (``-`` for stderr)."""
+
+    def __init__(self, path, sample=1.0, capacity=CAPACITY, max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.sample = sample
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.logged = 0
+        self.dropped = 0
+        self._written_drops = 0
+        self._queue = deque()
+        self._drop_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+        self._thread.start()
+
+    def record(self, method, path, status, seconds, size, user):
+        """Queue one request; called on the request thread, so it never blocks."""
+        if self.sample < 1 and status < 500 and random.random() >= self.sample:
+            return
+        queue = self._queue
+        # The length check races with other threads, so the bound is approximate
+        if len(queue) >= self.capacity:
+            with self._drop_lock:
+                self.dropped += 1
+            return
+        queue.append((round(time.time(), 3), method, path, status, round(seconds * 1000, 2), size, user))
+        if len(queue) == BATCH:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self._flush()
+
+    def _flush(self):
+        queue = self._queue
+        lines = []
+        while queue:
+            lines.append(json.dumps(dict(zip(FIELDS, queue.popleft())), separators=(',', ':')))
+        records = len(lines)
+        dropped = self.dropped
+        if dropped != self._written_drops:
+            lines.append(json.dumps({'ts': round(time.time(), 3), 'dropped': dropped}, separators=(',', ':')))
+            self._written_drops = dropped
+        if not lines:
+            return
+        data = ('\n'.join(lines) + '\n').encode()
+        try:
+            self._write(data)
+        except OSError as e:
+            print(f'Access log write to {self.path} failed: {e}', file=sys.stderr)
+            return
+        self.logged += records
+
+    def _write(self, data):
+        if self.path == '-':
+            sys.stderr.buffer.write(data)
+            sys.stderr.buffer.flush()
+            return
+        if self._file is not None and not self._current():
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._file = open(self.path, 'ab', buffering=0)
+        size = os.fstat(self._file.fileno()).st_size
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+
+    def _current(self):
+        # Whether the open file is still the one at ``path``, i.e. no other worker rotated it
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        mine = os.fstat(self._file.fileno())
+        return (current.st_dev, current.st_ino) == (mine.st_dev, mine.st_ino)
+
+    def _rotate(self):
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have rotated already; then only reopen
+            if self._current():
+                for i in range(self.backups - 1, 0, -1):
+                    if os.path.exists(f'{self.path}.{i}'):
+                        os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+                os.replace(self.path, f'{self.path}.1')
+            self._file.close()
+            self._file = open(self.path, 'ab', buffering=0)
+
+    def stats(self):
+        return {'path': self.path, 'sample': self.sample, 'queued': len(self._queue), 'logged': self.logged,
+                'dropped': self.dropped}
+
+    def close(self):
+        """Write what is queued and stop the writer."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
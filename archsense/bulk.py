@@ -0,0 +1,320 @@
+"""Streaming NDJSON bulk export and import of the server's stores.
+
+A dump is one JSON object per line, ``{"kind": ..., "data": {...}}``, with
+projects first, then plans, then exports. Records are numbered from 0 in
+dump order, and that number is the offset used to resume an interrupted
+export or import. Both directions work a record at a time, so memory
+stays flat however large the dump is:
+
+* export encodes records lazily and groups them into chunks for HTTP
+  chunked transfer encoding, and
+* import reads the request body incrementally, validates records into
+  batches and hands each complete batch to an ``apply`` callback. A bad
+  line stops the import without touching its batch, so everything before
+  the reported offset is committed and nothing after it is.
+
+Run ``python -m archsense.bulk --help`` for the command-line client.
+"""
+import argparse
+import itertools
+import json
+import math
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from archsense.model import check_plan, plan_body, to_json
+from archsense.store import KINDS
+
+BATCH_SIZE = 500
+# Per kind: fields a record must have as strings, fields that must be numbers if given,
+# and fields that must be strings or null if given
+FIELDS = {
+    'project': (('userId',), ('siteWidthMm', 'siteDepthMm', 'floors'), ('name', 'stylePreset', 'shareSlug')),
+    'plan': (('projectId',), (), ('createdAt',)),
+    'export': (('userId',), (), ('projectId', 'type', 'status', 'fileUri')),
+}
+CHUNK_SIZE = 64 * 1024
+READ_SIZE = 64 * 1024
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=to_json)
+_prefixes = {kind: f'{{"kind":"{kind}","data":'.encode() for kind in KINDS}
+
+
+class RecordError(ValueError):
+    """A dump line that is not a valid record."""
+
+    def __init__(self, number, message):
+        super().__init__(f'record {number}: {message}')
+        self.number = number
+
+
+class BodyError(ValueError):
+    """A request body whose framing is broken."""
+
+
+def _size(text, base, what):
+    try:
+        size = int(text, base)
+    except ValueError:
+        raise BodyError(f'invalid {what} {text[:40]!r}') from None
+    if size < 0:
+        raise BodyError(f'negative {what} {text[:40]!r}')
+    return size
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def check_record(kind, data):
+    """Raise ValueError unless ``data`` has the shape the server relies on for a ``kind`` record."""
+    required, numbers, strings = FIELDS[kind]
+    for key in required:
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"'{key}' must be a string")
+    for key in numbers:
+        if key in data and not _is_number(data[key]):
+            raise ValueError(f"'{key}' must be a number")
+    for key in strings:
+        if data.get(key) is not None and not isinstance(data[key], str):
+            raise ValueError(f"'{key}' must be a string")
+    if kind == 'project' and not isinstance(data.get('isPublic', False), bool):
+        raise ValueError("'isPublic' must be true or false")
+    if kind == 'plan':
+        if not isinstance(data.get('version'), int) or isinstance(data['version'], bool):
+            raise ValueError("'version' must be an integer")
+        if not isinstance(data.get('planJson'), dict):
+            raise ValueError("'planJson' must be an object")
+        check_plan(plan_body(data))
+
+
+def encode(kind, record):
+    return _prefixes[kind] + _encoder.encode(record).encode() + b'}\n'
+
+
+def decode(line, number):
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise RecordError(number, f'invalid JSON ({e})')
+    if not isinstance(record, dict) or record.get('kind') not in KINDS:
+        raise RecordError(number, "expected an object with a 'kind' of " + ', '.join(KINDS))
+    data = record.get('data')
+    if not isinstance(data, dict) or not isinstance(data.get('id'), str):
+        raise RecordError(number, "'data' must be an object with a string 'id'")
+    try:
+        check_record(record['kind'], data)
+    except ValueError as e:
+        raise RecordError(number, f"{record['kind']} {data['id']!r}: {e}") from None
+    return record['kind'], data
+
+
+def export_lines(collections, offset=0):
+    """NDJSON lines of every record from ``offset`` on.
+
+    ``collections`` is a sequence of ``(kind, records)`` in dump order.
+    Offsets stay valid while records are only appended to. Records before
+    ``offset`` are skipped with the store's ``tail``, so a resumed export
+    does not decode them.
+    """
+    start = 0
+    for kind, records in collections:
+        count = len(records)
+        skip = min(max(offset - start, 0), count)
+        for record in itertools.islice(records.tail(skip), count - skip):
+            yield encode(kind, record)
+        start += count
+
+
+def chunks(lines, size=CHUNK_SIZE):
+    """Group lines into blocks of roughly ``size`` bytes."""
+    block, length = [], 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= size:
+            yield b''.join(block)
+            block, length = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def write_chunked(wfile, blocks):
+    """Write blocks with HTTP chunked transfer encoding, including the terminator."""
+    for block in blocks:
+        wfile.write(b'%x\r\n%b\r\n' % (len(block), block))
+    wfile.write(b'0\r\n\r\n')
+
+
+def read_body(rfile, headers):
+    """Blocks of a request body sent with chunked encoding or a Content-Length.
+
+    Raises BodyError for a malformed or negative chunk size or length.
+    """
+    if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+        while True:
+            size = _size(rfile.readline().split(b';')[0].strip().decode('latin-1') or '0', 16, 'chunk size')
+            if size == 0:
+                # Trailers end with an empty line
+                while rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            remaining = size
+            while remaining:
+                block = rfile.read(min(remaining, READ_SIZE))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+            rfile.readline()
+    else:
+        remaining = _size(headers.get('Content-Length') or '0', 10, 'Content-Length')
+        while remaining:
+            block = rfile.read(min(remaining, READ_SIZE))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+
+def iter_lines(blocks):
+    """Non-blank lines across arbitrarily split blocks."""
+    rest = b''
+    for block in blocks:
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if rest.strip():
+        yield rest
+
+
+def import_lines(lines, apply, offset=0, batch_size=BATCH_SIZE, progress=None):
+    """Validate lines into batches and ``apply(batch)`` each complete one.
+
+    ``offset`` is the dump number of the first line, so results and errors
+    refer to positions in the full dump. Returns a summary whose 'offset'
+    is where a retry should resume, with an 'error' if a line was invalid.
+    """
+    summary = {'offset': offset, 'records': 0, 'batches': 0, 'counts': dict.fromkeys(KINDS, 0), 'error': None}
+    batch = []
+
+    def commit():
+        apply(batch)
+        summary['offset'] += len(batch)
+        summary['records'] += len(batch)
+        summary['batches'] += 1
+        for kind, _ in batch:
+            summary['counts'][kind] += 1
+        if progress:
+            progress(summary)
+
+    try:
+        for number, line in enumerate(lines, offset):
+            batch.append(decode(line, number))
+            if len(batch) >= batch_size:
+                commit()
+                batch = []
+        if batch:
+            commit()
+    except (RecordError, BodyError) as e:
+        summary['error'] = str(e)
+    return summary
+
+
+def _report(label, records, size, started):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    sys.stderr.write(f'\r{label}: {records} records, {size / 1e6:.1f} MB, {size / 1e6 / elapsed:.1f} MB/s')
+    sys.stderr.flush()
+
+
+def export_dump(url, path, offset=0, resume=False):
+    """Download a dump from a server, appending when resuming."""
+    if resume:
+        # Keep the complete records already downloaded, dropping a torn last line
+        with open(path, 'r+b') as f:
+            offset = end = 0
+            for line in f:
+                if line.endswith(b'\n'):
+                    end += len(line)
+                    offset += bool(line.strip())
+            f.truncate(end)
+    started = time.perf_counter()
+    records = size = 0
+    with urllib.request.urlopen(f'{url.rstrip("/")}/api/bulk/export?offset={offset}') as response, \
+            open(path, 'ab' if resume else 'wb') as out:
+        for line in response:
+            out.write(line)
+            records += 1
+            size += len(line)
+            if records % 10000 == 0:
+                _report('export', offset + records, size, started)
+    _report('export', offset + records, size, started)
+    sys.stderr.write('\n')
+    return offset + records
+
+
+def import_dump(url, path, offset=0, batch_size=BATCH_SIZE):
+    """Upload a dump to a server from record ``offset`` on; returns the server's summary."""
+    started = time.perf_counter()
+    sent = {'records': 0, 'size': 0}
+
+    def body():
+        with open(path, 'rb') as f:
+            skipped = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                sent['records'] += 1
+                sent['size'] += len(line)
+                if sent['records'] % 10000 == 0:
+                    _report('import', offset + sent['records'], sent['size'], started)
+                yield line
+
+    request = urllib.request.Request(
+        f'{url.rstrip("/")}/api/bulk/import?offset={offset}&batch={batch_size}',
+        data=chunks(body()), method='POST', headers={'Content-Type': 'application/x-ndjson'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            summary = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        summary = json.loads(e.read())
+    _report('import', offset + sent['records'], sent['size'], started)
+    sys.stderr.write('\n')
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m archsense.bulk', description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='download a dump to a file')
+    export.add_argument('url', help='server base URL, e.g. http://localhost:8080')
+    export.add_argument('path')
+    export.add_argument('--offset', type=int, default=0, help='first record to download')
+    export.add_argument('--resume', action='store_true', help='append to path, continuing after its last record')
+    load = commands.add_parser('import', help='upload a dump file')
+    load.add_argument('url')
+    load.add_argument('path')
+    load.add_argument('--offset', type=int, default=0, help='first record of the file to upload')
+    load.add_argument('--batch', type=int, default=BATCH_SIZE, help='records per transaction')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        export_dump(args.url, args.path, args.offset, args.resume)
+        return 0
+    summary = import_dump(args.url, args.path, args.offset, args.batch)
+    print(json.dumps(summary, indent=2))
+    if summary.get('error'):
+        sys.stderr.write(f"import stopped; rerun with --offset {summary['offset']} after fixing the dump\n")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
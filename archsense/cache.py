@@ -0,0 +1,121 @@
+"""Small LRU caches for results derived from stored records."""
+import threading
+from collections import OrderedDict
+
+
+class PlanCache:
+    """Caches derived data per (projectId, version, planId, *extra) key.
+
+    Plan versions are immutable once stored, so entries only need dropping
+    when a project gets a new version (``invalidate``) or for memory.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(plan, *extra):
+        return (plan.get('projectId'), plan.get('version', 0), plan.get('id')) + extra
+
+    def get(self, plan, *extra):
+        """Cached value or None; counts a hit or a miss."""
+        key = self.key(plan, *extra)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, plan, value, *extra):
+        key = self.key(plan, *extra)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, plan, compute, *extra):
+        value = self.get(plan, *extra)
+        if value is None:
+            value = compute()
+            self.put(plan, value, *extra)
+        return value
+
+    def invalidate(self, project_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == project_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, keep):
+        """Drop least recently used entries until at most ``keep`` are left; returns how many went."""
+        with self._lock:
+            dropped = max(len(self._entries) - keep, 0)
+            for _ in range(dropped):
+                self._entries.popitem(last=False)
+        return dropped
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RevisionCache:
+    """LRU cache of values that hold for one revision of their key, such as encoded responses.
+
+    A value is returned only for the revision it was stored with, so
+    writes elsewhere (another worker, another shard client) never serve a
+    stale one; ``invalidate`` just frees it sooner.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, revision):
+        """Value stored for ``revision`` of ``key`` or None; counts a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == revision:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, revision, value):
+        with self._lock:
+            self._entries[key] = (revision, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, keep):
+        """Drop least recently used entries until at most ``keep`` are left; returns how many went."""
+        with self._lock:
+            dropped = max(len(self._entries) - keep, 0)
+            for _ in range(dropped):
+                self._entries.popitem(last=False)
+        return dropped
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,274 @@
+"""Room adjacency graph and circulation analysis.
+
+The walking graph has one node per room centroid, one per door midpoint and
+a virtual entrance node. Doors of the same room are linked door-to-door, so
+room-to-room distances follow geometric paths through doorways. The graph
+is held as a sparse CSR matrix and solved with SciPy's compiled Dijkstra,
+which keeps large multi-floor plans cheap.
+"""
+import re
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+ENTRANCE = 'entrance'
+STAIR_TYPES = {'stair', 'stairs', 'core'}
+PUBLIC_TYPES = {'living', 'kitchen', 'dining'}
+PRIVATE_TYPES = {'bedroom', 'bathroom'}
+FLOOR_HEIGHT = 3000
+STAIR_FACTOR = 2.0      # walking cost of a flight relative to its rise
+MIN_SHARED_WALL = 900   # mm of common wall before two rooms count as adjacent
+TOLERANCE = 1           # mm
+EPSILON = 1e-6
+
+
+def _norm(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def _room_arrays(rooms):
+    x0 = np.array([r['x'] for r in rooms], dtype=float)
+    y0 = np.array([r['y'] for r in rooms], dtype=float)
+    x1 = x0 + np.array([r['width'] for r in rooms], dtype=float)
+    y1 = y0 + np.array([r['depth'] for r in rooms], dtype=float)
+    floor = np.array([r.get('floor', 0) for r in rooms], dtype=int)
+    return x0, y0, x1, y1, floor
+
+
+def _resolve_name(name, by_norm, by_type):
+    """Map a door's room1/room2 label ('bathroom1', 'living') to a room index."""
+    if name is None or _norm(name) == ENTRANCE:
+        return None
+    key = _norm(name)
+    if key in by_norm:
+        return by_norm[key]
+    return by_type.get(key)
+
+
+def _door_rooms(door, arrays):
+    """Indices of rooms whose boundary the door opening lies on, plus its midpoint."""
+    x0, y0, x1, y1, floor = arrays
+    dx, dy, dw = float(door.get('x', 0)), float(door.get('y', 0)), float(door.get('width', 0))
+    same_floor = floor == door.get('floor', 0)
+    on_h = (np.abs(y0 - dy) <= TOLERANCE) | (np.abs(y1 - dy) <= TOLERANCE)
+    h_overlap = np.minimum(x1, dx + dw) - np.maximum(x0, dx)
+    horizontal = np.flatnonzero(same_floor & on_h & (h_overlap > 0))
+    if len(horizontal):
+        return horizontal, (dx + dw / 2, dy)
+    on_v = (np.abs(x0 - dx) <= TOLERANCE) | (np.abs(x1 - dx) <= TOLERANCE)
+    v_overlap = np.minimum(y1, dy + dw) - np.maximum(y0, dy)
+    vertical = np.flatnonzero(same_floor & on_v & (v_overlap > 0))
+    return vertical, (dx, dy + dw / 2)
+
+
+def shared_walls(rooms, min_length=MIN_SHARED_WALL):
+    """Pairs (i, j), i < j, of same-floor rooms sharing at least min_length of wall."""
+    if not rooms:
+        return []
+    x0, y0, x1, y1, floor = _room_arrays(rooms)
+    pairs = []
+    # Compare rooms floor by floor so the pairwise arrays stay per-floor sized
+    for level in np.unique(floor):
+        idx = np.flatnonzero(floor == level)
+        a0, b0, a1, b1 = x0[idx], y0[idx], x1[idx], y1[idx]
+        y_overlap = np.minimum(b1[:, None], b1[None, :]) - np.maximum(b0[:, None], b0[None, :])
+        x_overlap = np.minimum(a1[:, None], a1[None, :]) - np.maximum(a0[:, None], a0[None, :])
+        vertical = (np.abs(a1[:, None] - a0[None, :]) <= TOLERANCE) & (y_overlap >= min_length)
+        horizontal = (np.abs(b1[:, None] - b0[None, :]) <= TOLERANCE) & (x_overlap >= min_length)
+        touching = vertical | horizontal
+        i, j = np.nonzero(np.triu(touching | touching.T, 1))
+        pairs.extend(zip(idx[i].tolist(), idx[j].tolist()))
+    return pairs
+
+
+def _stair_links(rooms, arrays):
+    x0, y0, x1, y1, floor = arrays
+    stairs = np.array([r.get('type') in STAIR_TYPES for r in rooms], dtype=bool)
+    idx = np.flatnonzero(stairs)
+    if len(idx) < 2:
+        return []
+    a, b = np.meshgrid(idx, idx, indexing='ij')
+    a, b = a.ravel(), b.ravel()
+    overlap = ((np.minimum(x1[a], x1[b]) > np.maximum(x0[a], x0[b])) &
+               (np.minimum(y1[a], y1[b]) > np.maximum(y0[a], y0[b])))
+    keep = (floor[b] - floor[a] == 1) & overlap
+    return list(zip(a[keep].tolist(), b[keep].tolist()))
+
+
+def shortest_paths(n, src, dst, weight, sources, unweighted=False):
+    """Distances from every node in ``sources`` to all n nodes.
+
+    Edges are directed (src -> dst) and packed into a CSR matrix, keeping the
+    cheapest of any parallel edges, then solved with compiled Dijkstra.
+    """
+    if not len(src):
+        dist = np.full((len(sources), n), np.inf)
+        dist[np.arange(len(sources)), sources] = 0.0
+        return dist
+    order = np.lexsort((weight, dst, src))
+    src, dst, weight = src[order], dst[order], weight[order]
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    # csgraph drops explicit zeros, so zero-cost links get a negligible weight
+    weight = np.maximum(weight[first], EPSILON)
+    graph = csr_matrix((weight, (src[first], dst[first])), shape=(n, n))
+    return dijkstra(graph, directed=True, indices=sources, unweighted=unweighted)
+
+
+def build_graph(plan_data):
+    """Build the walking graph and room adjacency list for a plan."""
+    rooms = plan_data.get('rooms', [])
+    doors = plan_data.get('doors', [])
+    arrays = _room_arrays(rooms) if rooms else None
+    cx = (arrays[0] + arrays[2]) / 2 if rooms else np.empty(0)
+    cy = (arrays[1] + arrays[3]) / 2 if rooms else np.empty(0)
+
+    by_norm = {_norm(r['id']): i for i, r in enumerate(rooms)}
+    by_type = {}
+    for i, r in enumerate(rooms):
+        by_type.setdefault(_norm(r.get('type', '')), i)
+
+    n_rooms, n_doors = len(rooms), len(doors)
+    entrance_node = n_rooms + n_doors
+    src, dst, weight = [], [], []
+    adjacency = {}
+
+    def link(a, b, w):
+        src.extend((a, b))
+        dst.extend((b, a))
+        weight.extend((w, w))
+
+    door_points = np.zeros((n_doors, 2))
+    room_doors = [[] for _ in rooms]
+    has_entrance = False
+    for d, door in enumerate(doors):
+        touching, mid = _door_rooms(door, arrays) if rooms else (np.empty(0, dtype=int), (0.0, 0.0))
+        door_points[d] = mid
+        named = [_resolve_name(door.get(k), by_norm, by_type) for k in ('room1', 'room2')]
+        connected = [i for i in named if i is not None]
+        if len(connected) < 2:
+            connected = sorted(set(connected) | set(touching.tolist()))
+        is_entrance = door.get('type') == ENTRANCE or ENTRANCE in (_norm(door.get('room1')), _norm(door.get('room2')))
+        for i in connected:
+            room_doors[i].append(d)
+        if is_entrance:
+            has_entrance = True
+            link(entrance_node, n_rooms + d, 0.0)
+            for i in connected:
+                adjacency[(ENTRANCE, rooms[i]['id'])] = 'door'
+        for a in range(len(connected)):
+            for b in range(a + 1, len(connected)):
+                pair = tuple(sorted((rooms[connected[a]]['id'], rooms[connected[b]]['id'])))
+                adjacency[pair] = 'door'
+
+    for i, door_ids in enumerate(room_doors):
+        for d in door_ids:
+            link(i, n_rooms + d, float(np.hypot(cx[i] - door_points[d, 0], cy[i] - door_points[d, 1])))
+        for a in range(len(door_ids)):
+            for b in range(a + 1, len(door_ids)):
+                pa, pb = door_points[door_ids[a]], door_points[door_ids[b]]
+                link(n_rooms + door_ids[a], n_rooms + door_ids[b], float(np.hypot(*(pa - pb))))
+
+    if rooms:
+        for a, b in _stair_links(rooms, arrays):
+            link(a, b, FLOOR_HEIGHT * STAIR_FACTOR)
+            adjacency[(rooms[a]['id'], rooms[b]['id'])] = 'stair'
+        for a, b in shared_walls(rooms):
+            adjacency.setdefault(tuple(sorted((rooms[a]['id'], rooms[b]['id']))), 'wall')
+
+    return {
+        'rooms': rooms,
+        'nodes': entrance_node + 1,
+        'entrance': entrance_node if has_entrance else None,
+        'src': np.array(src, dtype=np.int64),
+        'dst': np.array(dst, dtype=np.int64),
+        'weight': np.array(weight, dtype=float),
+        'adjacency': adjacency
+    }
+
+
+def _room_hops(graph):
+    """Rooms traversed from the entrance (entrance-adjacent rooms have depth 1)."""
+    rooms = graph['rooms']
+    index = {r['id']: i for i, r in enumerate(rooms)}
+    entrance = len(rooms)
+    src, dst = [], []
+    for (a, b), via in graph['adjacency'].items():
+        if via == 'wall':
+            continue
+        ia = entrance if a == ENTRANCE else index[a]
+        ib = index[b]
+        src.extend((ia, ib))
+        dst.extend((ib, ia))
+    hops = shortest_paths(len(rooms) + 1, np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+                          np.ones(len(src)), np.array([entrance]), unweighted=True)
+    return hops[0, :len(rooms)]
+
+
+def _finite(value):
+    return None if not np.isfinite(value) else round(float(value), 1)
+
+
+def analyze(plan_data, include_matrix=False):
+    """Adjacency, walking distances, reachability and flow metrics for a plan."""
+    graph = build_graph(plan_data)
+    rooms = graph['rooms']
+    n_rooms = len(rooms)
+    sources = np.arange(n_rooms)
+    if graph['entrance'] is not None:
+        sources = np.append(sources, graph['entrance'])
+    dist = shortest_paths(graph['nodes'], graph['src'], graph['dst'], graph['weight'], sources)
+    room_dist = dist[:n_rooms, :n_rooms]
+    if graph['entrance'] is not None:
+        entrance_dist = dist[n_rooms, :n_rooms]
+        depth = _room_hops(graph)
+    else:
+        entrance_dist = np.full(n_rooms, np.inf)
+        depth = np.full(n_rooms, np.inf)
+
+    types = np.array([r.get('type', '') for r in rooms])
+
+    def nearest(from_type, to_type):
+        rows, cols = np.flatnonzero(types == from_type), np.flatnonzero(types == to_type)
+        if not len(rows) or not len(cols):
+            return {}
+        best = room_dist[np.ix_(rows, cols)].min(axis=1)
+        return {rooms[r]['id']: _finite(v) for r, v in zip(rows, best)}
+
+    public = np.isin(types, list(PUBLIC_TYPES)) & np.isfinite(depth)
+    private = np.isin(types, list(PRIVATE_TYPES)) & np.isfinite(depth)
+    bedrooms = (types == 'bedroom') & np.isfinite(depth)
+    kitchen_living = nearest('kitchen', 'living')
+
+    result = {
+        'rooms': [
+            {
+                'id': r['id'],
+                'type': r.get('type'),
+                'floor': r.get('floor', 0),
+                'reachable': bool(np.isfinite(entrance_dist[i])),
+                'entranceDistance': _finite(entrance_dist[i]),
+                'depth': None if not np.isfinite(depth[i]) else int(depth[i])
+            }
+            for i, r in enumerate(rooms)
+        ],
+        'adjacency': [{'from': a, 'to': b, 'via': via} for (a, b), via in sorted(graph['adjacency'].items())],
+        'unreachable': [r['id'] for i, r in enumerate(rooms) if not np.isfinite(entrance_dist[i])],
+        'metrics': {
+            'bedroomToBathroom': nearest('bedroom', 'bathroom'),
+            'kitchenToLiving': min((v for v in kitchen_living.values() if v is not None), default=None),
+            'meanBedroomDepth': round(float(depth[bedrooms].mean()), 2) if bedrooms.any() else None,
+            # Positive when private rooms sit deeper in the plan than public ones
+            'privacyGradient': round(float(depth[private].mean() - depth[public].mean()), 2)
+            if private.any() and public.any() else None
+        }
+    }
+    if include_matrix:
+        matrix = np.round(room_dist, 1).astype(object)
+        matrix[~np.isfinite(room_dist)] = None
+        result['distances'] = {
+            'ids': [r['id'] for r in rooms],
+            'matrix': matrix.tolist()
+        }
+    return result
@@ -0,0 +1,400 @@
+"""Real-time collaborative plan editing.
+
+Participants of a project's session send small operations instead of
+whole plan versions: ``move_room``, ``resize_room``, ``edit_wall``,
+``add_furniture``, ``remove_window`` and so on, an action and an element
+kind (see ``KINDS``). The session applies them in arrival order to its
+copy of the plan and numbers each one. Every ``TICK`` seconds it turns
+the operations since the last tick into one batch of changes: repeated
+edits of an element collapse into one change carrying the final values,
+and an element added and removed within the tick is left out. Each
+participant long-polls for the batches after the last sequence number it
+has seen and gets the changes the others made.
+
+A change is ``["add", collection, element]`` (furniture adds name the
+room as a fourth item), ``["set", collection, id, {field: value}]`` or
+``["remove", collection, id]``. Changes carry absolute values and address
+elements by id, so applying one twice is harmless; a participant that
+joined mid-tick may see changes its snapshot already has.
+
+The plan is checkpointed as a stored version every
+``CHECKPOINT_INTERVAL`` seconds while it changes and when the last
+participant leaves, rather than on every edit.
+
+Over HTTP a participant joins with ``POST /api/projects/<id>/session``,
+sends ``{"participant", "ops"}`` to ``.../session/ops``, long-polls
+``GET .../session/updates?participant=&after=`` and leaves with
+``.../session/leave``. Sessions live in the process that serves them, so
+collaborative editing needs a single worker (``--workers 1``).
+"""
+import json
+import math
+import threading
+import time
+import uuid
+from collections import deque
+
+from archsense.model import plan_body, to_json
+
+TICK = 0.05
+CHECKPOINT_INTERVAL = 30.0
+PARTICIPANT_TIMEOUT = 60.0
+POLL_TIMEOUT = 20.0
+# Batches kept for participants catching up; older cursors get the whole plan
+HISTORY = 1200
+
+# Element kind -> plan collection and the fields edits may set
+KINDS = {
+    'room': ('rooms', ('x', 'y', 'width', 'depth', 'type', 'floor', 'height', 'color', 'floor_color')),
+    'wall': ('walls', ('x1', 'y1', 'x2', 'y2', 'height', 'thickness', 'floor')),
+    'door': ('doors', ('x', 'y', 'width', 'height', 'room1', 'room2', 'type', 'floor')),
+    'window': ('windows', ('x', 'y', 'width', 'height', 'room', 'type', 'depth', 'floor')),
+    'furniture': ('furniture', ('x', 'y', 'z', 'rotation', 'width', 'depth', 'height')),
+}
+# Operation verbs; move, resize and edit all set fields
+ACTIONS = {'add': 'add', 'remove': 'remove', 'move': 'set', 'resize': 'set', 'edit': 'set'}
+# Fields that must be numbers wherever an operation sets them
+GEOMETRY = frozenset(('x', 'y', 'z', 'width', 'depth', 'height', 'thickness', 'x1', 'y1', 'x2', 'y2', 'rotation'))
+
+
+class SessionError(LookupError):
+    """The participant is not (or no longer) in the session."""
+
+
+def _scalar(value):
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _geometry(name, values):
+    for key in GEOMETRY.intersection(values):
+        value = values[key]
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+            raise ValueError(f'{name} needs a number for {key!r}, not {value!r}')
+
+
+def parse_op(op):
+    """``(action, collection, id, value, room)`` for an operation, or ValueError."""
+    if not isinstance(op, dict):
+        raise ValueError('an operation must be an object')
+    verb, _, kind = str(op.get('op', '')).partition('_')
+    if verb not in ACTIONS or kind not in KINDS:
+        raise ValueError(f"unknown operation {op.get('op')!r}")
+    action = ACTIONS[verb]
+    collection, fields = KINDS[kind]
+    room = op.get('room') if kind == 'furniture' else None
+    if action == 'add':
+        element = op.get(kind)
+        if not isinstance(element, dict):
+            raise ValueError(f'{op["op"]} needs the {kind} as an object')
+        if kind == 'furniture' and not isinstance(room, str):
+            raise ValueError('add_furniture needs the id of its room')
+        _geometry(op['op'], element)
+        element_id = element.get('id') or f'{kind}-{uuid.uuid4().hex[:8]}'
+        return action, collection, str(element_id), element, room
+    element_id = op.get('id')
+    if not isinstance(element_id, str):
+        raise ValueError(f'{op["op"]} needs an element id')
+    if action == 'remove':
+        return action, collection, element_id, None, None
+    value = {k: v for k, v in op.items() if k in fields}
+    if not value:
+        raise ValueError(f"{op['op']} sets none of {', '.join(fields)}")
+    if not all(_scalar(v) for v in value.values()):
+        raise ValueError(f'{op["op"]} values must be numbers or strings')
+    _geometry(op['op'], value)
+    return action, collection, element_id, value, None
+
+
+class Session:
+    """One project's shared plan, its participants and the batches sent to them.
+
+    ``save(body)`` stores the plan body as a new version; it is called by
+    ``checkpoint`` without the session lock held.
+    """
+
+    def __init__(self, project_id, plan, save):
+        self.project_id = project_id
+        # A private copy: edits must not reach the stored version
+        self.plan = json.loads(json.dumps(plan_body(plan) if plan else {}, default=to_json))
+        for collection in ('rooms', 'walls', 'doors', 'windows'):
+            self.plan.setdefault(collection, [])
+        self.save = save
+        self.seq = 0
+        self.published = 0
+        self.checkpointed = 0
+        self.checkpoints = 0
+        self.last_checkpoint = time.monotonic()
+        self.participants = {}
+        self.closed = False
+        self.batches = deque(maxlen=HISTORY)
+        self._elements = {}
+        self._homes = {}
+        self._pending = {}
+        self._changed = threading.Condition()
+        self._index()
+
+    def _index(self):
+        # Elements without ids get stable ones, so every edit can name its target
+        for collection in ('rooms', 'walls', 'doors', 'windows'):
+            for i, element in enumerate(self.plan[collection]):
+                element.setdefault('id', f'{collection[:-1]}-{i}')
+                self._elements[collection, element['id']] = element
+        for room in self.plan['rooms']:
+            for i, item in enumerate(room.get('furniture') or ()):
+                item.setdefault('id', f"{room['id']}-item-{i}")
+                self._elements['furniture', item['id']] = item
+                self._homes[item['id']] = room
+
+    def join(self, user_id):
+        """JSON text for a new participant: its id, the plan and the sequence number it reflects."""
+        participant = uuid.uuid4().hex[:12]
+        with self._changed:
+            if self.closed:
+                raise SessionError('session closed')
+            self.participants[participant] = [user_id, time.monotonic()]
+            # Encoded under the lock, as edits change the plan in place
+            return json.dumps({'participant': participant, 'seq': self.seq, 'plan': self.plan}, default=to_json)
+
+    def leave(self, participant):
+        with self._changed:
+            self.participants.pop(participant, None)
+
+    def _touch(self, participant):
+        entry = self.participants.get(participant)
+        if entry is None or self.closed:
+            raise SessionError('not in this session')
+        entry[1] = time.monotonic()
+
+    def apply(self, participant, ops):
+        """Apply ``ops`` in order; all are checked first, so a bad one applies none (ValueError)."""
+        parsed = []
+        for i, op in enumerate(ops):
+            try:
+                parsed.append(parse_op(op))
+            except ValueError as e:
+                raise ValueError(f'operation {i}: {e}') from None
+        with self._changed:
+            self._touch(participant)
+            ids = [self._apply(participant, *op) for op in parsed]
+            return {'seq': self.seq, 'ids': ids}
+
+    def _container(self, collection, element_id):
+        return self._homes[element_id]['furniture'] if collection == 'furniture' else self.plan[collection]
+
+    def _apply(self, author, action, collection, element_id, value, room_id):
+        key = (collection, element_id)
+        element = self._elements.get(key)
+        fresh = False
+        # Edits of elements someone else removed meanwhile are dropped
+        if action == 'add':
+            if collection == 'furniture' and ('rooms', room_id) not in self._elements:
+                return None
+            if element is not None:
+                self._remove(collection, element_id, element)
+            fresh = element is None
+            element = dict(value, id=element_id)
+            if collection == 'furniture':
+                room = self._elements['rooms', room_id]
+                if not isinstance(room.get('furniture'), list):
+                    room['furniture'] = []
+                room['furniture'].append(element)
+                self._homes[element_id] = room
+            else:
+                self.plan[collection].append(element)
+            self._elements[key] = element
+            fields = ()
+        elif element is None:
+            return None
+        elif action == 'set':
+            element.update(value)
+            fields = set(value)
+            if collection == 'rooms' and fields & {'width', 'depth'} and 'area' in element:
+                element['area'] = element['width'] * element['depth'] / 1e6
+                fields.add('area')
+        else:
+            self._remove(collection, element_id, element)
+            fields = ()
+        self.seq += 1
+        self._note(key, action, fields, author, fresh)
+        return element_id
+
+    def _remove(self, collection, element_id, element):
+        container = self._container(collection, element_id)
+        del container[next(i for i, e in enumerate(container) if e is element)]
+        del self._elements[collection, element_id]
+        self._homes.pop(element_id, None)
+        if collection == 'rooms':
+            for item in element.get('furniture') or ():
+                self._elements.pop(('furniture', item.get('id')), None)
+                self._homes.pop(item.get('id'), None)
+
+    def _note(self, key, action, fields, author, fresh):
+        entry = self._pending.get(key)
+        if entry is None:
+            # [action, fields set, authors, created this tick]
+            self._pending[key] = [action, set(fields), {author}, fresh]
+            return
+        entry[2].add(author)
+        if action == 'set':
+            entry[1] |= fields
+        elif action == 'remove':
+            if entry[3]:
+                del self._pending[key]
+            else:
+                entry[0] = 'remove'
+        else:
+            entry[0] = 'add'
+
+    def flush(self):
+        """Publish the operations since the last tick as one batch; True if there were any."""
+        with self._changed:
+            if self.seq == self.published:
+                return False
+            changes = []
+            for (collection, element_id), (action, fields, authors, fresh) in self._pending.items():
+                element = self._elements.get((collection, element_id))
+                if element is None and action != 'remove':
+                    # Furniture that went with its room
+                    if fresh:
+                        continue
+                    action = 'remove'
+                if action == 'add':
+                    change = ['add', collection, element]
+                    if collection == 'furniture':
+                        change.append(self._homes[element_id]['id'])
+                elif action == 'set':
+                    change = ['set', collection, element_id, {f: element.get(f) for f in fields}]
+                else:
+                    change = ['remove', collection, element_id]
+                # Encoded once here, then joined into every participant's response
+                changes.append((json.dumps(change, default=to_json), frozenset(authors)))
+            self._pending = {}
+            self.batches.append((self.published, self.seq, changes))
+            self.published = self.seq
+            self._changed.notify_all()
+            return True
+
+    def updates(self, participant, after, timeout=POLL_TIMEOUT):
+        """JSON text of the changes others made after sequence number ``after``, waiting up to ``timeout``.
+
+        A cursor older than the kept batches, or ahead of the session,
+        gets the whole plan instead, marked ``"reset": true``.
+        """
+        with self._changed:
+            self._touch(participant)
+            self._changed.wait_for(lambda: self.published > after or self.closed, timeout)
+            if self.closed:
+                raise SessionError('session closed')
+            if after > self.published or (self.batches and after < self.batches[0][0]):
+                return json.dumps({'seq': self.seq, 'reset': True, 'plan': self.plan}, default=to_json)
+            parts = [text for first, last, changes in self.batches if last > after
+                     for text, authors in changes if authors != {participant}]
+            return f'{{"seq": {self.published}, "changes": [{",".join(parts)}]}}'
+
+    def expire(self, now, timeout=PARTICIPANT_TIMEOUT):
+        with self._changed:
+            for participant, (_, seen) in list(self.participants.items()):
+                if now - seen > timeout:
+                    del self.participants[participant]
+
+    def checkpoint(self):
+        """Store the plan as a new version if it changed since the last checkpoint."""
+        with self._changed:
+            if self.seq == self.checkpointed:
+                return None
+            seq, body = self.seq, json.loads(json.dumps(self.plan, default=to_json))
+        plan = self.save(body)
+        with self._changed:
+            self.checkpointed = max(self.checkpointed, seq)
+            self.checkpoints += 1
+            self.last_checkpoint = time.monotonic()
+        return plan
+
+    def close(self):
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def stats(self):
+        return {'participants': len(self.participants), 'seq': self.seq, 'published': self.published,
+                'checkpoints': self.checkpoints, 'batches': len(self.batches)}
+
+
+class Sessions:
+    """Open sessions by project, and the thread that ticks them.
+
+    Each tick flushes every session, drops participants that stopped
+    polling, checkpoints sessions due for it and closes sessions nobody is
+    in any more, after a last checkpoint.
+    """
+
+    def __init__(self, tick=TICK, checkpoint_interval=CHECKPOINT_INTERVAL, participant_timeout=PARTICIPANT_TIMEOUT):
+        self.tick = tick
+        self.checkpoint_interval = checkpoint_interval
+        self.participant_timeout = participant_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self, project_id):
+        session = self._sessions.get(project_id)
+        if session is None:
+            raise SessionError('no open session for this project')
+        return session
+
+    def join(self, project_id, user_id, open_session):
+        """Join the project's session, opening it with ``open_session()`` if there is none."""
+        with self._lock:
+            session = self._sessions.get(project_id)
+            if session is None:
+                session = self._sessions[project_id] = open_session()
+            elif session.closed:
+                # Its last checkpoint may not be stored yet, so its plan carries over
+                session = self._sessions[project_id] = Session(project_id, session.plan, session.save)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='collab-ticker', daemon=True)
+                self._thread.start()
+            return session.join(user_id)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            time.sleep(max(next_tick - time.monotonic(), 0))
+            now = time.monotonic()
+            # Ticks missed while busy are skipped, not made up
+            next_tick = max(next_tick, now - self.tick)
+            for session in list(self._sessions.values()):
+                try:
+                    self._tick(session, now)
+                except Exception as e:
+                    print(f'Collaboration session for project {session.project_id} failed: {e}')
+
+    def _tick(self, session, now):
+        session.flush()
+        session.expire(now, self.participant_timeout)
+        if not session.participants:
+            with self._lock:
+                # Someone may have joined since
+                if session.participants:
+                    return
+                session.close()
+            # The session stays listed until its last checkpoint is stored, so a failure is retried
+            session.checkpoint()
+            with self._lock:
+                if self._sessions.get(session.project_id) is session:
+                    del self._sessions[session.project_id]
+        elif now - session.last_checkpoint >= self.checkpoint_interval:
+            session.checkpoint()
+
+    def close(self):
+        """Close every session with a last checkpoint; for shutdown."""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.flush()
+            session.close()
+            session.checkpoint()
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,264 @@
+"""Daylight and direct-sun analysis on a rasterized floor grid.
+
+The plan is rasterized into square cells labelled with the room they fall
+in. For every window, visibility from all cells is found by casting rays
+against the plan's walls in bulk, then each cell gets:
+
+* a daylight factor estimate (%): the solid angle of the window seen from
+  the work plane, scaled by glazing transmission, and
+* sun hours: the time steps of the chosen day during which the sun, seen
+  from the cell, passes through the window opening.
+
+Loops only run over windows; cells and sun positions are NumPy arrays.
+"""
+import base64
+import re
+
+import numpy as np
+
+RESOLUTION = 100          # mm per cell
+LATITUDE = 40.0           # degrees north
+ORIENTATION = 180.0       # compass bearing the front (y = 0) facade faces
+DAY_OF_YEAR = 80          # spring equinox
+TIME_STEP = 0.25          # hours between sun positions
+SILL_HEIGHT = 900         # mm above floor
+WORK_PLANE = 850          # mm above floor
+TRANSMISSION = 0.7
+WELL_LIT = 2.0            # daylight factor (%) counted as well daylit
+MAX_CELLS = 250000        # grid cells per analysis; larger floors get coarser cells
+MAX_WALLS = 5000          # walls per floor
+MAX_PAIRS = 1 << 21       # cell-wall pairs tested for visibility at a time
+EPSILON = 1e-6
+
+
+def _norm(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def _on_floor(item, floor):
+    return item.get('floor', 0) == floor
+
+
+def rasterize(rooms, resolution):
+    """Room index per cell (-1 outside any room) and the cell-centre coordinates."""
+    if not rooms:
+        return np.full((0, 0), -1), np.empty(0), np.empty(0)
+    width = max(r['x'] + r['width'] for r in rooms)
+    depth = max(r['y'] + r['depth'] for r in rooms)
+    xs = (np.arange(int(np.ceil(width / resolution))) + 0.5) * resolution
+    ys = (np.arange(int(np.ceil(depth / resolution))) + 0.5) * resolution
+    labels = np.full((len(ys), len(xs)), -1)
+    for i, r in enumerate(rooms):
+        cols = (xs >= r['x']) & (xs < r['x'] + r['width'])
+        rows = (ys >= r['y']) & (ys < r['y'] + r['depth'])
+        labels[np.ix_(rows, cols)] = i
+    return labels, xs, ys
+
+
+def _resolution(rooms, resolution):
+    """``resolution``, coarsened as needed to keep the grid within MAX_CELLS."""
+    if not rooms:
+        return resolution
+    width = max(max(r['x'] + r['width'] for r in rooms), resolution)
+    depth = max(max(r['y'] + r['depth'] for r in rooms), resolution)
+    if width * depth / resolution ** 2 <= MAX_CELLS:
+        return resolution
+    return int(np.ceil(np.sqrt(width * depth / MAX_CELLS)))
+
+
+def _room_at(point, labels, resolution):
+    col, row = int(point[0] // resolution), int(point[1] // resolution)
+    if 0 <= row < labels.shape[0] and 0 <= col < labels.shape[1]:
+        return labels[row, col]
+    return -1
+
+
+def _window_frame(window, labels, rooms, resolution):
+    """Start point, unit tangent and inward normal of a window."""
+    x, y, width = float(window.get('x', 0)), float(window.get('y', 0)), float(window.get('width', 0))
+    horizontal = any(
+        abs(y - edge) < 1 and r['x'] - 1 <= x <= r['x'] + r['width'] + 1
+        for r in rooms for edge in (r['y'], r['y'] + r['depth'])
+    )
+    tangent = np.array([1.0, 0.0]) if horizontal else np.array([0.0, 1.0])
+    normal = np.array([0.0, 1.0]) if horizontal else np.array([1.0, 0.0])
+    start = np.array([x, y])
+    mid = start + tangent * width / 2
+
+    ahead = _room_at(mid + normal * resolution, labels, resolution)
+    behind = _room_at(mid - normal * resolution, labels, resolution)
+    if ahead < 0 <= behind:
+        normal = -normal
+    elif ahead >= 0 and behind >= 0:
+        # Window between two rooms: face into the room it is labelled with
+        label = _norm(window.get('room', ''))
+
+        def names(i):
+            return _norm(rooms[i]['id']), _norm(rooms[i].get('type', ''))
+
+        if label in names(behind) and label not in names(ahead):
+            normal = -normal
+    return start, tangent, normal, width
+
+
+def _visible(px, py, target, walls):
+    """Cells whose straight line to target is not crossed by any wall."""
+    if not len(walls):
+        return np.ones(px.shape, dtype=bool)
+    step = max(MAX_PAIRS // len(walls), 1)
+    if len(px) > step:
+        # Bounds the (cells x walls) arrays below
+        return np.concatenate([_visible(px[i:i + step], py[i:i + step], target, walls)
+                               for i in range(0, len(px), step)])
+    ax, ay, bx, by = walls.T
+    rx, ry = target[0] - px[:, None], target[1] - py[:, None]
+    sx, sy = bx - ax, by - ay
+    denom = rx * sy - ry * sx
+    parallel = np.abs(denom) < EPSILON
+    denom = np.where(parallel, 1.0, denom)
+    qx, qy = ax - px[:, None], ay - py[:, None]
+    t = (qx * sy - qy * sx) / denom
+    u = (qx * ry - qy * rx) / denom
+    # Walls the window itself sits in meet the ray at t == 1 and do not block
+    blocked = ~parallel & (t > EPSILON) & (t < 1 - 1e-3) & (u >= 0) & (u <= 1)
+    return ~blocked.any(axis=1)
+
+
+def sun_path(latitude, day_of_year, step=TIME_STEP):
+    """Azimuth (deg from north, clockwise) and altitude (deg) while the sun is up."""
+    hours = np.arange(0, 24, step) + step / 2
+    decl = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    lat = np.radians(latitude)
+    hour_angle = np.radians(15 * (hours - 12))
+    sin_alt = np.sin(lat) * np.sin(decl) + np.cos(lat) * np.cos(decl) * np.cos(hour_angle)
+    altitude = np.arcsin(np.clip(sin_alt, -1, 1))
+    azimuth = np.arctan2(-np.cos(decl) * np.sin(hour_angle),
+                         np.sin(decl) * np.cos(lat) - np.cos(decl) * np.cos(hour_angle) * np.sin(lat))
+    up = altitude > 0
+    return np.degrees(azimuth[up]) % 360, np.degrees(altitude[up])
+
+
+def analyze(plan_data, resolution=RESOLUTION, orientation=ORIENTATION, latitude=LATITUDE,
+            day_of_year=DAY_OF_YEAR, floor=0):
+    """Per-cell daylight factor and sun hours plus per-room summaries.
+
+    Returns a dict with 'rooms', 'grid' metadata and the raw 'daylight' and
+    'sunHours' arrays (rows follow y, columns follow x; NaN outside rooms).
+    The grid is coarser than ``resolution`` where it would pass MAX_CELLS.
+    ValueError if the floor has more than MAX_WALLS walls.
+    """
+    rooms = [r for r in plan_data.get('rooms', []) if _on_floor(r, floor)]
+    windows = [w for w in plan_data.get('windows', []) if _on_floor(w, floor)]
+    walls = np.array([[w['x1'], w['y1'], w['x2'], w['y2']] for w in plan_data.get('walls', [])
+                      if _on_floor(w, floor)], dtype=float).reshape(-1, 4)
+    if len(walls) > MAX_WALLS:
+        raise ValueError(f'Daylight is analysed for at most {MAX_WALLS} walls per floor, not {len(walls)}')
+
+    resolution = _resolution(rooms, resolution)
+    labels, xs, ys = rasterize(rooms, resolution)
+    inside = labels >= 0
+    rows, cols = np.nonzero(inside)
+    px, py = xs[cols], ys[rows]
+    daylight = np.zeros(len(px))
+    sun_steps = np.zeros(len(px))
+
+    azimuth, altitude = sun_path(latitude, day_of_year)
+    # Horizontal direction towards the sun in plan coordinates (y grows away from the front)
+    relative = np.radians(azimuth - orientation)
+    sun_dir = np.stack([np.sin(relative), -np.cos(relative)], axis=1)
+    tan_alt = np.tan(np.radians(altitude))
+
+    for window in windows:
+        start, tangent, normal, width = _window_frame(window, labels, rooms, resolution)
+        height = float(window.get('height', 1200))
+        mid = start + tangent * width / 2
+        # Only cells on the inward side that can see the window are evaluated
+        depth = (px - mid[0]) * normal[0] + (py - mid[1]) * normal[1]
+        ahead = np.flatnonzero(depth > 0)
+        # Rooms are rectangles, so cells of the room the window opens into
+        # always see it; only the rest need rays, and only against walls
+        # reaching into the inward half-plane.
+        own = labels[rows[ahead], cols[ahead]] == _room_at(mid + normal * resolution, labels, resolution)
+        wall_depth = np.stack([(walls[:, 0] - mid[0]) * normal[0] + (walls[:, 1] - mid[1]) * normal[1],
+                               (walls[:, 2] - mid[0]) * normal[0] + (walls[:, 3] - mid[1]) * normal[1]])
+        blockers = walls[wall_depth.max(axis=0) > EPSILON]
+        others = ahead[~own]
+        lit = np.concatenate([ahead[own], others[_visible(px[others], py[others], mid, blockers)]])
+        if not len(lit):
+            continue
+        lx, ly, ld = px[lit], py[lit], depth[lit]
+
+        # Solid angle of the window from the work plane, foreshortened by the viewing angle
+        rise = SILL_HEIGHT + height / 2 - WORK_PLANE
+        distance_sq = (lx - mid[0]) ** 2 + (ly - mid[1]) ** 2 + rise ** 2
+        cos_view = np.clip(ld / np.sqrt(distance_sq), 0, 1)
+        solid_angle = np.minimum(width * height * cos_view / distance_sq, 2 * np.pi)
+        daylight[lit] += 100 * TRANSMISSION * solid_angle / (2 * np.pi)
+
+        # Sun: walk from each cell towards the sun until reaching the window plane
+        facing = -(sun_dir @ normal)  # > 0 when the sun is outside this window
+        usable = facing > EPSILON
+        if not usable.any():
+            continue
+        travel = ld[:, None] / facing[None, usable]
+        hit_x = lx[:, None] + travel * sun_dir[usable, 0]
+        hit_y = ly[:, None] + travel * sun_dir[usable, 1]
+        along = (hit_x - start[0]) * tangent[0] + (hit_y - start[1]) * tangent[1]
+        # The ray leaves the cell at work-plane height; sill and head are measured from the floor
+        rise_at_wall = WORK_PLANE + travel * tan_alt[None, usable]
+        through = ((along >= 0) & (along <= width) &
+                   (rise_at_wall >= SILL_HEIGHT) & (rise_at_wall <= SILL_HEIGHT + height))
+        sun_steps[lit] += through.sum(axis=1)
+
+    sun_hours = sun_steps * TIME_STEP
+    daylight = np.minimum(daylight, 100)
+    room_index = labels[rows, cols]
+    counts = np.bincount(room_index, minlength=len(rooms))
+    safe = np.maximum(counts, 1)
+    mean_df = np.bincount(room_index, daylight, minlength=len(rooms)) / safe
+    mean_sun = np.bincount(room_index, sun_hours, minlength=len(rooms)) / safe
+    well_lit = np.bincount(room_index, daylight >= WELL_LIT, minlength=len(rooms)) / safe
+    max_sun = np.zeros(len(rooms))
+    np.maximum.at(max_sun, room_index, sun_hours)
+    min_df = np.full(len(rooms), np.inf)
+    np.minimum.at(min_df, room_index, daylight)
+
+    daylight_grid = np.full(labels.shape, np.nan, dtype=np.float32)
+    sun_grid = np.full(labels.shape, np.nan, dtype=np.float32)
+    daylight_grid[rows, cols] = daylight
+    sun_grid[rows, cols] = sun_hours
+
+    return {
+        'rooms': [
+            {
+                'id': r['id'],
+                'type': r.get('type'),
+                'meanDaylightFactor': round(float(mean_df[i]), 2),
+                'minDaylightFactor': round(float(min_df[i]), 2) if counts[i] else None,
+                'wellLitFraction': round(float(well_lit[i]), 3),
+                'meanSunHours': round(float(mean_sun[i]), 2),
+                'maxSunHours': round(float(max_sun[i]), 2)
+            }
+            for i, r in enumerate(rooms)
+        ],
+        'grid': {
+            'resolution': resolution,
+            'columns': len(xs),
+            'rows': len(ys),
+            'orientation': orientation,
+            'latitude': latitude,
+            'dayOfYear': day_of_year,
+            'floor': floor
+        },
+        'daylight': daylight_grid,
+        'sunHours': sun_grid
+    }
+
+
+def encode_heatmap(result):
+    """Base64 little-endian float32 buffers of the grids, row-major (y, x)."""
+    return {
+        'dtype': 'float32',
+        'daylight': base64.b64encode(result['daylight'].astype('<f4').tobytes()).decode('ascii'),
+        'sunHours': base64.b64encode(result['sunHours'].astype('<f4').tobytes()).decode('ascii')
+    }
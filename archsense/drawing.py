@@ -0,0 +1,845 @@
+"""Floor plans from CAD drawings: streaming DXF and SVG import.
+
+``read_dxf`` and ``read_svg`` consume a drawing block by block as it
+arrives and keep only its line work, as a flat array of coordinates, and
+its text labels, never the file itself. ``build_plan`` turns those into
+the plan structure the layout generator produces:
+
+* segments are snapped to directions and merged where collinear;
+* two parallel lines a wall's thickness apart become one wall on their
+  centre line; long lines without a partner become thin walls;
+* gaps of a door's width along a wall are bridged and kept as openings;
+* wall ends are extended or trimmed to meet at corners and junctions;
+* closed regions of the resulting wall graph become rooms, typed from
+  the text labels inside them ('Bedroom 2', 'Kitchen', ...).
+
+Rooms are rectangles in the plan model, so each carries its bounding box
+plus its true ``polygon`` and ``area``. Openings between two rooms become
+interior doors and those to the outside entrances. Windows drawn within
+a wall's thickness cannot be told from the wall and are not recognised.
+Arcs, curves, circles and block references are skipped and counted.
+"""
+import itertools
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from xml.etree import ElementTree
+
+from archsense.search import ROOM_WORDS, words
+from archsense.specs import ROOM_SPECS
+
+# Lengths in mm
+SNAP = 10
+MIN_THICKNESS = 50
+MAX_THICKNESS = 500
+# Overlap two parallel lines need to be taken as the faces of one wall
+MIN_PAIRED = 300
+SINGLE_THICKNESS = 100
+MIN_OPENING = 600
+MAX_OPENING = 2400
+JOIN = MAX_THICKNESS
+WALL_HEIGHT = 3000
+CELL = 2000
+# Largest plan accepted, and most grid entries its walls and rooms may take up
+MAX_EXTENT = 1000000
+MAX_CELLS = 1 << 22
+MIN_ROOM_AREA = 1.0
+# Directions are told apart to a quarter of a degree
+ANGLE_STEP = math.pi / 720
+BUCKETS = 720
+
+UNITS = {'mm': 1.0, 'cm': 10.0, 'm': 1000.0, 'in': 25.4, 'ft': 304.8}
+DXF_UNITS = {1: 25.4, 2: 304.8, 4: 1.0, 5: 10.0, 6: 1000.0}
+SVG_UNITS = {'mm': 1.0, 'cm': 10.0, 'm': 1000.0, 'in': 25.4, 'pt': 25.4 / 72, 'pc': 25.4 / 6}
+LABEL_WORDS = dict(ROOM_WORDS, wc='bathroom', toilet='bathroom', shower='bathroom', ensuite='bathroom',
+                   master='bedroom', dining='dining')
+DEFAULT_STYLE = {'height': 2800, 'color': 0xf0f0f0, 'floor_color': 0xf5f5f5}
+
+
+class DrawingError(ValueError):
+    """The drawing cannot be read or holds no line work."""
+
+
+class Drawing:
+    """Line work and text labels read from a drawing, in its own units."""
+
+    def __init__(self, kind, y_up=False):
+        self.kind = kind
+        self.y_up = y_up
+        # mm per drawing unit, when the file says
+        self.unit = None
+        self.segments = array('d')
+        self.labels = []
+        self.entities = Counter()
+        self.skipped = Counter()
+
+    def line(self, x1, y1, x2, y2):
+        if not all(map(math.isfinite, (x1, y1, x2, y2))):
+            raise DrawingError(f'a line has a coordinate that is not a finite number: {(x1, y1, x2, y2)}')
+        if x1 != x2 or y1 != y2:
+            self.segments.extend((x1, y1, x2, y2))
+
+    def polyline(self, points, closed=False):
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            self.line(x1, y1, x2, y2)
+        if closed and len(points) > 2:
+            self.line(*points[-1], *points[0])
+
+    def label(self, x, y, text):
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise DrawingError(f'a label has a coordinate that is not a finite number: {(x, y)}')
+        text = ' '.join(text.split())
+        if text:
+            self.labels.append((x, y, text))
+
+
+def _lines(blocks):
+    # Unlike bulk.iter_lines, blank lines are kept: DXF values may be empty
+    rest = b''
+    for block in blocks:
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+_MTEXT_FORMAT = re.compile(r'\\P|\\[A-Za-z][^;\\]*;|[{}]')
+
+
+def read_dxf(blocks, layers=None):
+    """Line work and labels of an ASCII DXF file arriving as ``blocks``.
+
+    Only the ENTITIES section is read; ``layers`` limits the line work to
+    the named layers (labels are taken from every layer).
+    """
+    drawing = Drawing('dxf', y_up=True)
+    wanted = {name.lower() for name in layers} if layers else None
+    lines = _lines(blocks)
+    section = kind = variable = layer = None
+    xs, ys, text = [], [], []
+    x2 = y2 = None
+    flags = 0
+    polyline = None
+    for raw in lines:
+        value = next(lines, b'').strip()
+        try:
+            code = int(raw)
+        except ValueError:
+            raise DrawingError('not an ASCII DXF file') from None
+        if code == 0:
+            if section == b'ENTITIES' and kind is not None:
+                polyline = _entity(drawing, kind, wanted is None or (layer or '').lower() in wanted,
+                                   xs, ys, x2, y2, flags, text, polyline)
+            if value == b'ENDSEC':
+                section = None
+            kind, layer, xs, ys, text, x2, y2, flags = value, None, [], [], [], None, None, 0
+        elif code == 2 and kind == b'SECTION':
+            section, kind = value, None
+        elif section == b'ENTITIES':
+            try:
+                if code == 10:
+                    xs.append(float(value))
+                elif code == 20:
+                    ys.append(float(value))
+                elif code == 11:
+                    x2 = float(value)
+                elif code == 21:
+                    y2 = float(value)
+                elif code == 8:
+                    layer = value.decode('utf-8', 'replace')
+                elif code == 70:
+                    flags = int(value)
+                elif code in (1, 3):
+                    text.append(value)
+            except ValueError:
+                raise DrawingError(f'bad value {value[:40]!r} for group code {code}') from None
+        elif section == b'HEADER':
+            if code == 9:
+                variable = value
+            elif code == 70 and variable == b'$INSUNITS':
+                try:
+                    drawing.unit = DXF_UNITS.get(int(value))
+                except ValueError:
+                    raise DrawingError(f'bad value {value[:40]!r} for $INSUNITS') from None
+    return drawing
+
+
+def _entity(drawing, kind, wanted, xs, ys, x2, y2, flags, text, polyline):
+    """Add a finished DXF entity to ``drawing``; returns the POLYLINE still collecting vertices, if any."""
+    if kind == b'VERTEX' and polyline is not None:
+        if xs and ys:
+            polyline[0].append((xs[0], ys[0]))
+        return polyline
+    if kind == b'SEQEND' and polyline is not None:
+        vertices, closed, keep = polyline
+        if keep:
+            drawing.polyline(vertices, closed)
+        return None
+    name = kind.decode('ascii', 'replace')
+    if kind == b'LINE':
+        if wanted and xs and ys and x2 is not None and y2 is not None:
+            drawing.line(xs[0], ys[0], x2, y2)
+    elif kind == b'LWPOLYLINE':
+        if wanted:
+            drawing.polyline(list(zip(xs, ys)), flags & 1)
+    elif kind == b'POLYLINE':
+        polyline = ([], flags & 1, wanted)
+    elif kind in (b'TEXT', b'MTEXT'):
+        if xs and ys and text:
+            drawing.label(xs[0], ys[0], _MTEXT_FORMAT.sub(' ', b''.join(text).decode('utf-8', 'replace')))
+    else:
+        drawing.skipped[name] += 1
+        return polyline
+    drawing.entities[name] += 1
+    return polyline
+
+
+_NUMBER = re.compile(r'[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?')
+_PATH = re.compile(r'[MmLlHhVvZzCcSsQqTtAa]|[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?')
+_TRANSFORM = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+_PATH_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7}
+_LABEL = '{http://www.inkscape.org/namespaces/inkscape}label'
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _numbers(text):
+    return [float(n) for n in _NUMBER.findall(text or '')]
+
+
+def _number(text, default=0.0):
+    numbers = _numbers(text)
+    return numbers[0] if numbers else default
+
+
+def _compose(m, n):
+    """Affine matrix applying ``n`` first, then ``m``; matrices are SVG's (a, b, c, d, e, f)."""
+    return (m[0] * n[0] + m[2] * n[1], m[1] * n[0] + m[3] * n[1],
+            m[0] * n[2] + m[2] * n[3], m[1] * n[2] + m[3] * n[3],
+            m[0] * n[4] + m[2] * n[5] + m[4], m[1] * n[4] + m[3] * n[5] + m[5])
+
+
+def _transform(text):
+    matrix = IDENTITY
+    for name, args in _TRANSFORM.findall(text):
+        v = _numbers(args)
+        if not all(map(math.isfinite, v)):
+            raise DrawingError(f'bad transform {text[:40]!r}')
+        if name == 'matrix' and len(v) == 6:
+            step = tuple(v)
+        elif name == 'translate' and v:
+            step = (1.0, 0.0, 0.0, 1.0, v[0], v[1] if len(v) > 1 else 0.0)
+        elif name == 'scale' and v:
+            step = (v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0], 0.0, 0.0)
+        elif name == 'rotate' and v:
+            cos, sin = math.cos(math.radians(v[0])), math.sin(math.radians(v[0]))
+            cx, cy = (v[1], v[2]) if len(v) > 2 else (0.0, 0.0)
+            step = (cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+        elif name == 'skewX' and v:
+            step = (1.0, 0.0, math.tan(math.radians(v[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and v:
+            step = (1.0, math.tan(math.radians(v[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = _compose(matrix, step)
+    return matrix
+
+
+def _apply(m, points):
+    return [(m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]) for x, y in points]
+
+
+def _path(d):
+    """Straight runs of an SVG path and the number of curves in it; a curve ends a run."""
+    tokens = _PATH.findall(d or '')
+    runs, points = [], []
+    x = y = sx = sy = 0.0
+    curves = i = 0
+    command = None
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in 'Zz':
+                points.append((sx, sy))
+                if len(points) > 1:
+                    runs.append(points)
+                points, x, y = [(sx, sy)], sx, sy
+                continue
+        if command is None or command in 'Zz':
+            break
+        upper = command.upper()
+        args = tokens[i:i + _PATH_ARGS[upper]]
+        if len(args) < _PATH_ARGS[upper] or any(a.isalpha() for a in args):
+            break
+        args = [float(a) for a in args]
+        i += len(args)
+        relative = command.islower()
+        if upper == 'M':
+            if len(points) > 1:
+                runs.append(points)
+            x, y = (x + args[0], y + args[1]) if relative else args
+            sx, sy, points = x, y, [(x, y)]
+            # Further coordinate pairs are line-tos
+            command = 'l' if relative else 'L'
+        elif upper == 'L':
+            x, y = (x + args[0], y + args[1]) if relative else args
+            points.append((x, y))
+        elif upper == 'H':
+            x = x + args[0] if relative else args[0]
+            points.append((x, y))
+        elif upper == 'V':
+            y = y + args[0] if relative else args[0]
+            points.append((x, y))
+        else:
+            curves += 1
+            x, y = (x + args[-2], y + args[-1]) if relative else (args[-2], args[-1])
+            if len(points) > 1:
+                runs.append(points)
+            points = [(x, y)]
+    if len(points) > 1:
+        runs.append(points)
+    return runs, curves
+
+
+def _svg_unit(root):
+    """mm per user unit from the root's physical width and its viewBox, or None."""
+    match = re.fullmatch(r'\s*([0-9.eE+-]+)\s*(mm|cm|m|in|pt|pc)\s*', root.get('width') or '')
+    if not match:
+        return None
+    try:
+        width = float(match.group(1)) * SVG_UNITS[match.group(2)]
+    except ValueError:
+        return None
+    box = _numbers(root.get('viewBox'))
+    return width / box[2] if len(box) == 4 and box[2] > 0 else SVG_UNITS[match.group(2)]
+
+
+def read_svg(blocks, layers=None):
+    """Line work and labels of an SVG drawing arriving as ``blocks``.
+
+    ``layers`` limits the line work to groups with one of those ids or
+    Inkscape layer names. Elements are dropped from the parsed tree as
+    soon as they end, so memory does not grow with the file.
+    """
+    drawing = Drawing('svg')
+    wanted = {name.lower() for name in layers} if layers else None
+    parser = ElementTree.XMLPullParser(('start', 'end'))
+    stack = []
+    try:
+        for block in blocks:
+            parser.feed(block)
+            _svg_events(parser, drawing, stack, wanted)
+        parser.close()
+    except ElementTree.ParseError as e:
+        raise DrawingError(f'invalid SVG: {e}') from None
+    _svg_events(parser, drawing, stack, wanted)
+    return drawing
+
+
+def _svg_events(parser, drawing, stack, wanted):
+    for event, element in parser.read_events():
+        tag = element.tag.rpartition('}')[2]
+        if event == 'start':
+            if stack:
+                _, _, matrix, included = stack[-1]
+            else:
+                matrix, included = IDENTITY, wanted is None
+                drawing.unit = _svg_unit(element)
+            if element.get('transform'):
+                matrix = _compose(matrix, _transform(element.get('transform')))
+            if tag == 'g' and not included:
+                included = any((element.get(key) or '').lower() in wanted for key in ('id', _LABEL))
+            stack.append((element, tag, matrix, included))
+            continue
+        _, _, matrix, included = stack.pop()
+        if tag == 'text':
+            drawing.label(*_apply(matrix, [(_number(element.get('x')), _number(element.get('y')))])[0],
+                          ''.join(element.itertext()))
+            drawing.entities[tag] += 1
+        elif included and tag in ('line', 'polyline', 'polygon', 'rect', 'path'):
+            if tag == 'line':
+                runs = [[(_number(element.get('x1')), _number(element.get('y1'))),
+                         (_number(element.get('x2')), _number(element.get('y2')))]]
+            elif tag == 'rect':
+                x, y = _number(element.get('x')), _number(element.get('y'))
+                w, h = _number(element.get('width')), _number(element.get('height'))
+                runs = [[(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)]] if w > 0 and h > 0 else []
+            elif tag == 'path':
+                runs, curves = _path(element.get('d'))
+                if curves:
+                    drawing.skipped['curve'] += curves
+            else:
+                v = _numbers(element.get('points'))
+                runs = [list(zip(v[0::2], v[1::2]))]
+                if tag == 'polygon' and len(runs[0]) > 2:
+                    runs[0].append(runs[0][0])
+            for points in runs:
+                drawing.polyline(_apply(matrix, points))
+            drawing.entities[tag] += 1
+        elif tag in ('circle', 'ellipse', 'use', 'image'):
+            drawing.skipped[tag] += 1
+        # Finished elements leave the tree; a text's spans stay until the text ends
+        if stack and stack[-1][1] != 'text':
+            stack[-1][0].remove(element)
+
+
+def _direction(bucket):
+    if bucket == 0:
+        return 1.0, 0.0
+    if bucket == BUCKETS // 2:
+        return 0.0, 1.0
+    return math.cos(bucket * ANGLE_STEP), math.sin(bucket * ANGLE_STEP)
+
+
+DIRECTIONS = [_direction(b) for b in range(BUCKETS)]
+
+
+def _collinear(coords, point):
+    """Segments merged into collinear runs: {direction bucket: [(offset, start, end), ...]}.
+
+    A point on a run is ``start..end`` along the bucket's direction ``d``
+    plus ``offset`` along its normal ``(-d.y, d.x)``.
+    """
+    grouped = defaultdict(list)
+    for i in range(0, len(coords), 4):
+        x1, y1 = point(coords[i], coords[i + 1])
+        x2, y2 = point(coords[i + 2], coords[i + 3])
+        if abs(x2 - x1) < SNAP and abs(y2 - y1) < SNAP:
+            continue
+        bucket = round(math.atan2(y2 - y1, x2 - x1) % math.pi / ANGLE_STEP) % BUCKETS
+        cx, cy = DIRECTIONS[bucket]
+        a, b = cx * x1 + cy * y1, cx * x2 + cy * y2
+        grouped[bucket].append(((cx * (y1 + y2) - cy * (x1 + x2)) / 2, min(a, b), max(a, b)))
+    runs = {}
+    for bucket in list(grouped):
+        segments = sorted(grouped.pop(bucket))
+        merged = []
+        cluster = [segments[0]]
+        for segment in segments[1:] + [None]:
+            if segment is not None and segment[0] - cluster[-1][0] <= SNAP / 2:
+                cluster.append(segment)
+                continue
+            weight = sum(b - a for _, a, b in cluster)
+            offset = sum(o * (b - a) for o, a, b in cluster) / weight
+            cluster.sort(key=lambda s: s[1])
+            start, end = cluster[0][1], cluster[0][2]
+            for _, a, b in cluster[1:]:
+                if a - end > SNAP:
+                    merged.append((offset, start, end))
+                    start = a
+                end = max(end, b)
+            merged.append((offset, start, end))
+            cluster = [segment]
+        runs[bucket] = sorted(merged)
+    return runs
+
+
+def _intersect(first, second):
+    shared = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        lo, hi = max(first[i][0], second[j][0]), min(first[i][1], second[j][1])
+        if hi > lo:
+            shared.append((lo, hi))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return shared
+
+
+def _subtract(intervals, removed):
+    result = []
+    for a, b in intervals:
+        for lo, hi in removed:
+            if hi <= a or lo >= b:
+                continue
+            if lo > a:
+                result.append((a, lo))
+            a = max(a, hi)
+        if b > a:
+            result.append((a, b))
+    return result
+
+
+def _pair(bucket, lines):
+    """Walls ``[bucket, offset, start, end, thickness, paired]`` from the runs of one direction.
+
+    Parallel runs a wall's thickness apart are paired, those overlapping
+    most first, and each shared stretch becomes a wall on the centre line.
+    What is left of a run becomes a thin wall if it is long enough and not
+    inside a paired wall (like the middle line of a window symbol).
+    """
+    # Runs by band of offset and stretch along the direction, so only neighbours are compared
+    grid = defaultdict(list)
+    for i, (offset, a, b) in enumerate(lines):
+        for cell in range(int(a // CELL), int(b // CELL) + 1):
+            grid[int(offset // MAX_THICKNESS), cell].append(i)
+    candidates = []
+    seen = set()
+    for i, (offset, a, b) in enumerate(lines):
+        band = int(offset // MAX_THICKNESS)
+        for cell in range(int(a // CELL), int(b // CELL) + 1):
+            for j in grid[band, cell] + grid.get((band + 1, cell), []):
+                # Runs are sorted by offset, so later ones lie on the far side
+                if j <= i or (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                other, oa, ob = lines[j]
+                gap = other - offset
+                overlap = min(b, ob) - max(a, oa)
+                if MIN_THICKNESS <= gap <= MAX_THICKNESS and overlap >= MIN_PAIRED:
+                    candidates.append((-overlap, gap, i, j))
+    candidates.sort()
+    free = [[(a, b)] for _, a, b in lines]
+    walls = []
+    for _, gap, i, j in candidates:
+        shared = [(lo, hi) for lo, hi in _intersect(free[i], free[j]) if hi - lo >= MIN_PAIRED]
+        if shared:
+            offset = (lines[i][0] + lines[j][0]) / 2
+            walls += [[bucket, offset, lo, hi, gap, True] for lo, hi in shared]
+            free[i], free[j] = _subtract(free[i], shared), _subtract(free[j], shared)
+    walls.sort(key=lambda w: w[1])
+    offsets = [w[1] for w in walls]
+    singles = []
+    for (offset, _, _), intervals in zip(lines, free):
+        for lo, hi in intervals:
+            if hi - lo <= MAX_THICKNESS:
+                continue
+            first = bisect_left(offsets, offset - MAX_THICKNESS)
+            if not any(abs(w[1] - offset) <= w[4] / 2 + SNAP and w[2] - SNAP <= lo and hi <= w[3] + SNAP
+                       for w in walls[first:bisect_left(offsets, offset + MAX_THICKNESS + 1)]):
+                singles.append([bucket, offset, lo, hi, SINGLE_THICKNESS, False])
+    return walls + singles
+
+
+def _bridge(walls):
+    """Merge collinear walls across junction gaps and openings; returns walls and openings."""
+    walls.sort(key=lambda w: (w[0], w[1]))
+    merged, openings = [], []
+    group = []
+    for wall in walls + [None]:
+        if wall is not None and group and wall[0] == group[-1][0] and wall[1] - group[-1][1] <= SNAP:
+            group.append(wall)
+            continue
+        if group:
+            group.sort(key=lambda w: w[2])
+            current = list(group[0])
+            for w in group[1:]:
+                gap = w[2] - current[3]
+                if gap <= MIN_OPENING or (gap <= MAX_OPENING and abs(w[4] - current[4]) <= 2 * SNAP):
+                    if gap >= MIN_OPENING:
+                        openings.append((current[0], current[1], current[3], w[2], max(current[4], w[4])))
+                    current[3] = max(current[3], w[3])
+                    current[4] = max(current[4], w[4])
+                    current[5] = current[5] or w[5]
+                else:
+                    merged.append(current)
+                    current = list(w)
+            merged.append(current)
+        group = [wall]
+    return merged, openings
+
+
+def _at(bucket, offset, t):
+    cx, cy = DIRECTIONS[bucket]
+    return t * cx - offset * cy, t * cy + offset * cx
+
+
+def _span(a, b, pad):
+    return range(int((min(a, b) - pad) // CELL), int((max(a, b) + pad) // CELL) + 1)
+
+
+def _cells(x1, y1, x2, y2, pad=0.0):
+    return itertools.product(_span(x1, x2, pad), _span(y1, y2, pad))
+
+
+def _grid(boxes, pad=0.0):
+    """Indexes of ``boxes`` ``(x1, y1, x2, y2)`` by the cells they touch, at most ``MAX_CELLS`` entries."""
+    grid = defaultdict(list)
+    total = 0
+    for index, (x1, y1, x2, y2) in enumerate(boxes):
+        columns, rows = _span(x1, x2, pad), _span(y1, y2, pad)
+        total += len(columns) * len(rows)
+        if total > MAX_CELLS:
+            raise DrawingError('the drawing has too much line work to import')
+        for cell in itertools.product(columns, rows):
+            grid[cell].append(index)
+    return grid
+
+
+def _join(walls):
+    """Wall segments ``[x1, y1, x2, y2, thickness, paired]`` with their ends meeting the walls they stop at.
+
+    An end moves to where its line crosses a non-parallel wall, if that is
+    within ``JOIN``. Thin walls left with a loose end no longer than an
+    opening (door leaves, mostly) are dropped.
+    """
+    segments = []
+    for bucket, offset, a, b, thickness, paired in walls:
+        segments.append([*_at(bucket, offset, a), *_at(bucket, offset, b), thickness, paired])
+    grid = _grid((s[:4] for s in segments), JOIN)
+    joined = [[False, False] for _ in segments]
+    for index, s in enumerate(segments):
+        dx, dy = s[2] - s[0], s[3] - s[1]
+        for end in (0, 1):
+            ex, ey = s[2 * end], s[2 * end + 1]
+            best = None
+            for other in {o for cell in _cells(ex, ey, ex, ey) for o in grid[cell]}:
+                if other == index:
+                    continue
+                o = segments[other]
+                odx, ody = o[2] - o[0], o[3] - o[1]
+                length = math.hypot(odx, ody)
+                cross = dx * ody - dy * odx
+                if length == 0 or abs(cross) < 0.05 * math.hypot(dx, dy) * length:
+                    continue
+                # Where this wall's line crosses the other's
+                u = ((o[0] - s[0]) * ody - (o[1] - s[1]) * odx) / cross
+                px, py = s[0] + u * dx, s[1] + u * dy
+                distance = math.hypot(px - ex, py - ey)
+                along = ((px - o[0]) * odx + (py - o[1]) * ody) / length
+                if distance <= JOIN and -JOIN <= along <= length + JOIN and (best is None or distance < best[0]):
+                    best = (distance, px, py)
+            if best is not None:
+                s[2 * end], s[2 * end + 1] = best[1], best[2]
+                joined[index][end] = True
+    return [s for s, ends in zip(segments, joined)
+            if math.hypot(s[2] - s[0], s[3] - s[1]) > SNAP
+            and (s[5] or all(ends) or math.hypot(s[2] - s[0], s[3] - s[1]) > MAX_OPENING)]
+
+
+def _faces(segments):
+    """Closed regions of the graph the wall centre lines form, as polygons of rounded points."""
+    cuts = [[0.0, 1.0] for _ in segments]
+    grid = _grid(s[:4] for s in segments)
+    pairs = {(i, j) for members in grid.values() for i in members for j in members if i < j}
+    for i, j in pairs:
+        s, o = segments[i], segments[j]
+        rx, ry, qx, qy = s[2] - s[0], s[3] - s[1], o[2] - o[0], o[3] - o[1]
+        cross = rx * qy - ry * qx
+        if cross == 0:
+            continue
+        u = ((o[0] - s[0]) * qy - (o[1] - s[1]) * qx) / cross
+        v = ((o[0] - s[0]) * ry - (o[1] - s[1]) * rx) / cross
+        # A millimetre of slack, so walls ending on another one still meet it
+        su, sv = 1 / math.hypot(rx, ry), 1 / math.hypot(qx, qy)
+        if -su <= u <= 1 + su and -sv <= v <= 1 + sv:
+            cuts[i].append(min(max(u, 0.0), 1.0))
+            cuts[j].append(min(max(v, 0.0), 1.0))
+    neighbours = defaultdict(set)
+    for s, params in zip(segments, cuts):
+        nodes = [(round(s[0] + t * (s[2] - s[0])), round(s[1] + t * (s[3] - s[1]))) for t in sorted(set(params))]
+        for a, b in zip(nodes, nodes[1:]):
+            if a != b:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+    around = {node: sorted(others, key=lambda m: math.atan2(m[1] - node[1], m[0] - node[0]))
+              for node, others in neighbours.items()}
+    position = {node: {m: k for k, m in enumerate(others)} for node, others in around.items()}
+    visited = set()
+    faces = []
+    for start, others in around.items():
+        for first in others:
+            if (start, first) in visited:
+                continue
+            face = []
+            a, b = start, first
+            while (a, b) not in visited:
+                visited.add((a, b))
+                face.append(a)
+                ring = around[b]
+                a, b = b, ring[(position[b][a] - 1) % len(ring)]
+            faces.append(face)
+    # Turning to the next edge clockwise walks bounded regions counter-clockwise (positive area);
+    # the outline around each separate group of walls comes out the other way round
+    return [_simplify(face) for face in faces if _area(face) > 0]
+
+
+def _area(points):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1])) / 2
+
+
+def _simplify(points):
+    """Points without repeats, straight-through corners or the spikes dangling walls leave."""
+    changed = True
+    while changed and len(points) > 2:
+        changed = False
+        kept = []
+        n = len(points)
+        for i, (x, y) in enumerate(points):
+            px, py = points[i - 1]
+            nx, ny = points[(i + 1) % n]
+            if (x, y) == (px, py) or (x - px) * (ny - y) - (y - py) * (nx - x) == 0:
+                changed = True
+                continue
+            kept.append((x, y))
+        if changed:
+            points = kept
+    return points
+
+
+def _contains(polygon, x, y):
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+class _Rooms:
+    """Finds the room containing a point through a grid of room bounding boxes."""
+
+    def __init__(self, rooms):
+        self.rooms = rooms
+        self.grid = _grid((r['x'], r['y'], r['x'] + r['width'], r['y'] + r['depth']) for r in rooms)
+
+    def find(self, x, y):
+        for index in self.grid.get((int(x // CELL), int(y // CELL)), ()):
+            room = self.rooms[index]
+            if room['x'] <= x <= room['x'] + room['width'] and room['y'] <= y <= room['y'] + room['depth'] \
+                    and _contains(room['polygon'], x, y):
+                return room
+        return None
+
+
+def build_plan(drawing, unit=None):
+    """Plan and import summary for ``drawing``; ``unit`` (mm per drawing unit) overrides the file's."""
+    scale = unit or drawing.unit or 1.0
+    coords = drawing.segments
+    if not coords:
+        raise DrawingError('the drawing has no line work')
+    min_x, max_x = min(min(coords[0::4]), min(coords[2::4])), max(max(coords[0::4]), max(coords[2::4]))
+    min_y, max_y = min(min(coords[1::4]), min(coords[3::4])), max(max(coords[1::4]), max(coords[3::4]))
+    if not (math.isfinite(scale) and scale > 0):
+        raise DrawingError(f'bad drawing unit {scale!r} mm')
+    width, depth = (max_x - min_x) * scale, (max_y - min_y) * scale
+    if max(width, depth) > MAX_EXTENT:
+        raise DrawingError(f'the drawing spans {width / 1000:.6g} x {depth / 1000:.6g} m, more than '
+                           f'{MAX_EXTENT // 1000} m; check its unit')
+
+    # Plan coordinates are mm from the top-left corner, with y running down as on screen
+    def point(x, y):
+        return (x - min_x) * scale, ((max_y - y) if drawing.y_up else (y - min_y)) * scale
+
+    walls, openings = _bridge([w for bucket, lines in _collinear(coords, point).items() for w in _pair(bucket, lines)])
+    segments = _join(walls)
+
+    rooms = []
+    for polygon in _faces(segments):
+        area = abs(_area(polygon)) / 1e6
+        if area < MIN_ROOM_AREA:
+            continue
+        xs, ys = [p[0] for p in polygon], [p[1] for p in polygon]
+        rooms.append({'id': None, 'type': 'room', 'x': min(xs), 'y': min(ys), 'width': max(xs) - min(xs),
+                      'depth': max(ys) - min(ys), 'area': round(area, 2), 'polygon': [list(p) for p in polygon]})
+    rooms.sort(key=lambda r: (r['y'], r['x']))
+    locate = _Rooms(rooms)
+    names = defaultdict(list)
+    for x, y, text in drawing.labels:
+        room = locate.find(*point(x, y))
+        if room is not None:
+            names[id(room)].append(text)
+    counts = Counter()
+    for room in rooms:
+        labels = names.get(id(room), [])
+        room_type = next((LABEL_WORDS[w] for text in labels for w in words(text) if w in LABEL_WORDS), 'room')
+        style = ROOM_SPECS.get(room_type, DEFAULT_STYLE)
+        counts[room_type] += 1
+        room.update({
+            'id': f'{room_type}_{counts[room_type]}',
+            'type': room_type,
+            'height': style['height'],
+            'color': style['color'],
+            'floor_color': style['floor_color'],
+            'furniture': [],
+            '3d_properties': {'ceiling_height': style['height'], 'wall_thickness': 200,
+                              'window_height': 800 if room_type == 'bathroom' else 1200, 'door_height': 2100}
+        })
+        if labels:
+            room['name'] = ', '.join(labels)
+
+    doors = []
+    for bucket, offset, a, b, thickness in openings:
+        x, y = _at(bucket, offset, a)
+        mx, my = _at(bucket, offset, (a + b) / 2)
+        cx, cy = DIRECTIONS[bucket]
+        reach = thickness / 2 + 200
+        sides = [locate.find(mx - cy * reach * side, my + cx * reach * side) for side in (1, -1)]
+        sides = [room['id'] for room in sides if room is not None]
+        if sides:
+            doors.append({'x': round(x), 'y': round(y), 'width': round(b - a), 'height': 2100,
+                          'room1': sides[0] if len(sides) == 2 else 'entrance', 'room2': sides[-1],
+                          'type': 'interior' if len(sides) == 2 else 'entrance'})
+
+    width, depth = round((max_x - min_x) * scale), round((max_y - min_y) * scale)
+    plan = {
+        'rooms': rooms,
+        'walls': [{'x1': round(s[0]), 'y1': round(s[1]), 'x2': round(s[2]), 'y2': round(s[3]),
+                   'height': WALL_HEIGHT, 'thickness': round(s[4])} for s in segments],
+        'doors': doors,
+        'windows': [],
+        'furniture': [],
+        '3d_data': {
+            'camera': {
+                'position': {'x': width / 2, 'y': depth / 2, 'z': max(3000, max(width, depth) / 2)},
+                'target': {'x': width / 2, 'y': depth / 2, 'z': 0},
+                'fov': 60
+            },
+            'lights': [
+                {'type': 'ambient', 'intensity': 0.4, 'color': 0xffffff},
+                {'type': 'directional', 'position': {'x': width / 2, 'y': 0, 'z': 5000}, 'intensity': 0.8,
+                 'color': 0xffffff}
+            ],
+            'materials': {
+                'floor': {'color': 0xf5f5dc, 'roughness': 0.8},
+                'wall': {'color': 0xf0f0f0, 'roughness': 0.9},
+                'ceiling': {'color': 0xffffff, 'roughness': 0.7}
+            }
+        },
+        'react_planner_data': {
+            'version': '1.0',
+            'scale': 1,
+            'layers': {
+                'layer-1': {
+                    'id': 'layer-1',
+                    'name': 'Floor Plan',
+                    'visible': True,
+                    'opacity': 1,
+                    'selected': True,
+                    'elements': {}
+                }
+            },
+            'scene': {'width': width, 'height': depth, 'rotation': 0, 'scale': 1}
+        }
+    }
+    elements = plan['react_planner_data']['layers']['layer-1']['elements']
+    for i, room in enumerate(rooms, start=1):
+        elements[f'element-{i}'] = {
+            'id': f'element-{i}',
+            'type': 'room',
+            'x': room['x'],
+            'y': room['y'],
+            'width': room['width'],
+            'height': room['depth'],
+            'properties': {'name': room.get('name', room['type'].title()), 'height': room['height'],
+                           'color': room['color']}
+        }
+    summary = {
+        'format': drawing.kind,
+        'unitMm': scale,
+        'extentMm': [width, depth],
+        'entities': dict(drawing.entities),
+        'skipped': dict(drawing.skipped),
+        'segments': len(coords) // 4,
+        'labels': len(drawing.labels),
+        'walls': len(segments),
+        'pairedWalls': sum(1 for s in segments if s[5]),
+        'openings': len(doors),
+        'rooms': len(rooms),
+        'roomArea': round(sum(r['area'] for r in rooms), 2)
+    }
+    return plan, summary
@@ -0,0 +1,410 @@
+"""3D export of plans as glTF 2.0 (binary ``.glb`` or embedded ``.gltf``) and Wavefront OBJ.
+
+Walls become boxes along their centre lines, rooms floor slabs coloured
+like the plan, and furniture one mesh per catalog item: a few boxes shaped
+after the item's type (bed frame and headboard, table top and legs, ...)
+at its catalog size. Those meshes are built once and kept in ``meshes``,
+an LRU shared by every export, and a furnished building only repeats a
+few dozen of them.
+
+glTF exports place each piece of furniture in one of three ways:
+
+* ``nodes`` (default): one node per placement referring to the shared
+  mesh, with the placement as its translation and rotation;
+* ``gpu``: one node per mesh carrying every placement in the
+  ``EXT_mesh_gpu_instancing`` extension, for viewers that draw them in
+  a single call (others show only the first placement);
+* ``off``: geometry copied and transformed per placement, for tools that
+  cannot instance at all.
+
+OBJ has no instancing, so every placement's vertices are written out, but
+its faces are written with relative indices and reused from the cache.
+
+Plan millimetres map to glTF metres with y up: plan x is x, plan y is z
+and heights are y, which keeps the plan's orientation when looking down.
+Furniture ``rotation`` is in degrees, clockwise on the plan, about the
+centre of the item's footprint; ``x``/``y`` are the corner of that
+footprint relative to its room.
+"""
+import base64
+import json
+import math
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from archsense.specs import ROOM_SPECS
+
+FORMATS = ('glb', 'gltf', 'obj')
+CONTENT_TYPES = {'glb': 'model/gltf-binary', 'gltf': 'model/gltf+json', 'obj': 'model/obj'}
+INSTANCING = ('nodes', 'gpu', 'off')
+STOREY = 3000
+WALL_HEIGHT = 3000
+WALL_THICKNESS = 200
+SLAB = 50
+DEFAULT_FLOOR_COLOR = 0xf5f5f5
+WALL_COLOR = 0xf0f0f0
+FURNITURE_COLOR = 0xc8b89a
+MM = 0.001
+# Smallest furniture dimension modelled, in mm
+MIN_SIZE = 1.0
+
+# Faces of a unit box (x and z in -0.5..0.5, y in 0..1): normal and corners counter-clockwise from outside
+_FACES = (
+    ((1, 0, 0), ((0.5, 0, 0.5), (0.5, 0, -0.5), (0.5, 1, -0.5), (0.5, 1, 0.5))),
+    ((-1, 0, 0), ((-0.5, 0, -0.5), (-0.5, 0, 0.5), (-0.5, 1, 0.5), (-0.5, 1, -0.5))),
+    ((0, 1, 0), ((-0.5, 1, 0.5), (0.5, 1, 0.5), (0.5, 1, -0.5), (-0.5, 1, -0.5))),
+    ((0, -1, 0), ((-0.5, 0, -0.5), (0.5, 0, -0.5), (0.5, 0, 0.5), (-0.5, 0, 0.5))),
+    ((0, 0, 1), ((-0.5, 0, 0.5), (0.5, 0, 0.5), (0.5, 1, 0.5), (-0.5, 1, 0.5))),
+    ((0, 0, -1), ((0.5, 0, -0.5), (-0.5, 0, -0.5), (-0.5, 1, -0.5), (0.5, 1, -0.5))),
+)
+_CORNERS = np.array([c for _, corners in _FACES for c in corners], dtype=np.float64)
+_NORMALS = np.array([n for n, _ in _FACES for _ in range(4)], dtype=np.float64)
+_TRIANGLES = np.array([[4 * f, 4 * f + 1, 4 * f + 2, 4 * f, 4 * f + 2, 4 * f + 3] for f in range(6)]).ravel()
+
+
+def _yaw(points, angles):
+    """Rotate (..., 3) points about y by ``angles`` (radians, one per leading row)."""
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x, z = points[..., 0], points[..., 2]
+    return np.stack([x * cos + z * sin, points[..., 1], z * cos - x * sin], axis=-1)
+
+
+def boxes(specs):
+    """Positions, normals and triangle indices of boxes given as rows (x, y, z, width, height, depth, yaw).
+
+    (x, y, z) is the centre of the box's base; yaw turns it about y.
+    """
+    specs = np.asarray(specs, dtype=np.float64).reshape(-1, 7)
+    local = _CORNERS[None] * specs[:, None, 3:6]
+    positions = _yaw(local, specs[:, 6]) + specs[:, None, :3]
+    normals = _yaw(np.broadcast_to(_NORMALS, local.shape), specs[:, 6])
+    indices = (_TRIANGLES[None] + 24 * np.arange(len(specs))[:, None]).ravel()
+    return positions.reshape(-1, 3).astype(np.float32), normals.reshape(-1, 3).astype(np.float32), indices
+
+
+def _parts(kind, w, d, h):
+    """Boxes (x, y, z, width, height, depth) of a furniture item centred on its footprint, in mm."""
+    leg = 50
+    legs = [(sx * (w / 2 - leg), 0, sz * (d / 2 - leg), leg, 0, leg) for sx in (-1, 1) for sz in (-1, 1)]
+    if kind == 'bed':
+        return [(0, 0, 0, w, h * 0.5, d), (0, h * 0.5, 50, w - 60, h * 0.5, d - 160),
+                (0, 0, 60 - d / 2, w, h + 400, 60)]
+    if kind in ('table', 'chair'):
+        top = 450 if kind == 'chair' else h
+        parts = [(x, y, z, sw, top - 40, sd) for x, y, z, sw, _, sd in legs] + [(0, top - 40, 0, w, 40, d)]
+        if kind == 'chair':
+            parts.append((0, top, 25 - d / 2, w, h - top, 50))
+        return parts
+    if kind == 'sofa':
+        return [(0, 0, 0, w, 420, d), (0, 420, 100 - d / 2, w, h - 420, 200),
+                (75 - w / 2, 420, 0, 150, 200, d), (w / 2 - 75, 420, 0, 150, 200, d)]
+    if kind == 'toilet':
+        return [(0, 0, 60, w * 0.8, 400, d - 120), (0, 0, 80 - d / 2, w, h, 160)]
+    if kind == 'sink':
+        return [(0, 0, 0, w, h - 150, d), (0, h - 150, 0, w, 150, d), (0, h, 40 - d / 2, 30, 250, 30)]
+    if kind == 'shower':
+        return [(0, 0, 0, w, 80, d), (0, 80, d / 2 - 5, w, h - 80, 10), (w / 2 - 5, 80, 0, 10, h - 80, d)]
+    if kind == 'bathtub':
+        return [(0, 0, 0, w, 60, d), (0, 60, 40 - d / 2, w, h - 60, 80), (0, 60, d / 2 - 40, w, h - 60, 80),
+                (40 - w / 2, 60, 0, 80, h - 60, d - 160), (w / 2 - 40, 60, 0, 80, h - 60, d - 160)]
+    if kind in ('storage', 'appliance', 'counter'):
+        return [(0, 0, 0, w - 20, 100, d - 20), (0, 100, 0, w, h - 100, d)]
+    return [(0, 0, 0, w, h, d)]
+
+
+class Mesh:
+    """Geometry of one furniture item in metres, with its glTF buffer data packed once."""
+
+    __slots__ = ('name', 'positions', 'normals', 'indices', 'packed', 'faces')
+
+    def __init__(self, name, positions, normals, indices):
+        self.name = name
+        self.positions = positions
+        self.normals = normals
+        self.indices = indices
+        # (positions, normals, indices) bytes, min, max and index component type
+        self.packed = _pack(positions, normals, indices)
+        # OBJ face lines with indices relative to the end of the item's own vertices
+        relative = indices.reshape(-1, 3).astype(np.int64) - len(positions)
+        self.faces = ''.join(f'f {a}//{a} {b}//{b} {c}//{c}\n' for a, b, c in relative.tolist())
+
+    @property
+    def nbytes(self):
+        return sum(len(chunk) for chunk in self.packed[0]) + len(self.faces)
+
+
+class MeshCache:
+    """LRU of furniture meshes by (type, width, depth, height), shared by every export."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(item):
+        size = [float(item.get(k, default)) for k, default in (('width', 500), ('depth', 500), ('height', 750))]
+        # Zero, negative or NaN sizes would leave the item without geometry
+        return (item.get('type') or 'item', *(v if v > MIN_SIZE else MIN_SIZE for v in size))
+
+    def get(self, item):
+        key = self.key(item)
+        with self._lock:
+            mesh = self._entries.get(key)
+            if mesh is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return mesh
+            self.misses += 1
+        kind, w, d, h = key
+        parts = [(x * MM, y * MM, z * MM, sw * MM, sh * MM, sd * MM, 0)
+                 for x, y, z, sw, sh, sd in _parts(kind, w, d, h) if sw > 0 and sh > 0 and sd > 0]
+        # Items too small for any of their type's parts are a plain box
+        parts = parts or [(0, 0, 0, w * MM, h * MM, d * MM, 0)]
+        positions, normals, indices = boxes(parts)
+        mesh = Mesh(item.get('catalogId') or item.get('name') or kind, positions, normals, indices.astype(np.uint16))
+        with self._lock:
+            self._entries[key] = mesh
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return mesh
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, keep):
+        """Drop least recently used entries until at most ``keep`` are left; returns how many went."""
+        with self._lock:
+            dropped = max(len(self._entries) - keep, 0)
+            for _ in range(dropped):
+                self._entries.popitem(last=False)
+        return dropped
+
+    def __len__(self):
+        return len(self._entries)
+
+
+meshes = MeshCache()
+
+
+def _pack(positions, normals, indices):
+    if indices.dtype != np.uint16 and len(positions) <= 0xffff:
+        indices = indices.astype(np.uint16)
+    elif indices.dtype != np.uint16:
+        indices = indices.astype(np.uint32)
+    # glTF component types: 5123 unsigned short, 5125 unsigned int
+    component = 5123 if indices.dtype == np.uint16 else 5125
+    return ((positions.tobytes(), normals.tobytes(), indices.tobytes()),
+            positions.min(axis=0).tolist(), positions.max(axis=0).tolist(), component)
+
+
+def _color(value, default):
+    try:
+        value = int(value.lstrip('#'), 16) if isinstance(value, str) else int(value)
+    except (OverflowError, TypeError, ValueError):
+        # Missing, named ('beige') or otherwise unreadable colours
+        value = default
+    # Plan colours are sRGB; glTF base colours are linear
+    return tuple(round((((value >> s) & 0xff) / 255) ** 2.2, 4) for s in (16, 8, 0))
+
+
+def _rotation(item):
+    return math.radians(item.get('rotation', 0) or 0)
+
+
+def placements(plan):
+    """Furniture of a plan as ``{mesh key: (mesh, [(x, y, z, yaw), ...])}`` in metres and radians."""
+    placed = {}
+    for room in plan.get('rooms', []):
+        base = room.get('floor', 0) * STOREY
+        for item in room.get('furniture', []):
+            mesh = meshes.get(item)
+            turn = _rotation(item)
+            w, d = float(item.get('width', 500)), float(item.get('depth', 500))
+            # x/y give the corner of the turned footprint; the mesh is centred on it
+            fw = abs(w * math.cos(turn)) + abs(d * math.sin(turn))
+            fd = abs(w * math.sin(turn)) + abs(d * math.cos(turn))
+            x = room.get('x', 0) + item.get('x', 0) + fw / 2
+            y = room.get('y', 0) + item.get('y', 0) + fd / 2
+            entry = placed.setdefault(MeshCache.key(item), (mesh, []))
+            # Clockwise on the plan (y down) is a negative turn about glTF's y axis
+            entry[1].append((x * MM, (base + item.get('z', 0)) * MM, y * MM, -turn))
+    return placed
+
+
+def structure(plan):
+    """Walls and floor slabs as ``[(name, colour, positions, normals, indices)]``, one per material."""
+    parts = []
+    walls = []
+    for wall in plan.get('walls', []):
+        x1, y1, x2, y2 = wall.get('x1', 0), wall.get('y1', 0), wall.get('x2', 0), wall.get('y2', 0)
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length:
+            walls.append(((x1 + x2) / 2 * MM, wall.get('floor', 0) * STOREY * MM, (y1 + y2) / 2 * MM, length * MM,
+                          wall.get('height', WALL_HEIGHT) * MM, wall.get('thickness', WALL_THICKNESS) * MM,
+                          math.atan2(y1 - y2, x2 - x1)))
+    if walls:
+        parts.append(('walls', _color(None, WALL_COLOR), *boxes(walls)))
+    slabs = {}
+    for room in plan.get('rooms', []):
+        color = room.get('floor_color', ROOM_SPECS.get(room.get('type'), {}).get('floor_color'))
+        slabs.setdefault(_color(color, DEFAULT_FLOOR_COLOR), []).append((
+            (room.get('x', 0) + room.get('width', 0) / 2) * MM, (room.get('floor', 0) * STOREY - SLAB) * MM,
+            (room.get('y', 0) + room.get('depth', 0) / 2) * MM, room.get('width', 0) * MM, SLAB * MM,
+            room.get('depth', 0) * MM, 0))
+    for i, (color, rows) in enumerate(slabs.items()):
+        parts.append((f'floors_{i + 1}', color, *boxes(rows)))
+    return parts
+
+
+class _Gltf:
+    """A glTF document and its binary buffer under construction."""
+
+    def __init__(self):
+        self.doc = {'asset': {'version': '2.0', 'generator': 'ArchSense'}, 'scene': 0, 'scenes': [{'nodes': []}],
+                    'nodes': [], 'meshes': [], 'materials': [], 'accessors': [], 'bufferViews': []}
+        self.chunks = []
+        self.length = 0
+        self.colors = {}
+
+    def view(self, data, target=None):
+        padding = -self.length % 4
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.length += padding
+        view = {'buffer': 0, 'byteOffset': self.length, 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        self.chunks.append(data)
+        self.length += len(data)
+        self.doc['bufferViews'].append(view)
+        return len(self.doc['bufferViews']) - 1
+
+    def accessor(self, data, component, count, kind, target=None, bounds=None):
+        accessor = {'bufferView': self.view(data, target), 'componentType': component, 'count': count, 'type': kind}
+        if bounds:
+            accessor['min'], accessor['max'] = bounds
+        self.doc['accessors'].append(accessor)
+        return len(self.doc['accessors']) - 1
+
+    def material(self, color):
+        if color not in self.colors:
+            self.colors[color] = len(self.doc['materials'])
+            self.doc['materials'].append({'pbrMetallicRoughness': {'baseColorFactor': [*color, 1.0],
+                                                                   'metallicFactor': 0.0, 'roughnessFactor': 0.8}})
+        return self.colors[color]
+
+    def mesh(self, name, packed, count, material):
+        (positions, normals, indices), low, high, component = packed
+        # 34962 ARRAY_BUFFER, 34963 ELEMENT_ARRAY_BUFFER; 5126 FLOAT
+        primitive = {
+            'attributes': {'POSITION': self.accessor(positions, 5126, count, 'VEC3', 34962, (low, high)),
+                           'NORMAL': self.accessor(normals, 5126, count, 'VEC3', 34962)},
+            'indices': self.accessor(indices, component, len(indices) // (2 if component == 5123 else 4),
+                                     'SCALAR', 34963),
+            'material': material
+        }
+        self.doc['meshes'].append({'name': name, 'primitives': [primitive]})
+        return len(self.doc['meshes']) - 1
+
+    def node(self, node):
+        self.doc['nodes'].append(node)
+        self.doc['scenes'][0]['nodes'].append(len(self.doc['nodes']) - 1)
+
+    def glb(self):
+        doc = json.dumps(self.finish(), separators=(',', ':')).encode()
+        doc += b' ' * (-len(doc) % 4)
+        binary = b''.join(self.chunks)
+        binary += b'\0' * (-len(binary) % 4)
+        return b''.join((struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(doc) + 8 + len(binary)),
+                         struct.pack('<I4s', len(doc), b'JSON'), doc,
+                         struct.pack('<I4s', len(binary), b'BIN\0'), binary))
+
+    def gltf(self):
+        doc = self.finish()
+        if self.length:
+            doc['buffers'][0]['uri'] = ('data:application/octet-stream;base64,'
+                                        + base64.b64encode(b''.join(self.chunks)).decode())
+        return json.dumps(doc, separators=(',', ':')).encode()
+
+    def finish(self):
+        doc = {key: value for key, value in self.doc.items() if value != []}
+        if self.length:
+            doc['buffers'] = [{'byteLength': self.length}]
+        return doc
+
+
+def export_gltf(plan, binary=True, instancing='nodes'):
+    """A plan body as a glTF 2.0 document: GLB bytes, or JSON with the buffer embedded."""
+    if instancing not in INSTANCING:
+        raise ValueError(f"instancing must be one of {', '.join(INSTANCING)}")
+    gltf = _Gltf()
+    for name, color, positions, normals, indices in structure(plan):
+        mesh = gltf.mesh(name, _pack(positions, normals, indices), len(positions), gltf.material(color))
+        gltf.node({'name': name, 'mesh': mesh})
+    furniture = gltf.material(_color(None, FURNITURE_COLOR))
+    for mesh, placed in placements(plan).values():
+        count = len(mesh.positions)
+        if instancing == 'off':
+            for number, (x, y, z, yaw) in enumerate(placed, start=1):
+                positions = (_yaw(mesh.positions[None], np.array([yaw]))[0] + (x, y, z)).astype(np.float32)
+                normals = _yaw(mesh.normals[None], np.array([yaw]))[0].astype(np.float32)
+                index = gltf.mesh(mesh.name, _pack(positions, normals, mesh.indices), count, furniture)
+                gltf.node({'name': f'{mesh.name}_{number}', 'mesh': index})
+            continue
+        index = gltf.mesh(mesh.name, mesh.packed, count, furniture)
+        rotations = [[0.0, math.sin(yaw / 2), 0.0, math.cos(yaw / 2)] for _, _, _, yaw in placed]
+        if instancing == 'gpu':
+            translations = np.array([p[:3] for p in placed], dtype=np.float32)
+            attributes = {'TRANSLATION': gltf.accessor(translations.tobytes(), 5126, len(placed), 'VEC3'),
+                          'ROTATION': gltf.accessor(np.array(rotations, dtype=np.float32).tobytes(), 5126,
+                                                    len(placed), 'VEC4')}
+            gltf.node({'name': mesh.name, 'mesh': index,
+                       'extensions': {'EXT_mesh_gpu_instancing': {'attributes': attributes}}})
+            gltf.doc['extensionsUsed'] = ['EXT_mesh_gpu_instancing']
+            continue
+        for number, ((x, y, z, yaw), rotation) in enumerate(zip(placed, rotations), start=1):
+            node = {'name': f'{mesh.name}_{number}', 'mesh': index, 'translation': [x, y, z]}
+            if yaw:
+                node['rotation'] = rotation
+            gltf.node(node)
+    return gltf.glb() if binary else gltf.gltf()
+
+
+def _obj_block(name, positions, normals, faces):
+    lines = [f'o {name}\n']
+    lines += [f'v {x:.4f} {y:.4f} {z:.4f}\n' for x, y, z in positions.tolist()]
+    lines += [f'vn {x:.4f} {y:.4f} {z:.4f}\n' for x, y, z in normals.tolist()]
+    lines.append(faces)
+    return ''.join(lines)
+
+
+def export_obj(plan):
+    """A plan body as Wavefront OBJ text (bytes), in metres with y up."""
+    blocks = ['# ArchSense plan export\n']
+    for name, _, positions, normals, indices in structure(plan):
+        relative = indices.reshape(-1, 3) - len(positions)
+        faces = ''.join(f'f {a}//{a} {b}//{b} {c}//{c}\n' for a, b, c in relative.tolist())
+        blocks.append(_obj_block(name, positions, normals, faces))
+    for mesh, placed in placements(plan).values():
+        placed = np.array(placed)
+        # Every placement of a mesh is transformed in one go
+        positions = _yaw(np.broadcast_to(mesh.positions, (len(placed),) + mesh.positions.shape), placed[:, 3])
+        positions += placed[:, None, :3]
+        normals = _yaw(np.broadcast_to(mesh.normals, positions.shape), placed[:, 3])
+        for number in range(len(placed)):
+            blocks.append(_obj_block(f'{mesh.name}_{number + 1}', positions[number], normals[number], mesh.faces))
+    return ''.join(blocks).encode()
+
+
+def export(plan, fmt, instancing='nodes'):
+    """A plan body in ``fmt`` (one of ``FORMATS``)."""
+    if fmt == 'obj':
+        return export_obj(plan)
+    return export_gltf(plan, binary=fmt == 'glb', instancing=instancing)
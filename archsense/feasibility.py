@@ -0,0 +1,433 @@
+"""Analytic feasibility precheck for layout requests.
+
+Every check is a necessary condition on the request alone: a request that
+fails one cannot be laid out whatever the solver does, while one that
+passes may still fail to solve. The checks are
+
+* area: the rooms' minimum areas (``ROOM_SPECS``, or a room's own
+  ``minArea`` or fixed footprint) against the site area of every floor,
+  less the stair core when there are several floors, in total and for
+  the rooms pinned to each floor;
+* dimensions: a room with a fixed ``width`` or ``depth`` has to fit the
+  site, turned if need be, and so does the stair core; a single floor is
+  drawn as a fixed layout, which needs a ``SINGLE_FLOOR_SITE`` site;
+* adjacency: required neighbours (``adjacency``, pairs of room ids such
+  as ``bedroom_2``, or of types with a single room) must be on the same
+  floor, a room can only share ``MIN_SHARED_WALL`` of wall with as many
+  rooms as its largest perimeter allows, and rectangles that share walls
+  form a planar graph.
+
+Each failure is a reason with a ``code`` and the numbers behind it, and
+comes with relaxations tagged with that code: alternative changes to one
+field of the request (site width or depth, floors, rooms or adjacency),
+each the smallest that clears the reason on its own. A report that gets
+that far also gives the site and floors as numbers, defaults filled in,
+which is what the request is to be laid out with.
+"""
+import math
+from itertools import islice
+
+from archsense.multifloor import CORE_DEPTH, CORE_WIDTH, DEFAULT_PROGRAM, DEFAULT_SPEC, GRID, MAX_FLOORS
+from archsense.specs import ROOM_SPECS
+
+MIN_SHARED_WALL = 900   # mm of common wall before two rooms count as adjacent
+MAX_ROOMS = 500
+MAX_SITE = 1000000      # mm, for either side of the site and of a room
+# Width and depth of the layout the server draws for a single floor
+SINGLE_FLOOR_SITE = (10000, 6500)
+# Planarity test attempts when looking for an adjacency to drop
+MAX_DROPS = 60
+
+
+class _Infeasible(Exception):
+    """The request is malformed; carries the reason."""
+
+
+def _number(requirements, key, default, minimum, maximum):
+    value = requirements.get(key, default)
+    try:
+        value = float(value if value is not None else default)
+    except (TypeError, ValueError):
+        raise _Infeasible({'code': 'invalid', 'field': key, 'message': f'{key} must be a number'})
+    if not minimum <= value <= maximum:
+        raise _Infeasible({'code': 'invalid', 'field': key, 'message': f'{key} must be from {minimum} to {maximum}'})
+    return value
+
+
+def _bounded(value, minimum, maximum):
+    """``value`` as a float; ValueError unless it lies in [minimum, maximum], which also rules out NaN."""
+    value = float(value)
+    if not minimum <= value <= maximum:
+        raise ValueError(f'{value} is not from {minimum} to {maximum}')
+    return value
+
+
+def program(rooms):
+    """The requested rooms ('bedroom' or {'type', 'count', 'floor', 'id', 'minArea', 'width', 'depth'}).
+
+    Returns dicts with an ``id`` (the given one, else ``<type>_<n>``
+    counting from 1 per type), type, floor, minimum area in m² and the
+    fixed width and depth in mm, None where free.
+    """
+    entries = []
+    for room in rooms or DEFAULT_PROGRAM:
+        if isinstance(room, str):
+            room = {'type': room}
+        elif not isinstance(room, dict) or not room.get('type'):
+            continue
+        count = int(room.get('count', 1))
+        if count < 0:
+            raise _Infeasible({'code': 'invalid', 'field': 'rooms', 'message': 'Room counts must not be negative'})
+        if len(entries) + count > MAX_ROOMS:
+            raise _Infeasible({'code': 'invalid', 'field': 'rooms',
+                               'message': f'Requests are limited to {MAX_ROOMS} rooms'})
+        spec = ROOM_SPECS.get(room['type'], DEFAULT_SPEC)
+        width, depth = room.get('width'), room.get('depth')
+        width = _bounded(width, 0, MAX_SITE) if width else None
+        depth = _bounded(depth, 0, MAX_SITE) if depth else None
+        area = _bounded(room.get('minArea', spec['min_area']), 0, MAX_SITE * MAX_SITE / 1e6)
+        if width and depth:
+            area = max(area, width * depth / 1e6)
+        floor = room.get('floor')
+        entries.extend([{'id': room.get('id') if count == 1 else None, 'type': room['type'],
+                         'floor': int(_bounded(floor, 0, MAX_FLOORS - 1)) if floor is not None else None,
+                         'area': area, 'width': width, 'depth': depth}] * count)
+    numbers = {}
+    result = []
+    for entry in entries:
+        numbers[entry['type']] = numbers.get(entry['type'], 0) + 1
+        result.append(dict(entry, id=entry['id'] or f"{entry['type']}_{numbers[entry['type']]}"))
+    return result
+
+
+def _up(value):
+    return int(math.ceil(value / GRID) * GRID)
+
+
+def _area(rooms, site_width, site_depth, floors, reasons, relaxations):
+    floor_area = site_width * site_depth / 1e6
+    core = CORE_WIDTH * CORE_DEPTH / 1e6 if floors > 1 else 0
+    available = floors * (floor_area - core)
+    required = sum(room['area'] for room in rooms)
+    if required > available:
+        reasons.append({'code': 'area', 'required': round(required, 2), 'available': round(available, 2),
+                        'message': f'The rooms need at least {required:.1f} m² but {floors:.0f} floor(s) of the '
+                                   f'site have {available:.1f} m²'})
+        per_floor = required / floors + core
+        relaxations.append({'reason': 'area', 'field': 'siteDepthMm', 'value': _up(per_floor * 1e6 / site_width)})
+        relaxations.append({'reason': 'area', 'field': 'siteWidthMm', 'value': _up(per_floor * 1e6 / site_depth)})
+        # A second floor costs a stair core on each floor, which the site has to hold
+        if site_width >= CORE_WIDTH * 2 and site_depth >= CORE_DEPTH:
+            needed = max(2, math.ceil(required / (floor_area - CORE_WIDTH * CORE_DEPTH / 1e6)))
+            relaxations.append({'reason': 'area', 'field': 'floors', 'value': needed})
+        excess, removed = required - available, {}
+        for room in sorted(rooms, key=lambda r: r['area'], reverse=True):
+            if excess <= 0:
+                break
+            removed[room['type']] = removed.get(room['type'], 0) + 1
+            excess -= room['area']
+        relaxations.append({'reason': 'area', 'field': 'rooms', 'remove': removed})
+    for floor in sorted({room['floor'] for room in rooms if room['floor'] is not None and room['floor'] < floors}):
+        pinned = sum(room['area'] for room in rooms if room['floor'] == floor)
+        if pinned > floor_area - core:
+            reasons.append({'code': 'floorArea', 'floor': floor, 'required': round(pinned, 2),
+                            'available': round(floor_area - core, 2),
+                            'message': f'The rooms pinned to floor {floor} need {pinned:.1f} m² but it has '
+                                       f'{floor_area - core:.1f} m²'})
+            relaxations.append({'reason': 'floorArea', 'field': 'rooms', 'unpin': floor})
+
+
+def _dimensions(rooms, site_width, site_depth, floors, reasons, relaxations):
+    if floors == 1 and (site_width < SINGLE_FLOOR_SITE[0] or site_depth < SINGLE_FLOOR_SITE[1]):
+        reasons.append({'code': 'layout', 'message': f'A single floor is laid out on at least '
+                                                     f'{SINGLE_FLOOR_SITE[0]}x{SINGLE_FLOOR_SITE[1]}mm, not '
+                                                     f'{site_width:.0f}x{site_depth:.0f}mm'})
+        if site_width < SINGLE_FLOOR_SITE[0]:
+            relaxations.append({'reason': 'layout', 'field': 'siteWidthMm', 'value': SINGLE_FLOOR_SITE[0]})
+        if site_depth < SINGLE_FLOOR_SITE[1]:
+            relaxations.append({'reason': 'layout', 'field': 'siteDepthMm', 'value': SINGLE_FLOOR_SITE[1]})
+    if floors > 1 and (site_width < CORE_WIDTH * 2 or site_depth < CORE_DEPTH):
+        reasons.append({'code': 'core', 'message': f'A {site_width:.0f}x{site_depth:.0f}mm site is too small for '
+                                                   f'a {CORE_WIDTH}x{CORE_DEPTH}mm stair core'})
+        if site_width < CORE_WIDTH * 2:
+            relaxations.append({'reason': 'core', 'field': 'siteWidthMm', 'value': CORE_WIDTH * 2})
+        if site_depth < CORE_DEPTH:
+            relaxations.append({'reason': 'core', 'field': 'siteDepthMm', 'value': CORE_DEPTH})
+        relaxations.append({'reason': 'core', 'field': 'floors', 'value': 1})
+    long_side, short_side = max(site_width, site_depth), min(site_width, site_depth)
+    seen = set()
+    for room in rooms:
+        width, depth = room['width'], room['depth']
+        if width is None and depth is None:
+            continue
+        # A free side is as short as the minimum area allows
+        width = width or room['area'] * 1e6 / depth
+        depth = depth or room['area'] * 1e6 / width
+        if max(width, depth) <= long_side and min(width, depth) <= short_side:
+            continue
+        key = (room['type'], width, depth)
+        if key in seen:
+            continue
+        seen.add(key)
+        reasons.append({'code': 'dimension', 'room': room['id'], 'width': round(width), 'depth': round(depth),
+                        'message': f'{room["id"]} needs {width:.0f}x{depth:.0f}mm, which does not fit a '
+                                   f'{site_width:.0f}x{site_depth:.0f}mm site'})
+        # Widen the site the least, keeping the room the way it fits best
+        upright = (max(site_width, width), max(site_depth, depth))
+        turned = (max(site_width, depth), max(site_depth, width))
+        grown = min(upright, turned, key=lambda size: size[0] * size[1])
+        if grown[0] > site_width:
+            relaxations.append({'reason': 'dimension', 'field': 'siteWidthMm', 'value': _up(grown[0])})
+        if grown[1] > site_depth:
+            relaxations.append({'reason': 'dimension', 'field': 'siteDepthMm', 'value': _up(grown[1])})
+        relaxations.append({'reason': 'dimension', 'field': 'rooms', 'room': room['id'], 'width': None, 'depth': None})
+
+
+def _adjacency(rooms, pairs, site_width, site_depth, reasons, relaxations):
+    """Required neighbours as a graph of room ids; checks floors, degrees and planarity."""
+    by_id = {room['id']: room for room in rooms}
+    by_type = {}
+    for room in rooms:
+        by_type.setdefault(room['type'], []).append(room['id'])
+
+    def resolve(name):
+        if name in by_id:
+            return name
+        ids = by_type.get(name, ())
+        if len(ids) == 1:
+            return ids[0]
+        message = (f'{len(ids)} rooms are of type {name}; name one such as {ids[0]}' if ids
+                   else f'There is no room {name}')
+        raise KeyError(message)
+
+    adjacent = {}
+    for pair in pairs or ():
+        if isinstance(pair, dict):
+            pair = (pair.get('from'), pair.get('to'))
+        try:
+            a, b = (resolve(str(name)) for name in pair)
+        except (KeyError, TypeError, ValueError) as e:
+            reasons.append({'code': 'adjacency', 'pair': pair,
+                            'message': e.args[0] if isinstance(e, KeyError) else 'Adjacency pairs name two rooms'})
+            relaxations.append({'reason': 'adjacency', 'field': 'adjacency', 'remove': pair})
+            continue
+        if a == b:
+            continue
+        floors = by_id[a]['floor'], by_id[b]['floor']
+        if None not in floors and floors[0] != floors[1]:
+            reasons.append({'code': 'crossFloor', 'pair': [a, b],
+                            'message': f'{a} and {b} are pinned to floors {floors[0]} and {floors[1]}'})
+            relaxations.append({'reason': 'crossFloor', 'field': 'adjacency', 'remove': [a, b]})
+            continue
+        adjacent.setdefault(a, set()).add(b)
+        adjacent.setdefault(b, set()).add(a)
+
+    for name, neighbours in adjacent.items():
+        room = by_id[name]
+        if room['width'] and room['depth']:
+            perimeter = 2 * (room['width'] + room['depth'])
+        else:
+            perimeter = 2 * (site_width + site_depth)
+        limit = int(perimeter // MIN_SHARED_WALL)
+        if len(neighbours) > limit:
+            reasons.append({'code': 'degree', 'room': name, 'neighbours': len(neighbours), 'limit': limit,
+                            'message': f'{name} can share {MIN_SHARED_WALL}mm of wall with at most {limit} rooms, '
+                                       f'not {len(neighbours)}'})
+            relaxations.append({'reason': 'degree', 'field': 'adjacency', 'room': name, 'removeCount': len(neighbours) - limit})
+
+    # Graphs with fewer than 9 edges (K3,3) or 5 rooms (K5) are all planar
+    if sum(len(neighbours) for neighbours in adjacent.values()) < 18 or len(adjacent) < 5:
+        return
+    for block in _blocks(adjacent):
+        vertices = {v for edge in block for v in edge}
+        if len(vertices) < 5 or len(block) < 9 or _planar(block):
+            continue
+        reasons.append({'code': 'nonPlanar', 'rooms': sorted(vertices), 'pairs': len(block),
+                        'message': f'The required adjacencies among {", ".join(sorted(vertices))} cannot all be '
+                                   f'shared walls on one floor'})
+        bound = 3 * len(vertices) - 6
+        drops = [] if len(block) > bound + 1 else \
+            list(islice((list(edge) for edge in block[:MAX_DROPS] if _planar([e for e in block if e != edge])), 3))
+        if drops:
+            relaxations.extend({'reason': 'nonPlanar', 'field': 'adjacency', 'remove': edge} for edge in drops)
+        else:
+            relaxations.append({'reason': 'nonPlanar', 'field': 'adjacency', 'rooms': sorted(vertices),
+                                'removeCount': max(len(block) - bound, 1)})
+
+
+def _blocks(adjacent):
+    """Biconnected components (Hopcroft-Tarjan) of a graph as lists of edges."""
+    index, low, blocks, edges = {}, {}, [], []
+    for root in adjacent:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack = [(root, None, iter(adjacent[root]))]
+        while stack:
+            v, parent, neighbours = stack[-1]
+            for w in neighbours:
+                if w == parent:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    edges.append((v, w))
+                    stack.append((w, v, iter(adjacent[w])))
+                    break
+                if index[w] < index[v]:
+                    edges.append((v, w))
+                    low[v] = min(low[v], index[w])
+            else:
+                stack.pop()
+                if parent is None:
+                    continue
+                low[parent] = min(low[parent], low[v])
+                if low[v] >= index[parent]:
+                    block = []
+                    while True:
+                        edge = edges.pop()
+                        block.append(edge)
+                        if edge == (parent, v):
+                            break
+                    blocks.append(block)
+    return blocks
+
+
+def _planar(block):
+    """Planarity of a biconnected graph given as edges (Demoucron, Malgrange and Pertuiset).
+
+    Starts from a cycle embedded with an inner and an outer face and adds
+    a path through some fragment (a chord, or a component of the rest with
+    its attachments) at a time, into a face holding all of its attachment
+    vertices, preferring fragments that fit only one. A fragment that fits
+    none means the graph is not planar.
+    """
+    adjacent = {}
+    for a, b in block:
+        adjacent.setdefault(a, set()).add(b)
+        adjacent.setdefault(b, set()).add(a)
+    if len(block) > 3 * len(adjacent) - 6:
+        return False
+    cycle = _cycle(adjacent)
+    embedded = set(cycle)
+    used = {frozenset(pair) for pair in zip(cycle, cycle[1:] + cycle[:1])}
+    faces = [cycle, cycle[::-1]]
+    while len(used) < len(block):
+        fragments = []
+        for a, b in block:
+            if a in embedded and b in embedded and frozenset((a, b)) not in used:
+                fragments.append(({a, b}, [a, b]))
+        seen = set()
+        for start in adjacent:
+            if start in embedded or start in seen:
+                continue
+            component, attachments, queue = {start}, set(), [start]
+            while queue:
+                v = queue.pop()
+                for w in adjacent[v]:
+                    if w in embedded:
+                        attachments.add(w)
+                    elif w not in component:
+                        component.add(w)
+                        queue.append(w)
+            seen |= component
+            fragments.append((attachments, component))
+        chosen = None
+        for attachments, body in fragments:
+            fits = [i for i, face in enumerate(faces) if attachments.issubset(face)]
+            if not fits:
+                return False
+            if chosen is None or len(fits) == 1:
+                chosen = attachments, body, fits[0]
+                if len(fits) == 1:
+                    break
+        attachments, body, face_index = chosen
+        path = body if isinstance(body, list) else _through(adjacent, attachments, body)
+        face = faces[face_index]
+        i, j = face.index(path[0]), face.index(path[-1])
+        first = face[i:j + 1] if i <= j else face[i:] + face[:j + 1]
+        second = face[j:i + 1] if j <= i else face[j:] + face[:i + 1]
+        inner = path[1:-1]
+        faces[face_index] = first + inner[::-1]
+        faces.append(second + inner)
+        embedded.update(inner)
+        used.update(frozenset(pair) for pair in zip(path, path[1:]))
+    return True
+
+
+def _cycle(adjacent):
+    """Some cycle of a biconnected graph, by depth-first search to the first back edge."""
+    start = next(iter(adjacent))
+    parent = {start: None}
+    stack = [start]
+    while stack:
+        v = stack.pop()
+        for w in adjacent[v]:
+            if w == parent[v]:
+                continue
+            if w in parent:
+                # The back edge closes a cycle through the lowest common ancestor
+                path_v, path_w = [v], [w]
+                ancestors = {v}
+                while parent[path_v[-1]] is not None:
+                    path_v.append(parent[path_v[-1]])
+                    ancestors.add(path_v[-1])
+                while path_w[-1] not in ancestors:
+                    path_w.append(parent[path_w[-1]])
+                top = path_w[-1]
+                return path_v[:path_v.index(top) + 1] + path_w[-2::-1]
+            parent[w] = v
+            stack.append(w)
+    raise ValueError('graph has no cycle')
+
+
+def _through(adjacent, attachments, component):
+    """A path between two attachment vertices running through ``component``."""
+    start = next(iter(attachments))
+    entries = [v for v in adjacent[start] if v in component]
+    parent = {v: start for v in entries}
+    queue = list(entries)
+    for v in queue:
+        for w in adjacent[v]:
+            if w in attachments and w != start:
+                path = [w, v]
+                while path[-1] != start:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            if w in component and w not in parent:
+                parent[w] = v
+                queue.append(w)
+    raise ValueError('fragment has a single attachment')
+
+
+def check(requirements):
+    """Feasibility report for a layout request: feasible, reasons and relaxations (see the module docstring)."""
+    reasons, relaxations = [], []
+    try:
+        if not isinstance(requirements, dict):
+            raise _Infeasible({'code': 'invalid', 'field': None, 'message': 'The layout request must be an object'})
+        site_width = _number(requirements, 'siteWidthMm', 10000, 1, MAX_SITE)
+        site_depth = _number(requirements, 'siteDepthMm', 15000, 1, MAX_SITE)
+        floors = int(_number(requirements, 'floors', 1, 1, MAX_FLOORS))
+        try:
+            rooms = program(requirements.get('rooms'))
+        except (OverflowError, TypeError, ValueError):
+            raise _Infeasible({'code': 'invalid', 'field': 'rooms',
+                               'message': f'Room counts, floors (0 to {MAX_FLOORS - 1}), areas and sizes '
+                                          f'(up to {MAX_SITE}mm) must be finite numbers'})
+    except _Infeasible as e:
+        return {'feasible': False, 'reasons': [e.args[0]], 'relaxations': []}
+    _area(rooms, site_width, site_depth, floors, reasons, relaxations)
+    _dimensions(rooms, site_width, site_depth, floors, reasons, relaxations)
+    _adjacency(rooms, requirements.get('adjacency'), site_width, site_depth, reasons, relaxations)
+    # Rooms of a type with the same fixed size fail alike
+    unique = []
+    for relaxation in relaxations:
+        if relaxation not in unique:
+            unique.append(relaxation)
+    return {'feasible': not reasons, 'rooms': len(rooms),
+            'siteWidthMm': int(site_width) if site_width.is_integer() else site_width,
+            'siteDepthMm': int(site_depth) if site_depth.is_integer() else site_depth, 'floors': floors,
+            'area': {'required': round(sum(room['area'] for room in rooms), 2),
+                     'available': round(floors * (site_width * site_depth / 1e6 -
+                                                  (CORE_WIDTH * CORE_DEPTH / 1e6 if floors > 1 else 0)), 2)},
+            'reasons': reasons, 'relaxations': unique}
@@ -0,0 +1,280 @@
+"""Furniture catalog and automatic per-room placement.
+
+Placement is a greedy solver: items are placed largest-first, and for each
+item every grid position and rotation inside the room is scored in one pass
+with NumPy (clearance, wall adjacency, door swing and window conflicts).
+"""
+import numpy as np
+
+FURNITURE_CATALOG = {
+    'living-room': [
+        {'id': 'sofa_1', 'name': '3-Seater Sofa', 'type': 'sofa', 'width': 2000, 'depth': 800, 'height': 850},
+        {'id': 'sofa_2', 'name': '2-Seater Sofa', 'type': 'sofa', 'width': 1500, 'depth': 800, 'height': 850},
+        {'id': 'tv_stand', 'name': 'TV Stand', 'type': 'tv', 'width': 1200, 'depth': 400, 'height': 500},
+        {'id': 'coffee_table', 'name': 'Coffee Table', 'type': 'table', 'width': 1200, 'depth': 600, 'height': 450},
+        {'id': 'dining_table', 'name': 'Dining Table', 'type': 'table', 'width': 1800, 'depth': 900, 'height': 750},
+        {'id': 'dining_chairs', 'name': 'Dining Chairs', 'type': 'chair', 'width': 450, 'depth': 450, 'height': 900}
+    ],
+    'bedroom': [
+        {'id': 'bed_single', 'name': 'Single Bed', 'type': 'bed', 'width': 900, 'depth': 1900, 'height': 600},
+        {'id': 'bed_double', 'name': 'Double Bed', 'type': 'bed', 'width': 1350, 'depth': 1900, 'height': 600},
+        {'id': 'bed_queen', 'name': 'Queen Bed', 'type': 'bed', 'width': 1500, 'depth': 2000, 'height': 600},
+        {'id': 'wardrobe', 'name': 'Wardrobe', 'type': 'storage', 'width': 800, 'depth': 600, 'height': 2000},
+        {'id': 'nightstand', 'name': 'Nightstand', 'type': 'table', 'width': 400, 'depth': 400, 'height': 600},
+        {'id': 'dresser', 'name': 'Dresser', 'type': 'storage', 'width': 1200, 'depth': 450, 'height': 800}
+    ],
+    'kitchen': [
+        {'id': 'kitchen_counter', 'name': 'Kitchen Counter', 'type': 'counter', 'width': 2000, 'depth': 600, 'height': 900},
+        {'id': 'stove', 'name': 'Stove', 'type': 'appliance', 'width': 600, 'depth': 600, 'height': 900},
+        {'id': 'refrigerator', 'name': 'Refrigerator', 'type': 'appliance', 'width': 700, 'depth': 700, 'height': 1800},
+        {'id': 'sink', 'name': 'Kitchen Sink', 'type': 'sink', 'width': 500, 'depth': 500, 'height': 900},
+        {'id': 'dishwasher', 'name': 'Dishwasher', 'type': 'appliance', 'width': 600, 'depth': 600, 'height': 850},
+        {'id': 'microwave', 'name': 'Microwave', 'type': 'appliance', 'width': 500, 'depth': 400, 'height': 300}
+    ],
+    'bathroom': [
+        {'id': 'toilet', 'name': 'Toilet', 'type': 'toilet', 'width': 400, 'depth': 700, 'height': 750},
+        {'id': 'sink', 'name': 'Bathroom Sink', 'type': 'sink', 'width': 500, 'depth': 400, 'height': 850},
+        {'id': 'shower', 'name': 'Shower', 'type': 'shower', 'width': 900, 'depth': 900, 'height': 2000},
+        {'id': 'bathtub', 'name': 'Bathtub', 'type': 'bathtub', 'width': 1700, 'depth': 700, 'height': 600},
+        {'id': 'towel_rack', 'name': 'Towel Rack', 'type': 'accessory', 'width': 400, 'depth': 100, 'height': 1800},
+        {'id': 'mirror', 'name': 'Bathroom Mirror', 'type': 'mirror', 'width': 600, 'depth': 50, 'height': 800}
+    ]
+}
+
+# Catalog category used for each room type
+ROOM_CATEGORIES = {
+    'living': 'living-room',
+    'bedroom': 'bedroom',
+    'kitchen': 'kitchen',
+    'bathroom': 'bathroom'
+}
+
+# Default furnishing per room type; a tuple lists alternatives tried in order
+ROOM_FURNITURE = {
+    'living': ['sofa_1', 'tv_stand', 'coffee_table', 'dining_table'],
+    'kitchen': ['kitchen_counter', 'stove', 'sink', 'refrigerator'],
+    'bathroom': ['toilet', 'sink', ('shower', 'bathtub')],
+    'bedroom': [('bed_queen', 'bed_double', 'bed_single'), 'wardrobe', 'nightstand']
+}
+
+# Items that stand free in the room instead of backing onto a wall
+FREESTANDING = {'coffee_table', 'dining_table', 'dining_chairs'}
+
+GRID_STEP = 100          # mm between candidate positions
+CLEARANCE = 600          # mm walkway in front of / around an item
+DOOR_SWING_PENALTY = 1e6
+WINDOW_SILL = 900        # items taller than this block a window
+WALL_WEIGHT = 1.0
+CENTRE_WEIGHT = 0.2
+SLIVER_WEIGHT = 2.0
+FRONT_WEIGHT = 2000.0
+WINDOW_WEIGHT = 1000.0
+WALL_TOLERANCE = 1       # mm
+
+
+def catalog_item(category, item_id):
+    return next((i for i in FURNITURE_CATALOG.get(category, []) if i['id'] == item_id), None)
+
+
+def check_selections(selections):
+    """Raise ValueError unless ``selections`` is None or maps room types to lists of their catalog ids."""
+    if selections is None:
+        return
+    if not isinstance(selections, dict):
+        raise ValueError("furniture must map room types to lists of catalog ids, such as {'living': ['sofa_1']}")
+    for room_type, ids in selections.items():
+        category = ROOM_CATEGORIES.get(room_type)
+        if category is None:
+            raise ValueError(f"There is no furniture for {room_type!r} rooms; use {', '.join(ROOM_CATEGORIES)}")
+        if not isinstance(ids, list):
+            raise ValueError(f'The furniture for {room_type} must be a list of catalog ids')
+        for item_id in ids:
+            if not isinstance(item_id, str) or catalog_item(category, item_id) is None:
+                raise ValueError(f'{item_id!r} is not in the {category} catalog')
+
+
+def default_items(room_type):
+    """Resolve ROOM_FURNITURE ids for a room type into catalog entries."""
+    category = ROOM_CATEGORIES.get(room_type)
+    items = []
+    for entry in ROOM_FURNITURE.get(room_type, []):
+        ids = entry if isinstance(entry, tuple) else (entry,)
+        alternatives = [catalog_item(category, i) for i in ids]
+        alternatives = [a for a in alternatives if a is not None]
+        if alternatives:
+            items.append(alternatives)
+    return items
+
+
+def _opening_zones(room, openings, depth_of):
+    """Room-local rectangles in front of openings lying on the room boundary."""
+    rx, ry, rw, rd = room['x'], room['y'], room['width'], room['depth']
+    zones = []
+    for o in openings:
+        ox, oy, ow = o.get('x', 0), o.get('y', 0), o.get('width', 0)
+        depth = depth_of(o)
+        lx, ly = ox - rx, oy - ry
+        if rx - WALL_TOLERANCE <= ox <= rx + rw + WALL_TOLERANCE and abs(ly) <= WALL_TOLERANCE:
+            zones.append((lx, 0, lx + ow, depth))
+        elif rx - WALL_TOLERANCE <= ox <= rx + rw + WALL_TOLERANCE and abs(ly - rd) <= WALL_TOLERANCE:
+            zones.append((lx, rd - depth, lx + ow, rd))
+        elif ry - WALL_TOLERANCE <= oy <= ry + rd + WALL_TOLERANCE and abs(lx) <= WALL_TOLERANCE:
+            zones.append((0, ly, depth, ly + ow))
+        elif ry - WALL_TOLERANCE <= oy <= ry + rd + WALL_TOLERANCE and abs(lx - rw) <= WALL_TOLERANCE:
+            zones.append((rw - depth, ly, rw, ly + ow))
+    return np.array(zones, dtype=float).reshape(-1, 4)
+
+
+def _candidates(room_w, room_d, item, rotations, step):
+    """Every (x0, y0, x1, y1, rotation) footprint of item on the room grid."""
+    blocks = []
+    for rot in rotations:
+        fw, fd = (item['width'], item['depth']) if rot in (0, 180) else (item['depth'], item['width'])
+        if fw > room_w or fd > room_d:
+            continue
+        # Always include the position flush with the far walls
+        xs = np.unique(np.append(np.arange(0, room_w - fw, step, dtype=float), room_w - fw))
+        ys = np.unique(np.append(np.arange(0, room_d - fd, step, dtype=float), room_d - fd))
+        gx, gy = np.meshgrid(xs, ys, indexing='ij')
+        gx, gy = gx.ravel(), gy.ravel()
+        blocks.append(np.column_stack([gx, gy, gx + fw, gy + fd, np.full(gx.size, rot, dtype=float)]))
+    if not blocks:
+        return np.empty((0, 5))
+    return np.concatenate(blocks)
+
+
+def _overlap(a, b):
+    """Pairwise intersection area, shape (len(a), len(b))."""
+    ix = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    iy = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    return np.maximum(ix, 0) * np.maximum(iy, 0)
+
+
+def _gap(a, b):
+    """Pairwise axis-aligned separation between disjoint rectangles (0 when touching)."""
+    dx = np.maximum(b[None, :, 0] - a[:, None, 2], a[:, None, 0] - b[None, :, 2])
+    dy = np.maximum(b[None, :, 1] - a[:, None, 3], a[:, None, 1] - b[None, :, 3])
+    return np.maximum(np.maximum(dx, dy), 0)
+
+
+def _collides(a, b):
+    """True for every rectangle in a that intersects any rectangle in b."""
+    if not len(b):
+        return np.zeros(len(a), dtype=bool)
+    return ((a[:, None, 0] < b[None, :, 2]) & (b[None, :, 0] < a[:, None, 2]) &
+            (a[:, None, 1] < b[None, :, 3]) & (b[None, :, 1] < a[:, None, 3])).any(axis=1)
+
+
+def _score(cands, item, room_w, room_d, placed, door_zones, window_zones):
+    """Score every collision-free candidate at once (lower is better)."""
+    x0, y0, x1, y1, rot = cands.T
+    scores = np.zeros(len(cands))
+    rects = cands[:, :4]
+
+    if len(placed):
+        # Narrow slivers between items are wasted floor: touching is fine,
+        # a gap is fine once it is wide enough to walk through.
+        gap = _gap(rects, placed)
+        sliver = (gap > 0) & (gap < CLEARANCE)
+        scores += SLIVER_WEIGHT * ((CLEARANCE - gap) * sliver).sum(axis=1)
+
+    if item['id'] in FREESTANDING:
+        # Keep a walkway on every side and prefer the middle of the room
+        ring = np.column_stack([x0 - CLEARANCE / 2, y0 - CLEARANCE / 2, x1 + CLEARANCE / 2, y1 + CLEARANCE / 2])
+        ring_area = (ring[:, 2] - ring[:, 0]) * (ring[:, 3] - ring[:, 1])
+        inside = _overlap(ring, np.array([[0, 0, room_w, room_d]], dtype=float))[:, 0]
+        blocked = ring_area - inside
+        if len(placed):
+            blocked = blocked + _overlap(ring, placed).sum(axis=1)
+        scores += FRONT_WEIGHT * blocked / ring_area
+        scores += CENTRE_WEIGHT * (np.abs((x0 + x1) / 2 - room_w / 2) + np.abs((y0 + y1) / 2 - room_d / 2))
+    else:
+        # rotation 0 backs onto the y=0 wall, then clockwise: 90 -> x=W, 180 -> y=D, 270 -> x=0
+        back_gap = np.select([rot == 0, rot == 90, rot == 180], [y0, room_w - x1, room_d - y1], x0)
+        scores += WALL_WEIGHT * back_gap
+        front = np.select(
+            [(rot == 0)[:, None], (rot == 90)[:, None], (rot == 180)[:, None]],
+            [np.column_stack([x0, y1, x1, y1 + CLEARANCE]),
+             np.column_stack([x0 - CLEARANCE, y0, x0, y1]),
+             np.column_stack([x0, y0 - CLEARANCE, x1, y0])],
+            np.column_stack([x1, y0, x1 + CLEARANCE, y1]))
+        front_area = (front[:, 2] - front[:, 0]) * (front[:, 3] - front[:, 1])
+        inside = _overlap(front, np.array([[0, 0, room_w, room_d]], dtype=float))[:, 0]
+        blocked = front_area - inside
+        if len(placed):
+            blocked = blocked + _overlap(front, placed).sum(axis=1)
+        scores += FRONT_WEIGHT * blocked / front_area
+
+    footprint = (x1 - x0) * (y1 - y0)
+    if len(door_zones):
+        scores += DOOR_SWING_PENALTY * _overlap(rects, door_zones).sum(axis=1) / footprint
+    if len(window_zones) and item['height'] > WINDOW_SILL:
+        scores += WINDOW_WEIGHT * _overlap(rects, window_zones).sum(axis=1) / footprint
+    return scores
+
+
+def place_furniture(room, items, doors=(), windows=(), step=GRID_STEP):
+    """Place catalog items inside a room rectangle.
+
+    ``items`` holds catalog entries, or lists of alternative entries of which
+    the first that fits is used. Returns ``(placed, unplaced)`` where placed
+    items use room-local coordinates like the rest of the plan data.
+    """
+    room_w, room_d = float(room['width']), float(room['depth'])
+    door_zones = _opening_zones(room, doors, lambda d: d.get('width', 0))
+    window_zones = _opening_zones(room, windows, lambda w: CLEARANCE)
+
+    groups = [i if isinstance(i, list) else [i] for i in items]
+    groups.sort(key=lambda g: g[0]['width'] * g[0]['depth'], reverse=True)
+
+    placed_rects = np.empty((0, 4))
+    placed, unplaced = [], []
+    for group in groups:
+        for item in group:
+            rotations = (0, 90) if item['id'] in FREESTANDING else (0, 90, 180, 270)
+            cands = _candidates(room_w, room_d, item, rotations, step)
+            cands = cands[~_collides(cands[:, :4], placed_rects)]
+            if not len(cands):
+                continue
+            scores = _score(cands, item, room_w, room_d, placed_rects, door_zones, window_zones)
+            best = cands[np.argmin(scores)]
+            placed_rects = np.vstack([placed_rects, best[:4]])
+            placed.append({
+                'type': item['type'],
+                'catalogId': item['id'],
+                'x': int(best[0]),
+                'y': int(best[1]),
+                'z': 0,
+                'width': item['width'],
+                'depth': item['depth'],
+                'height': item['height'],
+                'name': item['name'],
+                'rotation': int(best[4])
+            })
+            break
+        else:
+            unplaced.append(group[0]['name'])
+    return placed, unplaced
+
+
+def furnish_plan(plan_data, selections=None, step=GRID_STEP):
+    """Furnish every room of a generated plan in place.
+
+    ``selections`` optionally maps a room type to a list of catalog ids that
+    replaces the default furnishing. Returns ``{room_id: [unplaced names]}``
+    for rooms where something did not fit.
+    """
+    selections = selections or {}
+    unplaced_by_room = {}
+    for room in plan_data['rooms']:
+        if room['type'] in selections:
+            category = ROOM_CATEGORIES.get(room['type'])
+            items = [catalog_item(category, i) for i in selections[room['type']]]
+            items = [i for i in items if i is not None]
+        else:
+            items = default_items(room['type'])
+        placed, unplaced = place_furniture(room, items, plan_data.get('doors', []), plan_data.get('windows', []), step)
+        room['furniture'] = placed
+        if unplaced:
+            unplaced_by_room[room['id']] = unplaced
+    return unplaced_by_room
@@ -0,0 +1,230 @@
+"""Memory accounting for a server process: deep sizes, allocation sites and an RSS watchdog.
+
+Records, caches and indexes all live in the worker's memory, so this is
+where growth shows first. ``deep_size`` walks an object graph and adds up
+``sys.getsizeof``; sizes are inclusive, so an object reachable from two
+caches counts in both. ``Tracer`` reports tracemalloc's top allocation
+sites and what changed since its previous report. ``Watchdog`` samples
+the resident set size in the background and, over a budget, asks the
+server to shrink its caches.
+
+Python seldom hands freed memory back to the system by itself, so after
+shrinking the watchdog collects garbage and, with glibc, trims the heap;
+otherwise RSS would stay over budget and every cache would be emptied.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+
+INTERVAL = 5.0
+HISTORY = 720
+# Each shrink keeps this share of every cache's entries
+KEEP = 0.5
+_SKIPPED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+            types.CodeType, types.FrameType, threading.Thread)
+_LEAVES = {str, int, float, bool, bytes, type(None)}
+# Allocations by tracemalloc and the import machinery, left out of reports
+_UNTRACED = {tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+             '<unknown>'}
+# Slot names by type, for deep_size
+_slots = {}
+
+
+def rss():
+    """Resident set size of this process in bytes (the peak where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _trim():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        libc.malloc_trim(0)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+
+def deep_size(obj):
+    """Bytes held by ``obj`` and everything it references, each object once.
+
+    Containers, instance ``__dict__`` and ``__slots__`` are followed;
+    classes, modules, functions and threads are not. Other threads may
+    change what is being walked, so containers are copied before reading.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    getsizeof = sys.getsizeof
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        kind = type(obj)
+        if kind in _LEAVES:
+            seen.add(id(obj))
+            total += getsizeof(obj)
+            continue
+        if isinstance(obj, _SKIPPED):
+            continue
+        seen.add(id(obj))
+        total += getsizeof(obj, 0)
+        if kind is dict:
+            for item in list(obj.items()):
+                stack.extend(item)
+            continue
+        if kind is list or kind is tuple:
+            stack.extend(obj)
+            continue
+        if isinstance(obj, dict):
+            for item in list(obj.items()):
+                stack.extend(item)
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(list(obj))
+        if hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+        slots = _slots.get(kind)
+        if slots is None:
+            slots = _slots[kind] = [name for cls in kind.__mro__ for name in cls.__dict__.get('__slots__', ())
+                                    if name not in ('__dict__', '__weakref__')]
+        for name in slots:
+            if hasattr(obj, name):
+                stack.append(getattr(obj, name))
+    return total
+
+
+class Tracer:
+    """tracemalloc reports: top allocation sites and the change since the previous report.
+
+    Only the per-site totals of the previous report are kept: a snapshot
+    holds a trace per live allocation and, being allocated while tracing,
+    would show up in (and slow down) every later one. Tracing itself makes
+    allocation-heavy requests several times slower, more so with more
+    frames, so it is best started for a while and stopped again.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tracing():
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=1):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(max(int(frames), 1))
+        with self._lock:
+            self._previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._previous = None
+
+    def report(self, limit=10, group='lineno'):
+        """Top ``limit`` sites grouped by ``group`` ('lineno', 'filename' or 'traceback'), and the diff."""
+        if not tracemalloc.is_tracing():
+            return {'tracing': False}
+        current, peak = tracemalloc.get_traced_memory()
+        # Filtering the grouped sites rather than every trace (Snapshot.filter_traces) takes a fraction of the time
+        stats = [stat for stat in tracemalloc.take_snapshot().statistics(group)
+                 if stat.traceback[-1].filename not in _UNTRACED]
+        totals = {(_site(stat.traceback, group) if group != 'traceback' else
+                   tuple(_site(stat.traceback, group))): (stat.size, stat.count) for stat in stats}
+        with self._lock:
+            previous, self._previous = self._previous, (group, totals)
+        report = {
+            'tracing': True,
+            'frames': tracemalloc.get_traceback_limit(),
+            'traced': current,
+            'peak': peak,
+            'top': [{'site': _site(stat.traceback, group), 'bytes': stat.size, 'count': stat.count}
+                    for stat in stats[:limit]]
+        }
+        if previous is not None and previous[0] == group:
+            before = previous[1]
+            changes = []
+            for site in totals.keys() | before.keys():
+                size, count = totals.get(site, (0, 0))
+                old_size, old_count = before.get(site, (0, 0))
+                if size != old_size or count != old_count:
+                    changes.append((abs(size - old_size), site, size, size - old_size, count, count - old_count))
+            changes.sort(key=lambda change: change[0], reverse=True)
+            report['diff'] = [{'site': list(site) if isinstance(site, tuple) else site, 'bytes': size,
+                               'bytesDiff': size_diff, 'count': count, 'countDiff': count_diff}
+                              for _, site, size, size_diff, count, count_diff in changes[:limit]]
+        return report
+
+
+def _site(traceback, group):
+    if group == 'filename':
+        return traceback[0].filename
+    return [f'{frame.filename}:{frame.lineno}' for frame in traceback] if group == 'traceback' \
+        else f'{traceback[0].filename}:{traceback[0].lineno}'
+
+
+class Watchdog:
+    """Samples RSS every ``interval`` seconds; above ``budget`` bytes it calls ``shrink(KEEP)``.
+
+    ``shrink`` returns how many cache entries it dropped. While RSS stays
+    over budget every sample shrinks again, so caches halve each
+    ``interval`` until it fits or they are empty; only shrinks that
+    dropped something are printed.
+    """
+
+    def __init__(self, budget=None, shrink=None, interval=INTERVAL, history=HISTORY):
+        self.budget = budget
+        self.shrink = shrink
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self.events = deque(maxlen=50)
+        self.shrinks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-watchdog', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f'Memory watchdog failed: {e}', file=sys.stderr)
+
+    def sample(self):
+        """Record the current RSS and shrink the caches if it is over budget."""
+        before = rss()
+        self.samples.append((round(time.time(), 1), before))
+        if not self.budget or before <= self.budget or self.shrink is None:
+            return None
+        started = time.perf_counter()
+        dropped = self.shrink(KEEP)
+        gc.collect()
+        _trim()
+        event = {'ts': round(time.time(), 1), 'rssBefore': before, 'rssAfter': rss(), 'dropped': dropped,
+                 'ms': round((time.perf_counter() - started) * 1000, 1)}
+        self.shrinks += 1
+        self.events.append(event)
+        if dropped:
+            print(f"Memory over budget ({before >> 20} > {self.budget >> 20} MiB): dropped {dropped} cache entries, "
+                  f"RSS now {event['rssAfter'] >> 20} MiB", file=sys.stderr)
+        return event
+
+    def stats(self, history=60):
+        return {'budget': self.budget, 'interval': self.interval, 'shrinks': self.shrinks,
+                'events': list(self.events), 'samples': list(self.samples)[-history:]}
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,383 @@
+"""Compact plan elements: rooms, furniture, walls, doors and windows.
+
+Plan JSON repeats the same keys in every element and the same room-type
+styling, 3D properties and catalog dimensions in every room and item. The
+classes here keep per-element values in ``__slots__`` and share the
+repeated parts, down to individual numbers and strings, through intern
+tables.
+
+Elements are read-write mappings over their JSON keys, so the analysis
+modules use them exactly like the dicts they replace. ``from_json`` /
+``to_json`` convert at the API boundary, and ``compact_plan`` /
+``expand_plan`` do a whole plan body. Keys an element class does not know
+are kept in a per-element ``extra`` dict, so the conversion is lossless.
+"""
+import math
+import sys
+from collections import namedtuple
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+
+from archsense.specs import ROOM_SPECS
+
+# Marks a known key that is absent from an element
+MISSING = object()
+
+RoomStyle = namedtuple('RoomStyle', ('type', 'height', 'color', 'floor_color'))
+CatalogPart = namedtuple('CatalogPart', ('type', 'catalogId', 'width', 'depth', 'height', 'name'))
+
+# Stop sharing new numbers once this many distinct ones are held
+SCALAR_CACHE_SIZE = 1 << 16
+# Likewise for style, catalog and 3D property parts
+PART_CACHE_SIZE = 1 << 14
+
+_parts = {}
+_numbers = {int: {}, float: {}}
+
+
+def _key(value):
+    """Intern-table key for a value, telling apart ones that compare equal: 1, 1.0 and True, or 0.0 and -0.0."""
+    if type(value) is float and value == 0:
+        return float, value, math.copysign(1.0, value)
+    return type(value), value
+
+
+def share(value):
+    """Shared instance of a JSON string or number; other values pass through.
+
+    Plans repeat the same coordinates, sizes and names over and over, and
+    every repeat is otherwise its own object.
+    """
+    kind = type(value)
+    if kind is str:
+        return sys.intern(value)
+    cache = _numbers.get(kind)
+    if cache is None or value != value:
+        return value
+    # Each number type has its own table; only the sign of a float zero needs more than the value
+    key = value if value or kind is int else _key(value)
+    shared = cache.get(key)
+    if shared is None:
+        if len(cache) >= SCALAR_CACHE_SIZE:
+            return value
+        shared = cache[key] = value
+    return shared
+
+
+def share_part(part):
+    """Shared instance of a style or catalog part tuple."""
+    key = (type(part),) + tuple(map(_key, part))
+    shared = _parts.get(key)
+    if shared is None:
+        if len(_parts) >= PART_CACHE_SIZE:
+            return part
+        shared = _parts[key] = part
+    return shared
+
+
+def share_props(props):
+    """Read-only shared view of a 3D properties dict, or the dict itself if unhashable."""
+    try:
+        key = ('props',) + tuple((k, _key(v)) for k, v in props.items())
+        shared = _parts.get(key)
+    except TypeError:
+        return props
+    if shared is None:
+        shared = MappingProxyType({k: share(v) for k, v in props.items()})
+        if len(_parts) < PART_CACHE_SIZE:
+            _parts[key] = shared
+    return shared
+
+
+class Element(MutableMapping):
+    """Mapping over JSON ``_keys`` held in slots, plus an ``extra`` dict."""
+
+    __slots__ = ('extra',)
+    _keys = ()
+    _required = ()
+    _known = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._known = frozenset(cls._keys)
+
+    def _load(self, get):
+        for key in self.__slots__:
+            setattr(self, key, share(get(key, MISSING)))
+
+    def _read(self, key):
+        return getattr(self, key)
+
+    def _write(self, key, value):
+        setattr(self, key, share(value))
+
+    def __getitem__(self, key):
+        if key in self._known:
+            value = self._read(key)
+            if value is not MISSING:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._known:
+            self._write(key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._known and self._read(key) is not MISSING:
+            self._write(key, MISSING)
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self._keys:
+            if self._read(key) is not MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_json()!r})'
+
+    @classmethod
+    def from_json(cls, data):
+        """Element for a JSON dict, or the dict unchanged if it lacks required keys."""
+        if not isinstance(data, dict) or any(k not in data for k in cls._required):
+            return data
+        element = cls.__new__(cls)
+        element._load(data.get)
+        known = cls._known
+        element.extra = {k: v for k, v in data.items() if k not in known} or None
+        return element
+
+    def to_json(self):
+        return {key: to_json(self[key]) for key in self}
+
+
+class FurnitureItem(Element):
+    """Placed catalog item; type, id, dimensions and name are a shared part."""
+
+    __slots__ = ('part', 'x', 'y', 'z', 'rotation')
+    _keys = ('type', 'catalogId', 'x', 'y', 'z', 'width', 'depth', 'height', 'name', 'rotation')
+    _required = ('x', 'y', 'width', 'depth')
+    _part_keys = frozenset(CatalogPart._fields)
+
+    def _load(self, get):
+        self.part = share_part(CatalogPart(*[share(get(k, MISSING)) for k in CatalogPart._fields]))
+        self.x = share(get('x', MISSING))
+        self.y = share(get('y', MISSING))
+        self.z = share(get('z', MISSING))
+        self.rotation = share(get('rotation', MISSING))
+
+    def _read(self, key):
+        if key in self._part_keys:
+            return getattr(self.part, key)
+        return getattr(self, key)
+
+    def _write(self, key, value):
+        if key in self._part_keys:
+            self.part = share_part(self.part._replace(**{key: share(value)}))
+        else:
+            setattr(self, key, share(value))
+
+
+class Room(Element):
+    """Rectangular room; styling by type and 3D properties are shared."""
+
+    __slots__ = ('id', 'style', 'x', 'y', 'width', 'depth', 'area', 'floor', 'furniture', 'props')
+    _keys = ('id', 'type', 'x', 'y', 'width', 'depth', 'height', 'area', 'color', 'floor_color', 'floor',
+             'furniture', '3d_properties')
+    _required = ('id', 'x', 'y', 'width', 'depth')
+    _style_keys = frozenset(RoomStyle._fields)
+
+    def _load(self, get):
+        for key in ('id', 'x', 'y', 'width', 'depth', 'area', 'floor'):
+            setattr(self, key, share(get(key, MISSING)))
+        self.style = share_part(RoomStyle(*[share(get(k, MISSING)) for k in RoomStyle._fields]))
+        self._write('furniture', get('furniture', MISSING))
+        self._write('3d_properties', get('3d_properties', MISSING))
+
+    def _read(self, key):
+        if key in self._style_keys:
+            return getattr(self.style, key)
+        if key == '3d_properties':
+            return self.props
+        return getattr(self, key)
+
+    def _write(self, key, value):
+        if key in self._style_keys:
+            self.style = share_part(self.style._replace(**{key: share(value)}))
+        elif key == '3d_properties':
+            self.props = share_props(value) if isinstance(value, dict) else value
+        elif key == 'furniture':
+            self.furniture = [FurnitureItem.from_json(i) for i in value] if isinstance(value, list) else value
+        else:
+            setattr(self, key, share(value))
+
+    @classmethod
+    def create(cls, room_id, room_type, x, y, width, depth, window_height=1200, door_height=2100,
+               wall_thickness=200):
+        """Room of a known type, styled from ROOM_SPECS."""
+        spec = ROOM_SPECS[room_type]
+        return cls.from_json({
+            'id': room_id,
+            'type': room_type,
+            'x': x,
+            'y': y,
+            'width': width,
+            'depth': depth,
+            'height': spec['height'],
+            'area': width * depth / 1e6,
+            'color': spec['color'],
+            'floor_color': spec['floor_color'],
+            'furniture': [],
+            '3d_properties': {
+                'ceiling_height': spec['height'],
+                'wall_thickness': wall_thickness,
+                'window_height': window_height,
+                'door_height': door_height
+            }
+        })
+
+
+class Wall(Element):
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'height', 'thickness', 'floor')
+    _keys = __slots__
+    _required = ('x1', 'y1', 'x2', 'y2')
+
+
+class Door(Element):
+    __slots__ = ('x', 'y', 'width', 'height', 'room1', 'room2', 'type', 'floor')
+    _keys = __slots__
+    _required = ('x', 'y', 'width')
+
+
+class Window(Element):
+    __slots__ = ('x', 'y', 'width', 'height', 'room', 'type', 'depth', 'floor')
+    _keys = __slots__
+    _required = ('x', 'y', 'width')
+
+
+ELEMENTS = {
+    'rooms': Room,
+    'walls': Wall,
+    'doors': Door,
+    'windows': Window,
+    'furniture': FurnitureItem
+}
+
+
+def to_json(value):
+    """JSON-ready form of a value that may hold elements; also a ``json.dumps`` default."""
+    if isinstance(value, Element):
+        return value.to_json()
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    if isinstance(value, list):
+        return [to_json(v) for v in value]
+    return value
+
+
+def plan_body(plan):
+    """The plan geometry of a stored plan version, a layout response or a raw plan."""
+    body = plan.get('planJson', plan)
+    return body.get('plan', body) if isinstance(body, Mapping) else body
+
+
+def plan_version(plan):
+    """A stored plan's version number; anything but an integer, as older records may hold, counts as 0."""
+    version = plan.get('version', 0)
+    return version if isinstance(version, int) and not isinstance(version, bool) else 0
+
+
+# Per collection: fields an element must have as numbers, fields that must be numbers if given,
+# and fields that must be strings if given
+PLAN_FIELDS = {
+    'rooms': (('x', 'y', 'width', 'depth'), ('height', 'area', 'floor'), ('id', 'type', 'floor_finish', 'ceiling_finish')),
+    'walls': (('x1', 'y1', 'x2', 'y2'), ('height', 'thickness', 'floor'), ()),
+    'doors': ((), ('x', 'y', 'width', 'height', 'floor'), ('type',)),
+    'windows': ((), ('x', 'y', 'width', 'height', 'depth', 'floor'), ('type',)),
+    'furniture': ((), ('x', 'y', 'z', 'width', 'depth', 'height', 'rotation'), ('type', 'name', 'catalogId')),
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _check_elements(elements, collection):
+    if not isinstance(elements, list):
+        raise ValueError(f'{collection} must be a list')
+    required, numbers, strings = PLAN_FIELDS[collection]
+    for i, element in enumerate(elements):
+        if not isinstance(element, Mapping):
+            raise ValueError(f'{collection}[{i}] must be an object')
+        for key in required:
+            if not _is_number(element.get(key)):
+                raise ValueError(f'{collection}[{i}].{key} must be a number')
+        for key in numbers:
+            if key in element and not _is_number(element[key]):
+                raise ValueError(f'{collection}[{i}].{key} must be a number')
+        for key in strings:
+            if key in element and not isinstance(element[key], str):
+                raise ValueError(f'{collection}[{i}].{key} must be a string')
+        if collection == 'rooms':
+            if not isinstance(element.get('id'), str):
+                raise ValueError(f'rooms[{i}].id must be a string')
+            if element['width'] < 0 or element['depth'] < 0:
+                raise ValueError(f'rooms[{i}] must not have a negative size')
+            if 'furniture' in element:
+                _check_elements(element['furniture'], 'furniture')
+
+
+def check_plan(body):
+    """Raise ValueError unless ``body`` is a plan whose elements have usable geometry.
+
+    Rooms need an id and a position and size, walls their two ends; other
+    known fields must be numbers or strings where given.
+    """
+    if not isinstance(body, Mapping):
+        raise ValueError('The plan must be an object')
+    for collection in PLAN_FIELDS:
+        if collection in body:
+            _check_elements(body[collection], collection)
+
+
+def compact_plan(body):
+    """Plan body with its element lists converted; a nested 'plan' is converted too."""
+    if not isinstance(body, dict):
+        return body
+    compact = dict(body)
+    for key, cls in ELEMENTS.items():
+        if isinstance(body.get(key), list):
+            compact[key] = [cls.from_json(e) for e in body[key]]
+    if isinstance(body.get('plan'), dict):
+        compact['plan'] = compact_plan(body['plan'])
+    return compact
+
+
+def expand_plan(body):
+    """Inverse of ``compact_plan``: plain JSON dicts throughout."""
+    if not isinstance(body, dict):
+        return body
+    expanded = {key: to_json(value) for key, value in body.items()}
+    if isinstance(body.get('plan'), dict):
+        expanded['plan'] = expand_plan(body['plan'])
+    return expanded
+
+
+def compact_record(record):
+    """Stored plan version with a compact planJson."""
+    if isinstance(record.get('planJson'), dict):
+        return dict(record, planJson=compact_plan(record['planJson']))
+    return record
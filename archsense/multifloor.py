@@ -0,0 +1,379 @@
+"""Multi-floor layout generation.
+
+The stair core is fixed first and shared by every floor, then each floor is
+laid out, furnished and given openings independently in a process pool.
+The floors are merged into one plan with a react-planner layer per floor.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from archsense.furniture import furnish_plan
+from archsense.specs import ROOM_SPECS
+
+CORE_WIDTH = 2400
+CORE_DEPTH = 5000
+FLOOR_HEIGHT = 3000
+WALL_THICKNESS = 200
+DOOR_WIDTH = 900
+DOOR_INSET = 300
+WINDOW_WIDTH = 1200
+GRID = 100
+MAX_FLOORS = 50
+
+PUBLIC_TYPES = ('living', 'kitchen', 'dining')
+HABITABLE_TYPES = ('living', 'kitchen', 'bedroom', 'dining')
+DEFAULT_PROGRAM = ['living', 'kitchen', 'bathroom', 'bedroom', 'bedroom', 'bedroom', 'bathroom']
+DEFAULT_SPEC = {'min_area': 6, 'width': 3000, 'depth': 2500, 'height': 2800, 'color': 0xf0f0f0, 'floor_color': 0xf5f5f5}
+CORE_SPEC = {'height': FLOOR_HEIGHT, 'color': 0xdcdcdc, 'floor_color': 0xd3d3d3}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """The process pool, created on first use with a worker per CPU and kept for the life of the process.
+
+    Workers are spawned rather than forked: the server forking from one of
+    its request threads could copy a lock another thread holds.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _discard(pool):
+    global _executor
+    with _executor_lock:
+        if _executor is pool:
+            _executor = None
+
+
+def room_program(rooms):
+    """Expand the request's rooms ('bedroom' or {'type', 'count', 'floor'}) into (type, floor) pairs."""
+    program = []
+    for room in rooms:
+        if isinstance(room, str):
+            program.append((room, None))
+        elif isinstance(room, dict) and room.get('type'):
+            try:
+                count = int(room.get('count', 1))
+                floor = int(room['floor']) if room.get('floor') is not None else None
+            except (TypeError, ValueError):
+                raise ValueError(f"Room count and floor must be whole numbers, not {room.get('count', 1)!r} "
+                                 f"and {room.get('floor')!r}")
+            program.extend([(room['type'], floor)] * count)
+    return program or [(t, None) for t in DEFAULT_PROGRAM]
+
+
+def distribute(program, floors):
+    """Assign room types to floors: public rooms and a guest bathroom downstairs."""
+    per_floor = [[] for _ in range(floors)]
+    unassigned = []
+    for room_type, floor in program:
+        if floor is not None and 0 <= floor < floors:
+            per_floor[floor].append(room_type)
+        elif floors == 1 or room_type in PUBLIC_TYPES:
+            per_floor[0].append(room_type)
+        else:
+            unassigned.append(room_type)
+    if 'bathroom' in unassigned and 'bathroom' not in per_floor[0]:
+        unassigned.remove('bathroom')
+        per_floor[0].append('bathroom')
+    # Spread each remaining type round-robin over the upper floors
+    for room_type in dict.fromkeys(unassigned):
+        for i in range(unassigned.count(room_type)):
+            per_floor[1 + i % (floors - 1)].append(room_type)
+    return per_floor
+
+
+def plan_core(site_width, site_depth):
+    """Stair core at the front-right corner, identical on every floor."""
+    if site_width < CORE_WIDTH * 2 or site_depth < CORE_DEPTH:
+        raise ValueError(f'Site {site_width}x{site_depth}mm is too small for a {CORE_WIDTH}x{CORE_DEPTH}mm stair core')
+    return {'x': site_width - CORE_WIDTH, 'y': 0, 'width': CORE_WIDTH, 'depth': CORE_DEPTH}
+
+
+def _room_size(room_type, region_width):
+    spec = ROOM_SPECS.get(room_type, DEFAULT_SPEC)
+    width = min(spec['width'], region_width)
+    depth = spec['depth']
+    # Keep the minimum area when the region forces a narrower room
+    min_depth = math.ceil(spec['min_area'] * 1e6 / width / GRID) * GRID
+    return width, max(depth, min_depth)
+
+
+def _pack(types, region):
+    """Row-pack room types into a region; returns (rows of [type, x, y, w, d], leftovers)."""
+    x0, y0, x1, y1 = region
+    rows, leftovers = [], []
+    row, cursor, row_y = [], x0, y0
+    for room_type in types:
+        width, depth = _room_size(room_type, x1 - x0)
+        if cursor + width > x1 and row:
+            rows.append(row)
+            row_y += max(r[4] for r in row)
+            row, cursor = [], x0
+        if row_y + depth > y1:
+            leftovers.append(room_type)
+            continue
+        row.append([room_type, cursor, row_y, width, depth])
+        cursor += width
+    if row:
+        rows.append(row)
+    # Rows get a common depth and their last room runs to the region edge
+    for row in rows:
+        depth = max(r[4] for r in row)
+        for r in row:
+            r[4] = depth
+        row[-1][3] = x1 - row[-1][1]
+    return rows, leftovers
+
+
+def _room(room_id, room_type, floor, x, y, width, depth):
+    spec = ROOM_SPECS.get(room_type, CORE_SPEC if room_type == 'stair' else DEFAULT_SPEC)
+    return {
+        'id': room_id,
+        'type': room_type,
+        'floor': floor,
+        'x': x,
+        'y': y,
+        'width': width,
+        'depth': depth,
+        'height': spec['height'],
+        'area': width * depth / 1000000,
+        'color': spec['color'],
+        'floor_color': spec['floor_color'],
+        'furniture': [],
+        '3d_properties': {
+            'ceiling_height': spec['height'],
+            'wall_thickness': WALL_THICKNESS,
+            'window_height': 800 if room_type == 'bathroom' else 1200,
+            'door_height': 2100
+        }
+    }
+
+
+def _door_between(a, b, floor):
+    """Door on the wall shared by rooms a and b, or None if they only touch at a corner."""
+    if a['x'] + a['width'] == b['x'] or b['x'] + b['width'] == a['x']:
+        x = max(a['x'], b['x'])
+        lo, hi = max(a['y'], b['y']), min(a['y'] + a['depth'], b['y'] + b['depth'])
+        if hi - lo >= DOOR_WIDTH + 2 * DOOR_INSET:
+            return {'x': x, 'y': lo + DOOR_INSET, 'width': DOOR_WIDTH, 'height': 2100,
+                    'room1': a['id'], 'room2': b['id'], 'type': 'interior', 'floor': floor}
+    if a['y'] + a['depth'] == b['y'] or b['y'] + b['depth'] == a['y']:
+        y = max(a['y'], b['y'])
+        lo, hi = max(a['x'], b['x']), min(a['x'] + a['width'], b['x'] + b['width'])
+        if hi - lo >= DOOR_WIDTH + 2 * DOOR_INSET:
+            return {'x': lo + DOOR_INSET, 'y': y, 'width': DOOR_WIDTH, 'height': 2100,
+                    'room1': a['id'], 'room2': b['id'], 'type': 'interior', 'floor': floor}
+    return None
+
+
+def _exterior_edges(room, others):
+    """Edges of room not shared with any other room, as (x, y, length, horizontal)."""
+    x0, y0, x1, y1 = room['x'], room['y'], room['x'] + room['width'], room['y'] + room['depth']
+    edges = [(x0, y0, room['width'], True), (x0, y1, room['width'], True),
+             (x0, y0, room['depth'], False), (x1, y0, room['depth'], False)]
+    exterior = []
+    for x, y, length, horizontal in edges:
+        shared = False
+        for o in others:
+            ox0, oy0, ox1, oy1 = o['x'], o['y'], o['x'] + o['width'], o['y'] + o['depth']
+            if horizontal and y in (oy0, oy1) and min(x + length, ox1) > max(x, ox0):
+                shared = True
+            elif not horizontal and x in (ox0, ox1) and min(y + length, oy1) > max(y, oy0):
+                shared = True
+        if not shared:
+            exterior.append((x, y, length, horizontal))
+    return exterior
+
+
+def _walls(rooms):
+    seen, walls = set(), []
+    for r in rooms:
+        x0, y0, x1, y1 = r['x'], r['y'], r['x'] + r['width'], r['y'] + r['depth']
+        for seg in ((x0, y0, x1, y0), (x1, y0, x1, y1), (x1, y1, x0, y1), (x0, y1, x0, y0)):
+            key = tuple(sorted((seg[:2], seg[2:])))
+            if key in seen:
+                continue
+            seen.add(key)
+            walls.append({'x1': seg[0], 'y1': seg[1], 'x2': seg[2], 'y2': seg[3],
+                          'height': FLOOR_HEIGHT, 'thickness': WALL_THICKNESS, 'floor': r['floor']})
+    return walls
+
+
+def solve_floor(task):
+    """Lay out, connect and furnish one floor around the shared core.
+
+    Runs in a worker process, so it takes and returns plain data only.
+    """
+    floor, types, site_width, site_depth, core = task
+    core_room = _room(f'core_f{floor}', 'stair', floor, core['x'], core['y'], core['width'], core['depth'])
+    front = (0, 0, core['x'], site_depth)
+    behind = (core['x'], core['y'] + core['depth'], site_width, site_depth)
+
+    counts = {}
+    rooms, grid = [], []
+    rows, leftovers = _pack(types, front)
+    back_rows, leftovers = _pack(leftovers, behind)
+    for row in rows + back_rows:
+        placed_row = []
+        for room_type, x, y, width, depth in row:
+            counts[room_type] = counts.get(room_type, 0) + 1
+            room = _room(f'f{floor}_{room_type}_{counts[room_type]}', room_type, floor, x, y, width, depth)
+            rooms.append(room)
+            placed_row.append(room)
+        grid.append(placed_row)
+
+    doors = []
+    # Rooms in a row open onto each other; each row opens onto the row before it
+    for r, row in enumerate(grid):
+        for a, b in zip(row, row[1:]):
+            door = _door_between(a, b, floor)
+            if door:
+                doors.append(door)
+        if r > 0:
+            for candidate in grid[r - 1]:
+                door = _door_between(row[0], candidate, floor)
+                if door:
+                    doors.append(door)
+                    break
+    # Every room touching the core gets a landing door
+    for room in rooms:
+        door = _door_between(core_room, room, floor)
+        if door:
+            doors.append(door)
+    if floor == 0 and rooms:
+        doors.append({'x': rooms[0]['x'] + DOOR_INSET, 'y': 0, 'width': DOOR_WIDTH, 'height': 2100,
+                      'room1': 'entrance', 'room2': rooms[0]['id'], 'type': 'entrance', 'floor': floor})
+
+    windows = []
+    for room in rooms:
+        if room['type'] not in HABITABLE_TYPES and room['type'] != 'bathroom':
+            continue
+        others = [o for o in rooms if o is not room] + [core_room]
+        exterior = _exterior_edges(room, others)
+        if not exterior:
+            continue
+        x, y, length, horizontal = max(exterior, key=lambda e: e[2])
+        width = min(WINDOW_WIDTH, length - 2 * DOOR_INSET)
+        if width <= 0:
+            continue
+        offset = (length - width) // 2
+        windows.append({'x': x + offset if horizontal else x, 'y': y if horizontal else y + offset,
+                        'width': width, 'height': room['3d_properties']['window_height'],
+                        'room': room['id'], 'type': 'window', 'depth': 100, 'floor': floor})
+
+    all_rooms = rooms + [core_room]
+    floor_plan = {'rooms': all_rooms, 'doors': doors, 'windows': windows}
+    unplaced_furniture = furnish_plan(floor_plan)
+    return {
+        'floor': floor,
+        'rooms': all_rooms,
+        'walls': _walls(all_rooms),
+        'doors': doors,
+        'windows': windows,
+        'unplaced_rooms': leftovers,
+        'unplaced_furniture': unplaced_furniture
+    }
+
+
+def _layer(floor_plan):
+    floor = floor_plan['floor']
+    elements = {}
+    for i, room in enumerate(floor_plan['rooms'], start=1):
+        element_id = f'element-{floor + 1}-{i}'
+        elements[element_id] = {
+            'id': element_id,
+            'type': 'room',
+            'x': room['x'],
+            'y': room['y'],
+            'width': room['width'],
+            'height': room['depth'],
+            'properties': {
+                'name': room['type'].title(),
+                'height': room['height'],
+                'color': room['color']
+            }
+        }
+    return {
+        'id': f'layer-{floor + 1}',
+        'name': 'Ground Floor' if floor == 0 else f'Floor {floor + 1}',
+        'altitude': floor * FLOOR_HEIGHT,
+        'visible': True,
+        'opacity': 1,
+        'selected': floor == 0,
+        'elements': elements
+    }
+
+
+def generate_building(rooms, site_width, site_depth, floors, workers=None):
+    """Generate a merged multi-floor plan.
+
+    ``workers`` defaults to one process per floor, capped at the CPU count;
+    with a single worker the floors are solved in this process, otherwise
+    in the shared pool. ValueError unless 1 <= ``floors`` <= ``MAX_FLOORS``.
+    """
+    if not isinstance(floors, int) or isinstance(floors, bool) or not 1 <= floors <= MAX_FLOORS:
+        raise ValueError(f'A building has 1 to {MAX_FLOORS} floors, not {floors!r}')
+    core = plan_core(site_width, site_depth)
+    per_floor = distribute(room_program(rooms), floors)
+    tasks = [(f, types, site_width, site_depth, core) for f, types in enumerate(per_floor)]
+    workers = workers or min(floors, os.cpu_count() or 1)
+    if workers > 1:
+        pool = _pool()
+        try:
+            floor_plans = list(pool.map(solve_floor, tasks))
+        except BrokenProcessPool:
+            # A worker died; the pool cannot be used again, so the next request gets a new one
+            _discard(pool)
+            floor_plans = [solve_floor(t) for t in tasks]
+    else:
+        floor_plans = [solve_floor(t) for t in tasks]
+
+    plan = {
+        'rooms': [], 'walls': [], 'doors': [], 'windows': [], 'furniture': [],
+        'floors': floors,
+        'core': dict(core, type='stair'),
+        '3d_data': {
+            'camera': {
+                'position': {'x': site_width / 2, 'y': site_depth / 2, 'z': FLOOR_HEIGHT * (floors + 1)},
+                'target': {'x': site_width / 2, 'y': site_depth / 2, 'z': 0},
+                'fov': 60
+            },
+            'lights': [
+                {'type': 'ambient', 'intensity': 0.4, 'color': 0xffffff},
+                {'type': 'directional', 'position': {'x': site_width / 2, 'y': 0, 'z': FLOOR_HEIGHT * (floors + 2)},
+                 'intensity': 0.8, 'color': 0xffffff}
+            ],
+            'materials': {
+                'floor': {'color': 0xf5f5dc, 'roughness': 0.8},
+                'wall': {'color': 0xf0f0f0, 'roughness': 0.9},
+                'ceiling': {'color': 0xffffff, 'roughness': 0.7}
+            }
+        },
+        'react_planner_data': {
+            'version': '1.0',
+            'scale': 1,
+            'layers': {},
+            'scene': {'width': site_width, 'height': site_depth, 'rotation': 0, 'scale': 1}
+        }
+    }
+    unplaced = {'rooms': {}, 'furniture': {}}
+    for floor_plan in floor_plans:
+        for key in ('rooms', 'walls', 'doors', 'windows'):
+            plan[key].extend(floor_plan[key])
+        layer = _layer(floor_plan)
+        plan['react_planner_data']['layers'][layer['id']] = layer
+        if floor_plan['unplaced_rooms']:
+            unplaced['rooms'][floor_plan['floor']] = floor_plan['unplaced_rooms']
+        unplaced['furniture'].update(floor_plan['unplaced_furniture'])
+    return plan, unplaced
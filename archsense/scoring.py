@@ -0,0 +1,213 @@
+"""Batch quality scoring for candidate floor plans.
+
+Candidates are packed into padded (candidates x rooms) NumPy arrays so a
+whole batch is scored with array operations. Every metric is a score in
+[0, 1] where higher is better; ``total`` is their weighted mean.
+"""
+import numpy as np
+
+from archsense.specs import ROOM_SPECS
+
+TYPE_CODES = {'living': 0, 'kitchen': 1, 'bedroom': 2, 'bathroom': 3}
+OTHER = len(TYPE_CODES)
+HABITABLE = ('living', 'kitchen', 'bedroom')
+
+# Pairs of room types that should share a wall: (room needing it, neighbour)
+PREFERRED_ADJACENCY = (('kitchen', 'living'), ('bedroom', 'bathroom'))
+
+DEFAULT_WEIGHTS = {
+    'areaDeviation': 0.3,
+    'aspectRatio': 0.15,
+    'adjacency': 0.25,
+    'windowExposure': 0.15,
+    'wastedArea': 0.15
+}
+
+GOOD_ASPECT = 1.5         # rooms up to this ratio are not penalised
+WORST_ASPECT = 3.0        # ... and at this ratio they score zero
+MIN_SHARED_WALL = 900     # mm, enough for a door
+MIN_EXTERIOR_WALL = 1000  # mm, enough for a window
+TOLERANCE = 1             # mm
+
+# Request limits: wall sharing is computed on (candidates x rooms x rooms) arrays
+MAX_CANDIDATES = 1000
+MAX_ROOMS = 500
+MAX_PAIRS = 1 << 22
+
+_MIN_AREA = np.array([ROOM_SPECS.get(t, {}).get('min_area', 0) for t in TYPE_CODES] + [0], dtype=float)
+
+
+def pack(plans, site_width=None, site_depth=None):
+    """Pack plan dicts into padded arrays.
+
+    Site dimensions come from each plan's ``react_planner_data.scene`` when
+    present, falling back to the given defaults.
+    """
+    count = len(plans)
+    width = max((len(p.get('rooms', [])) for p in plans), default=0)
+    x = np.zeros((count, width))
+    y = np.zeros((count, width))
+    w = np.zeros((count, width))
+    d = np.zeros((count, width))
+    kind = np.full((count, width), OTHER, dtype=np.int8)
+    mask = np.zeros((count, width), dtype=bool)
+    site = np.zeros((count, 2))
+    for c, plan in enumerate(plans):
+        rooms = plan.get('rooms', [])
+        n = len(rooms)
+        if n:
+            x[c, :n] = [r['x'] for r in rooms]
+            y[c, :n] = [r['y'] for r in rooms]
+            w[c, :n] = [r['width'] for r in rooms]
+            d[c, :n] = [r['depth'] for r in rooms]
+            kind[c, :n] = [TYPE_CODES.get(r.get('type'), OTHER) for r in rooms]
+            mask[c, :n] = True
+        scene = plan.get('react_planner_data', {}).get('scene', {})
+        site[c] = (scene.get('width', site_width or 10000), scene.get('height', site_depth or 15000))
+    return {'x': x, 'y': y, 'width': w, 'depth': d, 'type': kind, 'mask': mask, 'site': site}
+
+
+def _mean(values, mask):
+    """Row mean over masked entries; rows with nothing to measure score 1."""
+    counts = mask.sum(axis=1)
+    sums = np.where(mask, values, 0).sum(axis=1)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 1.0)
+
+
+def _shared_walls(x0, y0, x1, y1, mask):
+    """(C, R, R) boolean: rooms i and j of a candidate share a usable wall."""
+    y_overlap = np.minimum(y1[:, :, None], y1[:, None, :]) - np.maximum(y0[:, :, None], y0[:, None, :])
+    x_overlap = np.minimum(x1[:, :, None], x1[:, None, :]) - np.maximum(x0[:, :, None], x0[:, None, :])
+    vertical = (np.abs(x1[:, :, None] - x0[:, None, :]) <= TOLERANCE) & (y_overlap >= MIN_SHARED_WALL)
+    horizontal = (np.abs(y1[:, :, None] - y0[:, None, :]) <= TOLERANCE) & (x_overlap >= MIN_SHARED_WALL)
+    touching = vertical | horizontal
+    touching |= touching.transpose(0, 2, 1)
+    return touching & mask[:, :, None] & mask[:, None, :]
+
+
+def score_batch(batch, weights=None):
+    """Score packed candidates; returns a dict of (C,) arrays per metric plus 'total'."""
+    weights = weights or DEFAULT_WEIGHTS
+    x0, y0, mask, kind = batch['x'], batch['y'], batch['mask'], batch['type']
+    x1, y1 = x0 + batch['width'], y0 + batch['depth']
+    site_w, site_d = batch['site'][:, 0:1], batch['site'][:, 1:2]
+    area = batch['width'] * batch['depth'] / 1e6
+
+    min_area = _MIN_AREA[kind]
+    shortfall = np.clip((min_area - area) / np.where(min_area > 0, min_area, 1), 0, 1)
+    area_score = 1 - _mean(shortfall, mask & (min_area > 0))
+
+    short_side = np.minimum(batch['width'], batch['depth'])
+    ratio = np.maximum(batch['width'], batch['depth']) / np.where(short_side > 0, short_side, 1)
+    aspect_penalty = np.clip((ratio - GOOD_ASPECT) / (WORST_ASPECT - GOOD_ASPECT), 0, 1)
+    aspect_score = 1 - _mean(aspect_penalty, mask)
+
+    touching = _shared_walls(x0, y0, x1, y1, mask)
+    satisfied = np.zeros(mask.shape)
+    required = np.zeros(mask.shape, dtype=bool)
+    for room_type, neighbour in PREFERRED_ADJACENCY:
+        needs = mask & (kind == TYPE_CODES[room_type])
+        has = (touching & (kind == TYPE_CODES[neighbour])[:, None, :]).any(axis=2)
+        # Only ask for the neighbour when the candidate has one at all
+        available = (mask & (kind == TYPE_CODES[neighbour])).any(axis=1, keepdims=True)
+        needs &= available
+        required |= needs
+        satisfied = np.where(needs, has, satisfied)
+    adjacency_score = _mean(satisfied, required)
+
+    exterior = (np.where(np.abs(x0) <= TOLERANCE, batch['depth'], 0) +
+                np.where(np.abs(y0) <= TOLERANCE, batch['width'], 0) +
+                np.where(np.abs(x1 - site_w) <= TOLERANCE, batch['depth'], 0) +
+                np.where(np.abs(y1 - site_d) <= TOLERANCE, batch['width'], 0))
+    habitable = mask & np.isin(kind, [TYPE_CODES[t] for t in HABITABLE])
+    exposure_score = _mean(exterior >= MIN_EXTERIOR_WALL, habitable)
+
+    site_area = (site_w * site_d)[:, 0] / 1e6
+    used = np.where(mask, area, 0).sum(axis=1)
+    waste_score = np.clip(used / np.where(site_area > 0, site_area, 1), 0, 1)
+
+    scores = {
+        'areaDeviation': area_score,
+        'aspectRatio': aspect_score,
+        'adjacency': adjacency_score,
+        'windowExposure': exposure_score,
+        'wastedArea': waste_score
+    }
+    total_weight = sum(weights.get(k, 0) for k in scores)
+    scores['total'] = sum(weights.get(k, 0) * v for k, v in scores.items()) / (total_weight or 1)
+    return scores
+
+
+def breakdown(scores, index):
+    return {k: round(float(v[index]), 4) for k, v in scores.items()}
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and np.isfinite(value)
+
+
+def validate(plans, top=None, weights=None, site_width=None, site_depth=None):
+    """Raise ValueError unless the arguments to ``rank`` are well formed."""
+    if not isinstance(plans, list) or not all(isinstance(p, dict) for p in plans):
+        raise ValueError('candidates must be a list of plans')
+    if len(plans) > MAX_CANDIDATES:
+        raise ValueError(f'At most {MAX_CANDIDATES} candidates can be scored at once')
+    for c, plan in enumerate(plans):
+        rooms = plan.get('rooms', [])
+        if not isinstance(rooms, list):
+            raise ValueError(f'candidate {c}: rooms must be a list')
+        if len(rooms) > MAX_ROOMS:
+            raise ValueError(f'candidate {c}: at most {MAX_ROOMS} rooms can be scored')
+        for room in rooms:
+            if not isinstance(room, dict) or not all(_number(room.get(k)) for k in ('x', 'y', 'width', 'depth')):
+                raise ValueError(f'candidate {c}: every room needs numeric x, y, width and depth')
+            if room.get('type') is not None and not isinstance(room['type'], str):
+                raise ValueError(f'candidate {c}: room types must be strings')
+        planner = plan.get('react_planner_data', {})
+        scene = planner.get('scene', {}) if isinstance(planner, dict) else None
+        if not isinstance(scene, dict):
+            raise ValueError(f'candidate {c}: react_planner_data.scene must be an object')
+        if not all(_number(scene[k]) and scene[k] > 0 for k in ('width', 'height') if k in scene):
+            raise ValueError(f'candidate {c}: the scene width and height must be positive numbers')
+    width = max((len(p.get('rooms', [])) for p in plans), default=0)
+    if len(plans) * width * width > MAX_PAIRS:
+        raise ValueError(f'Too many candidates of {width} rooms to score at once; send at most '
+                         f'{MAX_PAIRS // max(width * width, 1)}')
+    if top is not None and (not isinstance(top, int) or isinstance(top, bool) or top < 0):
+        raise ValueError('top must be a non-negative integer')
+    if weights is not None and (not isinstance(weights, dict) or not all(_number(w) for w in weights.values())):
+        raise ValueError('weights must map metrics to numbers')
+    for name, value in (('siteWidthMm', site_width), ('siteDepthMm', site_depth)):
+        if value is not None and not (_number(value) and value > 0):
+            raise ValueError(f'{name} must be a positive number')
+
+
+def rank(plans, top=None, weights=None, site_width=None, site_depth=None):
+    """Score plan dicts and return [{'index', 'scores'}] best first."""
+    scores = score_batch(pack(plans, site_width, site_depth), weights)
+    order = np.argsort(-scores['total'], kind='stable')
+    if top is not None:
+        order = order[:top]
+    return [{'index': int(i), 'scores': breakdown(scores, i)} for i in order]
+
+
+def score_plan(plan, weights=None):
+    """Per-metric breakdown for a single plan.
+
+    Rooms of a multi-floor plan are scored floor by floor, since rooms
+    stacked on different floors would otherwise overlap; the result is
+    the mean over floors weighted by their room counts, with each floor's
+    own breakdown under ``floors``.
+    """
+    by_floor = {}
+    for room in plan.get('rooms', []):
+        by_floor.setdefault(room.get('floor', 0), []).append(room)
+    if len(by_floor) < 2:
+        return breakdown(score_batch(pack([plan]), weights), 0)
+    floors = sorted(by_floor, key=str)
+    scene = {'react_planner_data': plan.get('react_planner_data', {})}
+    scores = score_batch(pack([dict(scene, rooms=by_floor[f]) for f in floors]), weights)
+    counts = np.array([len(by_floor[f]) for f in floors], dtype=float)
+    combined = {k: round(float(np.average(v, weights=counts)), 4) for k, v in scores.items()}
+    combined['floors'] = [dict(breakdown(scores, i), floor=f) for i, f in enumerate(floors)]
+    return combined
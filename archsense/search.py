@@ -0,0 +1,447 @@
+"""Search over projects by name, style, room composition and size.
+
+Each project is one document, numbered in the order it was first seen.
+Its latest plan version supplies the room counts, floor area, floor count
+and furniture. The index has three parts, all updated in place when a
+project or plan is written, so nothing is ever reindexed in full:
+
+* an inverted index from terms (words of the name, the style preset and
+  furniture types and names) to the set of documents containing them,
+* dictionary-encoded columns for exact-match fields (style, owner) and
+  one count column per room type, and
+* float columns for site width, site depth, floor area and floors.
+
+A query intersects the postings of its words into a mask, narrows it with
+vectorised comparisons on the columns and counts facets over what is left
+with ``np.bincount``, so its cost grows with the number of documents at
+NumPy speed rather than Python speed.
+
+Room counts can be written into the query text: "3 bedrooms 2+ baths
+modern" asks for exactly three bedrooms, at least two bathrooms and the
+word "modern".
+"""
+import bisect
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from archsense.model import plan_body, plan_version
+
+NUMBERS = ('siteWidthMm', 'siteDepthMm', 'area', 'floors')
+KEYWORDS = ('stylePreset', 'userId')
+SORTS = ('recent',) + NUMBERS
+# Upper bounds of the floor area facet buckets, in m²
+AREA_BUCKETS = (50, 100, 150, 200, 300)
+# Counts above this are reported together in room facets
+MAX_FACET_COUNT = 6
+
+ROOM_WORDS = {
+    'bedroom': 'bedroom', 'bedrooms': 'bedroom', 'bed': 'bedroom', 'beds': 'bedroom',
+    'bathroom': 'bathroom', 'bathrooms': 'bathroom', 'bath': 'bathroom', 'baths': 'bathroom',
+    'kitchen': 'kitchen', 'kitchens': 'kitchen',
+    'living': 'living', 'livings': 'living', 'lounge': 'living', 'lounges': 'living'
+}
+
+_WORD = re.compile(r'[a-z0-9]+')
+_QUERY_WORD = re.compile(r'\d+\+?|[a-z0-9]+\*?')
+
+
+def words(text):
+    return _WORD.findall(str(text).lower()) if text else []
+
+
+def parse_range(value):
+    """``(low, high)`` from '3', '3+', '80-200', '80-' or '-200'; None bounds are open."""
+    value = str(value).strip()
+    if value.endswith('+'):
+        return float(value[:-1]), None
+    low, dash, high = value.partition('-')
+    if not dash:
+        return float(value), float(value)
+    return float(low) if low.strip() else None, float(high) if high.strip() else None
+
+
+def summarize_plan(plan):
+    """Room counts by type, floor area in m², floor count and furniture words of a plan version."""
+    body = plan_body(plan)
+    rooms = {}
+    area = 0.0
+    floors = set()
+    furniture = set()
+    for room in body.get('rooms', []) or []:
+        kind = room.get('type')
+        if kind:
+            rooms[kind] = rooms.get(kind, 0) + 1
+        area += room.get('area') or (room.get('width', 0) * room.get('depth', 0) / 1e6)
+        floors.add(room.get('floor', 0))
+        for item in room.get('furniture', []) or []:
+            furniture.update(words(item.get('type')), words(item.get('name')))
+    for item in body.get('furniture', []) or []:
+        furniture.update(words(item.get('type')), words(item.get('name')))
+    return rooms, round(area, 2), len(floors) or None, furniture
+
+
+class _Postings:
+    """Documents containing a term, as a set and as an array built for queries.
+
+    New documents are appended to the array, so only a removal (a rename,
+    or a plan that lost a piece of furniture) makes it rebuild.
+    """
+
+    __slots__ = ('docs', 'array', 'pending')
+
+    def __init__(self):
+        self.docs = set()
+        self.array = None
+        self.pending = []
+
+    def add(self, doc):
+        if doc not in self.docs:
+            self.docs.add(doc)
+            if self.array is not None:
+                self.pending.append(doc)
+
+    def discard(self, doc):
+        if doc in self.docs:
+            self.docs.discard(doc)
+            self.array, self.pending = None, []
+
+    def to_array(self):
+        if self.array is None:
+            self.array = np.fromiter(self.docs, dtype=np.int32, count=len(self.docs))
+        elif self.pending:
+            self.array = np.concatenate([self.array, np.array(self.pending, dtype=np.int32)])
+            self.pending = []
+        return self.array
+
+
+class _Keyword:
+    """Dictionary-encoded column: an int32 code per document, -1 when missing."""
+
+    def __init__(self, capacity):
+        self.codes = np.full(capacity, -1, dtype=np.int32)
+        self.values = []
+        self._lookup = {}
+
+    def code(self, value, add=True):
+        code = self._lookup.get(value)
+        if code is None and add:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class SearchIndex:
+    """Incrementally maintained search index over projects and their latest plans."""
+
+    def __init__(self, capacity=1024):
+        self._synced = None
+        self._count = 0
+        self._slots = {}
+        self._ids = []
+        self._names = []
+        self._plan_versions = []
+        self._project_terms = []
+        self._plan_terms = []
+        self._postings = {}
+        self._vocabulary = []
+        self._numbers = {field: np.full(capacity, np.nan) for field in NUMBERS}
+        self._keywords = {field: _Keyword(capacity) for field in KEYWORDS}
+        self._rooms = {}
+        # Facet bucket per document, 0 when unknown: floor count, and 1 + the AREA_BUCKETS slot
+        self._buckets = {'floors': np.zeros(capacity, np.int8), 'area': np.zeros(capacity, np.int8)}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def _capacity(self):
+        return len(self._numbers['area'])
+
+    def _grow(self):
+        capacity = self._capacity() * 2
+        for field, column in self._numbers.items():
+            self._numbers[field] = np.concatenate([column, np.full(capacity - len(column), np.nan)])
+        for keyword in self._keywords.values():
+            keyword.codes = np.concatenate([keyword.codes, np.full(capacity - len(keyword.codes), -1, np.int32)])
+        for kind, column in self._rooms.items():
+            self._rooms[kind] = np.concatenate([column, np.zeros(capacity - len(column), np.int16)])
+        for field, column in self._buckets.items():
+            self._buckets[field] = np.concatenate([column, np.zeros(capacity - len(column), np.int8)])
+
+    def _slot(self, project_id):
+        doc = self._slots.get(project_id)
+        if doc is None:
+            if self._count == self._capacity():
+                self._grow()
+            doc = self._slots[project_id] = self._count
+            self._count += 1
+            self._ids.append(project_id)
+            self._names.append(None)
+            self._plan_versions.append(None)
+            self._project_terms.append(())
+            self._plan_terms.append(())
+        return doc
+
+    def _set_terms(self, doc, terms, previous):
+        for term in previous:
+            if term not in terms:
+                self._postings[term].discard(doc)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+                bisect.insort(self._vocabulary, term)
+            postings.add(doc)
+
+    def _set_floors(self, doc, floors):
+        self._numbers['floors'][doc] = floors
+        self._buckets['floors'][doc] = 0 if np.isnan(floors) else min(max(int(floors), 0), 127)
+
+    def _add_project(self, project):
+        doc = self._slot(project['id'])
+        self._names[doc] = project.get('name')
+        terms = tuple(set(words(project.get('name')) + words(project.get('stylePreset'))))
+        self._set_terms(doc, terms, self._project_terms[doc])
+        self._project_terms[doc] = terms
+        for field in KEYWORDS:
+            value = project.get(field)
+            keyword = self._keywords[field]
+            keyword.codes[doc] = -1 if value is None else keyword.code(value)
+        for field in ('siteWidthMm', 'siteDepthMm'):
+            self._numbers[field][doc] = _number(project.get(field))
+        if self._plan_versions[doc] is None:
+            self._set_floors(doc, _number(project.get('floors')))
+
+    def _add_plan(self, plan):
+        doc = self._slot(plan.get('projectId'))
+        version = plan_version(plan)
+        current = self._plan_versions[doc]
+        if current is not None and version < current:
+            return
+        rooms, area, floors, furniture = summarize_plan(plan)
+        self._plan_versions[doc] = version
+        for kind, column in self._rooms.items():
+            column[doc] = rooms.pop(kind, 0)
+        for kind, count in rooms.items():
+            self._rooms[kind] = column = np.zeros(self._capacity(), np.int16)
+            column[doc] = count
+        self._numbers['area'][doc] = area
+        self._buckets['area'][doc] = 1 + bisect.bisect_right(AREA_BUCKETS, area)
+        if floors is not None:
+            self._set_floors(doc, floors)
+        terms = tuple(furniture)
+        self._set_terms(doc, terms, self._plan_terms[doc])
+        self._plan_terms[doc] = terms
+
+    @staticmethod
+    def _index(add, record):
+        # A malformed record is left out rather than stopping every later one from being indexed
+        try:
+            add(record)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            print(f"Search index skipped record {record.get('id')!r}: {e!r}", file=sys.stderr)
+
+    def sync(self, projects, plans):
+        """Index the records appended to the stores since the last sync; the first sync indexes all.
+
+        This picks up records written by other processes sharing the stores.
+        Records replaced in place are only seen through ``add_project`` and
+        ``add_plan``.
+        """
+        with self._lock:
+            synced = self._synced or (0, 0)
+            counts = (len(projects), len(plans))
+            if counts == self._synced:
+                return
+            # Records appended meanwhile may be indexed twice, which is harmless
+            for project in projects.tail(synced[0]):
+                self._index(self._add_project, project)
+            for plan in plans.tail(synced[1]):
+                self._index(self._add_plan, plan)
+            self._synced = counts
+
+    def add_project(self, project):
+        """Insert or update a project; ignored before the first sync, which will see it."""
+        with self._lock:
+            if self._synced is not None:
+                self._index(self._add_project, project)
+
+    def add_plan(self, plan):
+        """Take a plan version's composition if it is its project's newest; ignored before the first sync."""
+        with self._lock:
+            if self._synced is not None:
+                self._index(self._add_plan, plan)
+
+    def _term_mask(self, term, n):
+        mask = np.zeros(n, dtype=bool)
+        if not term.endswith('*'):
+            postings = self._postings.get(term)
+            if postings is not None:
+                mask[postings.to_array()] = True
+            return mask
+        prefix = term[:-1]
+        for word in self._vocabulary[bisect.bisect_left(self._vocabulary, prefix):]:
+            if not word.startswith(prefix):
+                break
+            mask[self._postings[word].to_array()] = True
+        return mask
+
+    def _mask(self, terms, filters, rooms, ranges):
+        """Boolean mask of matching documents, or None when nothing narrows the search."""
+        n = self._count
+        mask = None
+
+        def narrow(condition):
+            nonlocal mask
+            if mask is None:
+                mask = condition
+            else:
+                mask &= condition
+
+        for term in terms:
+            narrow(self._term_mask(term, n))
+        for field, values in filters.items():
+            keyword = self._keywords[field]
+            codes = [c for c in (keyword.code(v, add=False) for v in values) if c is not None]
+            if len(codes) <= 8:
+                match = np.zeros(n, dtype=bool)
+                for code in codes:
+                    match |= keyword.codes[:n] == code
+            else:
+                # Lookup table by code + 1, so missing values (-1) land on index 0
+                accepted = np.zeros(len(keyword.values) + 1, dtype=bool)
+                accepted[[c + 1 for c in codes]] = True
+                match = accepted[keyword.codes[:n] + 1]
+            narrow(match)
+        for kind, (low, high) in rooms.items():
+            column = self._rooms.get(kind)
+            counts = column[:n] if column is not None else np.zeros(n, np.int16)
+            if low is not None:
+                narrow(counts >= low)
+            if high is not None:
+                narrow(counts <= high)
+        for field, (low, high) in ranges.items():
+            column = self._numbers[field][:n]
+            if low is not None:
+                narrow(column >= low)
+            if high is not None:
+                narrow(column <= high)
+        return mask
+
+    def _facets(self, mask, hits):
+        n = self._count
+
+        def count(column, codes, clip=None):
+            """Matching documents per code; ``clip`` also counts the codes above it."""
+            column = column[:n]
+            if len(codes) > 16 or len(hits) * 16 < n:
+                # Few matches or many distinct values: one bincount beats a comparison per value
+                values = column if mask is None else column[hits]
+                if clip is not None:
+                    values = np.minimum(values, clip)
+                found = np.bincount(values[values >= 0], minlength=max(codes, default=0) + 1)
+                return [int(found[c]) for c in codes]
+            found = []
+            for code in codes:
+                # Comparisons on small integer columns are far cheaper than gathering the matches
+                match = column >= code if code == clip else column == code
+                if mask is not None:
+                    match &= mask
+                found.append(int(np.count_nonzero(match)))
+            return found
+
+        styles = self._keywords['stylePreset']
+        found = count(styles.codes, range(len(styles.values)))
+        facets = {'stylePreset': {styles.values[c]: f for c, f in enumerate(found) if f}}
+        facets['rooms'] = {
+            kind: {(f'{c}+' if c == MAX_FACET_COUNT else str(c)): f
+                   for c, f in enumerate(count(column, range(MAX_FACET_COUNT + 1), MAX_FACET_COUNT)) if f}
+            for kind, column in sorted(self._rooms.items())
+        }
+        floors = self._buckets['floors']
+        most = int(floors[:n].max()) if n else 0
+        facets['floors'] = {str(f): c for f, c in zip(range(1, most + 1), count(floors, range(1, most + 1))) if c}
+        labels = [f'0-{AREA_BUCKETS[0]}'] + [f'{a}-{b}' for a, b in zip(AREA_BUCKETS, AREA_BUCKETS[1:])] \
+            + [f'{AREA_BUCKETS[-1]}+']
+        facets['area'] = dict(zip(labels, count(self._buckets['area'], range(1, len(AREA_BUCKETS) + 2))))
+        return facets
+
+    def _order(self, hits, sort, end):
+        if sort == 'recent':
+            return hits[::-1][:end]
+        descending = sort.startswith('-')
+        values = self._numbers[sort.lstrip('-')][hits]
+        # Missing values sort last either way
+        keys = np.where(np.isnan(values), np.inf, -values if descending else values)
+        if end < len(keys):
+            top = np.argpartition(keys, end - 1)[:end]
+            return hits[top[np.argsort(keys[top], kind='stable')]]
+        return hits[np.argsort(keys, kind='stable')]
+
+    def _document(self, doc):
+        document = {'id': self._ids[doc], 'name': self._names[doc]}
+        for field, keyword in self._keywords.items():
+            code = keyword.codes[doc]
+            document[field] = keyword.values[code] if code >= 0 else None
+        for field, column in self._numbers.items():
+            value = column[doc]
+            document[field] = None if np.isnan(value) else (int(value) if field != 'area' else float(value))
+        document['rooms'] = {kind: int(column[doc]) for kind, column in sorted(self._rooms.items()) if column[doc]}
+        return document
+
+    def search(self, text='', filters=None, rooms=None, ranges=None, sort='recent', offset=0, limit=20,
+               facets=True):
+        """Projects matching every word of ``text`` and every filter, newest first by default.
+
+        ``filters`` maps KEYWORDS fields to accepted values, ``rooms`` room
+        types and ``ranges`` NUMBERS fields to ``(low, high)`` bounds. Room
+        counts written in ``text`` are added to ``rooms``. ``sort`` is
+        'recent' or a NUMBERS field, prefixed with '-' for descending.
+        """
+        started = time.perf_counter()
+        terms, rooms = parse_query(text, dict(rooms or {}))
+        if sort.lstrip('-') not in SORTS or sort == '-recent':
+            raise ValueError(f"sort must be one of {', '.join(SORTS)}, optionally prefixed with '-'")
+        with self._lock:
+            mask = self._mask(terms, filters or {}, rooms, ranges or {})
+            hits = np.arange(self._count) if mask is None else np.flatnonzero(mask)
+            order = self._order(hits, sort, offset + limit)[offset:]
+            result = {
+                'total': int(len(hits)),
+                'offset': offset,
+                'limit': limit,
+                'results': [self._document(doc) for doc in order],
+            }
+            if facets:
+                result['facets'] = self._facets(mask, hits)
+        result['tookMs'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+
+def parse_query(text, rooms):
+    """Words of a query, and room count bounds with those written in the text added."""
+    tokens = _QUERY_WORD.findall(str(text or '').lower())
+    terms = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        kind = ROOM_WORDS.get(tokens[i + 1]) if i + 1 < len(tokens) and token[0].isdigit() else None
+        if kind:
+            count = int(token.rstrip('+'))
+            rooms[kind] = (count, None if token.endswith('+') else count)
+            i += 2
+        else:
+            terms.append(token.rstrip('+'))
+            i += 1
+    return terms, rooms
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,1981 @@
+"""The ArchSense HTTP server: JSON API plus the built frontend.
+
+Run it with ``python -m archsense``. Settings come from the command line
+or, failing that, the environment, so a deployment only sets variables:
+
+* ``--port`` / ``ARCHSENSE_PORT`` or ``PORT`` (default 8080)
+* ``--static-root`` / ``ARCHSENSE_STATIC_ROOT``: directory of the built
+  frontend, relative to the repository (default ``dist/public``)
+* ``--workers`` / ``ARCHSENSE_WORKERS``: processes sharing the port
+* ``--store`` / ``ARCHSENSE_STORE``: SQLite database for shared state
+* ``--shards`` / ``ARCHSENSE_SHARDS``: partition projects, plans and
+  exports by user across this many shard processes (see
+  ``archsense.shards``), kept in the directory ``<store>.shards``
+* ``--subsystems`` / ``ARCHSENSE_SUBSYSTEMS``: comma-separated subset of
+  ``SUBSYSTEMS``, ``all`` or ``none``
+* ``--preload`` / ``ARCHSENSE_PRELOAD=1``: import the enabled subsystems
+  before serving instead of on first use
+* ``--access-log`` / ``ARCHSENSE_ACCESS_LOG``: JSON-lines access log file,
+  ``-`` for stderr (default) or ``off`` (see ``archsense.accesslog``)
+* ``--access-log-sample`` / ``ARCHSENSE_ACCESS_LOG_SAMPLE``: share of
+  requests logged (default 1)
+* ``--memory-budget`` / ``ARCHSENSE_MEMORY_BUDGET``: RSS in MiB per process
+  above which caches are shrunk (see ``archsense.memory``)
+* ``--tracemalloc`` / ``ARCHSENSE_TRACEMALLOC``: trace allocations with this
+  many frames from the start, for ``/api/admin/memory`` (answered only to
+  clients on this machine, and not to web pages)
+
+Requests are handled in threads, so long-polling collaboration clients
+do not hold up the rest.
+
+The subsystems pull in numpy and scipy, which costs far more than the
+rest of the server put together, so the handlers import them on first use
+and a cold start answers its first request without them.
+``--measure-startup`` reports how long that takes.
+"""
+import argparse
+import http.server
+import importlib
+import ipaddress
+import itertools
+import math
+import os
+import json
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+from archsense.cache import PlanCache, RevisionCache
+from archsense.model import Room, check_plan, plan_body, plan_version, to_json
+from archsense.shards import ShardError, TenantRecords, open_sharded_stores, start_shards, stop_shards
+from archsense.store import open_stores
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional parts of the API and the modules each one loads
+SUBSYSTEMS = {
+    'layout': ('archsense.feasibility', 'archsense.furniture', 'archsense.multifloor', 'archsense.scoring'),
+    'analysis': ('archsense.circulation', 'archsense.daylight'),
+    'takeoff': ('archsense.takeoff',),
+    'thumbnails': ('archsense.thumbnails',),
+    'bulk': ('archsense.bulk',),
+    'share': ('archsense.share', 'archsense.thumbnails'),
+    'search': ('archsense.search',),
+    'collab': ('archsense.collab',),
+    'drawing': ('archsense.drawing', 'archsense.bulk'),
+    'export3d': ('archsense.export3d',),
+}
+
+DEFAULTS = {
+    'port': 8080,
+    'static_root': 'dist/public',
+    'workers': 1,
+    'store': None,
+    'shards': 0,
+    'subsystems': 'all',
+    'access_log': '-',
+    'access_log_sample': 1.0,
+    'memory_budget': 0,
+    'tracemalloc': 0,
+}
+
+# Mock data storage
+mock_users = {
+    'dev-user-1': {
+        'id': 'dev-user-1',
+        'email': 'dev@example.com',
+        'firstName': 'Development',
+        'lastName': 'User',
+        'profileImageUrl': '',
+        'createdAt': datetime.now().isoformat(),
+        'updatedAt': datetime.now().isoformat()
+    }
+}
+
+# Set by configure(): the settings, and in-process lists or SQLite tables shared by every worker process,
+# or stores across the shards and the client routing requests to them
+config = None
+stores = {}
+mock_projects = mock_plans = mock_exports = None
+shard_client = None
+
+# Derived analysis per stored plan version
+circulation_cache = PlanCache()
+daylight_cache = PlanCache(maxsize=64)
+takeoff_cache = PlanCache(maxsize=10000)
+# Encoded 3D models per plan version, format and instancing
+model_cache = PlanCache(maxsize=32)
+
+# Encoded latest plan per project, valid for one revision of the project's plans
+latest_plan_cache = RevisionCache()
+
+# Structured access log written by a background thread; None when off
+access_log = None
+
+# RSS sampling thread shrinking the caches over the memory budget, and tracemalloc reports
+memory_watchdog = memory_tracer = None
+
+# Plan thumbnails, rendered in the background when a plan version is saved; None when disabled
+thumbnail_store = None
+
+# Public share snapshots and the slug index resolving them; None when disabled
+share_cache = share_index = None
+
+# Project search, created and filled from the stores by the first search; None until then
+search_index = None
+_search_lock = threading.Lock()
+
+# Collaborative editing sessions and their ticker, created by the first join
+collab_sessions = None
+_collab_lock = threading.Lock()
+
+
+class CountingWriter:
+    """A response stream that counts the bytes written through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self.raw.write(data)
+
+    def take(self):
+        written, self.written = self.written, 0
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    # Long-polls keep connections open, so bursts of new ones need a deeper backlog
+    request_queue_size = 128
+
+
+def configure(settings):
+    """Open the stores and thumbnail store for ``settings`` (see ``parse_config``)."""
+    global config, stores, mock_projects, mock_plans, mock_exports, thumbnail_store, share_cache, share_index
+    global search_index, shard_client, collab_sessions, access_log, memory_watchdog, memory_tracer
+    config = settings
+    if access_log is not None:
+        access_log.close()
+    if settings.access_log != 'off':
+        from archsense.accesslog import AccessLog
+        access_log = AccessLog(settings.access_log, settings.access_log_sample)
+    else:
+        access_log = None
+    from archsense.memory import Tracer, Watchdog
+    if memory_watchdog is not None:
+        memory_watchdog.close()
+    memory_watchdog = Watchdog(int(settings.memory_budget * 1024 * 1024) or None, shrink_caches)
+    memory_tracer = Tracer()
+    if settings.tracemalloc:
+        memory_tracer.start(settings.tracemalloc)
+    if settings.shards:
+        stores, shard_client = open_sharded_stores(settings.store + '.shards')
+    else:
+        stores, shard_client = open_stores(settings.store), None
+    mock_projects = stores['project']
+    mock_plans = stores['plan']
+    mock_exports = stores['export']
+    if 'thumbnails' in settings.subsystems:
+        from archsense.thumbnails import ThumbnailStore
+        thumbnail_store = ThumbnailStore(directory=settings.store + '.thumbnails' if settings.store else None)
+    else:
+        thumbnail_store = None
+    if 'share' in settings.subsystems:
+        from archsense.share import ShareCache, SlugIndex
+        share_cache = ShareCache(directory=settings.store + '.share' if settings.store else None)
+        share_index = SlugIndex()
+    else:
+        share_cache = share_index = None
+    search_index = collab_sessions = None
+
+
+def preload(subsystems):
+    for name in subsystems:
+        for module in SUBSYSTEMS[name]:
+            importlib.import_module(module)
+
+
+def caches():
+    """The server's caches by name; each can ``shrink``."""
+    named = {'circulation': circulation_cache, 'daylight': daylight_cache, 'takeoff': takeoff_cache,
+             'model': model_cache, 'latestPlan': latest_plan_cache}
+    if thumbnail_store is not None:
+        named['thumbnails'] = thumbnail_store
+    if share_cache is not None:
+        named['share'] = share_cache
+    # Only once an export has loaded it, so reporting never imports numpy
+    export3d = sys.modules.get('archsense.export3d')
+    if export3d is not None:
+        named['meshes'] = export3d.meshes
+    return named
+
+
+def shrink_caches(keep):
+    """Shrink every cache to the share ``keep`` of its entries; returns how many entries went."""
+    return sum(cache.shrink(int(len(cache) * keep)) for cache in caches().values())
+
+
+def latest_plans(plans, project_ids=None):
+    latest = {}
+    for plan in plans:
+        project_id = plan.get('projectId')
+        if project_ids is not None and project_id not in project_ids:
+            continue
+        if project_id not in latest or plan_version(plan) > plan_version(latest[project_id]):
+            latest[project_id] = plan
+    return list(latest.values())
+
+
+def project_search():
+    """The search index, brought up to date with records other processes appended."""
+    global search_index
+    with _search_lock:
+        if search_index is None:
+            from archsense.search import SearchIndex
+            search_index = SearchIndex()
+    search_index.sync(mock_projects, mock_plans)
+    return search_index
+
+
+def collaboration():
+    """The open collaboration sessions."""
+    global collab_sessions
+    with _collab_lock:
+        if collab_sessions is None:
+            from archsense.collab import Sessions
+            collab_sessions = Sessions()
+    return collab_sessions
+
+
+def store_plan(plans, project_id, data):
+    """Append a plan version to ``plans`` and drop what was derived from the project's older ones.
+
+    Raises ValueError if the version is not a non-negative integer.
+    """
+    version = data.get('version', 1)
+    if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+        raise ValueError(f'version must be a non-negative integer, not {version!r}')
+    plan = {
+        'id': str(uuid.uuid4()),
+        'projectId': project_id,
+        'version': version,
+        'planJson': data.get('planJson', {}),
+        'constraintsJson': data.get('constraintsJson', {}),
+        'cameraStateJson': data.get('cameraStateJson', {}),
+        'createdAt': datetime.now().isoformat()
+    }
+    plans.append(plan)
+    if search_index is not None:
+        search_index.add_plan(plan)
+    circulation_cache.invalidate(project_id)
+    daylight_cache.invalidate(project_id)
+    takeoff_cache.invalidate(project_id)
+    model_cache.invalidate(project_id)
+    latest_plan_cache.invalidate(project_id)
+    if thumbnail_store is not None:
+        thumbnail_store.submit(plan)
+    return plan
+
+
+def checkpoint_plan(plans, project_id, body):
+    """Store a collaboration session's plan body as the project's next version."""
+    latest = next(iter(latest_plans(plans.select(projectId=project_id))), None) or {}
+    plan_json = latest.get('planJson')
+    return store_plan(plans, project_id, {
+        'version': plan_version(latest) + 1,
+        # A generated layout keeps its wrapper around the edited plan
+        'planJson': dict(plan_json, plan=body) if isinstance(plan_json, dict) and 'plan' in plan_json else body,
+        'constraintsJson': latest.get('constraintsJson', {}),
+        'cameraStateJson': latest.get('cameraStateJson', {})
+    })
+
+
+def build_share_snapshot(slug):
+    """Snapshot of the public project shared as ``slug``, or None."""
+    from archsense.share import build
+
+    project_id = share_index.resolve(slug, mock_projects)
+    project = next(iter(mock_projects.select(id=project_id)), None) if project_id else None
+    if not project or not project.get('isPublic') or project.get('shareSlug') != slug:
+        return None
+    # Projects marked public without going through publish share their latest plan
+    plans = mock_plans.select(projectId=project_id)
+    plan = next((p for p in plans if p.get('id') == project.get('publishedPlanId')), None)
+    if plan is None:
+        plan = next(iter(latest_plans(plans)), None)
+    try:
+        check_plan(plan_body(plan)) if plan else None
+    except ValueError:
+        return None
+    return build(project, plan) if plan else None
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=config.static_root, **kwargs)
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def parse_request(self):
+        self.started = time.perf_counter()
+        self.status = None
+        return super().parse_request()
+
+    def handle_one_request(self):
+        # Also set here: an over-long request line is answered before parse_request runs
+        self.started = time.perf_counter()
+        self.status = None
+        super().handle_one_request()
+        if self.status is not None and access_log is not None:
+            # A malformed request is answered before its path and headers are parsed
+            headers = getattr(self, 'headers', None)
+            access_log.record(self.command, getattr(self, 'path', '').partition('?')[0], self.status,
+                              time.perf_counter() - self.started, self.wfile.take(),
+                              headers.get('X-User-Id') if headers else None)
+
+    def log_request(self, code='-', size='-'):
+        # Recorded once the response is written (see handle_one_request), not printed here
+        self.status = int(code)
+
+    def end_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-User-Id, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Access-Control-Allow-Credentials', 'true')
+        super().end_headers()
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self):
+        parsed_path = urlparse(self.path)
+        path = parsed_path.path
+
+        # Handle API routes
+        if path.startswith('/api/'):
+            self.handle_sharded(self.handle_api, path, parsed_path.query)
+            return
+
+        if path.startswith('/share/'):
+            self.handle_sharded(self.handle_share, path[len('/share/'):])
+            return
+
+        # Handle React routing - serve index.html for all routes
+        if path == '/' or path.startswith('/editor') or path.startswith('/app'):
+            self.serve_react_app()
+            return
+
+        # Default to serving static files from the static root
+        super().do_GET()
+
+    def do_POST(self):
+        parsed_path = urlparse(self.path)
+        path = parsed_path.path
+
+        # Bulk import streams its body, so it must not be read up front
+        if path == '/api/bulk/import':
+            self.handle_sharded(self.handle_bulk_import, parsed_path.query)
+            return
+        if path == '/api/import/drawing':
+            self.handle_import_drawing(parsed_path.query)
+            return
+
+        if path.startswith('/api/'):
+            self.handle_sharded(self.handle_api_post, path)
+            return
+
+        self.send_response(404)
+        self.end_headers()
+
+    @property
+    def user_id(self):
+        # Development mode: X-User-Id picks the acting user, so several tenants can be exercised
+        return self.headers.get('X-User-Id') or 'dev-user-1'
+
+    def records(self, kind):
+        """The ``kind`` store as seen by the requesting user: only their shard's records when sharded."""
+        if shard_client is not None:
+            return TenantRecords(shard_client, kind, self.user_id)
+        return stores[kind]
+
+    def handle_sharded(self, handler, *args):
+        """Call ``handler``, answering 503 if the shard holding the user's records cannot be reached."""
+        try:
+            handler(*args)
+        except ShardError as e:
+            self.send_response(503)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': f'Store unavailable: {e}'}).encode())
+
+    def require(self, subsystem):
+        """True if ``subsystem`` is enabled; otherwise answers 404."""
+        if subsystem in config.subsystems:
+            return True
+        self.send_response(404)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'error': f'The {subsystem} subsystem is not enabled'}).encode())
+        return False
+
+    def require_local(self):
+        """True if the request comes straight from this machine, not via a proxy or web page; otherwise answers 404."""
+        try:
+            local = ipaddress.ip_address(self.client_address[0].removeprefix('::ffff:')).is_loopback
+        except (IndexError, TypeError, ValueError):
+            local = False
+        # Proxied requests (see nginx.conf) arrive from loopback too, but carry the client's address; browsers
+        # send Origin with cross-origin requests, and CORS here lets any page read the answer
+        if local and not any(key in self.headers for key in ('X-Forwarded-For', 'X-Real-IP', 'Origin')):
+            return True
+        self.send_response(404)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'error': 'API endpoint not found'}).encode())
+        return False
+
+    def plan_geometry(self, plan):
+        """Body of a stored plan version if its geometry is usable; otherwise answers 422 and returns None."""
+        body = plan_body(plan)
+        try:
+            check_plan(body)
+        except ValueError as e:
+            self.send_response(422)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': f'The plan cannot be used: {e}', 'planId': plan.get('id')}).encode())
+            return None
+        return body
+
+    def serve_react_app(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html')
+        self.end_headers()
+
+        try:
+            with open(os.path.join(config.static_root, 'index.html'), 'r', encoding='utf-8') as f:
+                content = f.read()
+            self.wfile.write(content.encode('utf-8'))
+        except FileNotFoundError:
+            html = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>ArchSense</title>
+    <style>
+        body { 
+            font-family: Arial, sans-serif; 
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            min-height: 100vh;
+            margin: 0;
+        }
+        .container {
+            text-align: center;
+            background: rgba(255,255,255,0.1);
+            padding: 2rem;
+            border-radius: 10px;
+            backdrop-filter: blur(10px);
+        }
+        .error { color: #ff6b6b; font-size: 2rem; margin-bottom: 1rem; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="error">⚠️ Error</div>
+        <h1>🏗️ ArchSense</h1>
+        <p>Built files not found. Please run 'npm run build' first.</p>
+    </div>
+</body>
+</html>'''
+            self.wfile.write(html.encode('utf-8'))
+
+    def handle_api(self, path, query):
+        if path == '/api/auth/user':
+            self.handle_auth_user()
+        elif path == '/api/auth/login':
+            self.handle_auth_login()
+        elif path == '/api/auth/register':
+            self.handle_auth_register()
+        elif path == '/api/auth/logout':
+            self.handle_auth_logout()
+        elif path == '/api/login':
+            self.handle_auth_login()
+        elif path == '/api/logout':
+            self.handle_auth_logout()
+        elif path == '/api/health':
+            self.handle_health()
+        elif path == '/api/projects':
+            self.handle_projects()
+        elif path == '/api/search':
+            self.handle_search(query)
+        elif path == '/api/admin/memory':
+            self.handle_memory({key: values[0] for key, values in parse_qs(query).items()})
+        elif path.startswith('/api/projects/') and path.endswith('/plans/latest/circulation'):
+            project_id = path.split('/')[3]
+            self.handle_project_circulation(project_id, query)
+        elif path.startswith('/api/projects/') and path.endswith('/plans/latest/daylight'):
+            project_id = path.split('/')[3]
+            self.handle_project_daylight(project_id, query)
+        elif path.startswith('/api/projects/') and path.endswith('/plans/latest/takeoff'):
+            project_id = path.split('/')[3]
+            self.handle_project_takeoff(project_id, {})
+        elif path.startswith('/api/projects/') and '/plans/latest/model.' in path:
+            project_id = path.split('/')[3]
+            self.handle_project_model(project_id, path.rpartition('.')[2], query)
+        elif path.startswith('/api/projects/') and '/plans/latest' in path:
+            project_id = path.split('/')[3]
+            self.handle_project_latest_plan(project_id)
+        elif path.startswith('/api/projects/') and path.endswith('/session/updates'):
+            project_id = path.split('/')[3]
+            self.handle_session(project_id, 'updates', {k: v[0] for k, v in parse_qs(query).items()})
+        elif path.startswith('/api/projects/'):
+            project_id = path.split('/')[-1]
+            self.handle_project_detail(project_id)
+        elif path == '/api/takeoff/bulk':
+            self.handle_bulk_takeoff({})
+        elif path == '/api/bulk/export':
+            self.handle_bulk_export(query)
+        elif path.startswith('/api/thumbnails/'):
+            name = path.split('/')[-1]
+            self.handle_thumbnail(name)
+        elif path == '/api/exports':
+            self.handle_exports()
+        elif path.startswith('/api/exports/'):
+            export_id = path.split('/')[-1]
+            self.handle_export_detail(export_id)
+        elif path.startswith('/api/furniture/category/'):
+            category = path.split('/')[-1]
+            self.handle_furniture_category(category)
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'API endpoint not found'}).encode())
+
+    def handle_api_post(self, path):
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length).decode('utf-8')
+
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            data = {}
+
+        if path == '/api/auth/login':
+            self.handle_auth_login()
+        elif path == '/api/auth/register':
+            self.handle_auth_register()
+        elif path == '/api/login':
+            self.handle_auth_login()
+        elif path == '/api/register':
+            self.handle_auth_register()
+        elif path == '/api/projects':
+            self.handle_create_project(data)
+        elif path == '/api/exports':
+            self.handle_create_export(data)
+        elif path == '/api/layout/generate':
+            self.handle_generate_layout(data)
+        elif path == '/api/layout/check':
+            self.handle_check_layout(data)
+        elif path == '/api/layout/score':
+            self.handle_score_layouts(data)
+        elif path == '/api/takeoff/bulk':
+            self.handle_bulk_takeoff(data)
+        elif path == '/api/admin/memory':
+            self.handle_memory_control(data)
+        elif path.startswith('/api/projects/') and path.endswith('/plans/latest/takeoff'):
+            project_id = path.split('/')[3]
+            self.handle_project_takeoff(project_id, data)
+        elif path.startswith('/api/projects/') and path.endswith('/publish'):
+            project_id = path.split('/')[3]
+            self.handle_publish_project(project_id)
+        elif path.startswith('/api/projects/') and path.endswith('/unpublish'):
+            project_id = path.split('/')[3]
+            self.handle_unpublish_project(project_id)
+        elif path.startswith('/api/projects/') and path.split('/')[4:5] == ['session']:
+            parts = path.split('/')
+            self.handle_session(parts[3], parts[5] if len(parts) > 5 else 'join', data)
+        elif path.startswith('/api/projects/') and '/plans' in path:
+            project_id = path.split('/')[3]
+            self.handle_create_plan(project_id, data)
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'API endpoint not found'}).encode())
+
+    def handle_auth_user(self):
+        # Mock authentication - always return a development user
+        user = mock_users['dev-user-1']
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(user).encode())
+
+    def handle_auth_logout(self):
+        # Mock logout - just return a success message
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'message': 'Logout successful'}).encode())
+
+    def handle_auth_login(self):
+        # Mock login - always return success for development
+        response = {
+            'message': 'Login successful',
+            'user': mock_users['dev-user-1'],
+            'token': 'dev-token-123'
+        }
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_auth_register(self):
+        # Mock registration - always return success for development
+        response = {
+            'message': 'Registration successful',
+            'user': mock_users['dev-user-1'],
+            'token': 'dev-token-123'
+        }
+        self.send_response(201)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_health(self):
+        response = {
+            'status': 'OK',
+            'message': 'ArchSense Complete API is running',
+            'frontend': 'Built React app loaded',
+            'backend': 'Python server active',
+            'auth': 'Development mode enabled',
+            'subsystems': config.subsystems
+        }
+        if access_log is not None:
+            response['accessLog'] = access_log.stats()
+        if memory_watchdog is not None and memory_watchdog.budget:
+            stats = memory_watchdog.stats(history=1)
+            response['memory'] = {'budget': stats['budget'], 'rss': stats['samples'][-1][1] if stats['samples'] else None,
+                                  'shrinks': stats['shrinks']}
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_memory(self, params):
+        if not self.require_local():
+            return
+        from archsense.memory import deep_size, rss
+
+        try:
+            limit = min(max(int(params.get('top', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+        group = params.get('group', 'lineno')
+        if group not in ('lineno', 'filename', 'traceback'):
+            group = 'lineno'
+        response = {'pid': os.getpid(), 'rss': rss(), 'watchdog': memory_watchdog.stats()}
+        if params.get('sizes', '1') != '0':
+            started = time.perf_counter()
+            records = {'user': {'store': 'memory', 'records': len(mock_users), 'bytes': deep_size(mock_users)}}
+            for kind, store in stores.items():
+                entry = {'store': type(store).__name__}
+                if isinstance(store, list):
+                    entry.update(records=len(store), bytes=deep_size(store))
+                elif getattr(store, 'path', None):
+                    # SQLite keeps the records on disk; only its page cache is in memory
+                    entry.update(records=len(store), fileBytes=sum(
+                        os.path.getsize(store.path + suffix) for suffix in ('', '-wal')
+                        if os.path.exists(store.path + suffix)))
+                records[kind] = entry
+            response['stores'] = records
+            response['caches'] = {name: {'entries': len(cache), 'bytes': deep_size(cache),
+                                         'hits': getattr(cache, 'hits', None), 'misses': getattr(cache, 'misses', None)}
+                                  for name, cache in caches().items()}
+            response['indexes'] = {name: deep_size(index) for name, index in
+                                   (('search', search_index), ('collab', collab_sessions)) if index is not None}
+            response['sizingMs'] = round((time.perf_counter() - started) * 1000, 1)
+        response['tracemalloc'] = memory_tracer.report(limit, group)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_memory_control(self, data):
+        """Start or stop tracemalloc ({"tracemalloc": "start", "frames": 5}), set the budget or shrink the caches now."""
+        if not self.require_local():
+            return
+        response = {}
+        action = data.get('tracemalloc')
+        try:
+            if action == 'start':
+                memory_tracer.start(int(data.get('frames', 1)))
+            elif action == 'stop':
+                memory_tracer.stop()
+            elif action is not None:
+                raise ValueError('tracemalloc is start or stop')
+            if 'budget' in data:
+                budget = float(data['budget'] or 0)
+                if not 0 <= budget < math.inf:
+                    raise ValueError('budget is in MiB, 0 for none')
+                memory_watchdog.budget = int(budget * 1024 * 1024) or None
+            if 'shrink' in data:
+                keep = float(data['shrink'])
+                if not 0 <= keep <= 1:
+                    raise ValueError('shrink is the share of entries to keep, 0 to 1')
+                response['dropped'] = shrink_caches(keep)
+        except (TypeError, ValueError, OverflowError) as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+        response['tracing'] = memory_tracer.tracing()
+        response['budget'] = memory_watchdog.budget
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_projects(self):
+        # Return mock projects for the development user
+        user_projects = self.records('project').select(userId=self.user_id)
+        if thumbnail_store is not None:
+            user_projects = [dict(p, thumbnails=thumbnail_store.urls(p['id'])) for p in user_projects]
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(user_projects).encode())
+
+    def handle_search(self, query):
+        if not self.require('search'):
+            return
+        from archsense.search import NUMBERS, ROOM_WORDS, parse_range
+
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        try:
+            rooms, ranges = {}, {}
+            for key, value in params.items():
+                kind = key[len('rooms.'):] if key.startswith('rooms.') else ROOM_WORDS.get(key)
+                if kind:
+                    rooms[kind] = parse_range(value)
+                elif key in NUMBERS:
+                    ranges[key] = parse_range(value)
+            filters = {'userId': [self.user_id]}
+            if params.get('style'):
+                filters['stylePreset'] = params['style'].split(',')
+            # Sharded, the user's shard searches its own index
+            index = self.records('project') if shard_client is not None else project_search()
+            result = index.search(
+                params.get('q', ''),
+                filters,
+                rooms,
+                ranges,
+                sort=params.get('sort', 'recent'),
+                offset=max(int(params.get('offset', 0)), 0),
+                limit=min(max(int(params.get('limit', 20)), 1), 100),
+                facets=params.get('facets', '1') not in ('0', 'false')
+            )
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': f'Invalid search: {e}'}).encode())
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(result).encode())
+
+    def not_modified(self, revision):
+        """Answer 304 if If-None-Match names the ETag of ``revision``; weak comparison, as the tags are weak."""
+        header = self.headers.get('If-None-Match')
+        if revision is None or not header:
+            return False
+        # '*' is not honoured: a revision does not say whether the resource exists
+        if f'"{revision}"' not in {tag.strip().removeprefix('W/') for tag in header.split(',')}:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', f'W/"{revision}"')
+        self.end_headers()
+        return True
+
+    def send_revision_headers(self, revision):
+        if revision is not None:
+            self.send_header('ETag', f'W/"{revision}"')
+            self.send_header('Cache-Control', 'no-cache')
+
+    def handle_project_detail(self, project_id):
+        projects = self.records('project')
+        # Read before the record, so a write in between can only make the tag older, never newer
+        revision = projects.revision(project_id)
+        if self.not_modified(revision):
+            return
+        project = next(iter(projects.select(id=project_id)), None)
+        if project:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_revision_headers(revision)
+            self.end_headers()
+            self.wfile.write(json.dumps(project).encode())
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Project not found'}).encode())
+
+    def handle_project_latest_plan(self, project_id):
+        plans = self.records('plan')
+        revision = plans.revision(project_id)
+        if self.not_modified(revision):
+            return
+        body = latest_plan_cache.get(project_id, revision) if revision is not None else None
+        if body is None:
+            # Find the latest plan for the project
+            project_plans = plans.select(projectId=project_id)
+            if project_plans:
+                latest_plan = max(project_plans, key=plan_version)
+                body = json.dumps(latest_plan, default=to_json).encode()
+                if revision is not None:
+                    latest_plan_cache.put(project_id, revision, body)
+        if body is not None:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_revision_headers(revision)
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'No plans found'}).encode())
+
+    def handle_project_circulation(self, project_id, query):
+        if not self.require('analysis'):
+            return
+        from archsense.circulation import analyze as analyze_circulation
+
+        project_plans = self.records('plan').select(projectId=project_id)
+        if not project_plans:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'No plans found'}).encode())
+            return
+
+        latest_plan = max(project_plans, key=plan_version)
+        body = self.plan_geometry(latest_plan)
+        if body is None:
+            return
+        include_matrix = parse_qs(query).get('matrix', ['0'])[0] in ('1', 'true')
+        analysis = circulation_cache.get_or_compute(
+            latest_plan,
+            lambda: analyze_circulation(body, include_matrix),
+            include_matrix
+        )
+        response = dict(analysis, planId=latest_plan['id'], version=latest_plan.get('version', 0))
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_project_daylight(self, project_id, query):
+        if not self.require('analysis'):
+            return
+        from archsense.daylight import analyze as analyze_daylight, encode_heatmap
+
+        project_plans = self.records('plan').select(projectId=project_id)
+        if not project_plans:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'No plans found'}).encode())
+            return
+
+        params = parse_qs(query)
+        try:
+            resolution = max(int(params.get('resolution', ['100'])[0]), 25)
+            orientation = float(params.get('orientation', ['180'])[0])
+            latitude = float(params.get('latitude', ['40'])[0])
+            day_of_year = int(params.get('day', ['80'])[0])
+            floor = int(params.get('floor', ['0'])[0])
+            if not (math.isfinite(orientation) and -90 <= latitude <= 90):
+                raise ValueError
+        except ValueError:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Invalid analysis parameters'}).encode())
+            return
+
+        latest_plan = max(project_plans, key=plan_version)
+        body = self.plan_geometry(latest_plan)
+        if body is None:
+            return
+        try:
+            analysis = daylight_cache.get_or_compute(
+                latest_plan,
+                lambda: analyze_daylight(body, resolution, orientation, latitude, day_of_year, floor),
+                resolution, orientation, latitude, day_of_year, floor
+            )
+        except ValueError as e:
+            self.send_response(422)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e), 'planId': latest_plan['id']}).encode())
+            return
+        response = {
+            'planId': latest_plan['id'],
+            'version': latest_plan.get('version', 0),
+            'rooms': analysis['rooms'],
+            'grid': analysis['grid']
+        }
+        if params.get('heatmap', ['0'])[0] in ('1', 'true'):
+            response['heatmap'] = encode_heatmap(analysis)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_project_takeoff(self, project_id, data):
+        if not self.require('takeoff'):
+            return
+        from archsense.takeoff import check_prices, estimate, quantities
+
+        try:
+            check_prices(data.get('prices') if isinstance(data, dict) else [])
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        project_plans = latest_plans(self.records('plan').select(projectId=project_id))
+        if not project_plans:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'No plans found'}).encode())
+            return
+
+        latest_plan = project_plans[0]
+        if self.plan_geometry(latest_plan) is None:
+            return
+        takeoff = takeoff_cache.get_or_compute(latest_plan, lambda: quantities([latest_plan])[0])
+        response = {
+            'planId': latest_plan['id'],
+            'version': latest_plan.get('version', 0),
+            'quantities': takeoff,
+            'cost': estimate(takeoff, data.get('prices'))
+        }
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_project_model(self, project_id, fmt, query):
+        if not self.require('export3d'):
+            return
+        from archsense.export3d import CONTENT_TYPES, INSTANCING, export
+
+        # OBJ cannot instance, so its models are the same whatever was asked
+        instancing = parse_qs(query).get('instancing', ['nodes'])[0] if fmt != 'obj' else None
+        if fmt not in CONTENT_TYPES or (fmt != 'obj' and instancing not in INSTANCING):
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': f"Use model.glb, model.gltf or model.obj, "
+                                                  f"with instancing {', '.join(INSTANCING)}"}).encode())
+            return
+
+        project_plans = latest_plans(self.records('plan').select(projectId=project_id))
+        if not project_plans:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'No plans found'}).encode())
+            return
+
+        latest_plan = project_plans[0]
+        body = self.plan_geometry(latest_plan)
+        if body is None:
+            return
+        model = model_cache.get_or_compute(latest_plan, lambda: export(body, fmt, instancing), fmt, instancing)
+        self.send_response(200)
+        self.send_header('Content-type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(model)))
+        self.send_header('Content-Disposition',
+                         f'attachment; filename="plan-v{latest_plan.get("version", 0)}.{fmt}"')
+        self.end_headers()
+        self.wfile.write(model)
+
+    def handle_bulk_takeoff(self, data):
+        if not self.require('takeoff'):
+            return
+        from archsense.takeoff import check_prices, portfolio, quantities
+
+        try:
+            check_prices(data.get('prices') if isinstance(data, dict) else [])
+            project_ids = data.get('projectIds')
+            if project_ids is not None and not (isinstance(project_ids, list)
+                                                and all(isinstance(i, str) for i in project_ids)):
+                raise ValueError('projectIds must be a list of project ids')
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        plans, errors = [], []
+        for plan in latest_plans(self.records('plan'), set(project_ids) if project_ids is not None else None):
+            # A plan without usable geometry is reported on its own instead of failing the batch
+            try:
+                check_plan(plan_body(plan))
+            except ValueError as e:
+                errors.append({'id': plan['projectId'], 'planId': plan['id'], 'error': str(e)})
+                continue
+            plans.append(plan)
+        takeoffs = [takeoff_cache.get(p) for p in plans]
+        missing = [i for i, t in enumerate(takeoffs) if t is None]
+        # Everything not cached yet is computed in one columnar batch
+        for i, takeoff in zip(missing, quantities([plans[i] for i in missing])):
+            takeoff_cache.put(plans[i], takeoff)
+            takeoffs[i] = takeoff
+        report = portfolio(takeoffs, data.get('prices'), [p['projectId'] for p in plans])
+        report['computed'] = len(missing)
+        report['errors'] = errors
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(report).encode())
+
+    def handle_bulk_export(self, query):
+        if not self.require('bulk') or not self.require_local():
+            return
+        from archsense import bulk
+
+        try:
+            offset = max(int(parse_qs(query).get('offset', ['0'])[0]), 0)
+        except ValueError:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Invalid offset'}).encode())
+            return
+
+        # Chunked transfer encoding is HTTP/1.1 only; the connection still closes afterwards
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        collections = (('project', mock_projects), ('plan', mock_plans), ('export', mock_exports))
+        bulk.write_chunked(self.wfile, bulk.chunks(bulk.export_lines(collections, offset)))
+
+    def handle_bulk_import(self, query):
+        if not self.require('bulk') or not self.require_local():
+            return
+        from archsense import bulk
+
+        params = parse_qs(query)
+        try:
+            offset = max(int(params.get('offset', ['0'])[0]), 0)
+            batch_size = min(max(int(params.get('batch', [bulk.BATCH_SIZE])[0]), 1), 10000)
+        except ValueError:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Invalid offset or batch size'}).encode())
+            return
+
+        touched = set()
+        slugs = set()
+
+        def apply(batch):
+            # Records are upserted by id, so replaying a resumed range is harmless.
+            # Each kind in a batch is written in one go (one transaction in SQLite).
+            for kind in bulk.KINDS:
+                records = [record for k, record in batch if k == kind]
+                if records:
+                    stores[kind].upsert(records)
+            touched.update(record.get('projectId') for kind, record in batch if kind == 'plan')
+            if search_index is not None:
+                # Upserts replace records in place, which the index's own catch-up would miss
+                for kind, record in batch:
+                    if kind == 'project':
+                        search_index.add_project(record)
+                    elif kind == 'plan':
+                        search_index.add_plan(record)
+            slugs.update(record['shareSlug'] for kind, record in batch if kind == 'project' and record.get('shareSlug'))
+
+        def progress(summary):
+            if summary['batches'] % 100 == 0:
+                print(f"Bulk import: {summary['records']} records committed, offset {summary['offset']}")
+
+        blocks = bulk.read_body(self.rfile, self.headers)
+        summary = bulk.import_lines(bulk.iter_lines(blocks), apply, offset, batch_size, progress)
+        # Drain the rest of a rejected upload so the client gets to read the summary
+        for _ in blocks:
+            pass
+        for project_id in touched:
+            circulation_cache.invalidate(project_id)
+            daylight_cache.invalidate(project_id)
+            takeoff_cache.invalidate(project_id)
+            model_cache.invalidate(project_id)
+            latest_plan_cache.invalidate(project_id)
+        if thumbnail_store is not None:
+            for plan in latest_plans(mock_plans, touched):
+                thumbnail_store.submit(plan)
+        if share_cache is not None:
+            # Imported projects may be newly public or pinned to another version
+            for slug in slugs:
+                share_cache.remove(slug)
+            share_index.invalidate()
+
+        self.send_response(400 if summary['error'] else 200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(summary).encode())
+
+    def handle_import_drawing(self, query):
+        if not self.require('drawing'):
+            return
+        from archsense import bulk, drawing
+
+        params = parse_qs(query)
+        content_type = self.headers.get('Content-Type', '')
+        blocks = bulk.read_body(self.rfile, self.headers)
+        unit = params.get('unit', [None])[0]
+        layers = [name for value in params.get('layers', []) for name in value.split(',') if name]
+        try:
+            first = next(blocks, b'')
+            kind = params.get('format', ['svg' if 'svg' in content_type or first.lstrip()[:1] == b'<' else 'dxf'])[0]
+            if kind not in ('dxf', 'svg'):
+                raise drawing.DrawingError(f'Unknown drawing format {kind!r}; use dxf or svg')
+            if unit is not None and unit not in drawing.UNITS:
+                raise drawing.DrawingError(f"Unknown unit {unit!r}; use one of {', '.join(drawing.UNITS)}")
+            read = drawing.read_svg if kind == 'svg' else drawing.read_dxf
+            plan, summary = drawing.build_plan(read(itertools.chain((first,), blocks), layers),
+                                               drawing.UNITS.get(unit))
+        except (drawing.DrawingError, bulk.BodyError) as e:
+            # Drain the rest of a rejected upload so the client gets to read the error
+            for _ in blocks:
+                pass
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        response = {
+            'plan': plan,
+            'message': f"Imported {summary['rooms']} rooms and {summary['walls']} walls from the drawing",
+            'rooms': summary['rooms'],
+            'totalArea': summary['extentMm'][0] * summary['extentMm'][1] / 1000000,
+            'import': summary
+        }
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_create_project(self, data):
+        project_id = str(uuid.uuid4())
+        project = {
+            'id': project_id,
+            'userId': self.user_id,
+            'name': data.get('name', 'New Project'),
+            'siteWidthMm': data.get('siteWidthMm', 10000),
+            'siteDepthMm': data.get('siteDepthMm', 15000),
+            'floors': data.get('floors', 1),
+            'stylePreset': data.get('stylePreset', 'modern'),
+            'createdAt': datetime.now().isoformat(),
+            'updatedAt': datetime.now().isoformat(),
+            'isPublic': False,
+            'shareSlug': None
+        }
+        self.records('project').append(project)
+        if search_index is not None:
+            search_index.add_project(project)
+
+        self.send_response(201)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(project).encode())
+
+    def handle_create_plan(self, project_id, data):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('The request body must be an object')
+            if not isinstance(data.get('planJson', {}), dict):
+                raise ValueError('planJson must be an object')
+            check_plan(plan_body(data.get('planJson', {})))
+            plan = store_plan(self.records('plan'), project_id, data)
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        self.send_response(201)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(plan).encode())
+
+    def handle_publish_project(self, project_id):
+        if not self.require('share'):
+            return
+        from archsense.share import PREFIX, build
+
+        project = next(iter(self.records('project').select(id=project_id)), None)
+        project_plans = latest_plans(self.records('plan').select(projectId=project_id))
+        if not project or not project_plans:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Project not found' if not project else 'No plans found'}).encode())
+            return
+
+        latest_plan = project_plans[0]
+        if self.plan_geometry(latest_plan) is None:
+            return
+        published = dict(
+            project,
+            isPublic=True,
+            shareSlug=project.get('shareSlug') or uuid.uuid4().hex[:12],
+            publishedPlanId=latest_plan['id'],
+            publishedVersion=latest_plan.get('version', 0),
+            updatedAt=datetime.now().isoformat()
+        )
+        # The new snapshot replaces the old one in one step, before the project says it is published
+        share_cache.publish(lambda: build(published, latest_plan))
+        self.records('project').upsert([published])
+        share_index.set(published['shareSlug'], project_id)
+        if search_index is not None:
+            search_index.add_project(published)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(dict(published, shareUrl=PREFIX + published['shareSlug'])).encode())
+
+    def handle_unpublish_project(self, project_id):
+        if not self.require('share'):
+            return
+
+        project = next(iter(self.records('project').select(id=project_id)), None)
+        if not project:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Project not found'}).encode())
+            return
+
+        # The slug is kept, so publishing again brings the same link back
+        unpublished = dict(project, isPublic=False, updatedAt=datetime.now().isoformat())
+        self.records('project').upsert([unpublished])
+        if search_index is not None:
+            search_index.add_project(unpublished)
+        if project.get('shareSlug'):
+            share_index.discard(project['shareSlug'])
+            share_cache.remove(project['shareSlug'])
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(unpublished).encode())
+
+    def handle_session(self, project_id, action, data):
+        """Collaborative editing: join, send ops, long-poll for updates or leave (see archsense.collab)."""
+        if not self.require('collab'):
+            return
+        from archsense.collab import POLL_TIMEOUT, Session, SessionError
+
+        try:
+            if action == 'join':
+                if not self.records('project').select(id=project_id):
+                    raise SessionError('Project not found')
+                plans = self.records('plan')
+
+                def open_session():
+                    latest = next(iter(latest_plans(plans.select(projectId=project_id))), None)
+                    return Session(project_id, latest, lambda body: checkpoint_plan(plans, project_id, body))
+
+                body = collaboration().join(project_id, self.user_id, open_session)
+            else:
+                if not isinstance(data, dict):
+                    raise ValueError('the request body must be an object')
+                session = collaboration().get(project_id)
+                participant = data.get('participant')
+                if participant is not None and not isinstance(participant, str):
+                    raise ValueError('participant must be a string')
+                if action == 'ops':
+                    if not isinstance(data.get('ops'), list):
+                        raise ValueError('ops must be a list')
+                    body = json.dumps(session.apply(participant, data['ops']))
+                elif action == 'updates':
+                    wait = float(data.get('wait', POLL_TIMEOUT))
+                    if not math.isfinite(wait):
+                        raise ValueError('wait must be a number of seconds')
+                    wait = min(max(wait, 0), POLL_TIMEOUT)
+                    body = session.updates(participant, int(data.get('after', 0)), wait)
+                elif action == 'leave':
+                    session.leave(participant)
+                    body = json.dumps({'message': 'Left the session'})
+                else:
+                    raise SessionError('API endpoint not found')
+        except SessionError as e:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+        except (TypeError, ValueError) as e:
+            # int() and float() raise TypeError for lists and objects
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': f'Invalid session request: {e}'}).encode())
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def layout_request(self, requirements):
+        """``requirements`` with the floors of the project it names when it gives none."""
+        if not isinstance(requirements, dict) or requirements.get('floors') is not None:
+            return requirements
+        project_id = requirements.get('projectId')
+        project = next(iter(self.records('project').select(id=project_id)), {}) if project_id else {}
+        return dict(requirements, floors=project.get('floors'))
+
+    def handle_check_layout(self, requirements):
+        if not self.require('layout'):
+            return
+        from archsense.feasibility import check
+
+        started = time.perf_counter()
+        response = check(self.layout_request(requirements))
+        response['elapsedUs'] = round((time.perf_counter() - started) * 1e6, 1)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_generate_layout(self, requirements):
+        if not self.require('layout'):
+            return
+        from archsense.feasibility import check
+        from archsense.furniture import check_selections, furnish_plan
+        from archsense.scoring import score_plan
+
+        try:
+            if not isinstance(requirements, dict):
+                raise ValueError('The layout request must be a JSON object')
+            check_selections(requirements.get('furniture'))
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        # Requests that cannot be laid out are turned away before any solving
+        started = time.perf_counter()
+        requirements = self.layout_request(requirements)
+        feasibility = check(requirements)
+        if not feasibility['feasible']:
+            feasibility['elapsedUs'] = round((time.perf_counter() - started) * 1e6, 1)
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(dict(feasibility, error='The layout request is infeasible')).encode())
+            return
+
+        # Enhanced layout generation with 3D visualization support
+        rooms = requirements.get('rooms', [])
+        # The sizes and floors as the check read them, defaults filled in
+        site_width, site_depth, floors = (feasibility[key] for key in ('siteWidthMm', 'siteDepthMm', 'floors'))
+        if floors > 1:
+            self.handle_generate_building(rooms, site_width, site_depth, floors)
+            return
+
+        # Generate comprehensive floor plan with 3D data
+        plan_data = {
+            'rooms': [],
+            'walls': [],
+            'doors': [],
+            'windows': [],
+            'furniture': [],
+            '3d_data': {
+                'camera': {
+                    'position': {'x': 5000, 'y': 7500, 'z': 3000},
+                    'target': {'x': 5000, 'y': 7500, 'z': 0},
+                    'fov': 60
+                },
+                'lights': [
+                    {'type': 'ambient', 'intensity': 0.4, 'color': 0xffffff},
+                    {'type': 'directional', 'position': {'x': 5000, 'y': 0, 'z': 5000}, 'intensity': 0.8, 'color': 0xffffff}
+                ],
+                'materials': {
+                    'floor': {'color': 0xf5f5dc, 'roughness': 0.8},
+                    'wall': {'color': 0xf0f0f0, 'roughness': 0.9},
+                    'ceiling': {'color': 0xffffff, 'roughness': 0.7}
+                }
+            },
+            'react_planner_data': {
+                'version': '1.0',
+                'scale': 1,
+                'layers': {
+                    'layer-1': {
+                        'id': 'layer-1',
+                        'name': 'Floor Plan',
+                        'visible': True,
+                        'opacity': 1,
+                        'selected': True,
+                        'elements': {}
+                    }
+                },
+                'scene': {
+                    'width': site_width,
+                    'height': site_depth,
+                    'rotation': 0,
+                    'scale': 1
+                }
+            }
+        }
+
+        # Create enhanced layout for a 10m x 6.5m footprint; the precheck turns away smaller sites
+        # (feasibility.SINGLE_FLOOR_SITE)
+        # Layout: Living room at front, kitchen adjacent, bedrooms grouped at back, bathrooms strategically placed
+
+        # Rooms share their type styling and 3D properties (see archsense.model)
+        plan_data['rooms'] = [
+            Room.create('living_1', 'living', 0, 0, 5000, 3500),  # Front left - 5m x 3.5m
+            Room.create('kitchen_1', 'kitchen', 5000, 0, 4000, 2500),  # Front right - 4m x 2.5m
+            Room.create('bathroom_1', 'bathroom', 5000, 2500, 2000, 2000, window_height=800),  # Near living room
+            Room.create('bedroom_1', 'bedroom', 0, 3500, 3500, 3000),  # Back left - 3.5m x 3m
+            Room.create('bedroom_2', 'bedroom', 3500, 3500, 3500, 3000),  # Back center - 3.5m x 3m
+            Room.create('bedroom_3', 'bedroom', 7000, 3500, 3000, 3000),  # Back right - 3m x 3m
+            Room.create('bathroom_2', 'bathroom', 7000, 2500, 2000, 2000, window_height=800),  # Near bedrooms
+        ]
+
+        # Add walls with 3D properties
+        plan_data['walls'] = [
+            {'x1': 0, 'y1': 0, 'x2': site_width, 'y2': 0, 'height': 3000, 'thickness': 200},  # Top
+            {'x1': site_width, 'y1': 0, 'x2': site_width, 'y2': site_depth, 'height': 3000, 'thickness': 200},  # Right
+            {'x1': site_width, 'y1': site_depth, 'x2': 0, 'y2': site_depth, 'height': 3000, 'thickness': 200},  # Bottom
+            {'x1': 0, 'y1': site_depth, 'x2': 0, 'y2': 0, 'height': 3000, 'thickness': 200},  # Left
+        ]
+
+        # Add internal walls for room separation
+        plan_data['walls'].extend([
+            {'x1': 5000, 'y1': 0, 'x2': 5000, 'y2': 2500, 'height': 3000, 'thickness': 200},  # Kitchen wall
+            {'x1': 0, 'y1': 3500, 'x2': 10000, 'y2': 3500, 'height': 3000, 'thickness': 200},  # Bedroom area wall
+            {'x1': 3500, 'y1': 3500, 'x2': 3500, 'y2': 6500, 'height': 3000, 'thickness': 200},  # Bedroom 1-2 wall
+            {'x1': 7000, 'y1': 2500, 'x2': 7000, 'y2': 6500, 'height': 3000, 'thickness': 200},  # Bedroom 3 wall
+        ])
+
+        # Add doors with 3D properties
+        plan_data['doors'] = [
+            {'x': 2500, 'y': 0, 'width': 900, 'height': 2100, 'room1': 'entrance', 'room2': 'living', 'type': 'entrance'},  # Main entrance
+            {'x': 4500, 'y': 0, 'width': 900, 'height': 2100, 'room1': 'living', 'room2': 'kitchen', 'type': 'interior'},  # Living to kitchen
+            {'x': 6000, 'y': 2500, 'width': 900, 'height': 2100, 'room1': 'kitchen', 'room2': 'bathroom1', 'type': 'interior'},  # Kitchen to bathroom
+            {'x': 1750, 'y': 3500, 'width': 900, 'height': 2100, 'room1': 'living', 'room2': 'bedroom1', 'type': 'interior'},  # Living to bedroom 1
+            {'x': 5250, 'y': 3500, 'width': 900, 'height': 2100, 'room1': 'bathroom1', 'room2': 'bedroom2', 'type': 'interior'},  # Bathroom to bedroom 2
+            {'x': 8500, 'y': 3500, 'width': 900, 'height': 2100, 'room1': 'bedroom2', 'room2': 'bedroom3', 'type': 'interior'},  # Bedroom 2 to 3
+            {'x': 8000, 'y': 2500, 'width': 900, 'height': 2100, 'room1': 'bedroom3', 'room2': 'bathroom2', 'type': 'interior'},  # Bedroom 3 to bathroom
+        ]
+
+        # Add windows with 3D properties
+        plan_data['windows'] = [
+            {'x': 1000, 'y': 0, 'width': 1500, 'height': 1200, 'room': 'living', 'type': 'window', 'depth': 100},  # Living room window
+            {'x': 6000, 'y': 0, 'width': 1500, 'height': 1200, 'room': 'kitchen', 'type': 'window', 'depth': 100},  # Kitchen window
+            {'x': 500, 'y': 3500, 'width': 1200, 'height': 1200, 'room': 'bedroom1', 'type': 'window', 'depth': 100},  # Bedroom 1 window
+            {'x': 4000, 'y': 3500, 'width': 1200, 'height': 1200, 'room': 'bedroom2', 'type': 'window', 'depth': 100},  # Bedroom 2 window
+            {'x': 7500, 'y': 3500, 'width': 1200, 'height': 1200, 'room': 'bedroom3', 'type': 'window', 'depth': 100},  # Bedroom 3 window
+        ]
+
+        # Place catalog furniture in each room around its doors and windows
+        unplaced_furniture = furnish_plan(plan_data, requirements.get('furniture'))
+
+        # Generate React-Planner compatible data
+        element_id = 1
+        for room in plan_data['rooms']:
+            # Add room as React-Planner element
+            plan_data['react_planner_data']['layers']['layer-1']['elements'][f'element-{element_id}'] = {
+                'id': f'element-{element_id}',
+                'type': 'room',
+                'x': room['x'],
+                'y': room['y'],
+                'width': room['width'],
+                'height': room['depth'],
+                'properties': {
+                    'name': room['type'].title(),
+                    'height': room['height'],
+                    'color': room['color']
+                }
+            }
+            element_id += 1
+
+        response = {
+            'plan': plan_data,
+            'message': 'Enhanced floor plan with 3D visualization generated successfully',
+            'rooms': len(plan_data['rooms']),
+            'totalArea': site_width * site_depth / 1000000,  # Convert to m²
+            'layout': {
+                'description': 'Family-friendly layout with living room at front, kitchen adjacent, bedrooms grouped at back',
+                'features': [
+                    'Living room near entrance for easy access',
+                    'Kitchen connects to living room for family flow',
+                    'Bedrooms grouped together for privacy',
+                    'Bathrooms strategically placed near bedrooms and living area',
+                    'Balanced layout optimized for family use',
+                    '3D visualization ready with Three.js',
+                    'React-Planner compatible format'
+                ],
+                'quality': score_plan(plan_data)
+            },
+            'visualization': {
+                '2d_editor': 'React-Planner compatible',
+                '3d_engine': 'Three.js ready',
+                'furniture_library': 'Complete furniture catalog',
+                'export_formats': ['2D PDF', '3D GLTF', 'VR Ready']
+            },
+            'furnishing': {
+                'unplaced': unplaced_furniture
+            }
+        }
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response, default=to_json).encode())
+
+    def handle_generate_building(self, rooms, site_width, site_depth, floors):
+        from archsense.multifloor import generate_building
+        from archsense.scoring import score_plan
+
+        try:
+            plan_data, unplaced = generate_building(rooms, site_width, site_depth, floors)
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+
+        response = {
+            'plan': plan_data,
+            'message': f'{floors}-floor plan with shared stair core generated successfully',
+            'rooms': len(plan_data['rooms']),
+            'floors': floors,
+            'totalArea': site_width * site_depth * floors / 1000000,  # Convert to m²
+            'layout': {
+                'description': 'Public rooms on the ground floor, private rooms upstairs around a shared stair core',
+                'quality': score_plan(plan_data)
+            },
+            'furnishing': {
+                'unplaced': unplaced['furniture']
+            },
+            'unplacedRooms': unplaced['rooms']
+        }
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_score_layouts(self, data):
+        if not self.require('layout'):
+            return
+        from archsense.scoring import rank, validate
+
+        try:
+            if not isinstance(data, dict) or not isinstance(data.get('candidates', []), list):
+                raise ValueError('candidates must be a list of plans')
+            candidates = [c.get('plan', c) if isinstance(c, dict) else c for c in data.get('candidates', [])]
+            options = {'top': data.get('top'), 'weights': data.get('weights'),
+                       'site_width': data.get('siteWidthMm'), 'site_depth': data.get('siteDepthMm')}
+            validate(candidates, **options)
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode())
+            return
+        ranking = rank(candidates, **options)
+        response = {
+            'count': len(candidates),
+            'ranking': ranking
+        }
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def handle_exports(self):
+        user_exports = self.records('export').select(userId=self.user_id)
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(user_exports).encode())
+
+    def handle_export_detail(self, export_id):
+        export = next(iter(self.records('export').select(id=export_id)), None)
+        if export:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(export).encode())
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Export not found'}).encode())
+
+    def handle_create_export(self, data):
+        export_id = str(uuid.uuid4())
+        export = {
+            'id': export_id,
+            'projectId': data.get('projectId'),
+            'userId': self.user_id,
+            'type': data.get('type', 'pdf'),
+            'status': 'pending',
+            'fileUri': None,
+            'createdAt': datetime.now().isoformat()
+        }
+        self.records('export').append(export)
+
+        self.send_response(201)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(export).encode())
+
+    def handle_thumbnail(self, name):
+        if not self.require('thumbnails'):
+            return
+        from archsense.thumbnails import CONTENT_TYPES
+
+        digest, _, fmt = name.partition('.')
+        blob = thumbnail_store.get(digest) if fmt in CONTENT_TYPES else None
+        if blob is None:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Thumbnail not found'}).encode())
+            return
+
+        # Content-addressed: a URL always names the same bytes
+        etag = f'"{digest}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(blob)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.end_headers()
+        self.wfile.write(blob)
+
+    def handle_share(self, rest):
+        if not self.require('share'):
+            return
+        from archsense.share import CACHE_CONTROL, PAGE
+
+        slug, _, name = rest.partition('/')
+        snapshot = share_cache.get_or_build(slug, lambda: build_share_snapshot(slug)) if slug else None
+        asset = snapshot.assets.get(name or PAGE) if snapshot else None
+        if asset is None:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Shared design not found'}).encode())
+            return
+
+        etags = [tag.strip().removeprefix('W/') for tag in self.headers.get('If-None-Match', '').split(',')]
+        if asset.etag in etags:
+            self.send_response(304)
+            self.send_header('ETag', asset.etag)
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-type', asset.content_type)
+        self.send_header('Content-Length', str(len(asset.body)))
+        self.send_header('ETag', asset.etag)
+        self.send_header('Cache-Control', CACHE_CONTROL)
+        self.end_headers()
+        self.wfile.write(asset.body)
+
+    def handle_furniture_category(self, category):
+        if not self.require('layout'):
+            return
+        from archsense.furniture import FURNITURE_CATALOG
+
+        category_data = FURNITURE_CATALOG.get(category, [])
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(category_data).encode())
+
+
+def parse_subsystems(value):
+    value = value.strip().lower()
+    if value == 'all':
+        return list(SUBSYSTEMS)
+    names = [] if value in ('', 'none') else [n.strip() for n in value.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SUBSYSTEMS]
+    if unknown:
+        raise ValueError(f"unknown subsystem {', '.join(unknown)}; choose from {', '.join(SUBSYSTEMS)}")
+    return [n for n in SUBSYSTEMS if n in names]
+
+
+def parse_config(argv=None, defaults=None):
+    """Settings from ``argv``, then the environment, then ``defaults``, then ``DEFAULTS``."""
+    settings = dict(DEFAULTS, **(defaults or {}))
+    env = os.environ
+    parser = argparse.ArgumentParser(prog='python -m archsense', description='ArchSense API and frontend server')
+    parser.add_argument('--port', type=int, default=env.get('ARCHSENSE_PORT', env.get('PORT', settings['port'])),
+                        help='port to listen on (env ARCHSENSE_PORT or PORT; default %(default)s)')
+    parser.add_argument('--static-root', default=env.get('ARCHSENSE_STATIC_ROOT', settings['static_root']),
+                        help='built frontend directory, relative to the repository (env ARCHSENSE_STATIC_ROOT; '
+                             'default %(default)s)')
+    parser.add_argument('--workers', type=int, default=env.get('ARCHSENSE_WORKERS', settings['workers']),
+                        help='worker processes sharing the port (env ARCHSENSE_WORKERS; default %(default)s)')
+    parser.add_argument('--store', default=env.get('ARCHSENSE_STORE', settings['store']),
+                        help='SQLite database holding shared state (env ARCHSENSE_STORE; '
+                             'default with several workers: archsense-store.db)')
+    parser.add_argument('--shards', type=int, default=env.get('ARCHSENSE_SHARDS', settings['shards']),
+                        help='shard processes holding the records, partitioned by user (env ARCHSENSE_SHARDS; '
+                             'default %(default)s: no sharding)')
+    parser.add_argument('--subsystems', default=env.get('ARCHSENSE_SUBSYSTEMS', settings['subsystems']),
+                        help=f"comma-separated subset of {', '.join(SUBSYSTEMS)}, 'all' or 'none' "
+                             "(env ARCHSENSE_SUBSYSTEMS; default %(default)s)")
+    parser.add_argument('--preload', action='store_true', default=env.get('ARCHSENSE_PRELOAD', '') in ('1', 'true'),
+                        help='import the enabled subsystems before serving instead of on first use '
+                             '(env ARCHSENSE_PRELOAD=1)')
+    parser.add_argument('--access-log', default=env.get('ARCHSENSE_ACCESS_LOG', settings['access_log']),
+                        help="JSON-lines access log file, '-' for stderr or 'off' "
+                             "(env ARCHSENSE_ACCESS_LOG; default %(default)s)")
+    parser.add_argument('--access-log-sample', type=float,
+                        default=env.get('ARCHSENSE_ACCESS_LOG_SAMPLE', settings['access_log_sample']),
+                        help='share of requests logged; server errors always are '
+                             '(env ARCHSENSE_ACCESS_LOG_SAMPLE; default %(default)s)')
+    parser.add_argument('--memory-budget', type=float, default=env.get('ARCHSENSE_MEMORY_BUDGET',
+                                                                       settings['memory_budget']),
+                        help='RSS in MiB per process above which caches are shrunk '
+                             '(env ARCHSENSE_MEMORY_BUDGET; default %(default)s: no budget)')
+    parser.add_argument('--tracemalloc', type=int, default=env.get('ARCHSENSE_TRACEMALLOC', settings['tracemalloc']),
+                        metavar='FRAMES', help='trace allocations from the start, keeping FRAMES frames '
+                                               '(env ARCHSENSE_TRACEMALLOC; default %(default)s: off)')
+    parser.add_argument('--measure-startup', type=int, nargs='?', const=5, default=0, metavar='RUNS',
+                        help='start the server RUNS times (default 5) and report the time to first response')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # argparse only converts command-line values, not defaults taken from the environment
+    try:
+        args.port = int(args.port)
+        args.workers = max(int(args.workers), 1)
+        args.shards = max(int(args.shards), 0)
+        args.subsystems = parse_subsystems(args.subsystems)
+        args.access_log_sample = min(max(float(args.access_log_sample), 0.0), 1.0)
+        args.memory_budget = max(float(args.memory_budget), 0.0)
+        args.tracemalloc = max(int(args.tracemalloc), 0)
+    except ValueError as e:
+        parser.error(str(e))
+    args.static_root = os.path.join(ROOT, args.static_root)
+    if (args.workers > 1 or args.shards) and not args.store:
+        args.store = os.path.join(ROOT, 'archsense-store.db')
+    if args.store:
+        args.store = os.path.abspath(args.store)
+    if args.access_log not in ('-', 'off'):
+        args.access_log = os.path.abspath(args.access_log)
+    return args
+
+
+def server_args(settings, port):
+    """Command-line arguments that reproduce ``settings`` on ``port``."""
+    args = ['--port', str(port), '--static-root', settings.static_root, '--workers', str(settings.workers),
+            '--subsystems', ','.join(settings.subsystems) or 'none']
+    if settings.store:
+        args += ['--store', settings.store]
+    if settings.shards:
+        args += ['--shards', str(settings.shards)]
+    if settings.preload:
+        args.append('--preload')
+    args += ['--access-log', settings.access_log, '--access-log-sample', str(settings.access_log_sample)]
+    args += ['--memory-budget', str(settings.memory_budget), '--tracemalloc', str(settings.tracemalloc)]
+    return args
+
+
+def _first_response(url, process, data=None, timeout=60):
+    import urllib.error
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            with urllib.request.urlopen(url, data, timeout=timeout) as response:
+                response.read()
+            return time.perf_counter()
+        except (ConnectionError, urllib.error.URLError):
+            time.sleep(0.002)
+    raise RuntimeError(f'no response from {url} in {timeout} s')
+
+
+def measure_startup(settings, runs):
+    """Start the server ``runs`` times and print the time to first response.
+
+    Each run is a fresh interpreter, timed from just before it is spawned
+    to the end of its first ``/api/health`` response. With the layout
+    subsystem enabled the first layout generation is timed too, since a
+    lazy start defers the import cost to it.
+    """
+    # Only needed here, so kept out of the server's own start-up
+    import statistics
+    import subprocess
+    import tempfile
+
+    print(f"Measuring startup: subsystems {','.join(settings.subsystems) or 'none'}, "
+          f"{'preloaded' if settings.preload else 'lazy'}, {settings.workers} worker(s)")
+    results = []
+    for run in range(1, runs + 1):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        started = time.perf_counter()
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen([sys.executable, '-m', 'archsense', *server_args(settings, port)],
+                                   cwd=ROOT, stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            ready = _first_response(f'http://127.0.0.1:{port}/api/health', process)
+            result = {'first response': ready - started}
+            if 'layout' in settings.subsystems:
+                sent = time.perf_counter()
+                done = _first_response(f'http://127.0.0.1:{port}/api/layout/generate', process, b'{}')
+                result['first layout'] = done - sent
+        except RuntimeError:
+            log.seek(0)
+            sys.stderr.write(log.read().decode(errors='replace'))
+            raise
+        finally:
+            process.terminate()
+            process.wait()
+            log.close()
+        results.append(result)
+        print(f'run {run}: ' + ', '.join(f'{k} {v * 1000:.1f} ms' for k, v in result.items()), flush=True)
+    print('median: ' + ', '.join(f'{k} {statistics.median(r[k] for r in results) * 1000:.1f} ms'
+                                 for k in results[0]))
+    return results
+
+
+def main(argv=None, defaults=None):
+    settings = parse_config(argv, defaults)
+    if settings.measure_startup:
+        measure_startup(settings, settings.measure_startup)
+        return 0
+
+    # Workers are started as `python -m archsense`, which needs the repository on the path
+    os.chdir(ROOT)
+
+    shards = []
+    if settings.shards and not settings.worker:
+        shards = start_shards(settings.store + '.shards', settings.shards)
+        print(f"🧱 Shards: {settings.shards} processes in {settings.store}.shards")
+    try:
+        return serve(settings)
+    finally:
+        if shards:
+            stop_shards(shards)
+
+
+def serve(settings):
+    if settings.workers > 1 and not settings.worker:
+        from archsense.supervisor import Supervisor, worker_command
+        print(f"🚀 ARCHSENSE SERVER: {settings.workers} workers on http://localhost:{settings.port}")
+        print(f"🗄️  Shared store: {settings.store}")
+        print(f"🔁 Rolling restart: kill -HUP {os.getpid()}")
+        return Supervisor(worker_command(*server_args(settings, settings.port)), settings.workers).run()
+
+    configure(settings)
+    if settings.preload:
+        preload(settings.subsystems)
+
+    if settings.worker:
+        from archsense.supervisor import ReusePortServer, run_worker
+        run_worker(ReusePortServer(("", settings.port), Handler))
+        shutdown()
+        return 0
+
+    with ThreadingServer(("", settings.port), Handler) as httpd:
+        print("=" * 60)
+        print(f"🚀 ARCHSENSE SERVER RUNNING")
+        print(f"📍 URL: http://localhost:{settings.port}")
+        print(f"⚛️  Frontend: {settings.static_root}")
+        print(f"🔗 API: http://localhost:{settings.port}/api/health")
+        print(f"👤 Auth: Development mode (auto-authenticated)")
+        print(f"🧩 Subsystems: {', '.join(settings.subsystems) or 'none'}"
+              f" ({'preloaded' if settings.preload else 'loaded on first use'})")
+        print("=" * 60, flush=True)
+
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Server stopped")
+    shutdown()
+    return 0
+
+
+def shutdown():
+    """Checkpoint open collaboration sessions, write out the access log and stop the memory watchdog."""
+    if collab_sessions is not None:
+        collab_sessions.close()
+    if access_log is not None:
+        access_log.close()
+    if memory_watchdog is not None:
+        memory_watchdog.close()
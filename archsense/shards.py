@@ -0,0 +1,716 @@
+"""Tenant-sharded record stores.
+
+Records are partitioned by a hash of their owner's ``userId`` into
+``SLOTS`` fixed slots, and the slots are spread over shard processes.
+A slot is held by one shard at a time, in memory with its own lookup and
+search indexes, and persisted to its own SQLite file. Front workers reach
+the owning shard over a Unix socket; ``shards.json`` in the shard
+directory says which shard holds each slot.
+
+Rebalancing moves whole slots: the old owner releases the slot, which
+leaves its file complete on disk, the new owner opens it and the map is
+rewritten. A request that reaches a shard not holding its slot is
+answered "moved" and retried against the reloaded map, so a move only
+delays the tenants of that slot, for about the time it takes to load it.
+
+``python -m archsense.shards serve DIR INDEX`` runs a shard; the server
+starts them itself when given ``--shards``. ``rebalance DIR COUNT``
+spreads the slots over the running shards 0 to COUNT-1, and ``status
+DIR`` shows which shard holds what.
+"""
+import argparse
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sqlite3
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+
+from archsense.model import compact_record, to_json
+from archsense.store import KINDS, REVISION_KEYS
+
+SLOTS = 64
+MAP = 'shards.json'
+PAGE_SIZE = 500
+READY_TIMEOUT = 30.0
+RETRY_TIMEOUT = 10.0
+# Project owners a client remembers, and how long it remembers an unknown project id
+OWNER_CACHE_SIZE = 1 << 16
+MISS_TIMEOUT = 5.0
+_LENGTH = struct.Struct('>I')
+
+
+class ShardError(RuntimeError):
+    """A shard failed an operation or a slot stayed unavailable."""
+
+
+class SlotMoved(Exception):
+    """The shard does not hold the slot (any more)."""
+
+
+def slot_of(user_id):
+    """Slot of a tenant; stable across processes, unlike ``hash``."""
+    return zlib.crc32(str(user_id or '').encode()) % SLOTS
+
+
+def socket_path(directory, shard):
+    return os.path.join(directory, f'shard-{shard}.sock')
+
+
+def slot_path(directory, slot):
+    return os.path.join(directory, f'slot-{slot:02d}.db')
+
+
+def send(sock, message):
+    data = json.dumps(message, default=to_json).encode()
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def receive(file):
+    header = file.read(_LENGTH.size)
+    if len(header) < _LENGTH.size:
+        raise ConnectionResetError('shard connection closed')
+    (length,) = _LENGTH.unpack(header)
+    data = file.read(length)
+    if len(data) < length:
+        raise ConnectionResetError('shard connection closed')
+    return json.loads(data)
+
+
+class ShardMap:
+    """Which shard holds each slot, kept in ``shards.json``; ``version`` counts the moves."""
+
+    def __init__(self, directory, slots, version=0):
+        self.directory = directory
+        self.slots = list(slots)
+        self.version = version
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, MAP)) as f:
+            data = json.load(f)
+        return cls(directory, data['slots'], data['version'])
+
+    @classmethod
+    def create(cls, directory, shards):
+        """The map of a new directory, slots dealt round-robin; an existing map is loaded instead."""
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, MAP)):
+            return cls.load(directory)
+        shard_map = cls(directory, [slot % shards for slot in range(SLOTS)])
+        shard_map.save()
+        return shard_map
+
+    @property
+    def shards(self):
+        return max(self.slots) + 1
+
+    def held_by(self, shard):
+        return [slot for slot, owner in enumerate(self.slots) if owner == shard]
+
+    def save(self):
+        path = os.path.join(self.directory, MAP)
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'version': self.version, 'slots': self.slots}, f)
+        os.replace(temp, path)
+
+
+class Partition:
+    """The records of one slot, indexed in memory and persisted to the slot's SQLite file.
+
+    Each record is stored with its owner, the tenant it was routed by;
+    plans are owned by the user of their project. Revisions are counted in
+    memory per ``REVISION_KEYS`` value, under an epoch drawn when the slot
+    is loaded, so they start over safely when it moves.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS records (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'kind TEXT NOT NULL, id TEXT NOT NULL, owner TEXT, body TEXT NOT NULL, UNIQUE (kind, id))')
+        self.records = {kind: {} for kind in KINDS}
+        self.owners = {kind: {} for kind in KINDS}
+        self.by_owner = {kind: {} for kind in KINDS}
+        self.by_project = {}
+        self.search_index = None
+        self.closed = False
+        self.epoch = uuid.uuid4().hex[:8]
+        self.revisions = Counter()
+        self._lock = threading.Lock()
+        for kind, owner, body in self.db.execute('SELECT kind, owner, body FROM records ORDER BY seq'):
+            self._put(kind, owner, json.loads(body))
+
+    def _put(self, kind, owner, record):
+        if kind == 'plan':
+            record = compact_record(record)
+        record_id = record['id']
+        previous = self.records[kind].get(record_id)
+        self.records[kind][record_id] = record
+        if record_id not in self.owners[kind] or self.owners[kind][record_id] != owner:
+            if record_id in self.owners[kind]:
+                self.by_owner[kind][self.owners[kind][record_id]].pop(record_id, None)
+            self.owners[kind][record_id] = owner
+            self.by_owner[kind].setdefault(owner, {})[record_id] = None
+        if kind == 'plan':
+            if previous is not None and previous.get('projectId') != record.get('projectId'):
+                self.by_project[previous.get('projectId')].pop(record_id, None)
+            self.by_project.setdefault(record.get('projectId'), {})[record_id] = None
+        return record
+
+    def _check(self):
+        if self.closed:
+            raise SlotMoved()
+
+    def write(self, kind, owner, records):
+        """Insert or replace ``records`` by id, owned by ``owner``, in one transaction."""
+        rows = [(kind, r['id'], owner, json.dumps(r, default=to_json)) for r in records]
+        with self._lock:
+            self._check()
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.executemany('INSERT INTO records (kind, id, owner, body) VALUES (?, ?, ?, ?) '
+                                    'ON CONFLICT (kind, id) DO UPDATE SET owner = excluded.owner, body = excluded.body',
+                                    rows)
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+            for record in records:
+                record = self._put(kind, owner, record)
+                if kind in REVISION_KEYS:
+                    self.revisions[kind, record.get(REVISION_KEYS[kind])] += 1
+                if self.search_index is not None and kind != 'export':
+                    (self.search_index.add_project if kind == 'project' else self.search_index.add_plan)(record)
+
+    def select(self, kind, owner=None, fields=None):
+        """Records of ``kind``, of ``owner`` if given, whose ``fields`` equal the given values."""
+        fields = fields or {}
+        with self._lock:
+            self._check()
+            records, owners = self.records[kind], self.owners[kind]
+            # Narrow down with an index, then check every condition
+            if 'id' in fields:
+                ids = [fields['id']]
+            elif kind == 'plan' and 'projectId' in fields:
+                ids = list(self.by_project.get(fields['projectId'], ()))
+            elif owner is not None:
+                ids = list(self.by_owner[kind].get(owner, ()))
+            else:
+                ids = list(records)
+            return [records[i] for i in ids if i in records and (owner is None or owners[i] == owner)
+                    and all(records[i].get(k) == v for k, v in fields.items())]
+
+    def revision(self, kind, owner, value):
+        """Revision token of the ``kind`` records revised by ``value``; None if its project is not ``owner``'s."""
+        with self._lock:
+            self._check()
+            # Both revision keys name a project
+            if owner is not None and self.owners['project'].get(value) != owner:
+                return None
+            return f'{self.epoch}-{self.revisions[kind, value]}'
+
+    def count(self, kind, owner=None):
+        with self._lock:
+            self._check()
+            return len(self.records[kind] if owner is None else self.by_owner[kind].get(owner, ()))
+
+    def scan(self, kind, offset, limit):
+        """Records of ``kind`` from position ``offset`` on, at most ``limit``."""
+        with self._lock:
+            self._check()
+            return list(itertools.islice(self.records[kind].values(), offset, offset + limit))
+
+    def search(self, params):
+        """``SearchIndex.search`` over this slot's projects; the index is built on first use."""
+        with self._lock:
+            self._check()
+            if self.search_index is None:
+                from archsense.search import SearchIndex
+                from archsense.store import MemoryRecords
+
+                index = SearchIndex()
+                index.sync(MemoryRecords(), MemoryRecords())
+                for project in self.records['project'].values():
+                    index.add_project(project)
+                for plan in self.records['plan'].values():
+                    index.add_plan(plan)
+                self.search_index = index
+            index = self.search_index
+        return index.search(**params)
+
+    def close(self):
+        """Stop serving the slot; writes in progress finish first."""
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self.db.close()
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    # One front worker thread; requests and replies alternate until it hangs up
+    def handle(self):
+        while True:
+            try:
+                message = receive(self.rfile)
+            except OSError:
+                return
+            try:
+                reply = {'result': self.server.dispatch(message)}
+            except SlotMoved:
+                reply = {'moved': True}
+            except Exception as e:
+                reply = {'error': str(e), 'type': type(e).__name__}
+            send(self.connection, reply)
+
+
+class ShardServer(socketserver.ThreadingUnixStreamServer):
+    """Serves the slots shard ``shard`` holds in ``directory``, taking them from the map at start.
+
+    With ``parent`` the shard stops when that process is gone, so shards
+    started by a server do not outlive it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory, shard, parent=None):
+        self.directory = directory
+        self.shard = shard
+        self.parent = parent
+        self.partitions = {}
+        self._lock = threading.Lock()
+        for slot in ShardMap.load(directory).held_by(shard):
+            self.acquire(slot)
+        path = socket_path(directory, shard)
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, _Connection)
+
+    def acquire(self, slot):
+        with self._lock:
+            if slot not in self.partitions:
+                self.partitions[slot] = Partition(slot_path(self.directory, slot))
+
+    def release(self, slot):
+        with self._lock:
+            partition = self.partitions.pop(slot, None)
+        if partition is not None:
+            partition.close()
+
+    def partition(self, slot):
+        partition = self.partitions.get(slot)
+        if partition is None:
+            raise SlotMoved()
+        return partition
+
+    def dispatch(self, message):
+        op = message['op']
+        if op == 'ping':
+            return {'shard': self.shard, 'pid': os.getpid(), 'slots': sorted(self.partitions)}
+        if op == 'status':
+            return {slot: {kind: p.count(kind) for kind in KINDS} for slot, p in sorted(self.partitions.items())}
+        if op == 'acquire':
+            return self.acquire(message['slot'])
+        if op == 'release':
+            return self.release(message['slot'])
+        partition = self.partition(message['slot'])
+        if op == 'select':
+            return partition.select(message['kind'], message.get('owner'), message.get('fields'))
+        if op == 'write':
+            return partition.write(message['kind'], message.get('owner'), message['records'])
+        if op == 'count':
+            return partition.count(message['kind'], message.get('owner'))
+        if op == 'revision':
+            return partition.revision(message['kind'], message.get('owner'), message['value'])
+        if op == 'scan':
+            return partition.scan(message['kind'], message['offset'], message['limit'])
+        if op == 'search':
+            return partition.search(message['params'])
+        raise ValueError(f'unknown shard operation {op!r}')
+
+    def service_actions(self):
+        if self.parent is not None and os.getppid() != self.parent:
+            self.parent = None
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def server_close(self):
+        super().server_close()
+        for slot in list(self.partitions):
+            self.release(slot)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class ShardClient:
+    """Routes operations to the shard holding a slot, following the map as slots move.
+
+    Connections are opened lazily per process and thread, like the SQLite
+    stores', so a client can be created before workers fork.
+    """
+
+    def __init__(self, directory, retry_timeout=RETRY_TIMEOUT):
+        self.directory = directory
+        self.retry_timeout = retry_timeout
+        self.map = ShardMap.load(directory)
+        # Owners of projects seen, so plans can be routed by their projectId, least recent first
+        self.owners = OrderedDict()
+        # Unknown project ids and when to stop taking them as unknown
+        self._misses = {}
+        self._owners_lock = threading.Lock()
+        self._local = threading.local()
+
+    def reload(self):
+        """Pick up the map as rewritten by a rebalance."""
+        shard_map = ShardMap.load(self.directory)
+        if shard_map.version != self.map.version:
+            self.map = shard_map
+
+    def _connections(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connections, local.pid = {}, os.getpid()
+        return local.connections
+
+    def call(self, shard, message):
+        """Send ``message`` to ``shard`` and return its reply; OSError if the shard cannot be reached."""
+        connections = self._connections()
+        if shard not in connections:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(socket_path(self.directory, shard))
+            except OSError:
+                sock.close()
+                raise
+            connections[shard] = (sock, sock.makefile('rb'))
+        sock, file = connections[shard]
+        try:
+            send(sock, message)
+            reply = receive(file)
+        except OSError:
+            del connections[shard]
+            sock.close()
+            raise
+        if 'error' in reply:
+            raise (ValueError if reply.get('type') == 'ValueError' else ShardError)(reply['error'])
+        return reply
+
+    def route(self, slot, message):
+        """Result of ``message`` from the shard holding ``slot``, waiting out moves and restarts."""
+        message = dict(message, slot=slot)
+        deadline = None
+        while True:
+            try:
+                reply = self.call(self.map.slots[slot], message)
+                if not reply.get('moved'):
+                    return reply['result']
+            except OSError:
+                pass
+            # Requests are reads or upserts by id, so sending one again is harmless
+            now = time.monotonic()
+            deadline = deadline or now + self.retry_timeout
+            if now > deadline:
+                raise ShardError(f'slot {slot} is unavailable')
+            time.sleep(0.005)
+            self.reload()
+
+    def remember(self, kind, records):
+        if kind == 'project':
+            with self._owners_lock:
+                for record in records:
+                    self.owners[record['id']] = record.get('userId')
+                    self.owners.move_to_end(record['id'])
+                    self._misses.pop(record['id'], None)
+                while len(self.owners) > OWNER_CACHE_SIZE:
+                    self.owners.popitem(last=False)
+
+    def owner(self, project_id):
+        """userId of a project, asking every slot if it has not been seen.
+
+        A project no slot holds is taken as unknown for ``MISS_TIMEOUT``
+        seconds, unless it is created in the meantime.
+        """
+        if project_id is None:
+            return None
+        now = time.monotonic()
+        with self._owners_lock:
+            if project_id in self.owners:
+                self.owners.move_to_end(project_id)
+                return self.owners[project_id]
+            if self._misses.get(project_id, 0) > now:
+                return None
+        for slot in range(SLOTS):
+            found = self.route(slot, {'op': 'select', 'kind': 'project', 'fields': {'id': project_id}})
+            if found:
+                self.remember('project', found)
+                return found[0].get('userId')
+        with self._owners_lock:
+            if len(self._misses) >= OWNER_CACHE_SIZE:
+                self._misses = {key: until for key, until in self._misses.items() if until > now}
+            if len(self._misses) < OWNER_CACHE_SIZE:
+                self._misses[project_id] = now + MISS_TIMEOUT
+        return None
+
+
+class TenantRecords:
+    """One user's records of one kind, held by their shard; list-like, like the other stores."""
+
+    def __init__(self, client, kind, user_id):
+        self.client = client
+        self.kind = kind
+        self.user_id = user_id
+        self.slot = slot_of(user_id)
+
+    def _route(self, op, **args):
+        return self.client.route(self.slot, dict(args, op=op, kind=self.kind, owner=self.user_id))
+
+    def select(self, **fields):
+        """Records whose ``fields`` equal the given values, looked up by the shard's indexes."""
+        records = self._route('select', fields=fields)
+        self.client.remember(self.kind, records)
+        return records
+
+    def __iter__(self):
+        return iter(self.select())
+
+    def __len__(self):
+        return self._route('count')
+
+    def revision(self, value):
+        """Revision token of the records revised by ``value``, or None if that is not the user's project."""
+        return self._route('revision', value=value)
+
+    def tail(self, start):
+        return iter(self.select()[start:])
+
+    def append(self, record):
+        self.upsert([record])
+
+    def upsert(self, records):
+        records = list(records)
+        self._route('write', records=records)
+        self.client.remember(self.kind, records)
+
+    def search(self, text='', filters=None, rooms=None, ranges=None, sort='recent', offset=0, limit=20, facets=True):
+        """``SearchIndex.search`` run by the user's shard over the projects of their slot."""
+        params = {'text': text, 'filters': filters, 'rooms': rooms, 'ranges': ranges, 'sort': sort,
+                  'offset': offset, 'limit': limit, 'facets': facets}
+        return self.client.route(self.slot, {'op': 'search', 'params': params})
+
+
+class ShardedRecords:
+    """Records of one kind across every tenant, for bulk export and import and public share links.
+
+    Writes are routed record by record to the owner's slot; reads go to
+    one slot when the owner is known from the fields and to all of them
+    otherwise. Iteration runs slot by slot, so bulk export offsets only
+    hold while nothing is written.
+    """
+
+    def __init__(self, client, kind):
+        self.client = client
+        self.kind = kind
+
+    def _owner(self, record):
+        if self.kind == 'plan':
+            return self.client.owner(record.get('projectId'))
+        return record.get('userId')
+
+    def _slots(self, fields):
+        if self.kind != 'plan' and 'userId' in fields:
+            return [slot_of(fields['userId'])]
+        if self.kind == 'plan' and 'projectId' in fields:
+            return [slot_of(self.client.owner(fields['projectId']))]
+        return range(SLOTS)
+
+    def select(self, **fields):
+        """Records whose ``fields`` equal the given values."""
+        records = []
+        for slot in self._slots(fields):
+            records += self.client.route(slot, {'op': 'select', 'kind': self.kind, 'fields': fields})
+        self.client.remember(self.kind, records)
+        return records
+
+    def __iter__(self):
+        for slot in range(SLOTS):
+            for offset in itertools.count(0, PAGE_SIZE):
+                page = self.client.route(slot, {'op': 'scan', 'kind': self.kind, 'offset': offset, 'limit': PAGE_SIZE})
+                yield from page
+                if len(page) < PAGE_SIZE:
+                    break
+
+    def __len__(self):
+        return sum(self.client.route(slot, {'op': 'count', 'kind': self.kind}) for slot in range(SLOTS))
+
+    def tail(self, start):
+        return itertools.islice(self, start, None)
+
+    def append(self, record):
+        self.upsert([record])
+
+    def upsert(self, records):
+        """Insert or replace records by id; one write per owner."""
+        records = list(records)
+        self.client.remember(self.kind, records)
+        groups = {}
+        for record in records:
+            groups.setdefault(self._owner(record), []).append(record)
+        for owner, group in groups.items():
+            self.client.route(slot_of(owner), {'op': 'write', 'kind': self.kind, 'owner': owner, 'records': group})
+
+
+def open_sharded_stores(directory):
+    """Project, plan and export stores across the shards of ``directory``, and their client."""
+    client = ShardClient(directory)
+    return {kind: ShardedRecords(client, kind) for kind in KINDS}, client
+
+
+def wait_ready(directory, shards, processes=(), timeout=READY_TIMEOUT):
+    """Wait until shards 0 to ``shards``-1 answer; RuntimeError if one of ``processes`` exits first."""
+    client = ShardClient(directory)
+    deadline = time.monotonic() + timeout
+    for shard in range(shards):
+        while True:
+            try:
+                client.call(shard, {'op': 'ping'})
+                break
+            except OSError:
+                exited = [p for p in processes if p.poll() is not None]
+                if exited:
+                    raise RuntimeError(f'shard process exited with {exited[0].returncode}')
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'shard {shard} did not start in {timeout:.0f} s')
+                time.sleep(0.02)
+
+
+def rebalance(directory, shards):
+    """Spread the slots evenly over shards 0 to ``shards``-1, moving as few as possible.
+
+    The target shards must be running. A source shard that is not running
+    has nothing open, so its slots are simply taken over. Returns the
+    moves as ``(slot, from, to)``.
+    """
+    shard_map = ShardMap.load(directory)
+    client = ShardClient(directory)
+    for shard in range(shards):
+        try:
+            client.call(shard, {'op': 'ping'})
+        except OSError:
+            raise ShardError(f'shard {shard} is not running') from None
+    quota = [SLOTS // shards + (shard < SLOTS % shards) for shard in range(shards)]
+    held = [0] * shards
+    moving = []
+    for slot, owner in enumerate(shard_map.slots):
+        if owner < shards and held[owner] < quota[owner]:
+            held[owner] += 1
+        else:
+            moving.append(slot)
+    moves = []
+    for slot in moving:
+        target = min(range(shards), key=lambda shard: held[shard] - quota[shard])
+        held[target] += 1
+        source = shard_map.slots[slot]
+        try:
+            client.call(source, {'op': 'release', 'slot': slot})
+        except OSError:
+            pass
+        client.call(target, {'op': 'acquire', 'slot': slot})
+        # One map write per slot, so each slot is unavailable only for its own move
+        shard_map.slots[slot] = target
+        shard_map.version += 1
+        shard_map.save()
+        moves.append((slot, source, target))
+    return moves
+
+
+def start_shards(directory, shards):
+    """Start shard processes 0 to ``shards``-1 for ``directory``, rebalancing if the map has another count.
+
+    The shards stop when the calling process exits.
+    """
+    shard_map = ShardMap.create(directory, shards)
+    processes = [subprocess.Popen([sys.executable, '-m', 'archsense.shards', 'serve', directory, str(shard),
+                                   '--parent', str(os.getpid())])
+                 for shard in range(shards)]
+    try:
+        wait_ready(directory, shards, processes)
+        if any(owner >= shards for owner in shard_map.slots) or shard_map.shards < shards:
+            moves = rebalance(directory, shards)
+            print(f'[shards] rebalanced over {shards} shards: {len(moves)} of {SLOTS} slots moved', flush=True)
+    except BaseException:
+        stop_shards(processes)
+        raise
+    return processes
+
+
+def stop_shards(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def serve(directory, shard, parent=None):
+    server = ShardServer(directory, shard, parent)
+    signal.signal(signal.SIGINT, signal.SIG_IGN if parent else signal.default_int_handler)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m archsense.shards', description='Tenant-sharded record stores')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('serve', help='run one shard')
+    command.add_argument('directory')
+    command.add_argument('shard', type=int)
+    command.add_argument('--parent', type=int, help='stop when this process is gone')
+    command = commands.add_parser('rebalance', help='spread the slots over the running shards 0 to COUNT-1')
+    command.add_argument('directory')
+    command.add_argument('count', type=int)
+    command = commands.add_parser('status', help='show which shard holds which slots')
+    command.add_argument('directory')
+    args = parser.parse_args(argv)
+    directory = os.path.abspath(args.directory)
+
+    if args.command == 'serve':
+        serve(directory, args.shard, args.parent)
+    elif args.command == 'rebalance':
+        if args.count < 1:
+            parser.error('count must be at least 1')
+        moves = rebalance(directory, args.count)
+        for slot, source, target in moves:
+            print(f'slot {slot}: shard {source} -> {target}')
+        print(f'{len(moves)} slots moved; map version {ShardMap.load(directory).version}')
+    else:
+        shard_map = ShardMap.load(directory)
+        client = ShardClient(directory)
+        print(f'map version {shard_map.version}, {SLOTS} slots')
+        for shard in range(shard_map.shards):
+            try:
+                status = client.call(shard, {'op': 'status'})['result']
+            except OSError:
+                print(f'shard {shard}: not running, holds slots {shard_map.held_by(shard)}')
+                continue
+            totals = {kind: sum(counts[kind] for counts in status.values()) for kind in KINDS}
+            print(f"shard {shard}: {len(status)} slots, " + ', '.join(f'{n} {kind}s' for kind, n in totals.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Pre-rendered public share pages for published projects.
+
+Publishing a project pins its latest plan version and renders a snapshot
+of it once: a self-contained viewer page with the plan drawn inline as
+SVG, the plan JSON and a PNG preview for link unfurls. Share hits are
+then answered from the stored bytes, with a strong ETag per asset and a
+Cache-Control that lets browsers and CDNs absorb most of a traffic spike.
+
+A snapshot is replaced whole, so a request sees either the old published
+version or the new one. With a ``directory`` every snapshot is also one
+file, written then renamed into place; other worker processes notice the
+new file on their next hit to that slug.
+"""
+import hashlib
+import html
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from archsense.model import plan_body, to_json
+from archsense.thumbnails import render, render_svg, scene
+
+PREFIX = '/share/'
+PAGE = 'index.html'
+CACHE_CONTROL = 'public, max-age=60, s-maxage=300, stale-while-revalidate=600'
+PREVIEW_SIZE = 'large'
+VIEWER_SIZE = (960, 720)
+
+Asset = namedtuple('Asset', ('content_type', 'etag', 'body'))
+Snapshot = namedtuple('Snapshot', ('slug', 'projectId', 'planId', 'version', 'assets'))
+
+
+def _asset(content_type, body):
+    return Asset(content_type, '"' + hashlib.sha256(body).hexdigest()[:32] + '"', body)
+
+
+def _viewer(project, plan, body, svg, base):
+    name = html.escape(str(project.get('name') or 'Shared design'))
+    rooms = ''.join(
+        f'<li>{html.escape(str(room.get("type", "room")).title())}'
+        f'<span>{room.get("area", room.get("width", 0) * room.get("depth", 0) / 1e6):.1f} m²</span></li>'
+        for room in body.get('rooms', []) if room.get('floor', 0) == 0)
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{name} · ArchSense</title>
+    <meta property="og:title" content="{name}">
+    <meta property="og:type" content="website">
+    <meta property="og:image" content="{base}preview.png">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; background: #f6f7fb; color: #222; }}
+        header {{ padding: 1rem 2rem; background: #667eea; color: white; }}
+        main {{ display: flex; flex-wrap: wrap; gap: 2rem; padding: 2rem; }}
+        figure {{ margin: 0; background: white; border-radius: 8px; padding: 1rem; }}
+        figure svg {{ max-width: 100%; height: auto; }}
+        ul {{ list-style: none; padding: 0; min-width: 220px; }}
+        li {{ display: flex; justify-content: space-between; padding: 0.4rem 0; border-bottom: 1px solid #ddd; }}
+    </style>
+</head>
+<body>
+    <header><h1>{name}</h1><p>Version {int(plan.get('version', 0))}</p></header>
+    <main>
+        <figure>{svg.decode()}</figure>
+        <section>
+            <h2>Rooms</h2>
+            <ul>{rooms}</ul>
+            <p><a href="{base}plan.json">Plan data (JSON)</a></p>
+        </section>
+    </main>
+</body>
+</html>
+'''.encode()
+
+
+def build(project, plan):
+    """Snapshot of a published project's plan version."""
+    slug = project['shareSlug']
+    body = plan_body(plan)
+    primitives = scene(body)
+    base = f'{PREFIX}{slug}/'
+    data = {
+        'projectId': project['id'],
+        'name': project.get('name'),
+        'planId': plan['id'],
+        'version': plan.get('version', 0),
+        'plan': body
+    }
+    assets = {
+        PAGE: _asset('text/html; charset=utf-8', _viewer(project, plan, body, render_svg(primitives, *VIEWER_SIZE), base)),
+        'plan.json': _asset('application/json', json.dumps(data, default=to_json).encode()),
+        'preview.png': _asset('image/png', render(primitives, PREVIEW_SIZE, 'png'))
+    }
+    return Snapshot(slug, project['id'], plan['id'], plan.get('version', 0), assets)
+
+
+def _encode(snapshot):
+    names = list(snapshot.assets)
+    header = {
+        'slug': snapshot.slug,
+        'projectId': snapshot.projectId,
+        'planId': snapshot.planId,
+        'version': snapshot.version,
+        'assets': [[n, snapshot.assets[n].content_type, snapshot.assets[n].etag, len(snapshot.assets[n].body)]
+                   for n in names]
+    }
+    return b''.join([json.dumps(header).encode(), b'\n'] + [snapshot.assets[n].body for n in names])
+
+
+def _decode(data):
+    end = data.index(b'\n')
+    header = json.loads(data[:end])
+    assets, offset = {}, end + 1
+    for name, content_type, etag, length in header['assets']:
+        assets[name] = Asset(content_type, etag, data[offset:offset + length])
+        offset += length
+    return Snapshot(header['slug'], header['projectId'], header['planId'], header['version'], assets)
+
+
+class ShareCache:
+    """Snapshots by slug: an LRU of ``maxsize`` in memory, backed by ``directory`` if given.
+
+    ``get_or_build`` and ``remove`` are serialised, so a snapshot being
+    built from a project that is unpublished meanwhile cannot outlive the
+    unpublish.
+    """
+
+    def __init__(self, maxsize=1024, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.built = 0
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _path(self, slug):
+        return os.path.join(self.directory, hashlib.sha256(slug.encode()).hexdigest() + '.snapshot')
+
+    def _stamp(self, slug):
+        try:
+            stat = os.stat(self._path(slug))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _remember(self, snapshot, stamp):
+        with self._lock:
+            self._snapshots[snapshot.slug] = (snapshot, stamp)
+            self._snapshots.move_to_end(snapshot.slug)
+            while len(self._snapshots) > self.maxsize:
+                self._snapshots.popitem(last=False)
+
+    def get(self, slug):
+        """Current snapshot for ``slug``, or None."""
+        with self._lock:
+            entry = self._snapshots.get(slug)
+            if entry is not None:
+                self._snapshots.move_to_end(slug)
+        if not self.directory:
+            return entry[0] if entry else None
+        # The file is the source of truth across processes; a stat is enough to revalidate
+        stamp = self._stamp(slug)
+        if stamp is None:
+            if entry is not None:
+                with self._lock:
+                    self._snapshots.pop(slug, None)
+            return None
+        if entry is not None and entry[1] == stamp:
+            return entry[0]
+        try:
+            with open(self._path(slug), 'rb') as f:
+                snapshot = _decode(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+        self._remember(snapshot, stamp)
+        return snapshot
+
+    def put(self, snapshot):
+        """Make ``snapshot`` the one served for its slug."""
+        stamp = None
+        if self.directory:
+            path = self._path(snapshot.slug)
+            temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp, 'wb') as f:
+                f.write(_encode(snapshot))
+            os.replace(temp, path)
+            stamp = self._stamp(snapshot.slug)
+        with self._lock:
+            self.built += 1
+        self._remember(snapshot, stamp)
+
+    def get_or_build(self, slug, build):
+        """Cached snapshot, or ``build()`` stored; ``build`` returns None for unknown slugs."""
+        snapshot = self.get(slug)
+        if snapshot is not None:
+            return snapshot
+        # One build per slug even when a cold link is hit by many requests at once
+        with self._build_lock:
+            snapshot = self.get(slug)
+            if snapshot is None:
+                snapshot = build()
+                if snapshot is not None:
+                    self.put(snapshot)
+        return snapshot
+
+    def publish(self, build):
+        """Build and store a snapshot with other builds and removals held off."""
+        with self._build_lock:
+            snapshot = build()
+            self.put(snapshot)
+        return snapshot
+
+    def remove(self, slug):
+        with self._build_lock:
+            with self._lock:
+                self._snapshots.pop(slug, None)
+            if self.directory:
+                try:
+                    os.remove(self._path(slug))
+                except FileNotFoundError:
+                    pass
+
+    def shrink(self, keep):
+        """Drop least recently used snapshots until at most ``keep`` are left; returns how many went."""
+        with self._lock:
+            dropped = max(len(self._snapshots) - keep, 0)
+            for _ in range(dropped):
+                self._snapshots.popitem(last=False)
+        return dropped
+
+    def __len__(self):
+        return len(self._snapshots)
+
+
+class SlugIndex:
+    """Share slug to project id for public projects.
+
+    Kept up to date by publish and unpublish in this process; an unknown
+    slug rescans the project store, at most once per ``min_interval``
+    seconds, to pick up projects published elsewhere or imported.
+    """
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._ids = {}
+        self._scanned = None
+        self._lock = threading.Lock()
+
+    def scan(self, projects):
+        ids = {p['shareSlug']: p['id'] for p in projects if p.get('isPublic') and p.get('shareSlug')}
+        with self._lock:
+            self._ids = ids
+            self._scanned = time.monotonic()
+
+    def resolve(self, slug, projects):
+        project_id = self._ids.get(slug)
+        if project_id is None and (self._scanned is None or time.monotonic() - self._scanned >= self.min_interval):
+            self.scan(projects)
+            project_id = self._ids.get(slug)
+        return project_id
+
+    def set(self, slug, project_id):
+        with self._lock:
+            self._ids[slug] = project_id
+
+    def discard(self, slug):
+        with self._lock:
+            self._ids.pop(slug, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._scanned = None
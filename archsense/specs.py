@@ -0,0 +1,21 @@
+"""Room-type specifications shared by layout generation and analysis."""
+
+# Minimum area in m², default footprint and ceiling height in mm
+ROOM_SPECS = {
+    'bedroom': {
+        'min_area': 10, 'width': 3500, 'depth': 3000, 'height': 2800,
+        'color': 0xe8f4fd, 'floor_color': 0xf0f8ff
+    },
+    'bathroom': {
+        'min_area': 3, 'width': 2000, 'depth': 2000, 'height': 2600,
+        'color': 0xf0f8ff, 'floor_color': 0xe6f3ff
+    },
+    'kitchen': {
+        'min_area': 7, 'width': 4000, 'depth': 2500, 'height': 2800,
+        'color': 0xfff8dc, 'floor_color': 0xfff5e6
+    },
+    'living': {
+        'min_area': 14, 'width': 5000, 'depth': 3500, 'height': 3000,
+        'color': 0xf5f5dc, 'floor_color': 0xf0f0e6
+    }
+}
@@ -0,0 +1,234 @@
+"""Record stores for projects, plans and exports.
+
+By default the server keeps records in in-process lists, with plan bodies
+held as compact elements (see ``archsense.model``). When several
+worker processes serve the same port they share state through a SQLite
+database instead: each store is a table of JSON records that behaves like
+the list it replaces (append, index, iterate, clear), so handlers do not
+care which one they are given. The database runs in WAL mode, so readers
+in one worker never block writers in another. Tenant-sharded stores (see
+``archsense.shards``) offer the same interface.
+
+Projects and plans also keep a revision per resource, changed by every
+write to it: per project for the project record and per project for its
+plans (``REVISION_KEYS``). ``revision(value)`` is a short token, made
+unique across processes and databases by an epoch, from which the server
+derives ETags without loading the records.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from collections.abc import MutableSequence
+
+from archsense.model import compact_record
+
+KINDS = ('project', 'plan', 'export')
+# Field whose value names the resource a record's writes revise
+REVISION_KEYS = {'project': 'id', 'plan': 'projectId'}
+
+
+class MemoryRecords(list):
+    """In-process records: a list with ``upsert`` by id.
+
+    ``compact`` converts each record as it is added; it must return a new
+    record rather than change the caller's. With ``revision_key`` writes
+    count revisions per value of that field.
+    """
+
+    def __init__(self, records=(), compact=None, revision_key=None):
+        self.compact = compact
+        self.revision_key = revision_key
+        super().__init__(map(compact, records) if compact else records)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._indexed = 0
+        # The counters start over with the process, the epoch tells them apart
+        self._epoch = uuid.uuid4().hex[:8]
+        self._revisions = Counter(r.get(revision_key) for r in self) if revision_key else Counter()
+
+    def append(self, record):
+        record = self.compact(record) if self.compact else record
+        # Request threads append while others upsert
+        with self._lock:
+            super().append(record)
+            if self.revision_key:
+                self._revisions[record.get(self.revision_key)] += 1
+
+    def revision(self, value):
+        """Token that changes with every write to the records whose revision key is ``value``."""
+        return f'{self._epoch}-{self._revisions[value]}'
+
+    def tail(self, start):
+        """Records from position ``start`` on."""
+        return itertools.islice(self, start, None)
+
+    def select(self, **fields):
+        """Records whose ``fields`` equal the given values."""
+        return [r for r in self if all(r.get(k) == v for k, v in fields.items())]
+
+    def upsert(self, records):
+        """Replace records with the same id in place, append the rest, all at once."""
+        if self.compact:
+            records = [self.compact(r) for r in records]
+        with self._lock:
+            # The index only ever needs extending: records are appended, not removed
+            if self._indexed > len(self):
+                self._index, self._indexed = {}, 0
+            for i in range(self._indexed, len(self)):
+                self._index[self[i].get('id')] = i
+            for record in records:
+                position = self._index.get(record['id'])
+                if position is None:
+                    self._index[record['id']] = len(self)
+                    super().append(record)
+                else:
+                    self[position] = record
+                if self.revision_key:
+                    self._revisions[record.get(self.revision_key)] += 1
+            self._indexed = len(self)
+
+
+class SqliteRecords(MutableSequence):
+    """Records of one kind in a SQLite table, in insertion order.
+
+    Connections are opened lazily per process and thread, so instances can
+    be created before workers fork or start threads. With ``revision_key``
+    a second table counts revisions, updated in the transaction of the
+    write, so every worker sees them.
+    """
+
+    def __init__(self, path, table, revision_key=None):
+        self.path = path
+        self.table = table
+        self.revision_key = revision_key
+        self._local = threading.local()
+
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(f'CREATE TABLE IF NOT EXISTS {self.table} '
+                       '(seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, body TEXT NOT NULL)')
+            if self.revision_key:
+                if self.revision_key != 'id':
+                    # The expression matches the one select() writes, so lookups by the key use it
+                    db.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_by_{self.revision_key} '
+                               f"ON {self.table} (json_extract(body, '$.{self.revision_key}'))")
+                db.execute(f'CREATE TABLE IF NOT EXISTS {self.table}_revisions '
+                           '(key TEXT PRIMARY KEY, revision INTEGER NOT NULL)')
+                # The epoch row under the empty key is set once, when the database is created
+                db.execute(f'INSERT OR IGNORE INTO {self.table}_revisions VALUES (?, ?)',
+                           ('', uuid.uuid4().int & 0xffffffff))
+                local.epoch = '%08x' % db.execute(f"SELECT revision FROM {self.table}_revisions WHERE key = ''"
+                                                  ).fetchone()[0]
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _revise(self, db, records):
+        if self.revision_key:
+            db.executemany(f'INSERT INTO {self.table}_revisions VALUES (?, 1) '
+                           'ON CONFLICT (key) DO UPDATE SET revision = revision + 1',
+                           [(str(r.get(self.revision_key)),) for r in records])
+
+    def revision(self, value):
+        """Token that changes with every write to the records whose revision key is ``value``."""
+        db = self._db()
+        row = db.execute(f'SELECT revision FROM {self.table}_revisions WHERE key = ?', (str(value),)).fetchone()
+        return f'{self._local.epoch}-{row[0] if row else 0}'
+
+    def _seq(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('record index out of range')
+        return self._db().execute(f'SELECT seq FROM {self.table} ORDER BY seq LIMIT 1 OFFSET ?', (index,)).fetchone()[0]
+
+    def __len__(self):
+        return self._db().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def __iter__(self):
+        for (body,) in self._db().execute(f'SELECT body FROM {self.table} ORDER BY seq'):
+            yield json.loads(body)
+
+    def tail(self, start):
+        """Records from position ``start`` on, without decoding the ones before."""
+        query = f'SELECT body FROM {self.table} ORDER BY seq LIMIT -1 OFFSET ?'
+        for (body,) in self._db().execute(query, (start,)):
+            yield json.loads(body)
+
+    def select(self, **fields):
+        """Records whose ``fields`` equal the given values; string values are matched by SQLite first."""
+        where, params = [], []
+        for key, value in fields.items():
+            if isinstance(value, str) and key.isidentifier():
+                where.append('id = ?' if key == 'id' else f"json_extract(body, '$.{key}') = ?")
+                params.append(value)
+        query = f"SELECT body FROM {self.table} {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY seq"
+        records = (json.loads(body) for (body,) in self._db().execute(query, params))
+        return [r for r in records if all(r.get(k) == v for k, v in fields.items())]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        row = self._db().execute(f'SELECT body FROM {self.table} WHERE seq = ?', (self._seq(index),)).fetchone()
+        return json.loads(row[0])
+
+    def __setitem__(self, index, record):
+        self._db().execute(f'UPDATE {self.table} SET id = ?, body = ? WHERE seq = ?',
+                           (record.get('id'), json.dumps(record), self._seq(index)))
+
+    def __delitem__(self, index):
+        self._db().execute(f'DELETE FROM {self.table} WHERE seq = ?', (self._seq(index),))
+
+    def insert(self, index, record):
+        if index < len(self):
+            raise ValueError('records can only be appended')
+        self.append(record)
+
+    def append(self, record):
+        if not self.revision_key:
+            self._db().execute(f'INSERT INTO {self.table} (id, body) VALUES (?, ?)',
+                               (record.get('id'), json.dumps(record)))
+            return
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(f'INSERT INTO {self.table} (id, body) VALUES (?, ?)', (record.get('id'), json.dumps(record)))
+            self._revise(db, [record])
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def clear(self):
+        self._db().execute(f'DELETE FROM {self.table}')
+
+    def upsert(self, records):
+        """Insert or replace records by id in a single transaction."""
+        records = list(records)
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(f'INSERT INTO {self.table} (id, body) VALUES (?, ?) '
+                           'ON CONFLICT(id) DO UPDATE SET body = excluded.body',
+                           [(r['id'], json.dumps(r)) for r in records])
+            self._revise(db, records)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+
+def open_stores(path=None):
+    """Project, plan and export stores; in memory unless a database path is given."""
+    if path is None:
+        return {kind: MemoryRecords(compact=compact_record if kind == 'plan' else None,
+                                    revision_key=REVISION_KEYS.get(kind)) for kind in KINDS}
+    return {kind: SqliteRecords(path, f'{kind}s', REVISION_KEYS.get(kind)) for kind in KINDS}
@@ -0,0 +1,205 @@
+"""Pre-forked worker processes sharing one port.
+
+The supervisor starts N copies of a worker command. Each worker binds its
+own listening socket with SO_REUSEPORT, so the kernel spreads incoming
+connections across them and every worker runs on its own core. Within a
+worker each connection is handled in its own thread. Workers
+report liveness over a shared heartbeat pipe from their serve loop; the
+supervisor respawns workers that exit or stop beating.
+
+SIGHUP restarts the workers one at a time: a replacement is started and
+must send its first heartbeat before the old worker is told to stop.
+A stopping worker finishes its in-flight requests, serves whatever is
+still queued on its socket and only then closes it, so no connection is
+dropped. SIGTERM or SIGINT stop all workers the same way.
+"""
+import os
+import select
+import signal
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+HEARTBEAT_ENV = 'ARCHSENSE_HEARTBEAT_FD'
+HEARTBEAT_INTERVAL = 1.0
+HEARTBEAT_TIMEOUT = 30.0
+READY_TIMEOUT = 30.0
+DRAIN_TIMEOUT = 30.0
+_BEAT = struct.Struct('=i')
+
+
+class ReusePortServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server whose socket shares its port with the other workers.
+
+    Request threads are not daemonic, so closing the server waits for them.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def service_actions(self):
+        # Runs between requests and on every idle poll of serve_forever
+        now = time.monotonic()
+        fd = getattr(self, 'heartbeat_fd', None)
+        if fd is not None and now - getattr(self, '_last_beat', 0) >= HEARTBEAT_INTERVAL:
+            self._last_beat = now
+            try:
+                os.write(fd, _BEAT.pack(os.getpid()))
+            except BlockingIOError:
+                pass
+            except BrokenPipeError:
+                # The supervisor is gone; stop rather than serve unsupervised
+                self.heartbeat_fd = None
+                threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drain(self):
+        """Serve connections already queued on the socket, then close it."""
+        self.socket.setblocking(False)
+        while True:
+            try:
+                request, address = self.get_request()
+            except (BlockingIOError, InterruptedError):
+                break
+            request.setblocking(True)
+            if self.verify_request(request, address):
+                self.process_request(request, address)
+            else:
+                self.shutdown_request(request)
+        self.server_close()
+
+
+def run_worker(server):
+    """Serve until SIGTERM, then drain. Used inside a worker process."""
+    fd = os.environ.get(HEARTBEAT_ENV)
+    server.heartbeat_fd = int(fd) if fd else None
+    if fd:
+        os.set_blocking(server.heartbeat_fd, False)
+    # The supervisor decides when workers stop; Ctrl+C reaches it too
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+    server.drain()
+
+
+class Supervisor:
+    """Keeps ``workers`` copies of ``command`` running."""
+
+    def __init__(self, command, workers, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.command = command
+        self.workers = workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.slots = [None] * workers
+        self.beats = {}
+        self.failures = [0] * workers
+        self._reload = False
+        self._stop = False
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+
+    def _log(self, message):
+        print(f'[supervisor] {message}', flush=True)
+
+    def _spawn(self, slot):
+        env = dict(os.environ, **{HEARTBEAT_ENV: str(self._write_fd)})
+        process = subprocess.Popen(self.command, env=env, pass_fds=(self._write_fd,))
+        process.started = time.monotonic()
+        self.beats[process.pid] = None
+        self._log(f'worker {slot} started (pid {process.pid})')
+        return process
+
+    def _read_beats(self, timeout):
+        ready, _, _ = select.select([self._read_fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self._read_fd, 4096)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        for (pid,) in _BEAT.iter_unpack(data[:len(data) - len(data) % _BEAT.size]):
+            if pid in self.beats:
+                self.beats[pid] = now
+
+    def _stop_worker(self, process, timeout=DRAIN_TIMEOUT):
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._log(f'pid {process.pid} did not drain in {timeout:.0f} s, killing')
+                process.kill()
+                process.wait()
+        self.beats.pop(process.pid, None)
+
+    def _wait_ready(self, process):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline and process.poll() is None:
+            if self.beats.get(process.pid) is not None:
+                return True
+            self._read_beats(0.1)
+        return False
+
+    def _check(self):
+        now = time.monotonic()
+        for slot, process in enumerate(self.slots):
+            beat = self.beats.get(process.pid)
+            if process.poll() is not None:
+                self._log(f'worker {slot} (pid {process.pid}) exited with {process.returncode}')
+                # Back off when a worker keeps dying right after starting
+                self.failures[slot] = self.failures[slot] + 1 if now - process.started < 5 else 0
+                time.sleep(min(2 ** self.failures[slot] - 1, 30))
+            elif now - (beat if beat is not None else process.started) > self.heartbeat_timeout:
+                self._log(f'worker {slot} (pid {process.pid}) missed heartbeats, restarting')
+                process.kill()
+                process.wait()
+            else:
+                continue
+            self.beats.pop(process.pid, None)
+            self.slots[slot] = self._spawn(slot)
+
+    def rolling_restart(self):
+        self._log('rolling restart')
+        for slot, old in enumerate(self.slots):
+            new = self._spawn(slot)
+            if not self._wait_ready(new):
+                self._log(f'replacement for worker {slot} did not become ready, keeping pid {old.pid}')
+                self._stop_worker(new, timeout=5)
+                continue
+            self.slots[slot] = new
+            self._stop_worker(old)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, '_reload', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, '_stop', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, '_stop', True))
+        self.slots = [self._spawn(slot) for slot in range(self.workers)]
+        try:
+            while not self._stop:
+                self._read_beats(HEARTBEAT_INTERVAL)
+                if self._stop:
+                    break
+                if self._reload:
+                    self._reload = False
+                    self.rolling_restart()
+                self._check()
+        finally:
+            self._log('stopping workers')
+            for process in self.slots:
+                if process.poll() is None:
+                    process.terminate()
+            for process in self.slots:
+                self._stop_worker(process)
+        return 0
+
+
+def worker_command(*args):
+    """Command line running the server package as a worker."""
+    return [sys.executable, '-m', 'archsense', '--worker', *args]
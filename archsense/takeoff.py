@@ -0,0 +1,228 @@
+"""Quantity takeoff and cost estimation for plans.
+
+Quantities are always computed in bulk: the walls, openings, rooms and
+furniture of every plan in a batch are flattened into columns tagged with
+their plan index and aggregated with ``np.bincount`` / ``np.unique``. A
+single plan is just a batch of one. Prices are applied afterwards from a
+price table, so quantities can be cached independently of pricing.
+"""
+import numpy as np
+
+from archsense.model import plan_body
+
+FLOOR_FINISHES = {
+    'living': 'hardwood',
+    'bedroom': 'carpet',
+    'kitchen': 'porcelain-tile',
+    'bathroom': 'ceramic-tile',
+    'stair': 'concrete'
+}
+CEILING_FINISHES = {
+    'bathroom': 'moisture-board'
+}
+DEFAULT_FLOOR_FINISH = 'vinyl'
+DEFAULT_CEILING_FINISH = 'painted-plasterboard'
+DEFAULT_WALL_HEIGHT = 3000
+DEFAULT_WALL_THICKNESS = 200
+
+# Unit prices: per m² for wall area, floors and ceilings, per m³ for wall
+# volume, per item otherwise. 'kind:*' is the fallback for a kind.
+DEFAULT_PRICES = {
+    'wall:area': 45.0,
+    'wall:volume': 180.0,
+    'floor:hardwood': 85.0,
+    'floor:carpet': 35.0,
+    'floor:porcelain-tile': 60.0,
+    'floor:ceramic-tile': 55.0,
+    'floor:concrete': 25.0,
+    'floor:*': 40.0,
+    'ceiling:painted-plasterboard': 30.0,
+    'ceiling:moisture-board': 40.0,
+    'ceiling:*': 30.0,
+    'door:entrance': 1200.0,
+    'door:*': 350.0,
+    'window:*': 450.0,
+    'furniture:sofa_1': 1400.0,
+    'furniture:bed_queen': 900.0,
+    'furniture:bed_double': 750.0,
+    'furniture:refrigerator': 1100.0,
+    'furniture:*': 300.0
+}
+
+ITEM_KINDS = ('door', 'window', 'furniture')
+
+
+def _door_sku(door):
+    return f"{door.get('type', 'interior')}-{door.get('width', 0)}x{door.get('height', 0)}"
+
+
+def _window_sku(window):
+    return f"{window.get('width', 0)}x{window.get('height', 0)}"
+
+
+def _furniture_sku(item):
+    return item.get('catalogId') or item.get('name', item.get('type', 'item')).lower().replace(' ', '_')
+
+
+class _Codes(dict):
+    """Interns strings to dense integer codes."""
+
+    def code(self, value):
+        if value not in self:
+            self[value] = len(self)
+        return self[value]
+
+    def names(self):
+        return list(self)
+
+
+def quantities(plans):
+    """Takeoff quantities for a batch of plans, one dict per plan."""
+    bodies = [plan_body(p) for p in plans]
+    count = len(bodies)
+
+    walls = np.array([(i, w.get('x1', 0), w.get('y1', 0), w.get('x2', 0), w.get('y2', 0),
+                       w.get('height', DEFAULT_WALL_HEIGHT), w.get('thickness', DEFAULT_WALL_THICKNESS))
+                      for i, b in enumerate(bodies) for w in b.get('walls', [])], dtype=float).reshape(-1, 7)
+    w_plan = walls[:, 0].astype(np.int64)
+    w_len = np.hypot(walls[:, 3] - walls[:, 1], walls[:, 4] - walls[:, 2]) / 1000
+    w_height, w_thick = walls[:, 5] / 1000, walls[:, 6] / 1000
+
+    openings = np.array([(i, o.get('width', 0) * o.get('height', 0))
+                         for i, b in enumerate(bodies) for o in b.get('doors', []) + b.get('windows', [])],
+                        dtype=float).reshape(-1, 2)
+    o_plan = openings[:, 0].astype(np.int64)
+    o_area = openings[:, 1] / 1e6
+
+    wall_area = w_len * w_height
+    gross = np.bincount(w_plan, wall_area, minlength=count)
+    gross_volume = np.bincount(w_plan, wall_area * w_thick, minlength=count)
+    opening_area = np.bincount(o_plan, o_area, minlength=count)
+    length = np.bincount(w_plan, w_len, minlength=count)
+    # Openings are deducted at the plan's area-weighted mean wall thickness
+    mean_thickness = np.where(gross > 0, gross_volume / np.where(gross > 0, gross, 1), DEFAULT_WALL_THICKNESS / 1000)
+    net = np.maximum(gross - opening_area, 0)
+    net_volume = np.maximum(gross_volume - opening_area * mean_thickness, 0)
+
+    finishes = {'floor': _Codes(), 'ceiling': _Codes()}
+    floor_codes, ceiling_codes = finishes['floor'], finishes['ceiling']
+    rooms = np.array([(i, r.get('width', 0) * r.get('depth', 0),
+                       floor_codes.code(r.get('floor_finish', FLOOR_FINISHES.get(r.get('type'), DEFAULT_FLOOR_FINISH))),
+                       ceiling_codes.code(r.get('ceiling_finish', CEILING_FINISHES.get(r.get('type'), DEFAULT_CEILING_FINISH))))
+                      for i, b in enumerate(bodies) for r in b.get('rooms', [])], dtype=float).reshape(-1, 4)
+    r_plan = rooms[:, 0].astype(np.int64)
+    r_area = rooms[:, 1] / 1e6
+    r_floor, r_ceiling = rooms[:, 2].astype(np.int64), rooms[:, 3].astype(np.int64)
+
+    surfaces = {}
+    for surface, codes in (('floor', r_floor), ('ceiling', r_ceiling)):
+        n = max(len(finishes[surface]), 1)
+        surfaces[surface] = np.bincount(r_plan * n + codes, r_area, minlength=count * n).reshape(count, n)
+
+    skus = {kind: _Codes() for kind in ITEM_KINDS}
+    item_plan, item_kind, item_sku = [], [], []
+    for i, b in enumerate(bodies):
+        furniture = list(b.get('furniture', []))
+        for r in b.get('rooms', []):
+            furniture.extend(r.get('furniture', []))
+        for kind, items, sku in (('door', b.get('doors', []), _door_sku),
+                                 ('window', b.get('windows', []), _window_sku),
+                                 ('furniture', furniture, _furniture_sku)):
+            k = ITEM_KINDS.index(kind)
+            for item in items:
+                item_plan.append(i)
+                item_kind.append(k)
+                item_sku.append(skus[kind].code(sku(item)))
+    width = max([len(c) for c in skus.values()] + [1])
+    keys = (np.array(item_plan, dtype=np.int64) * len(ITEM_KINDS) + np.array(item_kind, dtype=np.int64)) * width \
+        + np.array(item_sku, dtype=np.int64)
+    unique_keys, counts = np.unique(keys, return_counts=True)
+
+    results = []
+    for i in range(count):
+        results.append({
+            'walls': {
+                'length': round(float(length[i]), 3),
+                'grossArea': round(float(gross[i]), 3),
+                'openingArea': round(float(opening_area[i]), 3),
+                'netArea': round(float(net[i]), 3),
+                'netVolume': round(float(net_volume[i]), 3)
+            },
+            'floors': {name: round(float(surfaces['floor'][i, c]), 3)
+                       for name, c in finishes['floor'].items() if surfaces['floor'][i, c] > 0},
+            'ceilings': {name: round(float(surfaces['ceiling'][i, c]), 3)
+                         for name, c in finishes['ceiling'].items() if surfaces['ceiling'][i, c] > 0},
+            'doors': {},
+            'windows': {},
+            'furniture': {}
+        })
+    names = {kind: skus[kind].names() for kind in ITEM_KINDS}
+    sections = {'door': 'doors', 'window': 'windows', 'furniture': 'furniture'}
+    for key, n in zip(unique_keys.tolist(), counts.tolist()):
+        plan_kind, sku = divmod(key, width)
+        i, k = divmod(plan_kind, len(ITEM_KINDS))
+        kind = ITEM_KINDS[k]
+        results[i][sections[kind]][names[kind][sku]] = n
+    return results
+
+
+def _unit_price(table, kind, sku):
+    for key in (f'{kind}:{sku}', f'{kind}:{sku.split("-")[0]}', f'{kind}:*'):
+        if key in table:
+            return float(table[key])
+    return 0.0
+
+
+def check_prices(prices):
+    """Raise ValueError unless ``prices`` is None or maps items to finite numbers."""
+    if prices is None:
+        return
+    if not isinstance(prices, dict):
+        raise ValueError("prices must map items such as 'floor:carpet' to unit prices")
+    for item, price in prices.items():
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not np.isfinite(price):
+            raise ValueError(f'The unit price of {item} must be a number')
+
+
+def estimate(takeoff, prices=None):
+    """Priced line items and total for one plan's takeoff quantities."""
+    table = dict(DEFAULT_PRICES, **(prices or {}))
+    lines = [
+        {'item': 'wall:area', 'quantity': takeoff['walls']['netArea'], 'unit': 'm2',
+         'unitPrice': float(table.get('wall:area', 0))},
+        {'item': 'wall:volume', 'quantity': takeoff['walls']['netVolume'], 'unit': 'm3',
+         'unitPrice': float(table.get('wall:volume', 0))}
+    ]
+    for kind, section in (('floor', 'floors'), ('ceiling', 'ceilings')):
+        for finish, area in takeoff[section].items():
+            lines.append({'item': f'{kind}:{finish}', 'quantity': area, 'unit': 'm2',
+                          'unitPrice': _unit_price(table, kind, finish)})
+    for kind, section in (('door', 'doors'), ('window', 'windows'), ('furniture', 'furniture')):
+        for sku, n in takeoff[section].items():
+            lines.append({'item': f'{kind}:{sku}', 'quantity': n, 'unit': 'each',
+                          'unitPrice': _unit_price(table, kind, sku)})
+    for line in lines:
+        line['cost'] = round(line['quantity'] * line['unitPrice'], 2)
+    return {'lines': lines, 'total': round(sum(line['cost'] for line in lines), 2)}
+
+
+def portfolio(takeoffs, prices=None, ids=None):
+    """Portfolio report over many plans' takeoffs: per-plan totals and summed quantities."""
+    ids = ids or list(range(len(takeoffs)))
+    totals = {'wallNetArea': 0.0, 'wallNetVolume': 0.0, 'floorArea': 0.0, 'doors': 0, 'windows': 0, 'furniture': 0}
+    plans = []
+    for plan_id, takeoff in zip(ids, takeoffs):
+        cost = estimate(takeoff, prices)['total']
+        plans.append({'id': plan_id, 'cost': cost})
+        totals['wallNetArea'] += takeoff['walls']['netArea']
+        totals['wallNetVolume'] += takeoff['walls']['netVolume']
+        totals['floorArea'] += sum(takeoff['floors'].values())
+        for section in ('doors', 'windows', 'furniture'):
+            totals[section] += sum(takeoff[section].values())
+    totals = {k: round(v, 3) if isinstance(v, float) else v for k, v in totals.items()}
+    return {
+        'plans': plans,
+        'count': len(plans),
+        'quantities': totals,
+        'totalCost': round(sum(p['cost'] for p in plans), 2)
+    }
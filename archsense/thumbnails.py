@@ -0,0 +1,339 @@
+"""Server-side 2D plan thumbnails and their content-addressed cache.
+
+A plan is reduced to a flat list of drawing primitives in plan millimetres
+(room fills, furniture footprints, walls, doors and windows of the ground
+floor), which is then written out as SVG or rasterized with NumPy and
+encoded as PNG with the standard library. Thumbnails are addressed by a
+hash of the primitives, renderer version, size and format, so identical
+plans share their images and a stored digest never changes meaning.
+"""
+import hashlib
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+
+from archsense.specs import ROOM_SPECS
+
+RENDERER_VERSION = 1
+SIZES = {
+    'small': (160, 120),
+    'medium': (320, 240),
+    'large': (640, 480)
+}
+FORMATS = ('png', 'svg')
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+PADDING = 0.05            # fraction of the image kept clear on each side
+
+BACKGROUND = 0xffffff
+DEFAULT_ROOM_COLOR = 0xf5f5f5
+FURNITURE_COLOR = 0xc8b89a
+WALL_COLOR = 0x333333
+DOOR_COLOR = 0xb5651d
+WINDOW_COLOR = 0x4fa3e0
+WALL_THICKNESS = 200
+
+
+def _rgb(color):
+    if isinstance(color, str):
+        color = int(color.lstrip('#'), 16)
+    return (int(color) >> 16) & 0xff, (int(color) >> 8) & 0xff, int(color) & 0xff
+
+
+def _horizontal(opening, walls):
+    """Whether an opening sits in a wall running along x."""
+    x, y = opening.get('x', 0), opening.get('y', 0)
+    for x1, y1, x2, y2, _ in walls:
+        if abs(y1 - y2) < 1 and abs(y - y1) < 1 and min(x1, x2) - 1 <= x <= max(x1, x2) + 1:
+            return True
+        if abs(x1 - x2) < 1 and abs(x - x1) < 1 and min(y1, y2) - 1 <= y <= max(y1, y2) + 1:
+            return False
+    return True
+
+
+def scene(plan):
+    """Drawing primitives of a plan's ground floor.
+
+    Returns ``(rects, lines)``: rects are ``(x, y, width, depth, fill)`` and
+    lines ``(x1, y1, x2, y2, thickness, color)``, all in plan millimetres.
+    """
+    def ground(items):
+        return [i for i in items if i.get('floor', 0) == 0]
+
+    rects, lines = [], []
+    rooms = ground(plan.get('rooms', []))
+    for room in rooms:
+        fill = room.get('floor_color', ROOM_SPECS.get(room.get('type'), {}).get('floor_color', DEFAULT_ROOM_COLOR))
+        rects.append((room['x'], room['y'], room['width'], room['depth'], fill))
+    for room in rooms:
+        for item in room.get('furniture', []):
+            # Furniture is stored room-local; quarter turns swap the footprint
+            turned = item.get('rotation', 0) % 180 == 90
+            width, depth = (item['depth'], item['width']) if turned else (item['width'], item['depth'])
+            rects.append((room['x'] + item['x'], room['y'] + item['y'], width, depth, FURNITURE_COLOR))
+
+    walls = [(w['x1'], w['y1'], w['x2'], w['y2'], w.get('thickness', WALL_THICKNESS))
+             for w in ground(plan.get('walls', []))]
+    lines.extend(w + (WALL_COLOR,) for w in walls)
+    for items, color in ((plan.get('doors', []), DOOR_COLOR), (plan.get('windows', []), WINDOW_COLOR)):
+        for o in ground(items):
+            x, y, width = o.get('x', 0), o.get('y', 0), o.get('width', 0)
+            end = (x + width, y) if _horizontal(o, walls) else (x, y + width)
+            lines.append((x, y) + end + (WALL_THICKNESS, color))
+    return rects, lines
+
+
+def digest(primitives, size, fmt):
+    """Content address of a thumbnail."""
+    payload = json.dumps([RENDERER_VERSION, size, fmt, primitives], separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _transform(rects, lines, width, height):
+    """Scale and offset mapping plan millimetres onto the image, centred."""
+    xs = [v for r in rects for v in (r[0], r[0] + r[2])] + [v for l in lines for v in (l[0], l[2])]
+    ys = [v for r in rects for v in (r[1], r[1] + r[3])] + [v for l in lines for v in (l[1], l[3])]
+    if not xs:
+        return 1.0, 0.0, 0.0
+    min_x, min_y = min(xs), min(ys)
+    extent_x, extent_y = max(max(xs) - min_x, 1), max(max(ys) - min_y, 1)
+    scale = min(width * (1 - 2 * PADDING) / extent_x, height * (1 - 2 * PADDING) / extent_y)
+    return scale, (width - extent_x * scale) / 2 - min_x * scale, (height - extent_y * scale) / 2 - min_y * scale
+
+
+def render_svg(primitives, width, height):
+    rects, lines = primitives
+    scale, dx, dy = _transform(rects, lines, width, height)
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}">',
+             f'<rect width="{width}" height="{height}" fill="#{BACKGROUND:06x}"/>',
+             f'<g transform="matrix({scale:.6g} 0 0 {scale:.6g} {dx:.3f} {dy:.3f})">']
+    for x, y, w, d, fill in rects:
+        parts.append(f'<rect x="{x}" y="{y}" width="{w}" height="{d}" fill="#{"%02x%02x%02x" % _rgb(fill)}"/>')
+    for x1, y1, x2, y2, thickness, color in lines:
+        parts.append(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="#{"%02x%02x%02x" % _rgb(color)}" '
+                     f'stroke-width="{thickness}" stroke-linecap="square"/>')
+    parts.append('</g></svg>')
+    return ''.join(parts).encode()
+
+
+def rasterize(primitives, width, height):
+    """RGB image (height, width, 3) of the primitives."""
+    # Imported here so serving stored thumbnails and URLs does not load NumPy
+    import numpy as np
+
+    rects, lines = primitives
+    scale, dx, dy = _transform(rects, lines, width, height)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = _rgb(BACKGROUND)
+
+    for x, y, w, d, fill in rects:
+        c0, c1 = int(round(x * scale + dx)), int(round((x + w) * scale + dx))
+        r0, r1 = int(round(y * scale + dy)), int(round((y + d) * scale + dy))
+        image[max(r0, 0):max(r1, 0), max(c0, 0):max(c1, 0)] = _rgb(fill)
+
+    for x1, y1, x2, y2, thickness, color in lines:
+        ax, ay, bx, by = x1 * scale + dx, y1 * scale + dy, x2 * scale + dx, y2 * scale + dy
+        half = max(thickness * scale / 2, 0.5)
+        # Pixels whose centre lies within half the stroke of the segment
+        c0, c1 = max(int(min(ax, bx) - half), 0), min(int(max(ax, bx) + half) + 1, width)
+        r0, r1 = max(int(min(ay, by) - half), 0), min(int(max(ay, by) + half) + 1, height)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        px = np.arange(c0, c1) + 0.5
+        py = (np.arange(r0, r1) + 0.5)[:, None]
+        sx, sy = bx - ax, by - ay
+        t = np.clip(((px - ax) * sx + (py - ay) * sy) / max(sx * sx + sy * sy, 1e-9), 0, 1)
+        near = np.hypot(px - (ax + t * sx), py - (ay + t * sy)) <= half
+        image[r0:r1, c0:c1][near] = _rgb(color)
+    return image
+
+
+def encode_png(image):
+    """Encode an RGB uint8 image as PNG."""
+    import numpy as np
+
+    height, width = image.shape[:2]
+    rows = np.hstack([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * 3)])
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)),
+        chunk(b'IEND', b'')
+    ])
+
+
+def render(primitives, size, fmt):
+    width, height = SIZES[size]
+    if fmt == 'svg':
+        return render_svg(primitives, width, height)
+    return encode_png(rasterize(primitives, width, height))
+
+
+def _keys(digests):
+    return [key for formats in digests.values() for key in formats.values()]
+
+
+class ThumbnailStore:
+    """Rendered thumbnails by digest, plus the digests of each project's latest plan.
+
+    ``submit`` queues a stored plan version for a background worker thread;
+    ``render_plan`` does the same work synchronously. Blobs are kept in an
+    LRU bounded by ``maxsize`` entries; those of a project's latest plan are
+    never evicted, so listed URLs always resolve.
+
+    With a ``directory``, blobs and latest-plan digests are also written to
+    disk and read back on a miss, so worker processes share thumbnails.
+    """
+
+    def __init__(self, maxsize=4096, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        if directory:
+            os.makedirs(os.path.join(directory, 'latest'), exist_ok=True)
+        self.rendered = 0
+        self._blobs = OrderedDict()
+        self._latest = {}
+        # Latest plans pinning each blob; plans with identical drawings share blobs
+        self._pinned = Counter()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def submit(self, plan):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+                self._worker.start()
+        self._queue.put(plan)
+
+    def join(self):
+        """Block until every submitted plan has been rendered."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            plan = self._queue.get()
+            try:
+                self.render_plan(plan)
+            except Exception as e:
+                print(f"Thumbnail rendering failed for plan {plan.get('id')}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def render_plan(self, plan):
+        """Render every size and format of a stored plan version that is not cached yet."""
+        body = plan.get('planJson', plan)
+        primitives = scene(body.get('plan', body))
+        digests = {}
+        for size in SIZES:
+            digests[size] = {}
+            for fmt in FORMATS:
+                key = digest(primitives, size, fmt)
+                with self._lock:
+                    cached = key in self._blobs
+                if not cached and self.directory:
+                    cached = os.path.exists(os.path.join(self.directory, key))
+                if not cached:
+                    self._store(key, render(primitives, size, fmt))
+                digests[size][fmt] = key
+
+        project_id, version = plan.get('projectId'), plan.get('version', 0)
+        with self._lock:
+            # A slower render of an older version must not replace a newer one
+            if project_id not in self._latest or version >= self._latest[project_id][0]:
+                self._pinned.update(_keys(digests))
+                if project_id in self._latest:
+                    for key in _keys(self._latest[project_id][1]):
+                        self._pinned[key] -= 1
+                        if self._pinned[key] <= 0:
+                            del self._pinned[key]
+                self._latest[project_id] = (version, digests)
+        if self.directory:
+            current = self._read_latest(project_id)
+            if current is None or version >= current[0]:
+                self._write(self._latest_path(project_id), json.dumps([version, digests]).encode())
+        return digests
+
+    def _latest_path(self, project_id):
+        name = hashlib.sha256(str(project_id).encode()).hexdigest()
+        return os.path.join(self.directory, 'latest', f'{name}.json')
+
+    def _read_latest(self, project_id):
+        try:
+            with open(self._latest_path(project_id), 'rb') as f:
+                return tuple(json.loads(f.read()))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        # Write then rename, so other processes never read a partial file
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+    def _store(self, key, blob):
+        if self.directory:
+            self._write(os.path.join(self.directory, key), blob)
+        with self._lock:
+            self.rendered += 1
+            self._remember(key, blob)
+
+    def _remember(self, key, blob):
+        self._blobs[key] = blob
+        if len(self._blobs) > self.maxsize:
+            for old in list(self._blobs):
+                if old not in self._pinned and old != key:
+                    del self._blobs[old]
+                    if len(self._blobs) <= self.maxsize:
+                        break
+
+    def get(self, key):
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+                return blob
+        if not self.directory or len(key) != 64 or not all(c in '0123456789abcdef' for c in key):
+            return None
+        try:
+            with open(os.path.join(self.directory, key), 'rb') as f:
+                blob = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._remember(key, blob)
+        return blob
+
+    def urls(self, project_id, prefix='/api/thumbnails/'):
+        """Thumbnail URLs ``{size: {format: url}}`` of a project's latest rendered plan, or None."""
+        if self.directory:
+            # Another process may have rendered a newer version
+            entry = self._read_latest(project_id)
+        else:
+            with self._lock:
+                entry = self._latest.get(project_id)
+        if entry is None:
+            return None
+        return {size: {fmt: f'{prefix}{key}.{fmt}' for fmt, key in formats.items()}
+                for size, formats in entry[1].items()}
+
+    def shrink(self, keep):
+        """Drop least recently used blobs until at most ``keep`` are left, never those of a latest plan."""
+        with self._lock:
+            unpinned = [key for key in self._blobs if key not in self._pinned]
+            dropped = unpinned[:max(len(self._blobs) - keep, 0)]
+            for key in dropped:
+                del self._blobs[key]
+        return len(dropped)
+
+    def __len__(self):
+        return len(self._blobs)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark what access logging costs the request path.
+
+Starts ``python -m archsense`` with the access log off, written to a file,
+and written to stderr piped into a slow collector (a reader draining the
+pipe at ``COLLECTOR_RATE`` bytes/s), then drives ``GET /api/projects``
+from client threads for a fixed time and reports throughput, latency
+percentiles and the records the server dropped. A synchronous logger
+stalls behind the slow collector once the pipe buffer fills.
+
+Usage: python benchmarks/accesslog.py [seconds] [clients]
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTOR_RATE = 20000
+COLLECTOR = ('import sys, time\n'
+             f'while sys.stdin.buffer.read(2000): time.sleep(2000 / {COLLECTOR_RATE})\n')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return json.loads(urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read())
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def request(port):
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        s.sendall(b'GET /api/projects HTTP/1.0\r\nHost: localhost\r\nX-User-Id: dev-user-1\r\n\r\n')
+        while s.recv(65536):
+            pass
+
+
+def drive(port, seconds, clients):
+    latencies = []
+
+    def client():
+        mine = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            request(port)
+            mine.append(time.perf_counter() - started)
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def measure(mode, seconds, clients):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        collector = None
+        stderr = subprocess.DEVNULL
+        log = {'off': 'off', 'file': os.path.join(tmp, 'access.jsonl'), 'slow stderr': '-'}[mode]
+        if mode == 'slow stderr':
+            collector = subprocess.Popen([sys.executable, '-c', COLLECTOR], stdin=subprocess.PIPE)
+            stderr = collector.stdin
+        server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port), '--subsystems', 'none',
+                                   '--access-log', log], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            wait_ready(port)
+            latencies = drive(port, seconds, clients)
+            health = wait_ready(port)
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+            if collector is not None:
+                collector.kill()
+                collector.wait()
+    return latencies, health.get('accessLog', {}).get('dropped', 0)
+
+
+def percentile(values, p):
+    return values[min(int(len(values) * p), len(values) - 1)] * 1000
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f'{os.cpu_count()} CPUs, {clients} client threads, {seconds:.0f} s per run, '
+          f'slow collector at {COLLECTOR_RATE / 1000:.0f} kB/s')
+    for mode in ('off', 'file', 'slow stderr'):
+        latencies, dropped = measure(mode, seconds, clients)
+        print(f'{mode:12s} {len(latencies) / seconds:7.0f} req/s  p50 {percentile(latencies, 0.5):6.2f} ms  '
+              f'p99 {percentile(latencies, 0.99):7.2f} ms  max {latencies[-1] * 1000:7.1f} ms  {dropped} dropped')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Benchmark streaming NDJSON export and import on a multi-GB synthetic dump.
+
+Records are generated on demand, so the benchmark's own memory stays
+small; peak RSS is reported after each phase to show it does not grow
+with the dump.
+
+Usage: python benchmarks/bulk.py [size-in-MB]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.bulk import READ_SIZE, chunks, export_lines, import_lines, iter_lines, read_body, write_chunked
+from archsense.furniture import furnish_plan
+
+from daylight import site_plan
+
+
+class SyntheticPlans:
+    """Sequence of stored plan versions built on access."""
+
+    def __init__(self, count, plan_json):
+        self.count = count
+        self.plan_json = plan_json
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return {'id': f'plan-{i}', 'projectId': f'project-{i // 5}', 'version': i % 5 + 1,
+                'planJson': self.plan_json, 'constraintsJson': {}, 'cameraStateJson': {},
+                'createdAt': '2024-01-01T00:00:00'}
+
+    def tail(self, start):
+        return (self[i] for i in range(start, self.count))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    plan = site_plan()
+    furnish_plan(plan)
+    record_size = len(next(export_lines([('plan', SyntheticPlans(1, plan))])))
+    plans = SyntheticPlans(target * 1024 * 1024 // record_size, plan)
+    print(f'{len(plans)} plan records of {record_size} bytes, baseline peak RSS {peak_rss_mb():.0f} MB')
+
+    # The dump is stored chunk-framed, exactly as it crosses the wire in both directions
+    with tempfile.NamedTemporaryFile(suffix='.ndjson') as dump:
+        with open(dump.name, 'wb', buffering=READ_SIZE) as out:
+            start = time.perf_counter()
+            write_chunked(out, chunks(export_lines([('plan', plans)])))
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(dump.name)
+        print(f'export {size / 1e6:.0f} MB in {elapsed:.1f} s ({size / 1e6 / elapsed:.0f} MB/s), '
+              f'peak RSS {peak_rss_mb():.0f} MB')
+
+        applied = [0]
+
+        def apply(batch):
+            applied[0] += len(batch)
+
+        with open(dump.name, 'rb') as rfile:
+            start = time.perf_counter()
+            summary = import_lines(iter_lines(read_body(rfile, {'Transfer-Encoding': 'chunked'})), apply)
+        elapsed = time.perf_counter() - start
+        print(f'import {size / 1e6:.0f} MB in {elapsed:.1f} s ({size / 1e6 / elapsed:.0f} MB/s), '
+              f'{applied[0]} records in {summary["batches"]} batches, peak RSS {peak_rss_mb():.0f} MB')
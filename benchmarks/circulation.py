@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Benchmark circulation analysis on synthetic multi-floor plans.
+
+Each floor is a grid of 4m x 4m rooms with doors between horizontal
+neighbours and down every column, plus a stair core stacked on all floors.
+
+Usage: python benchmarks/circulation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.circulation import analyze
+
+ROOM = 4000
+TYPES = ['living', 'kitchen', 'bedroom', 'bathroom', 'bedroom']
+
+
+def building(floors, cols, rows):
+    rooms, doors = [], []
+    for f in range(floors):
+        for r in range(rows):
+            for c in range(cols):
+                room_type = 'stair' if (r, c) == (0, 0) else TYPES[(r * cols + c) % len(TYPES)]
+                rooms.append({'id': f'f{f}_r{r}_c{c}', 'type': room_type, 'floor': f,
+                              'x': c * ROOM, 'y': r * ROOM, 'width': ROOM, 'depth': ROOM})
+                if c + 1 < cols:
+                    doors.append({'x': (c + 1) * ROOM, 'y': r * ROOM + 1000, 'width': 900, 'floor': f})
+                if r + 1 < rows:
+                    doors.append({'x': c * ROOM + 1000, 'y': (r + 1) * ROOM, 'width': 900, 'floor': f})
+    doors.append({'x': 1000, 'y': 0, 'width': 900, 'type': 'entrance', 'floor': 0})
+    return {'rooms': rooms, 'doors': doors}
+
+
+if __name__ == '__main__':
+    for floors, cols, rows in ((1, 4, 2), (4, 6, 5), (10, 8, 6), (20, 10, 8)):
+        plan = building(floors, cols, rows)
+        start = time.perf_counter()
+        result = analyze(plan, include_matrix=True)
+        elapsed = time.perf_counter() - start
+        print(f'{floors:2d} floors {len(plan["rooms"]):5d} rooms {len(plan["doors"]):5d} doors  '
+              f'{elapsed * 1000:9.1f} ms  unreachable={len(result["unreachable"])}')
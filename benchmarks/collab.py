@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark a collaborative editing session: operation throughput and fan-out latency.
+
+Starts ``python -m archsense`` with the collab subsystem, creates a project
+whose plan has one room per editor and has editor processes join its
+session. Each editor sends batches of ``move_room`` operations for its own
+room at a steady pace while long-polling for the others' changes. An
+operation carries its send time as the room's x, so each received change
+gives the latency from the last operation it folds in to its arrival at
+another editor. Clients share the machine's cores with the server, so
+os.cpu_count() is printed.
+
+Usage: python benchmarks/collab.py [seconds] [editors] [ops per batch] [batches per second]
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def call(port, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data, method=method)
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def editor(task):
+    port, project, number, seconds, per_batch, rate, start = task
+    session = f'/api/projects/{project}/session'
+    joined = call(port, 'POST', session, {})
+    participant, seq = joined['participant'], joined['seq']
+    own = f'room-{number}'
+    latencies = []
+    stop = threading.Event()
+
+    def poll():
+        nonlocal seq
+        while not stop.is_set():
+            update = call(port, 'GET', f'{session}/updates?participant={participant}&after={seq}&wait=2')
+            now = time.time() * 1000
+            seq = update['seq']
+            for change in update.get('changes', ()):
+                if change[0] == 'set' and change[2] != own:
+                    latencies.append(now - change[3]['x'])
+
+    poller = threading.Thread(target=poll)
+    time.sleep(max(start - time.time(), 0))
+    poller.start()
+    sent = batches = 0
+    interval = 1 / rate
+    next_batch = time.monotonic()
+    deadline = next_batch + seconds
+    while next_batch < deadline:
+        ops = [{'op': 'move_room', 'id': own, 'x': time.time() * 1000} for _ in range(per_batch)]
+        call(port, 'POST', f'{session}/ops', {'participant': participant, 'ops': ops})
+        sent += per_batch
+        batches += 1
+        next_batch += interval
+        time.sleep(max(next_batch - time.monotonic(), 0))
+    stop.set()
+    poller.join()
+    call(port, 'POST', f'{session}/leave', {'participant': participant})
+    return sent, batches, latencies
+
+
+def percentile(values, p):
+    return values[min(int(len(values) * p), len(values) - 1)] if values else float('nan')
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    editors = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    per_batch = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    rate = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port), '--subsystems', 'collab'],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        project = call(port, 'POST', '/api/projects', {'name': 'Collaboration benchmark'})['id']
+        rooms = [{'id': f'room-{i}', 'type': 'bedroom', 'x': 0, 'y': 5000 * i, 'width': 4000, 'depth': 4000}
+                 for i in range(editors)]
+        call(port, 'POST', f'/api/projects/{project}/plans', {'version': 1, 'planJson': {'rooms': rooms}})
+        start = time.time() + 1
+        with Pool(editors) as pool:
+            results = pool.map(editor, [(port, project, n, seconds, per_batch, rate, start) for n in range(editors)])
+        time.sleep(0.5)  # the last participant leaving triggers the final checkpoint
+        version = call(port, 'GET', f'/api/projects/{project}/plans/latest')['version']
+    finally:
+        server.terminate()
+        server.wait()
+    sent = sum(r[0] for r in results)
+    batches = sum(r[1] for r in results)
+    latencies = sorted(x for r in results for x in r[2])
+    print(f'{os.cpu_count()} CPUs, {editors} editors, {per_batch} ops x {rate:g} batches/s each, {seconds:.0f} s')
+    print(f'applied {sent} ops in {batches} requests: {sent / seconds:.0f} ops/s, {batches / seconds:.0f} requests/s')
+    print(f'fan-out: {len(latencies)} changes received, latency p50 {percentile(latencies, 0.5):.1f} ms  '
+          f'p95 {percentile(latencies, 0.95):.1f} ms  p99 {percentile(latencies, 0.99):.1f} ms')
+    print(f'checkpoints stored: {version - 1}')
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Benchmark daylight analysis of a fully built 10m x 15m plan at several resolutions.
+
+Usage: python benchmarks/daylight.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.daylight import analyze, encode_heatmap
+
+
+def site_plan(width=10000, depth=15000, cols=3, rows=4):
+    """Grid of rooms covering the whole site with a window on every exterior edge."""
+    rooms, walls, windows = [], [], []
+    room_w, room_d = width // cols, depth // rows
+    for r in range(rows):
+        for c in range(cols):
+            x, y = c * room_w, r * room_d
+            rooms.append({'id': f'room_{r}_{c}', 'type': 'bedroom', 'x': x, 'y': y, 'width': room_w, 'depth': room_d})
+            walls += [{'x1': x, 'y1': y, 'x2': x + room_w, 'y2': y}, {'x1': x, 'y1': y, 'x2': x, 'y2': y + room_d}]
+            if r == 0:
+                windows.append({'x': x + 500, 'y': 0, 'width': 1500, 'height': 1200})
+            if r == rows - 1:
+                windows.append({'x': x + 500, 'y': y + room_d, 'width': 1500, 'height': 1200})
+            if c == 0:
+                windows.append({'x': 0, 'y': y + 500, 'width': 1200, 'height': 1200})
+            if c == cols - 1:
+                windows.append({'x': x + room_w, 'y': y + 500, 'width': 1200, 'height': 1200})
+    walls += [{'x1': width, 'y1': 0, 'x2': width, 'y2': depth}, {'x1': 0, 'y1': depth, 'x2': width, 'y2': depth}]
+    return {'rooms': rooms, 'walls': walls, 'windows': windows}
+
+
+if __name__ == '__main__':
+    plan = site_plan()
+    for resolution in (200, 100, 50):
+        start = time.perf_counter()
+        result = analyze(plan, resolution=resolution)
+        analysed = time.perf_counter()
+        encode_heatmap(result)
+        encoded = time.perf_counter()
+        grid = result['grid']
+        print(f'{resolution:4d} mm  {grid["columns"]}x{grid["rows"]} cells  {len(plan["windows"])} windows  '
+              f'analysis {(analysed - start) * 1000:7.1f} ms  heatmap {(encoded - analysed) * 1000:5.1f} ms')
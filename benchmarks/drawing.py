@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Benchmark importing large CAD drawings: parse throughput and peak memory.
+
+Writes a DXF and an SVG floor plate of ``rows`` x ``columns`` rooms drawn
+the way architects draw them: walls as pairs of face lines with gaps for
+doors, door leaves and swing arcs, hatching lines inside the walls'
+thickness and a text label per room. Each file is then parsed in a fresh
+process, once streamed in ``BLOCK`` sized reads as the import endpoint
+does and once from the whole file in memory, and the report gives MB/s,
+the process's peak RSS above its baseline and how long ``build_plan``
+takes to turn the line work into walls and rooms.
+
+Usage: python benchmarks/drawing.py [rows] [columns]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archsense.drawing import build_plan, read_dxf, read_svg  # noqa: E402
+
+BLOCK = 64 * 1024
+WIDTH, DEPTH, WALL = 4200, 3700, 200
+LABELS = ('Bedroom', 'Kitchen', 'Living Room', 'Bath', 'Office', 'Store')
+
+
+def shapes(rows, columns):
+    """Lines (x1, y1, x2, y2) and labels (x, y, text) of the floor plate, in mm with y up."""
+    half = WALL / 2
+
+    def faces(length, cells, offset, door_in):
+        # The two faces of a wall line at ``offset``, broken at junctions and doors
+        for cell in range(cells):
+            start, end = cell * length + half, (cell + 1) * length - half
+            pieces = [(start, end)]
+            if door_in(cell):
+                middle = (start + end) / 2
+                pieces = [(start, middle - 450), (middle + 450, end)]
+                yield 'leaf', (middle - 450, offset + half, middle - 450, offset + half + 900)
+            for a, b in pieces:
+                yield 'face', (a, offset - half, b, offset - half)
+                yield 'face', (a, offset + half, b, offset + half)
+                for x in range(int(a) + 150, int(b), 300):
+                    yield 'hatch', (x, offset - half, x + 150, offset + half)
+
+    for row in range(rows + 1):
+        interior = 0 < row < rows
+        for kind, (x1, y1, x2, y2) in faces(WIDTH, columns, row * DEPTH,
+                                            lambda c: interior or (row == 0 and c == 0)):
+            yield kind, (x1, y1, x2, y2)
+    for column in range(columns + 1):
+        interior = 0 < column < columns
+        for kind, (y1, x1, y2, x2) in faces(DEPTH, rows, column * WIDTH, lambda r: interior):
+            yield kind, (x1, y1, x2, y2)
+    for row in range(rows):
+        for column in range(columns):
+            label = f'{LABELS[(row + column) % len(LABELS)]} {row * columns + column + 1}'
+            yield 'label', ((column + 0.5) * WIDTH, (row + 0.5) * DEPTH, label)
+
+
+def write_dxf(path, rows, columns):
+    with open(path, 'w') as f:
+        f.write('  0\nSECTION\n  2\nHEADER\n  9\n$INSUNITS\n 70\n4\n  0\nENDSEC\n  0\nSECTION\n  2\nENTITIES\n')
+        for kind, shape in shapes(rows, columns):
+            if kind == 'label':
+                x, y, text = shape
+                f.write(f'  0\nTEXT\n  8\nTEXT\n 10\n{x:.1f}\n 20\n{y:.1f}\n 30\n0.0\n 40\n250.0\n  1\n{text}\n')
+                continue
+            x1, y1, x2, y2 = shape
+            layer = {'face': 'A-WALL', 'leaf': 'A-DOOR', 'hatch': 'A-WALL-PATT'}[kind]
+            if kind == 'leaf':
+                f.write(f'  0\nARC\n  8\n{layer}\n 10\n{x1:.1f}\n 20\n{y1:.1f}\n 30\n0.0\n 40\n900.0\n'
+                        f' 50\n0.0\n 51\n90.0\n')
+            if x1 == x2:
+                f.write(f'  0\nLWPOLYLINE\n  8\n{layer}\n 90\n2\n 70\n0\n 10\n{x1:.1f}\n 20\n{y1:.1f}\n'
+                        f' 10\n{x2:.1f}\n 20\n{y2:.1f}\n')
+            else:
+                f.write(f'  0\nLINE\n  8\n{layer}\n 10\n{x1:.1f}\n 20\n{y1:.1f}\n 30\n0.0\n'
+                        f' 11\n{x2:.1f}\n 21\n{y2:.1f}\n 31\n0.0\n')
+        f.write('  0\nENDSEC\n  0\nEOF\n')
+
+
+def write_svg(path, rows, columns):
+    # In cm, y down, with walls on an Inkscape layer
+    width, depth = columns * WIDTH / 10 + 20, rows * DEPTH / 10 + 20
+    with open(path, 'w') as f:
+        f.write(f'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg" '
+                f'xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" width="{width * 10:.0f}mm" '
+                f'height="{depth * 10:.0f}mm" viewBox="-10 -10 {width:.0f} {depth:.0f}">\n'
+                f'<g inkscape:label="Walls" transform="translate(0,{rows * DEPTH / 10}) scale(0.1,-0.1)">\n')
+        for kind, shape in shapes(rows, columns):
+            if kind == 'label':
+                x, y, text = shape
+                f.write(f'<text x="{x:.1f}" y="{-y:.1f}" transform="scale(1,-1)" font-size="250">'
+                        f'<tspan>{text}</tspan></text>\n')
+            elif kind == 'leaf':
+                x1, y1, x2, y2 = shape
+                f.write(f'<path d="M{x1:.1f},{y1:.1f} L{x2:.1f},{y2:.1f} A900,900 0 0 1 {x1 + 900:.1f},{y1:.1f}"/>\n')
+            else:
+                f.write('<line x1="%.1f" y1="%.1f" x2="%.1f" y2="%.1f" stroke="#000"/>\n' % shape)
+        f.write('</g>\n</svg>\n')
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse(task):
+    """Parse and build in this (fresh) process; returns timings and peak RSS growth in MB."""
+    path, streamed = task
+    reader = read_svg if path.endswith('.svg') else read_dxf
+    baseline = maxrss()
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        blocks = iter(lambda: f.read(BLOCK), b'') if streamed else [f.read()]
+        drawing = reader(blocks)
+    parsed = time.perf_counter() - started
+    parse_peak = maxrss() - baseline
+    started = time.perf_counter()
+    plan, summary = build_plan(drawing)
+    built = time.perf_counter() - started
+    return parsed, parse_peak, built, maxrss() - baseline, summary
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    context = get_context('spawn')
+    print(f'{rows} x {columns} rooms of {WIDTH} x {DEPTH} mm, {BLOCK // 1024} KiB reads')
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in (('plate.dxf', write_dxf), ('plate.svg', write_svg)):
+            path = os.path.join(tmp, name)
+            write(path, rows, columns)
+            size = os.path.getsize(path) / 1e6
+            for streamed in (True, False):
+                with context.Pool(1) as pool:
+                    parsed, parse_peak, built, peak, summary = pool.apply(parse, ((path, streamed),))
+                print(f"{name[-3:]} {size:6.1f} MB {'streamed' if streamed else 'in memory':9s} "
+                      f"parse {parsed:5.2f} s {size / parsed:5.1f} MB/s  peak +{parse_peak:6.1f} MB  "
+                      f"build {built:5.2f} s (peak +{peak:6.1f} MB)  {summary['segments']} segments -> "
+                      f"{summary['walls']} walls, {summary['rooms']} rooms, {summary['openings']} openings")
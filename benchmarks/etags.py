@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Benchmark conditional GETs on an editor workload that keeps re-fetching.
+
+Starts ``python -m archsense``, creates projects with a large latest plan
+and has client threads act as editors: each navigation fetches a
+project and its latest plan, and one in ``EDIT_EVERY`` saves a new plan
+version first. The run is made once with clients that ignore ETags and
+once with clients that keep the last response per URL and revalidate
+with If-None-Match, and reports throughput, latency, bytes received and
+the server's CPU time per request (clients share the machine, so
+throughput alone understates the difference).
+
+With several workers the records live in a fresh SQLite store each run.
+
+Usage: python benchmarks/etags.py [seconds] [clients] [projects] [workers]
+"""
+import json
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EDIT_EVERY = 20
+ROOMS = 60
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def plan(rng):
+    rooms = []
+    for i in range(ROOMS):
+        x, y = 4000 * (i % 10), 4000 * (i // 10)
+        furniture = [{'type': 'Queen Bed', 'x': x + 500, 'y': y + 500, 'width': 1530, 'depth': 2030, 'rotation': 0},
+                     {'type': 'Nightstand', 'x': x + 2200, 'y': y + 500, 'width': 500, 'depth': 400, 'rotation': 90}]
+        rooms.append({'id': f'room-{i}', 'type': rng.choice(('bedroom', 'living', 'kitchen', 'bathroom')),
+                      'x': x, 'y': y, 'width': 3800, 'depth': 3800, 'furniture': furniture})
+    walls = [{'x1': r['x'], 'y1': r['y'], 'x2': r['x'] + 3800, 'y2': r['y'], 'thickness': 150} for r in rooms]
+    return {'plan': {'rooms': rooms, 'walls': walls, 'doors': [], 'windows': []}, 'score': rng.random()}
+
+
+def request(port, method, path, body=None, etag=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    head = f'{method} {path} HTTP/1.0\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n'
+    if etag:
+        head += f'If-None-Match: {etag}\r\n'
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        s.sendall((head + '\r\n').encode() + data)
+        response = b''
+        while chunk := s.recv(262144):
+            response += chunk
+    headers, _, payload = response.partition(b'\r\n\r\n')
+    tag = next((line.split(b':', 1)[1].strip().decode() for line in headers.split(b'\r\n')
+                if line.lower().startswith(b'etag:')), None)
+    return int(headers[9:12]), tag, payload, len(response)
+
+
+def drive(port, projects, seconds, clients, conditional):
+    totals = {'requests': 0, 'bytes': 0, 'not modified': 0, 'latencies': []}
+    lock = threading.Lock()
+
+    def editor(number):
+        rng = random.Random(number)
+        cache = {}
+        received = requests = not_modified = 0
+        latencies = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            project = rng.choice(projects)
+            if rng.randrange(EDIT_EVERY) == 0:
+                request(port, 'POST', f'/api/projects/{project}/plans',
+                        {'version': rng.randrange(2, 10 ** 6), 'planJson': plan(rng)})
+            for path in (f'/api/projects/{project}', f'/api/projects/{project}/plans/latest'):
+                etag = cache[path][0] if conditional and path in cache else None
+                started = time.perf_counter()
+                status, tag, payload, size = request(port, 'GET', path, etag=etag)
+                latencies.append(time.perf_counter() - started)
+                received += size
+                requests += 1
+                if status == 304:
+                    not_modified += 1
+                elif tag:
+                    cache[path] = (tag, payload)
+        with lock:
+            totals['requests'] += requests
+            totals['bytes'] += received
+            totals['not modified'] += not_modified
+            totals['latencies'] += latencies
+
+    threads = [threading.Thread(target=editor, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totals['latencies'].sort()
+    return totals
+
+
+def measure(seconds, clients, count, workers, conditional):
+    port = free_port()
+    tmp = tempfile.TemporaryDirectory()
+    store = ['--workers', str(workers), '--store', tmp.name + '/store.db'] if workers > 1 else []
+    server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port), '--subsystems', 'none',
+                               '--access-log', 'off', *store],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cpu = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        wait_ready(port)
+        time.sleep(1)  # let every worker bind
+        rng = random.Random(0)
+        projects = []
+        for i in range(count):
+            project = json.loads(request(port, 'POST', '/api/projects', {'name': f'House {i}'})[2])['id']
+            request(port, 'POST', f'/api/projects/{project}/plans', {'version': 1, 'planJson': plan(rng)})
+            projects.append(project)
+        totals = drive(port, projects, seconds, clients, conditional)
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+        tmp.cleanup()
+    # Includes the workers, which the server has waited for; seeding is counted too
+    used = resource.getrusage(resource.RUSAGE_CHILDREN)
+    totals['cpu'] = used.ru_utime + used.ru_stime - cpu.ru_utime - cpu.ru_stime
+    return totals
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    print(f'{os.cpu_count()} CPUs, {workers} worker(s), {clients} editors, {count} projects of {ROOMS} rooms, '
+          f'1 edit per {EDIT_EVERY} navigations, {seconds:.0f} s per run')
+    for conditional in (False, True):
+        totals = measure(seconds, clients, count, workers, conditional)
+        latencies = totals['latencies']
+        print(f"{'If-None-Match' if conditional else 'unconditional':14s} {totals['requests'] / seconds:6.0f} GET/s  "
+              f"p50 {latencies[len(latencies) // 2] * 1000:5.2f} ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms  "
+              f"{totals['bytes'] / totals['requests'] / 1024:6.1f} KiB/GET  "
+              f"{totals['not modified'] / totals['requests']:4.0%} 304  "
+              f"server CPU {totals['cpu'] / totals['requests'] * 1000:5.2f} ms/GET")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Benchmark 3D export size and time with and without furniture instancing.
+
+Builds a plan of ``rooms`` rooms (bedrooms, kitchens, bathrooms and living
+rooms on a grid, with walls) furnished by the layout solver, then exports
+it as GLB with every instancing mode, as embedded glTF and as OBJ. For
+each it reports the size, the gzipped size and the median export time,
+both with the furniture mesh cache warm and cleared before every export.
+
+Usage: python benchmarks/export3d.py [rooms] [runs]
+"""
+import gzip
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archsense import export3d  # noqa: E402
+from archsense.furniture import furnish_plan  # noqa: E402
+
+TYPES = ('bedroom', 'bedroom', 'kitchen', 'bathroom', 'living')
+ROOM = 4500
+
+
+def building(count):
+    columns = 10
+    rows = -(-count // columns)
+    rooms = [{'id': f'room-{i}', 'type': TYPES[i % len(TYPES)], 'x': ROOM * (i % columns),
+              'y': ROOM * (i // columns), 'width': ROOM, 'depth': ROOM, 'furniture': []} for i in range(count)]
+    walls = [{'x1': 0, 'y1': ROOM * r, 'x2': ROOM * columns, 'y2': ROOM * r, 'thickness': 200}
+             for r in range(rows + 1)]
+    walls += [{'x1': ROOM * c, 'y1': 0, 'x2': ROOM * c, 'y2': ROOM * rows, 'thickness': 200}
+              for c in range(columns + 1)]
+    plan = {'rooms': rooms, 'walls': walls, 'doors': [], 'windows': []}
+    furnish_plan(plan)
+    return plan
+
+
+def timed(fn, runs, cold):
+    times = []
+    for _ in range(runs):
+        if cold:
+            export3d.meshes.clear()
+        started = time.perf_counter()
+        data = fn()
+        times.append(time.perf_counter() - started)
+    return data, statistics.median(times) * 1000
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    plan = building(count)
+    items = sum(len(r['furniture']) for r in plan['rooms'])
+    kinds = len({export3d.MeshCache.key(i) for r in plan['rooms'] for i in r['furniture']})
+    print(f'{count} rooms, {len(plan["walls"])} walls, {items} furniture placements of {kinds} meshes, '
+          f'median of {runs} runs')
+    cases = [(f'glb {mode}', lambda mode=mode: export3d.export_gltf(plan, True, mode)) for mode in export3d.INSTANCING]
+    cases += [('gltf nodes', lambda: export3d.export_gltf(plan, False, 'nodes')),
+              ('obj', lambda: export3d.export_obj(plan))]
+    for name, fn in cases:
+        data, warm = timed(fn, runs, cold=False)
+        _, cold = timed(fn, runs, cold=True)
+        print(f'{name:11s} {len(data) / 1024:8.1f} KiB  gzip {len(gzip.compress(data)) / 1024:7.1f} KiB  '
+              f'{warm:7.1f} ms (mesh cache cleared: {cold:7.1f} ms)')
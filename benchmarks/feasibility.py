@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Benchmark the layout feasibility precheck on a mixed corpus of requests.
+
+Generates ``count`` layout requests, half of them feasible and the rest
+broken in one way each: rooms whose minimum areas exceed the site, a
+room wider than the site, a site too small for a stair core, adjacency
+across pinned floors, a room with more required neighbours than its
+walls allow, and adjacency that is not planar (a K5 or K3,3 among the
+rooms). Every request is checked ``runs`` times and the report gives the
+median and p99 time per kind, whether each kind was classified as
+intended, and for comparison how long the multi-floor solver takes on a
+feasible request.
+
+Usage: python benchmarks/feasibility.py [count] [runs]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from itertools import combinations
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archsense.feasibility import check  # noqa: E402
+from archsense.multifloor import generate_building  # noqa: E402
+
+
+def feasible(rng):
+    floors = rng.choice((1, 1, 2, 3))
+    width, depth = rng.randrange(12000, 20001, 500), rng.randrange(12000, 24001, 500)
+    rooms = [{'type': 'living'}, {'type': 'kitchen'}, {'type': 'bathroom', 'count': rng.randint(1, 2)},
+             {'type': 'bedroom', 'count': rng.randint(1, 3)}]
+    adjacency = [['living', 'kitchen'], ['bedroom_1', 'bathroom_1']]
+    return {'rooms': rooms, 'siteWidthMm': width, 'siteDepthMm': depth, 'floors': floors, 'adjacency': adjacency}
+
+
+def too_small(rng):
+    request = feasible(rng)
+    request.update(floors=1, siteWidthMm=6000, siteDepthMm=rng.randrange(5000, 8000, 500))
+    request['rooms'].append({'type': 'bedroom', 'count': rng.randint(2, 5)})
+    return request
+
+
+def too_wide(rng):
+    request = feasible(rng)
+    request['rooms'].append({'type': 'living', 'id': 'hall', 'width': request['siteWidthMm'] + 3000,
+                             'depth': request['siteDepthMm'] + 1000})
+    return request
+
+
+def no_core(rng):
+    request = feasible(rng)
+    request.update(floors=2, siteWidthMm=rng.randrange(3000, 4800, 100))
+    return request
+
+
+def cross_floor(rng):
+    request = feasible(rng)
+    request['floors'] = 2
+    request['rooms'] += [{'type': 'dining', 'id': 'dining', 'floor': 0}, {'type': 'study', 'id': 'study', 'floor': 1}]
+    request['adjacency'].append(['dining', 'study'])
+    return request
+
+
+def crowded(rng):
+    request = feasible(rng)
+    request['rooms'].append({'type': 'bathroom', 'id': 'wc', 'width': 1200, 'depth': 1500})
+    request['rooms'].append({'type': 'bedroom', 'count': 7})
+    request['adjacency'] += [['wc', f'bedroom_{i}'] for i in range(1, 8)]
+    return request
+
+
+def non_planar(rng):
+    request = feasible(rng)
+    request['rooms'].append({'type': 'bedroom', 'count': 6})
+    names = [f'bedroom_{i}' for i in range(1, 7)]
+    if rng.random() < 0.5:
+        pairs = combinations(['living', 'kitchen'] + names[:3], 2)
+    else:
+        pairs = ((a, b) for a in ('living', 'kitchen', 'bathroom_1') for b in names[:3])
+    request['adjacency'] = [list(pair) for pair in pairs]
+    return request
+
+
+KINDS = {'feasible': (feasible, None), 'area': (too_small, 'area'), 'dimension': (too_wide, 'dimension'),
+         'core': (no_core, 'core'), 'crossFloor': (cross_floor, 'crossFloor'), 'degree': (crowded, 'degree'),
+         'nonPlanar': (non_planar, 'nonPlanar')}
+
+
+def corpus(count, rng):
+    broken = [kind for kind in KINDS if kind != 'feasible']
+    requests = []
+    for i in range(count):
+        kind = 'feasible' if i % 2 == 0 else broken[(i // 2) % len(broken)]
+        requests.append((kind, KINDS[kind][0](rng)))
+    return requests
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    requests = corpus(count, random.Random(0))
+    times = {kind: [] for kind in KINDS}
+    right = {kind: 0 for kind in KINDS}
+    for kind, request in requests:
+        report = check(request)
+        expected = KINDS[kind][1]
+        codes = {reason['code'] for reason in report['reasons']}
+        right[kind] += report['feasible'] if expected is None else expected in codes
+        for _ in range(runs):
+            started = time.perf_counter()
+            check(request)
+            times[kind].append(time.perf_counter() - started)
+    print(f'{count} requests, each checked {runs} times')
+    for kind, samples in times.items():
+        samples.sort()
+        total = len(samples) // runs
+        print(f'{kind:10s} {total:5d} requests  median {statistics.median(samples) * 1e6:6.1f} us  '
+              f'p99 {samples[int(len(samples) * 0.99)] * 1e6:6.1f} us  classified as intended {right[kind]}/{total}')
+    solved = []
+    for kind, request in requests[:40:2]:
+        started = time.perf_counter()
+        generate_building(request['rooms'], request['siteWidthMm'], request['siteDepthMm'],
+                          max(request['floors'], 2), workers=1)
+        solved.append(time.perf_counter() - started)
+    print(f'for comparison, the multi-floor solver takes {statistics.median(solved) * 1000:.1f} ms per feasible '
+          f'request (median of {len(solved)})')
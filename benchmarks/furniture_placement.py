@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmark the vectorized furniture placement solver.
+
+Usage: python benchmarks/furniture_placement.py [repeats]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.furniture import FURNITURE_CATALOG, furnish_plan, place_furniture
+
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_room(count, repeats):
+    # A large open-plan room filled from every catalog category
+    pool = [item for items in FURNITURE_CATALOG.values() for item in items]
+    items = [pool[i % len(pool)] for i in range(count)]
+    room = {'x': 0, 'y': 0, 'width': 12000, 'depth': 9000}
+    doors = [{'x': 5000, 'y': 0, 'width': 900}, {'x': 0, 'y': 4000, 'width': 900}]
+    windows = [{'x': 1000, 'y': 9000, 'width': 1500}, {'x': 12000, 'y': 2000, 'width': 1500}]
+    elapsed, (placed, unplaced) = timed(lambda: place_furniture(room, items, doors, windows), repeats)
+    print(f'room   {count:3d} items  {elapsed * 1000:8.2f} ms  placed={len(placed)} unplaced={len(unplaced)}')
+
+
+def house(rooms_per_type):
+    rooms, doors = [], []
+    sizes = {'living': (5000, 3500), 'kitchen': (4000, 2500), 'bedroom': (3500, 3000), 'bathroom': (2000, 2000)}
+    x = 0
+    for room_type, (width, depth) in sizes.items():
+        for i in range(rooms_per_type):
+            rooms.append({'id': f'{room_type}_{i}', 'type': room_type, 'x': x, 'y': 0, 'width': width, 'depth': depth})
+            doors.append({'x': x + 300, 'y': depth, 'width': 900})
+            x += width
+    return {'rooms': rooms, 'doors': doors, 'windows': []}
+
+
+def bench_house(rooms_per_type, repeats):
+    elapsed, unplaced = timed(lambda: furnish_plan(house(rooms_per_type)), repeats)
+    print(f'house  {rooms_per_type * 4:3d} rooms  {elapsed * 1000:8.2f} ms  rooms with unplaced items={len(unplaced)}')
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for count in (10, 20, 30):
+        bench_room(count, repeats)
+    for rooms_per_type in (2, 10, 25):
+        bench_house(rooms_per_type, repeats)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Benchmark batch layout scoring on randomly jittered candidate plans.
+
+Usage: python benchmarks/layout_scoring.py [candidates]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.scoring import pack, score_batch
+
+BASE = [
+    ('living', 0, 0, 5000, 3500), ('kitchen', 5000, 0, 4000, 2500), ('bathroom', 5000, 2500, 2000, 2000),
+    ('bedroom', 0, 3500, 3500, 3000), ('bedroom', 3500, 3500, 3500, 3000), ('bedroom', 7000, 3500, 3000, 3000),
+    ('bathroom', 7000, 2500, 2000, 2000)
+]
+
+
+def candidates(count, seed=0):
+    rng = np.random.default_rng(seed)
+    jitter = rng.integers(-5, 6, size=(count, len(BASE), 2)) * 100
+    plans = []
+    for c in range(count):
+        rooms = [{'type': t, 'x': x, 'y': y, 'width': int(w + jitter[c, i, 0]), 'depth': int(d + jitter[c, i, 1])}
+                 for i, (t, x, y, w, d) in enumerate(BASE)]
+        plans.append({'rooms': rooms})
+    return plans
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    plans = candidates(count)
+    start = time.perf_counter()
+    batch = pack(plans, 10000, 15000)
+    packed = time.perf_counter()
+    scores = score_batch(batch)
+    scored = time.perf_counter()
+    print(f'{count} candidates: pack {(packed - start) * 1000:.1f} ms, score {(scored - packed) * 1000:.1f} ms, '
+          f'best total {scores["total"].max():.4f}')
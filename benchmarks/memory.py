@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Benchmark memory accounting: what tracing costs and whether the budget holds.
+
+Starts ``python -m archsense`` three times with ``projects`` projects whose
+latest plans have ``ROOMS`` rooms:
+
+* with tracemalloc off, on with 1 frame and on with 10 frames, reporting
+  GET throughput for latest plans and the time ``/api/admin/memory``
+  takes with store sizes and without;
+* once more, reading every project's latest plan and its takeoff to warm
+  up, then emptying the caches and setting the budget ``headroom`` MiB
+  above the RSS left, before reading on so the caches grow past it. The
+  watchdog's RSS samples and shrinks are printed as a timeline, with the
+  cache sizes at the end.
+
+Usage: python benchmarks/memory.py [projects] [seconds] [headroom]
+"""
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOMS = 200
+MIB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def call(port, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def start(args):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port), '--access-log', 'off', *args],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            call(port, 'GET', '/api/health')
+            return server, port
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('server did not start')
+
+
+def stop(server):
+    server.send_signal(signal.SIGINT)
+    server.wait()
+
+
+def plan(rng):
+    rooms = [{'id': f'room-{i}', 'type': rng.choice(('bedroom', 'living', 'kitchen', 'bathroom')),
+              'x': 4000 * (i % 20), 'y': 4000 * (i // 20), 'width': 3800, 'depth': 3800,
+              'furniture': [{'type': 'Queen Bed', 'x': 4000 * (i % 20) + 500, 'y': 4000 * (i // 20) + 500,
+                             'width': 1530, 'depth': 2030, 'rotation': 0}]} for i in range(ROOMS)]
+    walls = [{'x1': r['x'], 'y1': r['y'], 'x2': r['x'] + 3800, 'y2': r['y'], 'thickness': 150} for r in rooms]
+    return {'rooms': rooms, 'walls': walls, 'doors': [], 'windows': []}
+
+
+def seed(port, count):
+    rng = random.Random(0)
+    projects = []
+    for i in range(count):
+        project = call(port, 'POST', '/api/projects', {'name': f'House {i}'})['id']
+        call(port, 'POST', f'/api/projects/{project}/plans', {'version': 1, 'planJson': plan(rng)})
+        projects.append(project)
+    return projects
+
+
+def reads(port, projects, seconds):
+    count = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        call(port, 'GET', f'/api/projects/{projects[count % len(projects)]}/plans/latest')
+        count += 1
+    return count / seconds
+
+
+def timed(fn, runs=5):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def tracing_cost(count, seconds):
+    for frames in (0, 1, 10):
+        server, port = start(['--subsystems', 'none', '--tracemalloc', str(frames)])
+        try:
+            projects = seed(port, count)
+            throughput = reads(port, projects, seconds)
+            full = timed(lambda: call(port, 'GET', '/api/admin/memory?top=10'))
+            light = timed(lambda: call(port, 'GET', '/api/admin/memory?top=10&sizes=0'))
+            report = call(port, 'GET', '/api/admin/memory?top=1')
+        finally:
+            stop(server)
+        traced = report['tracemalloc'].get('traced', 0) / MIB
+        print(f"tracemalloc {'off' if not frames else f'{frames:2d} frames':9s} {throughput:6.0f} GET/s  "
+              f"report {full:7.1f} ms (without sizes {light:6.1f} ms)  RSS {report['rss'] / MIB:6.1f} MiB  "
+              f"traced {traced:6.1f} MiB  plans {report['stores']['plan']['bytes'] / MIB:6.1f} MiB")
+
+
+def budget(count, seconds, headroom):
+    server, port = start(['--subsystems', 'takeoff'])
+    try:
+        projects = seed(port, count)
+
+        def read(project):
+            call(port, 'GET', f'/api/projects/{project}/plans/latest')
+            call(port, 'POST', f'/api/projects/{project}/plans/latest/takeoff', {'region': 'AU'})
+
+        # One pass to warm the heap, then empty the caches: what is left is what the records need
+        for project in projects:
+            read(project)
+        full = call(port, 'GET', '/api/admin/memory?top=1')
+        call(port, 'POST', '/api/admin/memory', {'shrink': 0})
+        baseline = call(port, 'GET', '/api/admin/memory?sizes=0')['rss'] / MIB
+        limit = baseline + headroom
+        call(port, 'POST', '/api/admin/memory', {'budget': limit})
+        deadline = time.monotonic() + seconds
+        index = 0
+        while time.monotonic() < deadline:
+            read(projects[index % len(projects)])
+            index += 1
+        report = call(port, 'GET', '/api/admin/memory?top=1')
+    finally:
+        stop(server)
+    cached = sum(cache['bytes'] for cache in full['caches'].values()) / MIB
+    watchdog = report['watchdog']
+    print(f'budget {limit:.0f} MiB: {baseline:.0f} MiB with empty caches + {headroom:.0f} MiB; full caches hold '
+          f'{cached:.1f} MiB (RSS {full["rss"] / MIB:.0f} MiB); {index} plan and takeoff reads in {seconds:.0f} s, '
+          f'{watchdog["shrinks"]} shrinks')
+    events = list(watchdog['events'])
+    first = watchdog['samples'][0][0] if watchdog['samples'] else 0
+    for ts, size in watchdog['samples']:
+        note = ''
+        if events and abs(events[0]['ts'] - ts) < 0.5:
+            event = events.pop(0)
+            note = (f"  shrink: dropped {event['dropped']} entries in {event['ms']} ms, "
+                    f"RSS {event['rssAfter'] / MIB:.1f} MiB")
+        print(f'  {ts - first:6.1f} s  RSS {size / MIB:6.1f} MiB{" over" if size > limit * MIB else "     "}{note}')
+    print('  caches at the end: ' + ', '.join(f"{name} {cache['entries']} ({cache['bytes'] / MIB:.1f} MiB)"
+                                              for name, cache in report['caches'].items()))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    headroom = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(f'{count} projects of {ROOMS} rooms, {os.cpu_count()} CPUs')
+    tracing_cost(count, min(seconds, 10))
+    budget(count, seconds, headroom)
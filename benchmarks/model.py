@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Benchmark memory and construction time of compact plan elements against plain dicts.
+
+Plans are generated multi-floor buildings, furnished, as stored by the server.
+
+Usage: python benchmarks/model.py [plans]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.model import ELEMENTS, compact_plan, expand_plan
+from archsense.multifloor import generate_building
+
+
+def measure(build, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    plans = [build(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return plans, size / count, elapsed / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    template = generate_building([], 12000, 16000, 3, workers=1)[0]
+    text = json.dumps(template)
+    print(f'{len(template["rooms"])} rooms, {sum(len(r.get("furniture", [])) for r in template["rooms"])} '
+          f'furniture items, {len(template["walls"])} walls per plan')
+
+    elements = json.dumps({k: template[k] for k in ELEMENTS})
+    for label, source in (('whole plan', text), ('element lists', elements)):
+        _, dict_size, dict_time = measure(lambda i: json.loads(source), count)
+        compact, compact_size, compact_time = measure(lambda i: compact_plan(json.loads(source)), count)
+        start = time.perf_counter()
+        for plan in compact[:100]:
+            expand_plan(plan)
+        expand_time = (time.perf_counter() - start) / 100
+        print(f'{label}:')
+        print(f'  dicts:   {dict_size / 1024:6.1f} KiB/plan  build {dict_time * 1000:5.2f} ms/plan')
+        print(f'  compact: {compact_size / 1024:6.1f} KiB/plan  build {compact_time * 1000:5.2f} ms/plan  '
+              f'({dict_size / compact_size:.1f}x smaller), to JSON {expand_time * 1000:.2f} ms/plan')
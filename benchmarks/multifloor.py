@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Benchmark multi-floor generation: serial vs one worker process per floor.
+
+Usage: python benchmarks/multifloor.py [floors]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.multifloor import generate_building
+
+ROOMS = ['living', 'kitchen', {'type': 'bedroom', 'count': 9}, {'type': 'bathroom', 'count': 4}]
+
+
+def timed(floors, workers, repeats=3):
+    generate_building(ROOMS, 12000, 18000, floors, workers=workers)  # warm the pool
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_building(ROOMS, 12000, 18000, floors, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    floors = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    single = timed(1, 1)
+    serial = timed(floors, 1)
+    parallel = timed(floors, min(floors, os.cpu_count() or 1))
+    print(f'1 floor:                      {single * 1000:8.1f} ms')
+    print(f'{floors} floors, serial:            {serial * 1000:8.1f} ms')
+    print(f'{floors} floors, {min(floors, os.cpu_count() or 1)} worker processes: {parallel * 1000:8.1f} ms')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark requests/sec of CPU-bound layout generation against worker count.
+
+Starts complete-server.py in supervisor mode for each worker count and
+drives POST /api/layout/generate from client processes for a fixed time.
+Scaling is bounded by the cores available; os.cpu_count() is printed.
+
+Usage: python benchmarks/prefork.py [seconds] [workers ...]
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def client(task):
+    port, seconds = task
+    body = json.dumps({'rooms': []}).encode()
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/api/layout/generate', data=body,
+                                         headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(request, timeout=60).read()
+        done += 1
+    return done
+
+
+def measure(workers, seconds):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'complete-server.py'), '--workers', str(workers),
+                                   '--port', str(port), '--store', os.path.join(tmp, 'store.db')],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port)
+            time.sleep(1)  # let every worker bind
+            with Pool(workers * 2) as pool:
+                counts = pool.map(client, [(port, seconds)] * (workers * 2))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+    return sum(counts) / seconds
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    counts = [int(w) for w in sys.argv[2:]] or [1, 2, 4]
+    print(f'{os.cpu_count()} CPUs')
+    baseline = None
+    for workers in counts:
+        rate = measure(workers, seconds)
+        baseline = baseline or rate
+        print(f'{workers} workers: {rate:7.1f} req/s  ({rate / baseline:.2f}x)')
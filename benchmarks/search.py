@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark project search at scale: indexing, query latency and incremental updates.
+
+Indexes synthetic projects, each with a latest plan of random composition,
+then times representative queries (median and worst of repeated runs) and
+single project and plan updates.
+
+Usage: python benchmarks/search.py [projects]
+"""
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.search import SearchIndex
+from archsense.store import MemoryRecords
+
+WORDS = ('villa', 'cabin', 'loft', 'cottage', 'house', 'studio', 'retreat', 'haven', 'lakeside', 'hillside',
+         'urban', 'garden', 'family', 'courtyard', 'north', 'south', 'east', 'west', 'sunny', 'quiet')
+STYLES = ('modern', 'rustic', 'coastal', 'minimal', 'classic', 'industrial')
+FURNITURE = ('sofa', 'bed', 'table', 'desk', 'wardrobe', 'bathtub', 'shower', 'piano', 'bookshelf')
+QUERIES = {
+    'everything, with facets': {},
+    'one word': {'text': 'villa'},
+    'two words': {'text': 'lakeside villa'},
+    'prefix': {'text': 'cott*'},
+    '3 bedrooms 2 baths': {'text': '3 bedrooms 2 baths'},
+    'style + site range': {'filters': {'stylePreset': ['modern', 'minimal']},
+                           'ranges': {'siteWidthMm': (10000, 14000)}},
+    'area range, by area': {'ranges': {'area': (80, 150)}, 'sort': '-area'},
+    'word + rooms + range': {'text': 'garden piano 2+ bedrooms', 'ranges': {'siteDepthMm': (12000, None)}},
+}
+
+
+def project(i, rng):
+    return {
+        'id': f'p{i}',
+        'userId': 'dev-user-1',
+        'name': ' '.join(rng.sample(WORDS, 2)).title() + f' {rng.randint(1, 50)}',
+        'stylePreset': rng.choice(STYLES),
+        'siteWidthMm': rng.randrange(6000, 20001, 500),
+        'siteDepthMm': rng.randrange(8000, 30001, 500),
+        'floors': 1
+    }
+
+
+def plan(i, rng, version=1):
+    rooms = [{'type': 'living', 'area': rng.uniform(14, 40)}, {'type': 'kitchen', 'area': rng.uniform(7, 20)}]
+    rooms += [{'type': 'bedroom', 'area': rng.uniform(10, 20)} for _ in range(rng.randint(1, 5))]
+    rooms += [{'type': 'bathroom', 'area': rng.uniform(3, 8)} for _ in range(rng.randint(1, 3))]
+    rooms[0]['furniture'] = [{'type': f} for f in rng.sample(FURNITURE, 2)]
+    return {'id': f'v{i}-{version}', 'projectId': f'p{i}', 'version': version, 'planJson': {'rooms': rooms}}
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return result, times[len(times) // 2] * 1000, times[-1] * 1000
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(1)
+    index = SearchIndex()
+    index.sync(MemoryRecords(), MemoryRecords())
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for i in range(count):
+        index.add_project(project(i, rng))
+        index.add_plan(plan(i, rng))
+    elapsed = time.perf_counter() - started
+    grown = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024
+    print(f'indexed {count} projects in {elapsed:.1f} s ({elapsed / count * 1e6:.1f} us each), '
+          f'peak RSS +{grown:.0f} MB')
+
+    for label, query in QUERIES.items():
+        result, median, worst = timed(lambda: index.search(**query), 7)
+        print(f'{label:26s} {result["total"]:8d} hits  median {median:7.2f} ms  max {worst:7.2f} ms')
+        result, median, _ = timed(lambda: index.search(facets=False, **query), 7)
+        print(f'{"  without facets":26s} {"":8s}       median {median:7.2f} ms')
+
+    _, median, worst = timed(lambda: index.add_project(dict(project(7, rng), name='Renamed Observatory')), 101)
+    print(f'project update             median {median * 1000:7.1f} us  max {worst * 1000:7.1f} us')
+    version = iter(range(2, 1000))
+    _, median, worst = timed(lambda: index.add_plan(plan(7, rng, next(version))), 101)
+    print(f'plan update                median {median * 1000:7.1f} us  max {worst * 1000:7.1f} us')
+    print('renamed project found:', index.search('observatory')['total'] == 1)
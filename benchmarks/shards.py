@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark throughput of a multi-tenant workload against shard count.
+
+Starts ``python -m archsense`` with several front workers, first on the
+shared SQLite store and then with the records sharded over N shard
+processes, seeds it through a bulk import with many tenants and drives a
+mix of reads and writes, each request acting as a random tenant, from
+client processes for a fixed time. A last run grows from two shards to
+four under load, to show what a live rebalance costs. Everything shares
+the machine's cores, so os.cpu_count() is printed.
+
+Usage: python benchmarks/shards.py [seconds] [front workers] [shard counts ...]
+"""
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archsense.shards import rebalance, wait_ready as wait_shards
+
+TENANTS = 500
+PROJECTS = 4
+CLIENTS = 8
+PLAN = {'rooms': [{'id': f'room-{i}', 'type': kind, 'x': 3000 * i, 'y': 0, 'width': 3000, 'depth': 4000}
+                  for i, kind in enumerate(('living', 'kitchen', 'bedroom', 'bedroom', 'bathroom'))]}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def seed(port):
+    lines = []
+    for tenant in range(TENANTS):
+        for i in range(PROJECTS):
+            project = {'id': f't{tenant}-p{i}', 'userId': f'tenant-{tenant}', 'name': f'House {i}', 'floors': 1}
+            lines.append(json.dumps({'kind': 'project', 'data': project}))
+    for tenant in range(TENANTS):
+        for i in range(PROJECTS):
+            plan = {'id': f't{tenant}-p{i}-v1', 'projectId': f't{tenant}-p{i}', 'version': 1, 'planJson': PLAN}
+            lines.append(json.dumps({'kind': 'plan', 'data': plan}))
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/api/bulk/import', data='\n'.join(lines).encode())
+    summary = json.loads(urllib.request.urlopen(request, timeout=300).read())
+    assert not summary['error'], summary
+
+
+def request(port, method, path, user, body=None):
+    # Raw sockets keep the client side cheap, since it competes with the server for CPU
+    data = json.dumps(body).encode() if body is not None else b''
+    head = (f'{method} {path} HTTP/1.0\r\nHost: localhost\r\nX-User-Id: {user}\r\n'
+            f'Content-Length: {len(data)}\r\n\r\n').encode()
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        s.sendall(head + data)
+        response = b''
+        while chunk := s.recv(65536):
+            response += chunk
+    return response[9:12]
+
+
+def client(task):
+    port, seconds, number = task
+    rng = random.Random(number)
+    done = failed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        tenant = rng.randrange(TENANTS)
+        user = f'tenant-{tenant}'
+        project = f't{tenant}-p{rng.randrange(PROJECTS)}'
+        roll = rng.random()
+        if roll < 0.55:
+            status = request(port, 'GET', '/api/projects', user)
+        elif roll < 0.85:
+            status = request(port, 'GET', f'/api/projects/{project}/plans/latest', user)
+        elif roll < 0.97:
+            status = request(port, 'POST', f'/api/projects/{project}/plans', user,
+                             {'version': rng.randrange(2, 1000), 'planJson': PLAN})
+        else:
+            status = request(port, 'POST', '/api/projects', user, {'name': 'Extension'})
+        if status in (b'200', b'201'):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def measure(workers, shards, seconds, grow_to=None):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'store.db')
+        server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port), '--workers', str(workers),
+                                   '--shards', str(shards), '--store', store, '--subsystems', 'bulk'],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        extra = []
+        try:
+            wait_ready(port)
+            time.sleep(1)  # let every worker bind
+            seed(port)
+            moved = []
+            if grow_to:
+                def grow():
+                    time.sleep(seconds / 3)
+                    directory = store + '.shards'
+                    extra.extend(subprocess.Popen([sys.executable, '-m', 'archsense.shards', 'serve', directory,
+                                                   str(shard)], cwd=ROOT) for shard in range(shards, grow_to))
+                    wait_shards(directory, grow_to)
+                    started = time.perf_counter()
+                    moved.append((len(rebalance(directory, grow_to)), time.perf_counter() - started))
+                threading.Thread(target=grow, daemon=True).start()
+            with Pool(CLIENTS) as pool:
+                results = pool.map(client, [(port, seconds, n) for n in range(CLIENTS)])
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+            for process in extra:
+                process.terminate()
+                process.wait()
+    return sum(r[0] for r in results) / seconds, sum(r[1] for r in results), moved
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    counts = [int(n) for n in sys.argv[3:]] or [1, 2, 4]
+    print(f'{os.cpu_count()} CPUs, {workers} front workers, {CLIENTS} client processes, '
+          f'{TENANTS} tenants x {PROJECTS} projects, {seconds:.0f} s per run')
+    rate, failed, _ = measure(workers, 0, seconds)
+    print(f'shared SQLite store: {rate:7.1f} req/s  ({failed} failed)')
+    for shards in counts:
+        rate, failed, _ = measure(workers, shards, seconds)
+        print(f'{shards} shard(s):          {rate:7.1f} req/s  ({failed} failed)')
+    rate, failed, moved = measure(workers, 2, seconds, grow_to=4)
+    print(f'2 -> 4 shards live:   {rate:7.1f} req/s  ({failed} failed); '
+          + (f'{moved[0][0]} slots moved in {moved[0][1] * 1000:.0f} ms' if moved else 'rebalance did not finish'))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Load test of public share pages served by a single server process.
+
+Starts ``python -m archsense`` as one process, publishes a generated plan
+and drives GET /share/<slug> from client processes for a fixed time, once
+as first-time visitors (200 with the full page) and once as revisits
+carrying the page's ETag (304). Clients share the machine with the server,
+so os.cpu_count() is printed.
+
+Usage: python benchmarks/share.py [seconds] [clients]
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def call(port, path, data=None):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(data).encode() if data is not None else None)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.headers, response.read()
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return call(port, '/api/health')
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('server did not start')
+
+
+def publish(port):
+    _, body = call(port, '/api/projects', {'name': 'Load test'})
+    project_id = json.loads(body)['id']
+    _, body = call(port, '/api/layout/generate', {'rooms': []})
+    call(port, f'/api/projects/{project_id}/plans', {'planJson': json.loads(body), 'version': 1})
+    _, body = call(port, f'/api/projects/{project_id}/publish', {})
+    path = json.loads(body)['shareUrl']
+    headers, _ = call(port, path)
+    return path, headers['ETag']
+
+
+def client(task):
+    # Raw sockets keep the client side cheap, since it competes with the server for CPU
+    port, path, etag, seconds = task
+    request = f'GET {path} HTTP/1.0\r\nHost: localhost\r\n'
+    if etag:
+        request += f'If-None-Match: {etag}\r\n'
+    request = (request + '\r\n').encode()
+    expected = b' 304 ' if etag else b' 200 '
+    done = failed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        with socket.create_connection(('127.0.0.1', port)) as s:
+            s.sendall(request)
+            response = b''
+            while chunk := s.recv(65536):
+                response += chunk
+        if response[8:13] == expected:
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f'{os.cpu_count()} CPUs, {clients} client processes, {seconds:.0f} s per run')
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'archsense', '--port', str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        path, etag = publish(port)
+        for label, tag in (('first visits (200)', None), ('revisits (304)', etag)):
+            with Pool(clients) as pool:
+                results = pool.map(client, [(port, path, tag, seconds)] * clients)
+            done = sum(r[0] for r in results)
+            failed = sum(r[1] for r in results)
+            print(f'{label:20s} {done / seconds:8.0f} hits/s  ({failed} unexpected responses)')
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Benchmark cold-start time to first response of the server configurations.
+
+Compares lazily loaded subsystems (the default) with preloading them, as
+every server did before, and with no optional subsystems at all.
+
+Usage: python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.server import measure_startup, parse_config
+
+CONFIGURATIONS = {
+    'all subsystems, preloaded': ['--preload'],
+    'all subsystems, lazy': [],
+    'no subsystems': ['--subsystems', 'none'],
+}
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    summary = {}
+    for label, args in CONFIGURATIONS.items():
+        results = measure_startup(parse_config(args), runs)
+        summary[label] = {k: statistics.median(r[k] for r in results) for k in results[0]}
+        print()
+    for label, medians in summary.items():
+        print(f'{label:28s} ' + ', '.join(f'{k} {v * 1000:7.1f} ms' for k, v in medians.items()))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Benchmark columnar bulk takeoff and portfolio costing.
+
+Usage: python benchmarks/takeoff.py [plans]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.multifloor import generate_building
+from archsense.takeoff import portfolio, quantities
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    templates = [generate_building([], 12000, 16000, floors, workers=1)[0] for floors in (2, 3, 4)]
+    plans = [{'id': str(i), 'projectId': str(i), 'version': 1, 'planJson': templates[i % len(templates)]}
+             for i in range(count)]
+
+    start = time.perf_counter()
+    single = [quantities([p])[0] for p in plans[:200]]
+    per_plan = (time.perf_counter() - start) / len(single)
+
+    start = time.perf_counter()
+    takeoffs = quantities(plans)
+    computed = time.perf_counter()
+    report = portfolio(takeoffs)
+    priced = time.perf_counter()
+    print(f'{count} plans: bulk quantities {(computed - start):.2f} s, portfolio pricing {(priced - computed):.2f} s, '
+          f'total cost {report["totalCost"]:,.0f}')
+    print(f'one-at-a-time estimate for {count} plans: {per_plan * count:.2f} s')
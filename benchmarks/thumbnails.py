@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Benchmark thumbnail rendering of a furnished 10m x 15m plan and listing lookups.
+
+Usage: python benchmarks/thumbnails.py [projects]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archsense.furniture import furnish_plan
+from archsense.thumbnails import FORMATS, SIZES, ThumbnailStore, render, scene
+
+from daylight import site_plan
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    plan = site_plan()
+    furnish_plan(plan)
+    primitives = scene(plan)
+    for size in SIZES:
+        for fmt in FORMATS:
+            start = time.perf_counter()
+            blob = render(primitives, size, fmt)
+            print(f'{size:6s} {fmt}  {len(blob):6d} bytes  {(time.perf_counter() - start) * 1000:6.1f} ms')
+
+    store = ThumbnailStore()
+    start = time.perf_counter()
+    for i in range(count):
+        store.render_plan({'id': f'plan-{i}', 'projectId': f'project-{i}', 'version': 1, 'planJson': plan})
+    rendered = time.perf_counter()
+    for i in range(count):
+        store.urls(f'project-{i}')
+    listed = time.perf_counter()
+    print(f'{count} projects sharing one plan: render {(rendered - start) * 1000:.1f} ms '
+          f'({store.rendered} images), listing URLs {(listed - rendered) * 1000:.1f} ms')